@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException, Response
-from app.services.ai_core import model, clean_json
+from app.services.ai_core import generar, clean_json
 from app.services.prompts import RUBRIC_PROMPT, ASSESSMENT_PROMPT
 from app.services.file_engine import create_rubric_docx, create_assessment_docx
 from app.models.evaluacion import RubricRequest, RubricResult, AssessmentRequest, AssessmentResult
@@ -10,13 +10,13 @@ router = APIRouter()
 @router.post("/generate-rubric", response_model=RubricResult)
 async def gen_rubric(req: RubricRequest):
     prompt = RUBRIC_PROMPT.format(nivel=req.nivel, asignatura=req.asignatura, lista_oas=req.oaDescripcion, actividad=req.actividad)
-    return json.loads(clean_json(model.generate_content(prompt).text))
+    return json.loads(clean_json(await generar("evaluacion_v5", prompt)))
 
 @router.post("/generate-assessment", response_model=AssessmentResult)
 async def gen_assess(req: AssessmentRequest):
     prompt = ASSESSMENT_PROMPT.format(nivel=req.grade, asignatura=req.subject, lista_oas=str(req.oaIds), tipo_instrumento=str(req.quantities))
     try:
-        raw = json.loads(clean_json(model.generate_content(prompt).text))
+        raw = json.loads(clean_json(await generar("evaluacion_v5", prompt)))
         
         # --- CORRECCIÓN DE EMERGENCIA: APLANAR RESPUESTA ---
         # Si la IA devuelve 'sections', sacamos los items de adentro
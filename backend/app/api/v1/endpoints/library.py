@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException
-from app.db.supabase import supabase
+from app.db.supabase import supabase, ejecutar
 from app.models.common import SaveWorkRequest
 
 router = APIRouter()
@@ -7,16 +7,16 @@ router = APIRouter()
 @router.post("/library/save")
 async def save_library(work: SaveWorkRequest):
     if not supabase: raise HTTPException(500, "DB Off")
-    res = supabase.table("library").insert(work.dict()).execute()
+    res = await ejecutar(supabase.table("library").insert(work.dict()), "library.guardar")
     return {"status": "ok", "id": res.data[0]['id']}
 
 @router.get("/library")
 async def list_library(user_id: str):
     if not supabase: raise HTTPException(500, "DB Off")
-    return supabase.table("library").select("*").eq("user_id", user_id).order("created_at", desc=True).execute().data
+    return (await ejecutar(supabase.table("library").select("*").eq("user_id", user_id).order("created_at", desc=True), "library.listar")).data
 
 @router.delete("/library/{id}")
 async def del_library(id: str):
     if not supabase: raise HTTPException(500, "DB Off")
-    supabase.table("library").delete().eq("id", id).execute()
+    await ejecutar(supabase.table("library").delete().eq("id", id), "library.borrar")
     return {"status": "ok"}
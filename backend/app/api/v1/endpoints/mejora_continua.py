@@ -1,5 +1,5 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from app.services.ai_core import model, clean_json
+from app.services.ai_core import generar, clean_json
 from app.services.prompts import PME_IMPORT_PROMPT
 import json
 import io
@@ -33,7 +33,7 @@ async def importar_pme(file: UploadFile = File(...)):
         text_limited = " ".join(text.split()[:3000])
         
         prompt = PME_IMPORT_PROMPT.format(texto_documento=text_limited)
-        raw_response = model.generate_content(prompt).text
+        raw_response = await generar("mejora_continua_v5", prompt)
         json_data = json.loads(clean_json(raw_response))
         
         return json_data
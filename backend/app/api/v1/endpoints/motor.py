@@ -1,9 +1,22 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, Query, Header
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, Query, Header, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from typing import Optional, List, Dict, Any
+import copy
+import asyncio
 import json
 import logging
-from app.db.supabase import supabase
-from app.services.ai_core import model, clean_json
+from app.db.supabase import supabase, ejecutar, en_hilo
+from app.services.ai_core import generar, clean_json
+from app.services.motor_cache import motor_cache
+from app.services.curriculum_catalog import catalogo_curricular
+from app.services.motor_agregados import actualizar_resumenes, consultar_resumenes, minutos_atraso
+from app.services.motor_dashboard import (
+    Cronometro,
+    RegistroDashboard,
+    agregar_director,
+    cargar_registros_director,
+    desglose_por_curso
+)
 from app.services.prompts import MOTOR_PREVENTIVO_ROADMAP_PROMPT
 from app.models.schemas import (
     IngestaResponse,
@@ -18,14 +31,22 @@ from app.models.schemas import (
     DetailDrillDownResponse
 )
 from app.services.motor_service import (
-    parse_calificaciones,
-    parse_atrasos,
-    parse_anotaciones,
-    parse_asistencia,
     ejecutar_cruce_predictivo,
     normalize_subject_name,
     normalize_rut
 )
+from app.services.motor_columnar import (
+    parse_calificaciones,
+    parse_atrasos,
+    parse_anotaciones,
+    parse_asistencia
+)
+from app.services.motor_lote import (
+    leer_zip,
+    inferir_manifiesto,
+    validar_manifiesto,
+    procesar_lote
+)
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -39,9 +60,6 @@ except ImportError:
     async def get_current_user_id_optional(authorization: str = Header(default=None)) -> Optional[str]:
         return "mock-user-id"
 
-# Cache en memoria para tolerancia a fallas de base de datos
-IN_MEMORY_DB: Dict[str, Dict[str, Any]] = {}
-
 def get_cache_key(periodo_id: str, curso_id: str, depto_id: str, corte_temporal: str = "General") -> str:
     return f"{periodo_id}_{curso_id}_{depto_id}_{corte_temporal}"
 
@@ -76,6 +94,69 @@ def fetch_and_attach_comments(record: Dict[str, Any]) -> Dict[str, Any]:
     return record
 
 
+def _leer_registro_db(periodo_id: str, curso_id: str, depto_id: str, corte_temporal: str) -> Optional[Dict[str, Any]]:
+    """Lee un registro de motor_conduccion_preventiva (con sus comentarios) desde Supabase."""
+    if not supabase:
+        return None
+    try:
+        res = supabase.table("motor_conduccion_preventiva").select("*").eq("periodo_id", periodo_id).eq("curso_id", curso_id).eq("asignatura", depto_id).eq("corte_temporal", corte_temporal).maybe_single().execute()
+        if res and getattr(res, "data", None):
+            return fetch_and_attach_comments(res.data)
+    except Exception as e_db:
+        logger.warning("Fallo leyendo Supabase (%s/%s/%s/%s): %s", periodo_id, curso_id, depto_id, corte_temporal, str(e_db))
+    return None
+
+
+def obtener_registro(periodo_id: str, curso_id: str, depto_id: str, corte_temporal: str = "General") -> Optional[Dict[str, Any]]:
+    """Read-through: caché del motor y, si no está, Supabase."""
+    return motor_cache.get_or_load(
+        get_cache_key(periodo_id, curso_id, depto_id, corte_temporal),
+        lambda: _leer_registro_db(periodo_id, curso_id, depto_id, corte_temporal)
+    )
+
+
+def obtener_registro_o_general(
+    periodo_id: str,
+    curso_id: str,
+    depto_id: str,
+    corte_temporal: str,
+    contexto_default: str = ""
+) -> Optional[Dict[str, Any]]:
+    """
+    Como `obtener_registro`, pero si el corte pedido no existe recupera el corte "General"
+    del mismo periodo, curso y departamento, y lo deja cacheado bajo el corte pedido.
+    """
+    record = obtener_registro(periodo_id, curso_id, depto_id, corte_temporal)
+    if record or corte_temporal == "General":
+        return record
+
+    fallback_record = obtener_registro(periodo_id, curso_id, depto_id, "General")
+    if not fallback_record:
+        return None
+
+    record = copy.deepcopy({
+        "periodo_id": periodo_id,
+        "curso_id": curso_id,
+        "asignatura": depto_id,
+        "corte_temporal": corte_temporal,
+        "datos_academicos": fallback_record["datos_academicos"],
+        "datos_convivencia": fallback_record["datos_convivencia"],
+        "configuracion_umbrales": fallback_record.get("configuracion_umbrales", {"asistencia_limite": 85.0, "peso_atrasos": 0.4}),
+        "contexto_coordinador": fallback_record.get("contexto_coordinador", contexto_default),
+        "comentarios_aula": fallback_record.get("comentarios_aula", [])
+    })
+    motor_cache.set(get_cache_key(periodo_id, curso_id, depto_id, corte_temporal), record)
+    return record
+
+
+@router.get("/sistema/cache")
+async def estado_cache_motor(
+    user_id: str = Depends(get_current_user_id)
+):
+    """Contadores de aciertos/fallos y ocupación de la caché de registros del motor."""
+    return motor_cache.stats()
+
+
 @router.post("/sistema/migrar")
 async def ejecutar_migracion_sistema(
     user_id: str = Depends(get_current_user_id)
@@ -133,27 +214,15 @@ async def ejecutar_migracion_sistema(
 
 
 # --- ORDEN LÓGICO PEDAGÓGICO (Replica de routers/curriculum.py) ---
-ORDEN_NIVEL_OFICIAL = {
-    "NT1": 1, "Pre-Kinder": 1,
-    "NT2": 2, "Kinder": 2,
-    "1° Básico": 3, "2° Básico": 4, "3° Básico": 5,
-    "4° Básico": 6, "5° Básico": 7, "6° Básico": 8,
-    "7° Básico": 9, "8° Básico": 10,
-    "1° Medio": 11, "2° Medio": 12,
-    "3° Medio": 13, "4° Medio": 14,
-    "3° y 4° Medio": 15
-}
-
-
 @router.get("/filtros")
-async def get_filtros_dinamicos():
+async def get_filtros_dinamicos(request: Request):
     """
-    Devuelve los niveles y asignaturas reales desde la tabla curriculum_oas de Supabase,
-    con orden pedagógico oficial y mapeo nivel->asignaturas para selectores encadenados.
+    Devuelve los niveles y asignaturas reales del catálogo curricular compartido
+    (curriculum_oas en memoria), con orden pedagógico oficial y mapeo
+    nivel->asignaturas para selectores encadenados. La versión del catálogo viaja
+    como ETag: con If-None-Match vigente se responde 304 sin cuerpo.
     """
-    from collections import defaultdict
-
-    # Fallbacks robustos en caso de que Supabase no responda
+    # Fallbacks robustos en caso de que no haya catálogo (ni Supabase ni snapshot)
     FALLBACK_NIVELES = [
         "NT1", "NT2",
         "1° Básico", "2° Básico", "3° Básico", "4° Básico", "5° Básico", "6° Básico", "7° Básico", "8° Básico",
@@ -166,7 +235,8 @@ async def get_filtros_dinamicos():
         "Orientación", "Religión", "Tecnología"
     ]
 
-    if not supabase:
+    catalogo = await catalogo_curricular.obtener_async()
+    if not catalogo:
         return {
             "niveles": FALLBACK_NIVELES,
             "asignaturas": FALLBACK_ASIGNATURAS,
@@ -174,52 +244,15 @@ async def get_filtros_dinamicos():
             "source": "fallback"
         }
 
-    try:
-        # Paginación para traer TODOS los registros
-        all_rows = []
-        start = 0
-        batch_size = 1000
-        while True:
-            resp = supabase.table("curriculum_oas").select("nivel,asignatura").range(start, start + batch_size - 1).execute()
-            all_rows.extend(resp.data)
-            if len(resp.data) < batch_size:
-                break
-            start += batch_size
-
-        # Extraer únicos
-        niveles_set = set()
-        mapping = defaultdict(set)
-        for row in all_rows:
-            nivel = row.get("nivel")
-            asignatura = row.get("asignatura")
-            if nivel:
-                niveles_set.add(nivel)
-            if nivel and asignatura:
-                mapping[nivel].add(asignatura)
-
-        # Ordenar niveles pedagógicamente
-        niveles_ordenados = sorted(niveles_set, key=lambda x: ORDEN_NIVEL_OFICIAL.get(x, 99))
-
-        # Todas las asignaturas únicas ordenadas
-        todas_asignaturas = sorted(set(a for asigs in mapping.values() for a in asigs))
-
-        # Mapeo nivel -> lista de asignaturas ordenadas
-        mapeo = {nivel: sorted(list(mapping[nivel])) for nivel in niveles_ordenados}
-
-        return {
-            "niveles": niveles_ordenados,
-            "asignaturas": todas_asignaturas,
-            "mapeo_nivel_asignaturas": mapeo,
-            "source": "supabase_live"
-        }
-    except Exception as e:
-        logger.error("Error obteniendo filtros dinámicos: %s", str(e))
-        return {
-            "niveles": FALLBACK_NIVELES,
-            "asignaturas": FALLBACK_ASIGNATURAS,
-            "mapeo_nivel_asignaturas": {n: FALLBACK_ASIGNATURAS for n in FALLBACK_NIVELES},
-            "source": "fallback_error"
-        }
+    etag = f'"{catalogo.version}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(content={
+        "niveles": catalogo.niveles,
+        "asignaturas": catalogo.asignaturas,
+        "mapeo_nivel_asignaturas": catalogo.asignaturas_por_nivel,
+        "source": catalogo.origen
+    }, headers={"ETag": etag})
 
 
 # --- ENDPOINTS ---
@@ -295,7 +328,7 @@ async def ingesta_archivos(
         }
         
         cache_key = get_cache_key(periodo_id, curso_id, depto_id, corte_temporal)
-        IN_MEMORY_DB[cache_key] = db_payload
+        motor_cache.set(cache_key, db_payload)
         
         if supabase:
             try:
@@ -305,6 +338,8 @@ async def ingesta_archivos(
                 logger.info("Datos insertados exitosamente en Supabase: %s", res.data)
             except Exception as e_db:
                 logger.warning("Fallo al escribir en Supabase. Usando fallback de caché. Detalle: %s", str(e_db))
+
+        await en_hilo(actualizar_resumenes, [db_payload], nombre="motor_resumen.upsert")
                 
         return IngestaResponse(
             status="success",
@@ -319,6 +354,82 @@ async def ingesta_archivos(
         logger.error("Error crítico en ingesta: %s", str(e))
         raise HTTPException(status_code=500, detail=f"Error al procesar la ingesta: {str(e)}")
 
+@router.post("/ingesta/lote")
+async def ingesta_lote(
+    periodo_id: str = Form(..., description="Ej: '2026-S1'"),
+    corte_temporal: str = Form("General", description="Corte temporal (ej. Semana 1, Mayo)"),
+    manifiesto: Optional[str] = Form(
+        None,
+        description="JSON: lista de {curso_id, asignatura_nombre, calificaciones, atrasos, anotaciones, asistencia} "
+                    "con los nombres de archivo de cada curso. Si se omite y se envía un ZIP, se infiere de "
+                    "las carpetas <curso>/<asignatura>/<archivo>."
+    ),
+    file_lote: Optional[UploadFile] = File(None, description="ZIP con los archivos de todos los cursos"),
+    archivos: List[UploadFile] = File(default=[], description="Alternativa al ZIP: archivos sueltos referenciados en el manifiesto"),
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Ingesta masiva de un corte temporal completo (muchos cursos en una sola petición).
+    Parsea los archivos en el pool de procesos, triangula cada curso y responde en NDJSON
+    con un evento por curso a medida que termina; un archivo inválido solo marca como
+    fallido a su curso. Al final se hace un único upsert en bloque y se emite el resumen.
+    """
+    try:
+        contenidos = {}
+        if file_lote:
+            contenidos.update(leer_zip(await file_lote.read()))
+        for f in archivos:
+            contenidos[f.filename] = await f.read()
+        if not contenidos:
+            raise ValueError("Adjunte un ZIP en 'file_lote' o los archivos del lote en 'archivos'.")
+
+        entradas = validar_manifiesto(manifiesto or inferir_manifiesto(list(contenidos)), contenidos)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Lote inválido: {str(e)}")
+
+    async def _eventos():
+        exitosos = fallidos = 0
+        async for evento in procesar_lote(periodo_id, corte_temporal, entradas, contenidos):
+            if evento["evento"] == "fin":
+                registros = evento["registros"]
+                break
+            if evento["status"] == "success":
+                exitosos += 1
+            else:
+                fallidos += 1
+            yield json.dumps(evento, ensure_ascii=False) + "\n"
+
+        for registro in registros:
+            motor_cache.set(get_cache_key(periodo_id, registro["curso_id"], registro["asignatura"], corte_temporal), registro)
+
+        supabase_ok = False
+        if supabase and registros:
+            try:
+                db_records = [{k: v for k, v in r.items() if k != "comentarios_aula"} for r in registros]
+                await ejecutar(
+                    supabase.table("motor_conduccion_preventiva").upsert(db_records, on_conflict="periodo_id, curso_id, asignatura, corte_temporal"),
+                    "motor_conduccion_preventiva.upsert_lote"
+                )
+                supabase_ok = True
+            except Exception as e_db:
+                logger.warning("Fallo el upsert en bloque de la ingesta masiva. Usando fallback de caché. Detalle: %s", str(e_db))
+        # También escribe en Supabase: fuera del event loop
+        await en_hilo(actualizar_resumenes, registros, nombre="motor_resumen.upsert_lote")
+
+        logger.info("Ingesta masiva %s/%s: %s cursos OK, %s con error", periodo_id, corte_temporal, exitosos, fallidos)
+        yield json.dumps({
+            "evento": "resumen",
+            "status": "success" if exitosos else "error",
+            "periodo_id": periodo_id,
+            "corte_temporal": corte_temporal,
+            "total_cursos": exitosos + fallidos,
+            "exitosos": exitosos,
+            "fallidos": fallidos,
+            "supabase_upsert": supabase_ok
+        }, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(_eventos(), media_type="application/x-ndjson")
+
 @router.get("/hitl/{periodo_id}/{curso_id}", response_model=HITLPreviewResponse)
 async def get_hitl_preview(
     periodo_id: str,
@@ -331,43 +442,10 @@ async def get_hitl_preview(
     Recupera la previsualización agregada de alertas de Doble Riesgo y
     las calibraciones de umbrales actuales para el Coordinador.
     """
-    cache_key = get_cache_key(periodo_id, curso_id, departamento_id, corte_temporal)
-    record = IN_MEMORY_DB.get(cache_key)
-    
-    if supabase:
-        try:
-            res = supabase.table("motor_conduccion_preventiva").select("*").eq("periodo_id", periodo_id).eq("curso_id", curso_id).eq("asignatura", departamento_id).eq("corte_temporal", corte_temporal).maybe_single().execute()
-            if res and getattr(res, "data", None):
-                record = fetch_and_attach_comments(res.data)
-        except Exception as e_db:
-            logger.warning("Fallo leyendo Supabase. Usando caché en memoria: %s", str(e_db))
-            
-    if not record:
-        # Intentar recuperar el corte "General" del mismo periodo, curso y departamento como fallback
-        general_key = get_cache_key(periodo_id, curso_id, departamento_id, "General")
-        fallback_record = IN_MEMORY_DB.get(general_key)
-        
-        if supabase:
-            try:
-                res_fallback = supabase.table("motor_conduccion_preventiva").select("*").eq("periodo_id", periodo_id).eq("curso_id", curso_id).eq("asignatura", departamento_id).eq("corte_temporal", "General").maybe_single().execute()
-                if res_fallback and getattr(res_fallback, "data", None):
-                    fallback_record = fetch_and_attach_comments(res_fallback.data)
-            except Exception as e_db:
-                logger.warning("Fallo leyendo fallback de Supabase: %s", str(e_db))
-                
-        if fallback_record:
-            record = {
-                "periodo_id": periodo_id,
-                "curso_id": curso_id,
-                "asignatura": departamento_id,
-                "corte_temporal": corte_temporal,
-                "datos_academicos": fallback_record["datos_academicos"],
-                "datos_convivencia": fallback_record["datos_convivencia"],
-                "configuracion_umbrales": fallback_record.get("configuracion_umbrales", {"asistencia_limite": 85.0, "peso_atrasos": 0.4}),
-                "contexto_coordinador": fallback_record.get("contexto_coordinador", "Sin anotaciones del coordinador."),
-                "comentarios_aula": fallback_record.get("comentarios_aula", [])
-            }
-            IN_MEMORY_DB[cache_key] = record
+    record = obtener_registro_o_general(
+        periodo_id, curso_id, departamento_id, corte_temporal,
+        contexto_default="Sin anotaciones del coordinador."
+    )
 
     if not record:
         raise HTTPException(
@@ -400,43 +478,9 @@ async def hitl_validar(
         raise HTTPException(status_code=400, detail="El contexto cualitativo del coordinador es obligatorio para el paso de validación.")
         
     cache_key = get_cache_key(req.periodo_id, req.curso_id, departamento_id, corte_temporal)
-    record = IN_MEMORY_DB.get(cache_key)
-    
-    if supabase:
-        try:
-            res = supabase.table("motor_conduccion_preventiva").select("*").eq("periodo_id", req.periodo_id).eq("curso_id", req.curso_id).eq("asignatura", departamento_id).eq("corte_temporal", corte_temporal).maybe_single().execute()
-            if res and getattr(res, "data", None):
-                record = fetch_and_attach_comments(res.data)
-        except Exception as e_db:
-            logger.warning("Fallo leyendo Supabase: %s", str(e_db))
-            
-    asistencia_limite = req.configuracion_umbrales.get("asistencia_limite", 85.0)
+    record = obtener_registro_o_general(req.periodo_id, req.curso_id, departamento_id, corte_temporal)
 
-    if not record:
-        # Intentar recuperar el corte "General" como fallback
-        general_key = get_cache_key(req.periodo_id, req.curso_id, departamento_id, "General")
-        fallback_record = IN_MEMORY_DB.get(general_key)
-        
-        if supabase:
-            try:
-                res_fallback = supabase.table("motor_conduccion_preventiva").select("*").eq("periodo_id", req.periodo_id).eq("curso_id", req.curso_id).eq("asignatura", departamento_id).eq("corte_temporal", "General").maybe_single().execute()
-                if res_fallback and getattr(res_fallback, "data", None):
-                    fallback_record = fetch_and_attach_comments(res_fallback.data)
-            except Exception as e_db:
-                logger.warning("Fallo leyendo fallback de Supabase en hitl_validar: %s", str(e_db))
-                
-        if fallback_record:
-            record = {
-                "periodo_id": req.periodo_id,
-                "curso_id": req.curso_id,
-                "asignatura": departamento_id,
-                "corte_temporal": corte_temporal,
-                "datos_academicos": fallback_record["datos_academicos"],
-                "datos_convivencia": fallback_record["datos_convivencia"],
-                "configuracion_umbrales": fallback_record.get("configuracion_umbrales", {"asistencia_limite": 85.0, "peso_atrasos": 0.4}),
-                "contexto_coordinador": fallback_record.get("contexto_coordinador", ""),
-                "comentarios_aula": fallback_record.get("comentarios_aula", [])
-            }
+    asistencia_limite = req.configuracion_umbrales.get("asistencia_limite", 85.0)
 
     if not record:
         raise HTTPException(
@@ -465,7 +509,7 @@ async def hitl_validar(
         record["configuracion_umbrales"] = req.configuracion_umbrales
         record["contexto_coordinador"] = req.contexto_coordinador
     
-    IN_MEMORY_DB[cache_key] = record
+    motor_cache.set(cache_key, record)
     
     if supabase:
         try:
@@ -473,6 +517,9 @@ async def hitl_validar(
             supabase.table("motor_conduccion_preventiva").upsert(db_record).execute()
         except Exception as e_db:
             logger.warning("No se pudo actualizar en Supabase: %s", str(e_db))
+
+    # Recalcular el resumen: el nuevo umbral cambia el conteo de alumnos en riesgo
+    await en_hilo(actualizar_resumenes, [record], nombre="motor_resumen.upsert")
             
     return HITLPreviewResponse(
         periodo_id=record["periodo_id"],
@@ -487,6 +534,7 @@ async def hitl_validar(
 @router.post("/roadmap/generar")
 async def generar_roadmap(
     req: RoadmapGenerarRequest,
+    request: Request,
     departamento_id: str = Query("Lengua y Literatura", description="Nombre de la asignatura a consultar"),
     corte_temporal: str = Query("General"),
     user_id: str = Depends(get_current_user_id)
@@ -496,42 +544,7 @@ async def generar_roadmap(
     de observación docente del perfilador para generar el Roadmap a través del LLM.
     """
     cache_key = get_cache_key(req.periodo_id, req.curso_id, departamento_id, corte_temporal)
-    record = IN_MEMORY_DB.get(cache_key)
-    
-    if supabase:
-        try:
-            res = supabase.table("motor_conduccion_preventiva").select("*").eq("periodo_id", req.periodo_id).eq("curso_id", req.curso_id).eq("asignatura", departamento_id).eq("corte_temporal", corte_temporal).maybe_single().execute()
-            if res and getattr(res, "data", None):
-                record = fetch_and_attach_comments(res.data)
-        except Exception as e_db:
-            logger.warning("Fallo leyendo Supabase: %s", str(e_db))
-            
-    if not record:
-        # Intentar recuperar el corte "General" como fallback para el Roadmap
-        general_key = get_cache_key(req.periodo_id, req.curso_id, departamento_id, "General")
-        fallback_record = IN_MEMORY_DB.get(general_key)
-        
-        if supabase:
-            try:
-                res_fallback = supabase.table("motor_conduccion_preventiva").select("*").eq("periodo_id", req.periodo_id).eq("curso_id", req.curso_id).eq("asignatura", departamento_id).eq("corte_temporal", "General").maybe_single().execute()
-                if res_fallback and getattr(res_fallback, "data", None):
-                    fallback_record = fetch_and_attach_comments(res_fallback.data)
-            except Exception as e_db:
-                logger.warning("Fallo leyendo fallback para roadmap en Supabase: %s", str(e_db))
-                
-        if fallback_record:
-            record = {
-                "periodo_id": req.periodo_id,
-                "curso_id": req.curso_id,
-                "asignatura": departamento_id,
-                "corte_temporal": corte_temporal,
-                "datos_academicos": fallback_record["datos_academicos"],
-                "datos_convivencia": fallback_record["datos_convivencia"],
-                "configuracion_umbrales": fallback_record.get("configuracion_umbrales", {"asistencia_limite": 85.0, "peso_atrasos": 0.4}),
-                "contexto_coordinador": fallback_record.get("contexto_coordinador", ""),
-                "comentarios_aula": fallback_record.get("comentarios_aula", [])
-            }
-            IN_MEMORY_DB[cache_key] = record
+    record = obtener_registro_o_general(req.periodo_id, req.curso_id, departamento_id, corte_temporal)
 
     if not record:
         raise HTTPException(status_code=404, detail="No se encontraron datos pre-calculados para este curso y periodo. Ejecuta la ingesta primero.")
@@ -555,13 +568,13 @@ async def generar_roadmap(
     
     try:
         # Llamar a Gemini
-        raw_response = model.generate_content(prompt).text
+        raw_response = await generar("motor", prompt, request=request)
         cleaned = clean_json(raw_response)
         roadmap_json = json.loads(cleaned)
         
         # Guardar en base de datos
         record["roadmap_sugerido"] = roadmap_json
-        IN_MEMORY_DB[cache_key] = record
+        motor_cache.set(cache_key, record)
         
         if supabase:
             try:
@@ -591,16 +604,7 @@ async def get_dashboard_detalle(
     Retorna atrasos netos por RUT, anotaciones RICE con motivos y reactivos específicos de pruebas.
     Si se especifica el RUT del alumno, filtra los datos dinámicamente para dicho estudiante.
     """
-    cache_key = get_cache_key(periodo_id, curso_id, departamento_id, corte_temporal)
-    record = IN_MEMORY_DB.get(cache_key)
-    
-    if supabase:
-        try:
-            res = supabase.table("motor_conduccion_preventiva").select("*").eq("periodo_id", periodo_id).eq("curso_id", curso_id).eq("asignatura", departamento_id).eq("corte_temporal", corte_temporal).maybe_single().execute()
-            if res and getattr(res, "data", None):
-                record = res.data
-        except Exception as e_db:
-            logger.warning("Fallo leyendo Supabase en detalle: %s", str(e_db))
+    record = obtener_registro(periodo_id, curso_id, departamento_id, corte_temporal)
             
     normalized_search_rut = normalize_rut(rut) if rut else None
             
@@ -669,15 +673,19 @@ async def registrar_comentario_docente(
 
     depto_id = normalize_subject_name(asignatura_id)
     cache_key = get_cache_key(periodo_id, curso_id, depto_id)
-    record = IN_MEMORY_DB.get(cache_key)
-    
-    if supabase:
+
+    def _leer_registro_comentario():
+        if not supabase:
+            return None
         try:
             res = supabase.table("motor_conduccion_preventiva").select("*").eq("periodo_id", periodo_id).eq("curso_id", curso_id).eq("asignatura", depto_id).maybe_single().execute()
             if res and getattr(res, "data", None):
-                record = fetch_and_attach_comments(res.data)
+                return fetch_and_attach_comments(res.data)
         except Exception as e_db:
             logger.warning("Fallo leyendo Supabase: %s", str(e_db))
+        return None
+
+    record = motor_cache.get_or_load(cache_key, _leer_registro_comentario)
             
     if not record:
         raise HTTPException(
@@ -707,13 +715,13 @@ async def registrar_comentario_docente(
 
             try:
                 import google.generativeai as genai
-                audio_file = genai.upload_file(path=tmp_path, mime_type=mime_type)
+                audio_file = await asyncio.to_thread(genai.upload_file, path=tmp_path, mime_type=mime_type)
                 
                 parts = [sys_instruction, audio_file]
                 if comentario.strip():
                     parts.append(f"\n\nTexto adicional del docente: {comentario}")
                 
-                raw_response = model.generate_content(parts).text
+                raw_response = await generar("motor", parts)
                 cleaned = clean_json(raw_response)
                 knots = json.loads(cleaned)
                 logger.info("Nudo extraído vía audio multimodal Gemini.")
@@ -733,7 +741,7 @@ async def registrar_comentario_docente(
             )
         prompt = f"{sys_instruction}\n\nComentario del Docente: {texto_a_analizar}"
         try:
-            raw_response = model.generate_content(prompt).text
+            raw_response = await generar("motor", prompt)
             cleaned = clean_json(raw_response)
             knots = json.loads(cleaned)
         except Exception as e_text:
@@ -751,12 +759,12 @@ async def registrar_comentario_docente(
         "timestamp": datetime.now(timezone.utc).isoformat()
     }
     
-    # Anexar al cache local IN_MEMORY_DB
+    # Anexar al registro y escribir en la caché del motor (write-through)
     comentarios = record.get("comentarios_aula", [])
     comentarios.append(comentario_entry)
     record["comentarios_aula"] = comentarios
     
-    IN_MEMORY_DB[cache_key] = record
+    motor_cache.set(cache_key, record)
     
     if supabase:
         try:
@@ -795,29 +803,15 @@ async def get_evolucion_temporal(
     [NUEVO ENDPOINT V2.5]
     Retorna la serie temporal de todos los cortes registrados para el periodo, curso y depto.
     Esto permite trazar las curvas de tendencia en el frontend.
+    Lee solo las filas de resumen agregado (ver app.services.motor_agregados).
     """
-    records = []
-    
-    if supabase:
-        try:
-            query = supabase.table("motor_conduccion_preventiva").select("*").eq("periodo_id", periodo_id)
-            if curso_id != "Todos":
-                query = query.eq("curso_id", curso_id)
-            if departamento_id != "Todos" and departamento_id != "0":
-                query = query.eq("asignatura", departamento_id)
-            res = query.execute()
-            if res and getattr(res, "data", None):
-                records = res.data
-        except Exception as e_db:
-            logger.warning("Fallo leyendo Supabase en evolucion: %s", str(e_db))
-            
-    if not records:
-        # Fallback local de IN_MEMORY_DB
-        # BUG FIX: normalizar a lowercase para evitar mismatches por case en departamento_id
-        prefix = f"{periodo_id}_{curso_id}_{departamento_id}_".lower()
-        records = [v for k, v in IN_MEMORY_DB.items() if k.lower().startswith(prefix)]
+    resumenes = consultar_resumenes(
+        periodo_id,
+        curso_id=None if curso_id == "Todos" else curso_id,
+        asignatura=None if departamento_id in ("Todos", "0") else departamento_id
+    )
         
-    if not records:
+    if not resumenes:
         # Generar datos simulados de evolución por defecto si no hay nada
         cortes_mock = ["Semana 1", "Semana 2", "Semana 3", "Semana 4"]
         promedios_mock = [4.7, 4.9, 5.1, 5.3]
@@ -826,48 +820,29 @@ async def get_evolucion_temporal(
         aprobacion_mock = [78.0, 82.5, 87.0, 91.0]
         
         for i, corte in enumerate(cortes_mock):
-            records.append({
-                "periodo_id": periodo_id,
-                "curso_id": curso_id,
-                "asignatura": departamento_id,
+            resumenes.append({
                 "corte_temporal": corte,
-                "datos_academicos": {
-                    "promedio_general": promedios_mock[i],
-                    "porcentaje_aprobacion": aprobacion_mock[i],
-                },
-                "datos_convivencia": {
-                    "minutos_atraso_acumulados": atrasos_mock[i],
-                    "alumnos_doble_riesgo": [f"rut_{j}" for j in range(riesgo_mock[i])],
-                }
+                "promedio": promedios_mock[i],
+                "aprobacion": aprobacion_mock[i],
+                "atrasos": atrasos_mock[i],
+                "alumnos_riesgo": riesgo_mock[i]
             })
             
     # Agrupar por corte temporal para cuando hay múltiples cursos/asignaturas (vista Todos)
     grouped: Dict[str, Dict] = {}
-    for r in records:
+    for r in resumenes:
         corte = r.get("corte_temporal", "General")
-        acad = r.get("datos_academicos", {})
-        conv = r.get("datos_convivencia", {})
         
         if corte not in grouped:
             grouped[corte] = {"count": 0, "promedio": 0.0, "aprobacion": 0.0, "atrasos": 0, "alumnos_riesgo": 0}
             
-        p = acad.get("promedio_general", 0)
-        if p > 0:
-            grouped[corte]["promedio"] += p
-            grouped[corte]["aprobacion"] += acad.get("porcentaje_aprobacion", 0)
+        if r["promedio"] > 0:
+            grouped[corte]["promedio"] += r["promedio"]
+            grouped[corte]["aprobacion"] += r["aprobacion"]
             grouped[corte]["count"] += 1
             
-        a = conv.get("minutos_atraso_acumulados", 0)
-        if not a and "atrasos_por_rut" in conv:
-            a = sum(conv["atrasos_por_rut"].values())
-        if not a and "alumnos_doble_riesgo_detalle" in conv:
-            a = sum(x.get("atraso_minutos", 0) for x in conv["alumnos_doble_riesgo_detalle"])
-        grouped[corte]["atrasos"] += a
-        
-        r_riesgo = len(conv.get("alumnos_doble_riesgo", []))
-        if not r_riesgo and "alumnos_doble_riesgo_detalle" in conv:
-            r_riesgo = len(conv["alumnos_doble_riesgo_detalle"])
-        grouped[corte]["alumnos_riesgo"] += r_riesgo
+        grouped[corte]["atrasos"] += r["atrasos"]
+        grouped[corte]["alumnos_riesgo"] += r["alumnos_riesgo"]
 
     serie_temporal = []
     for corte, data in grouped.items():
@@ -899,58 +874,33 @@ async def get_desglose_cursos(
     """
     Retorna los datos desagregados por curso reales extraídos de Supabase.
     Si el rol es director, trae todos los cursos del colegio sin filtrar asignatura.
+    Lee solo las filas de resumen agregado (ver app.services.motor_agregados).
     """
+    # Si el rol NO es director, filtramos por la asignatura específica (si no es Todos)
+    filtrar_asignatura = not (role and role.lower() == "director") and departamento_id not in ("Todos", "0")
+
     desglose = []
-    
-    if supabase:
-        try:
-            # Construir query base
-            query = supabase.table("motor_conduccion_preventiva").select("*").eq("periodo_id", periodo_id).eq("corte_temporal", corte_temporal)
-            
-            # Si el rol NO es director, filtramos por la asignatura específica (si no es Todos)
-            if not (role and role.lower() == "director"):
-                if departamento_id != "Todos" and departamento_id != "0":
-                    query = query.eq("asignatura", departamento_id)
-            
-            # Y filtramos por curso si no es Todos
-            if curso_id != "Todos":
-                query = query.eq("curso_id", curso_id)
-                
-            res = query.execute()
-            if res and getattr(res, "data", None):
-                for r in res.data:
-                    c_id = r.get("curso_id", "S/C")
-                    
-                    # Ignorar filas donde el curso es literalmente "Todos" (datos sucios o agregados)
-                    if c_id.lower() == "todos":
-                        continue
-                        
-                    acad = r.get("datos_academicos", {})
-                    conv = r.get("datos_convivencia", {})
-                    
-                    promedio = acad.get("promedio_general", 0)
-                    aprobacion = acad.get("porcentaje_aprobacion", 0)
-                    
-                    # Calcular atrasos (suma total o del dict si está)
-                    atrasos = conv.get("minutos_atraso_acumulados", 0)
-                    if not atrasos and "atrasos_por_rut" in conv:
-                        atrasos = sum(conv["atrasos_por_rut"].values())
-                        
-                    riesgo = len(conv.get("alumnos_doble_riesgo", []))
-                    if not riesgo and "alumnos_doble_riesgo_detalle" in conv:
-                        riesgo = len(conv["alumnos_doble_riesgo_detalle"])
-                        
-                    desglose.append({
-                        "curso": c_id,
-                        "promedio": round(promedio, 2),
-                        "aprobacion": round(aprobacion, 2),
-                        "atrasos": atrasos,
-                        "alumnos_riesgo": riesgo
-                    })
-        except Exception as e_db:
-            logger.warning("Fallo leyendo Supabase en desglose_cursos: %s", str(e_db))
+    for r in consultar_resumenes(
+        periodo_id,
+        curso_id=None if curso_id == "Todos" else curso_id,
+        asignatura=departamento_id if filtrar_asignatura else None,
+        corte_temporal=corte_temporal
+    ):
+        c_id = r.get("curso_id") or "S/C"
+
+        # Ignorar filas donde el curso es literalmente "Todos" (datos sucios o agregados)
+        if c_id.lower() == "todos":
+            continue
+
+        desglose.append({
+            "curso": c_id,
+            "promedio": round(r["promedio"], 2),
+            "aprobacion": round(r["aprobacion"], 2),
+            "atrasos": r["atrasos"],
+            "alumnos_riesgo": r["alumnos_riesgo"]
+        })
             
-    # Fallback si no hay supabase
+    # Fallback si no hay resúmenes para el filtro
     if not desglose:
         # Extraer el nivel base eliminando las letras finales (A, B, C) si existen
         nivel_base = curso_id.strip()
@@ -1014,6 +964,7 @@ async def get_rbac_dashboard(
     """
     Endpoint principal unificado que filtra y devuelve esquemas de respuesta diferenciados
     según el rol del perfil del usuario (RBAC).
+    La cabecera `Server-Timing` desglosa la latencia en fetch, compute y serialize.
     """
     role_clean = role.lower().strip()
     
@@ -1028,104 +979,56 @@ async def get_rbac_dashboard(
     # Solo buscamos record si no es la vista macro total.
     is_macro_view = (role_clean == "director" and (curso_id == "Todos" or departamento_id == "Todos" or departamento_id == "0"))
     
-    record = None
-    if not is_macro_view:
-        cache_key = get_cache_key(periodo_id, curso_id, departamento_id, corte_temporal)
-        record = IN_MEMORY_DB.get(cache_key)
-        
-        if supabase:
-            try:
-                res = supabase.table("motor_conduccion_preventiva").select("*").eq("periodo_id", periodo_id).eq("curso_id", curso_id).eq("asignatura", departamento_id).eq("corte_temporal", corte_temporal).maybe_single().execute()
-                if res and getattr(res, "data", None):
-                    record = fetch_and_attach_comments(res.data)
-            except Exception as e_db:
-                logger.warning("Fallo leyendo Supabase: %s", str(e_db))
-                
-        if not record:
-            raise HTTPException(
-                status_code=404,
-                detail="No hay datos ingresados para este curso, periodo y departamento. Ejecute la ingesta de archivos primero."
-            )
+    crono = Cronometro()
+    with crono.tramo("fetch"):
+        record = None
+        if not is_macro_view:
+            record = obtener_registro(periodo_id, curso_id, departamento_id, corte_temporal)
+                    
+            if not record:
+                raise HTTPException(
+                    status_code=404,
+                    detail="No hay datos ingresados para este curso, periodo y departamento. Ejecute la ingesta de archivos primero."
+                )
+
+        registros = []
+        if role_clean == "director":
+            registros = cargar_registros_director(periodo_id, corte_temporal, curso_id, departamento_id)
+
+    with crono.tramo("compute"):
+        dashboard = _construir_dashboard(role_clean, periodo_id, curso_id, departamento_id, record, registros)
+
+    with crono.tramo("serialize"):
+        contenido = dashboard.model_dump(mode="json")
+
+    logger.info("Dashboard %s %s/%s/%s: %s", role_clean, periodo_id, curso_id, departamento_id, crono.server_timing())
+    return JSONResponse(content=contenido, headers={"Server-Timing": crono.server_timing()})
+
 
+def _construir_dashboard(
+    role_clean: str,
+    periodo_id: str,
+    curso_id: str,
+    departamento_id: str,
+    record: Optional[Dict[str, Any]],
+    registros: List[RegistroDashboard]
+):
+    """Arma la respuesta del rol a partir de los datos ya cargados (sin I/O)."""
     # 1. ROL DIRECTOR: Métricas longitudinales macro (Todo el colegio)
     if role_clean == "director":
-        promedio_macro = 0.0
-        aprobacion_macro = 0.0
-        atrasos_macro = 0
-        total_cursos = 0
-        alumnos_doble_riesgo_unicos = {}
-        
-        dok_distributions = {
-            "dok1": [],
-            "dok2": [],
-            "dok3": []
-        }
-        
-        if supabase:
-            try:
-                # Traer todos los registros agregables (todo el colegio)
-                query = supabase.table("motor_conduccion_preventiva").select("*").eq("periodo_id", periodo_id).eq("corte_temporal", corte_temporal)
-                # Si filtró por un curso pero es director, solo sumamos de ese curso:
-                if curso_id != "Todos":
-                    query = query.eq("curso_id", curso_id)
-                if departamento_id != "Todos" and departamento_id != "0":
-                    query = query.eq("asignatura", departamento_id)
-                    
-                res_macro = query.execute()
-                if res_macro and getattr(res_macro, "data", None):
-                    for r in res_macro.data:
-                        acad = r.get("datos_academicos", {})
-                        conv = r.get("datos_convivencia", {})
-                        
-                        p = acad.get("promedio_general", 0)
-                        if p > 0:
-                            promedio_macro += p
-                            aprobacion_macro += acad.get("porcentaje_aprobacion", 0)
-                            total_cursos += 1
-                            
-                        # Atrasos
-                        a = conv.get("minutos_atraso_acumulados", 0)
-                        if not a and "atrasos_por_rut" in conv:
-                            a = sum(conv["atrasos_por_rut"].values())
-                        if not a and "alumnos_doble_riesgo_detalle" in conv:
-                            a = sum(x.get("atraso_minutos", 0) for x in conv["alumnos_doble_riesgo_detalle"])
-                        atrasos_macro += a
-                        
-                        # Consolidar nómina Doble Riesgo eliminando duplicados por RUT
-                        detalle_riesgo = conv.get("alumnos_doble_riesgo_detalle", [])
-                        for al_riesgo in detalle_riesgo:
-                            rut_norm = normalize_rut(al_riesgo.get("rut", ""))
-                            if rut_norm and rut_norm not in alumnos_doble_riesgo_unicos:
-                                alumnos_doble_riesgo_unicos[rut_norm] = al_riesgo
-                                
-                        # Sumar DOKs si existen en el JSON de datos_academicos (si no, fallback mockeado abajo)
-                        dok_data = acad.get("distribucion_dok")
-                        if dok_data:
-                            dok_distributions["dok1"].append(dok_data.get("dok_1", 38))
-                            dok_distributions["dok2"].append(dok_data.get("dok_2", 47))
-                            dok_distributions["dok3"].append(dok_data.get("dok_3", 15))
-                            
-            except Exception as e_db:
-                logger.warning("Fallo en agregación macro de director: %s", str(e_db))
-                
-        if total_cursos > 0:
-            promedio_real = promedio_macro / total_cursos
-            aprobacion_real = aprobacion_macro / total_cursos
-            atrasos_real = atrasos_macro
-            en_riesgo_critico = len(alumnos_doble_riesgo_unicos)
+        agg = agregar_director(registros)
+        desglose = desglose_por_curso(agg)
+
+        if agg.total_registros > 0:
+            promedio_real = agg.promedio / agg.total_registros
+            aprobacion_real = agg.aprobacion / agg.total_registros
+            atrasos_real = agg.atrasos
+            en_riesgo_critico = len(agg.riesgo_unico)
         else:
             # Fallback a registro actual o mock base si no encontró nada
-            prom_ref = record["datos_academicos"].get("promedio_general", 5.2) if record else 5.2
-            aprob_ref = record["datos_academicos"].get("porcentaje_aprobacion", 88.5) if record else 88.5
-            if record:
-                atrasos_real = sum(record["datos_convivencia"].get("atrasos_por_rut", {}).values())
-                if not atrasos_real and "alumnos_doble_riesgo_detalle" in record["datos_convivencia"]:
-                    atrasos_real = sum(x.get("atraso_minutos", 0) for x in record["datos_convivencia"]["alumnos_doble_riesgo_detalle"])
-            else:
-                atrasos_real = 0
-                
-            promedio_real = prom_ref
-            aprobacion_real = aprob_ref
+            promedio_real = record["datos_academicos"].get("promedio_general", 5.2) if record else 5.2
+            aprobacion_real = record["datos_academicos"].get("porcentaje_aprobacion", 88.5) if record else 88.5
+            atrasos_real = minutos_atraso(record["datos_convivencia"]) if record else 0
             en_riesgo_critico = len(record["datos_convivencia"].get("alumnos_doble_riesgo", [])) if record else 2
                 
         datos_long = {}
@@ -1136,11 +1039,11 @@ async def get_rbac_dashboard(
         }
             
         # Promediar distribuciones DOK globales si las recolectamos
-        if dok_distributions["dok1"]:
+        if agg.dok["dok1"]:
             dok = {
-                "DOK 1 (Recordar/Identificar)": round(sum(dok_distributions["dok1"]) / len(dok_distributions["dok1"])),
-                "DOK 2 (Aplicar/Relacionar)": round(sum(dok_distributions["dok2"]) / len(dok_distributions["dok2"])),
-                "DOK 3 (Evaluar/Reflexionar)": round(sum(dok_distributions["dok3"]) / len(dok_distributions["dok3"]))
+                "DOK 1 (Recordar/Identificar)": round(sum(agg.dok["dok1"]) / len(agg.dok["dok1"])),
+                "DOK 2 (Aplicar/Relacionar)": round(sum(agg.dok["dok2"]) / len(agg.dok["dok2"])),
+                "DOK 3 (Evaluar/Reflexionar)": round(sum(agg.dok["dok3"]) / len(agg.dok["dok3"]))
             }
         else:
             base_dok3 = 20.0 + (promedio_real - 4.0) * 10
@@ -1169,16 +1072,6 @@ async def get_rbac_dashboard(
             
         if len(desafios) < 3:
             desafios.append({"tarea": "Alineación de estrategias de nivelación con equipo PIE", "urgencia": "Media"})
-            
-        # Calcular total de alumnos únicos reales a partir de los registros procesados
-        ruts_unicos_colegio: set = set()
-        for r in (res_macro.data if (supabase and 'res_macro' in dir()) else []):
-            conv = r.get("datos_convivencia", {})
-            for al in conv.get("alumnos_doble_riesgo_detalle", []):
-                rut_n = normalize_rut(al.get("rut", ""))
-                if rut_n:
-                    ruts_unicos_colegio.add(rut_n)
-        total_alumnos_real = len(ruts_unicos_colegio) if ruts_unicos_colegio else None
 
         return DirectorDashboardResponse(
             role="director",
@@ -1188,19 +1081,19 @@ async def get_rbac_dashboard(
             graficos_conversion_dok=dok,
             desafios_directivos_inversos=desafios,
             alumnos_doble_riesgo_resumen={
-                "total_alumnos": total_alumnos_real,
+                # Alumnos únicos (por RUT) con registro de riesgo en los cursos procesados
+                "total_alumnos": len(agg.riesgo_unico) or None,
                 "en_riesgo_critico": en_riesgo_critico,
                 "variacion_mensual": "0%"
-            }
+            },
+            desglose_cursos=desglose or None
         )
         
     # 2. ROL COORDINADOR: Sliders de calibración, heatmap y nómina de Doble Riesgo
     elif role_clean == "coordinador" or role_clean == "utp":
         # Generar un Heatmap dinámico real en base a datos reales de la ingesta
         promedio_real = record["datos_academicos"].get("promedio_general", 4.2)
-        atrasos_real = sum(record["datos_convivencia"].get("atrasos_por_rut", {}).values())
-        if not atrasos_real and "alumnos_doble_riesgo_detalle" in record["datos_convivencia"]:
-            atrasos_real = sum(x.get("atraso_minutos", 0) for x in record["datos_convivencia"]["alumnos_doble_riesgo_detalle"])
+        atrasos_real = minutos_atraso(record["datos_convivencia"])
         if not atrasos_real:
             atrasos_real = 340
             
@@ -1232,7 +1125,7 @@ async def get_rbac_dashboard(
             "titulo": f"Pauta de Acompañamiento de Ciclo - Mayo {periodo_id[:4]}",
             "puntos_ciegos": [
                 f"Brecha de sinceramiento en el departamento de {depto_name}.",
-                f"{len(record['datos_convivencia'].get('alumnos_doble_riesgo', [])) if record else en_riesgo_critico} alumnos presentan Doble Riesgo Crítico combinado con asistencia insuficiente."
+                f"{len(record['datos_convivencia'].get('alumnos_doble_riesgo', []))} alumnos presentan Doble Riesgo Crítico combinado con asistencia insuficiente."
             ]
         }
         return CoordinadorDashboardResponse(
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException, Response
 from app.db.supabase import supabase
-from app.services.ai_core import model, clean_json
+from app.services.ai_core import generar, clean_json
 from app.services.prompts import STRATEGY_PROMPT, CLASS_PROMPT
 from app.services.file_engine import create_plan_docx
 from app.models.planificacion import UnitRequest, EstrategiaUnidad, ClassGenerationRequest, DetalleClase
@@ -40,12 +40,12 @@ async def gen_strat(req: UnitRequest):
     ctx_full = f"{contexto_colegio} {req.contexto_manual}" if contexto_colegio else req.contexto_manual
     
     prompt = STRATEGY_PROMPT.format(asignatura=req.asignatura, nivel=req.nivel, lista_oas=str(req.oas), contexto_manual=ctx_full, total_clases=max(1, req.horas // 2))
-    return json.loads(clean_json(model.generate_content(prompt).text))
+    return json.loads(clean_json(await generar("planificador_v5", prompt)))
 
 @router.post("/generate-class", response_model=DetalleClase)
 async def gen_class(req: ClassGenerationRequest):
     prompt = CLASS_PROMPT.format(numero_clase=req.numero_clase, total_clases=req.total_clases, titulo_unidad=req.estrategia_unidad.titulo_unidad, meta_unidad=req.estrategia_unidad.meta_comprension_redactada, sello=req.estrategia_unidad.sello_identitario, foco_clase="General")
-    return json.loads(clean_json(model.generate_content(prompt).text))
+    return json.loads(clean_json(await generar("planificador_v5", prompt)))
 
 @router.post("/generate-docx-plan")
 async def docx_plan(data: dict):
@@ -2,7 +2,8 @@ from fastapi import APIRouter, HTTPException, Header
 from pydantic import BaseModel
 import os
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from supabase import Client
+from app.db.supabase import obtener_cliente, ejecutar
 
 load_dotenv()
 router = APIRouter()
@@ -10,7 +11,7 @@ router = APIRouter()
 # --- CONEXIÓN SUPABASE ---
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY) if SUPABASE_URL and SUPABASE_KEY else None
+supabase: Client = obtener_cliente(SUPABASE_URL, SUPABASE_KEY) if SUPABASE_URL and SUPABASE_KEY else None
 
 # --- MODELOS ---
 class ProfileUpdate(BaseModel):
@@ -33,7 +34,7 @@ async def get_profile(user_id: str):
     
     try:
         # 1. Intentar obtener el perfil de la tabla 'profiles'
-        response = supabase.table("profiles").select("*").eq("id", user_id).execute()
+        response = await ejecutar(supabase.table("profiles").select("*").eq("id", user_id), "profiles.leer")
         
         if response.data and len(response.data) > 0:
             return response.data[0]
@@ -58,7 +59,7 @@ async def update_profile(user_id: str, profile: ProfileUpdate):
         data_to_update["id"] = user_id
         data_to_update["updated_at"] = "now()"
         
-        response = supabase.table("profiles").upsert(data_to_update).execute()
+        response = await ejecutar(supabase.table("profiles").upsert(data_to_update), "profiles.guardar")
         
         return {"status": "success", "data": response.data}
         
@@ -7,5 +7,42 @@ class Settings:
     GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
     SUPABASE_URL = os.getenv("SUPABASE_URL")
     SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_ANON_KEY") or os.getenv("SUPABASE_KEY")
+    SUPABASE_POOL_CONEXIONES = int(os.getenv("SUPABASE_POOL_CONEXIONES", "20"))
+    SUPABASE_KEEPALIVE = float(os.getenv("SUPABASE_KEEPALIVE", "60"))
+    SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "120"))
+    SUPABASE_HILOS = int(os.getenv("SUPABASE_HILOS", "16"))
+    AUTH_CACHE_MAXSIZE = int(os.getenv("AUTH_CACHE_MAXSIZE", "10000"))
+    AUTH_TOKEN_TTL_MAX = float(os.getenv("AUTH_TOKEN_TTL_MAX", "3600"))
+    AUTH_ROLES_TTL = float(os.getenv("AUTH_ROLES_TTL", "60"))
+    AUTH_JWKS_TTL = float(os.getenv("AUTH_JWKS_TTL", "600"))
+    TELEMETRY_BUFFER_MAX = int(os.getenv("TELEMETRY_BUFFER_MAX", "10000"))
+    TELEMETRY_LOTE = int(os.getenv("TELEMETRY_LOTE", "200"))
+    TELEMETRY_INTERVALO = float(os.getenv("TELEMETRY_INTERVALO", "2"))
+    EXPORT_STORE_PATH = os.getenv("EXPORT_STORE_PATH", ".cache/export_jobs.sqlite3")
+    EXPORT_STORE_MAX_BYTES = int(os.getenv("EXPORT_STORE_MAX_BYTES", str(256 * 1024 * 1024)))
+    EXPORT_TTL = float(os.getenv("EXPORT_TTL", "3600"))
+    EXPORT_ESPERA = float(os.getenv("EXPORT_ESPERA", "120"))
+    EXPORT_HILOS = int(os.getenv("EXPORT_HILOS", "4"))
+    MOTOR_CACHE_BACKEND = os.getenv("MOTOR_CACHE_BACKEND", "memory").lower()
+    MOTOR_CACHE_MAXSIZE = int(os.getenv("MOTOR_CACHE_MAXSIZE", "1024"))
+    MOTOR_CACHE_TTL = float(os.getenv("MOTOR_CACHE_TTL", "300"))
+    MOTOR_LOTE_MAX_BYTES = int(os.getenv("MOTOR_LOTE_MAX_BYTES", str(200 * 1024 * 1024)))
+    MOTOR_LOTE_MAX_RATIO = float(os.getenv("MOTOR_LOTE_MAX_RATIO", "100"))
+    REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    CURRICULUM_CATALOG_TTL = float(os.getenv("CURRICULUM_CATALOG_TTL", "300"))
+    LLM_RPM = float(os.getenv("LLM_RPM", "60"))
+    LLM_CONCURRENCIA = int(os.getenv("LLM_CONCURRENCIA", "8"))
+    LLM_REINTENTOS = int(os.getenv("LLM_REINTENTOS", "4"))
+    LLM_LIMITES_MODELOS = os.getenv("LLM_LIMITES_MODELOS", "")
+    LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+    EMBEDDER = os.getenv("EMBEDDER", "gemini").lower()
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+    EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+    LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "sqlite").lower()
+    LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite3")
+    LLM_CACHE_MAXSIZE = int(os.getenv("LLM_CACHE_MAXSIZE", "5000"))
+    LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+    LLM_CACHE_RUTAS = os.getenv("LLM_CACHE_RUTAS", "")
+    LLM_CACHE_EXCLUIR = os.getenv("LLM_CACHE_EXCLUIR", "")
 
 settings = Settings()
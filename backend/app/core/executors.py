@@ -0,0 +1,27 @@
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Pool de procesos compartido para trabajo CPU-bound (parsers, visión, render).
+# Se crea de forma perezosa para no lanzar procesos al importar la app.
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Devuelve el pool de procesos compartido, dimensionado a los núcleos disponibles."""
+    global _process_pool
+    if _process_pool is None:
+        workers = int(os.getenv("PROFEIC_POOL_WORKERS", "0")) or os.cpu_count() or 1
+        _process_pool = ProcessPoolExecutor(max_workers=workers)
+        logger.info("Pool de procesos iniciado con %s workers", workers)
+    return _process_pool
+
+
+def shutdown_process_pool() -> None:
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
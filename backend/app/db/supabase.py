@@ -1,4 +1,175 @@
-from supabase import create_client, Client
+"""
+Acceso compartido a Supabase.
+
+Cada router creaba su propio cliente (`create_client`) al importarse, y algunos
+caminos calientes creaban uno por solicitud (la verificación de token en
+`routers/deps.py`, el generador SIMCE): cada cliente nuevo abre conexiones y
+paga un handshake TLS. Además todos los `.execute()` son HTTP síncrono dentro
+de handlers `async def`, así que bloqueaban el event loop.
+
+- `obtener_cliente(url, key)` devuelve un cliente único por (url, key), con un
+  `httpx.Client` propio en HTTP/2 y keep-alive (un pool por tipo de clave:
+  anon, service role). `cliente_anon()` y `cliente_service()` resuelven las
+  claves como lo hacían los routers.
+- `cliente_auth(url, key)` es un cliente de Auth nuevo por llamada para login y
+  registro: iniciar sesión en un cliente compartido haría que todas sus
+  consultas siguientes corrieran con el token de ese usuario.
+- `await ejecutar(query, "nombre")` corre el `.execute()` de un builder de
+  PostgREST en un pool de hilos acotado y registra su latencia por nombre;
+  `await en_hilo(funcion, ..., nombre=...)` hace lo mismo para otras llamadas
+  síncronas (p. ej. `auth.get_user`).
+- `estadisticas()`: consultas, errores y latencias p50/p95/máx por nombre.
+
+Configuración: SUPABASE_POOL_CONEXIONES, SUPABASE_KEEPALIVE, SUPABASE_TIMEOUT,
+SUPABASE_HILOS.
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+from supabase import create_client, Client, ClientOptions
+from supabase_auth import SyncGoTrueClient
+
 from app.core.config import settings
 
-supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY) if settings.SUPABASE_URL else None
+logger = logging.getLogger(__name__)
+
+# Latencias recientes que se conservan por consulta para los percentiles
+MUESTRAS_LATENCIA = 500
+
+_clientes: Dict[Tuple[str, str], Client] = {}
+_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+_http_auth: Optional[httpx.Client] = None
+
+
+def _http_client() -> httpx.Client:
+    limites = httpx.Limits(
+        max_connections=settings.SUPABASE_POOL_CONEXIONES,
+        max_keepalive_connections=settings.SUPABASE_POOL_CONEXIONES,
+        keepalive_expiry=settings.SUPABASE_KEEPALIVE
+    )
+    try:
+        return httpx.Client(http2=True, limits=limites, timeout=settings.SUPABASE_TIMEOUT, follow_redirects=True)
+    except ImportError:
+        # Sin el paquete `h2` httpx no habla HTTP/2; el keep-alive sigue funcionando en HTTP/1.1
+        logger.warning("Paquete h2 no disponible: los clientes Supabase usarán HTTP/1.1.")
+        return httpx.Client(limits=limites, timeout=settings.SUPABASE_TIMEOUT, follow_redirects=True)
+
+
+def obtener_cliente(url: str, key: str) -> Client:
+    """Cliente Supabase compartido para (url, key); se crea la primera vez que se pide."""
+    with _lock:
+        cliente = _clientes.get((url, key))
+        if cliente is None:
+            opciones = ClientOptions(httpx_client=_http_client(), auto_refresh_token=False, persist_session=False)
+            cliente = create_client(url, key, options=opciones)
+            _clientes[(url, key)] = cliente
+        return cliente
+
+
+def cliente_auth(url: str, key: str) -> SyncGoTrueClient:
+    """
+    Cliente de Auth nuevo (sesión propia, en memoria) para llamadas que inician sesión
+    (`sign_in_with_password`, `sign_up`). En el cliente compartido esas llamadas cambian
+    el header Authorization de todas sus consultas al token del usuario; aquí la sesión
+    muere con el objeto. Solo se comparte la conexión HTTP (los headers van por petición).
+    """
+    global _http_auth
+    with _lock:
+        if _http_auth is None:
+            _http_auth = _http_client()
+    return SyncGoTrueClient(
+        url=f"{url.rstrip('/')}/auth/v1",
+        headers={"apikey": key, "Authorization": f"Bearer {key}"},
+        auto_refresh_token=False,
+        persist_session=False,
+        http_client=_http_auth
+    )
+
+
+def _url() -> str:
+    return os.getenv("SUPABASE_URL") or settings.SUPABASE_URL or ""
+
+
+def cliente_anon() -> Optional[Client]:
+    """Cliente con la clave anon (SUPABASE_ANON_KEY o SUPABASE_KEY), o None si falta configuración."""
+    key = os.getenv("SUPABASE_ANON_KEY") or os.getenv("SUPABASE_KEY")
+    return obtener_cliente(_url(), key) if _url() and key else None
+
+
+def cliente_service() -> Optional[Client]:
+    """Cliente con service role (SUPABASE_SERVICE_ROLE_KEY o SUPABASE_KEY), o None si falta configuración."""
+    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY")
+    return obtener_cliente(_url(), key) if _url() and key else None
+
+
+# ─── Ejecución asíncrona ──────────────────────────────────────────────────────
+
+class _MetricasConsulta:
+    def __init__(self):
+        self.consultas = 0
+        self.errores = 0
+        self.latencias = deque(maxlen=MUESTRAS_LATENCIA)
+
+    def resumen(self) -> Dict[str, Any]:
+        ordenadas = sorted(self.latencias)
+
+        def percentil(p: float) -> Optional[float]:
+            return round(ordenadas[min(len(ordenadas) - 1, int(p * len(ordenadas)))], 4) if ordenadas else None
+
+        return {
+            "consultas": self.consultas,
+            "errores": self.errores,
+            "latencia_p50": percentil(0.5),
+            "latencia_p95": percentil(0.95),
+            "latencia_max": round(ordenadas[-1], 4) if ordenadas else None
+        }
+
+
+_metricas: Dict[str, _MetricasConsulta] = defaultdict(_MetricasConsulta)
+
+
+def _pool_hilos() -> ThreadPoolExecutor:
+    # Pool propio: las consultas no compiten con asyncio.to_thread ni lo agotan
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.SUPABASE_HILOS, thread_name_prefix="supabase")
+        return _executor
+
+
+async def en_hilo(funcion: Callable[..., Any], *args, nombre: str = "supabase", **kwargs) -> Any:
+    """Ejecuta una llamada síncrona del cliente Supabase sin bloquear el event loop, midiendo su latencia."""
+    metricas = _metricas[nombre]
+    metricas.consultas += 1
+    inicio = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_pool_hilos(), lambda: funcion(*args, **kwargs))
+    except Exception:
+        metricas.errores += 1
+        raise
+    finally:
+        metricas.latencias.append(time.perf_counter() - inicio)
+
+
+async def ejecutar(query: Any, nombre: str = "supabase") -> Any:
+    """`await ejecutar(supabase.table(...).select(...).eq(...), "tabla.accion")` ≡ `.execute()` asíncrono."""
+    return await en_hilo(query.execute, nombre=nombre)
+
+
+def estadisticas() -> Dict[str, Any]:
+    return {
+        "clientes": len(_clientes),
+        "consultas": {nombre: m.resumen() for nombre, m in _metricas.items()}
+    }
+
+
+supabase: Client = obtener_cliente(settings.SUPABASE_URL, settings.SUPABASE_KEY) if settings.SUPABASE_URL else None
@@ -0,0 +1,72 @@
+"""
+Hojas OMR sintéticas para tests y benchmarks.
+
+Dibuja hojas marcadas con la misma geometría que `OMRTemplateGenerator`
+(fiduciales, grilla RUT y 45 preguntas), opcionalmente reescaladas al tamaño
+de una foto de celular. Las usan test_omr_lote.py y bench_omr_lote.py.
+Requiere OpenCV y numpy.
+"""
+import random
+
+import cv2
+import numpy as np
+
+# Hoja carta a 200 DPI, coordenadas en mm con origen abajo-izquierda (ReportLab)
+ANCHO_PX, ALTO_PX = 1700, 2200
+PX_POR_MM = 200 / 25.4
+ALTO_MM = 279.4
+OPCIONES = ["A", "B", "C", "D"]
+
+
+def _px(x_mm: float, y_mm: float) -> tuple:
+    return int(round(x_mm * PX_POR_MM)), int(round((ALTO_MM - y_mm) * PX_POR_MM))
+
+
+def generar_hoja_sintetica(respuestas: dict, rut: str, tamano: tuple = None, semilla: int = 0) -> bytes:
+    """
+    Dibuja una hoja OMR marcada (JPEG) con la geometría del generador de PDF.
+    `respuestas` mapea "1".."45" → "A".."D" o None; `rut` es "12345678-K".
+    `tamano` (ancho, alto) reescala la hoja, p. ej. (3024, 4032) para una foto de 12 MP.
+    """
+    rng = np.random.default_rng(semilla)
+    hoja = np.full((ALTO_PX, ANCHO_PX), 255, np.uint8)
+
+    for x_mm, y_mm in [(15, 264), (200, 264), (15, 15), (200, 15)]:
+        x0, y1 = _px(x_mm, y_mm)
+        x1, y0 = _px(x_mm + 10, y_mm + 10)
+        cv2.rectangle(hoja, (x0, y0), (x1, y1), 0, -1)
+
+    r_q = int(2.5 * PX_POR_MM)
+    for i in range(45):
+        x_base = [20, 85, 150][i // 15]
+        y = 170 - (i % 15) * 8.5
+        for j, opt in enumerate(OPCIONES):
+            centro = _px(x_base + j * 5.5, y)
+            marcada = respuestas.get(str(i + 1)) == opt
+            cv2.circle(hoja, centro, r_q, 0, -1 if marcada else 2)
+
+    r_rut = int(2.2 * PX_POR_MM)
+    digitos = rut.replace("-", "")
+    for col in range(9):
+        x_mm = 70 + col * 6 + (4 if col == 8 else 0)
+        for row in range(11 if col == 8 else 10):
+            centro = _px(x_mm, 255 - 3.5 - row * 5.5)
+            etiqueta = str(row) if row < 10 else "K"
+            marcada = col < len(digitos) and digitos[col] == etiqueta
+            cv2.circle(hoja, centro, r_rut, 0, -1 if marcada else 1)
+
+    # Ruido de sensor leve para que Otsu trabaje como con una foto real
+    ruido = rng.normal(0, 6, hoja.shape)
+    hoja = np.clip(hoja.astype(np.float32) + ruido, 0, 255).astype(np.uint8)
+
+    if tamano:
+        hoja = cv2.resize(hoja, tamano, interpolation=cv2.INTER_LINEAR)
+    ok, jpeg = cv2.imencode(".jpg", cv2.cvtColor(hoja, cv2.COLOR_GRAY2BGR), [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return jpeg.tobytes()
+
+
+def hoja_aleatoria(semilla: int, tamano: tuple = None) -> tuple:
+    rng = random.Random(semilla)
+    respuestas = {str(i + 1): rng.choice(OPCIONES + [None]) for i in range(45)}
+    rut = "".join(rng.choice("0123456789") for _ in range(8)) + "-" + rng.choice("0123456789K")
+    return respuestas, rut, generar_hoja_sintetica(respuestas, rut, tamano, semilla)
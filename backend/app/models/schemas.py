@@ -65,6 +65,10 @@ class DirectorDashboardResponse(BaseModel):
         ...,
         description="Resumen agregado de alertas de Doble Riesgo sin detallar nóminas confidenciales si no es necesario, o estadísticas macro"
     )
+    desglose_cursos: Optional[List[Dict[str, Any]]] = Field(
+        None,
+        description="Drill-down por curso (promedio, aprobación, atrasos y alumnos en riesgo) calculado en la misma pasada que los KPI macro"
+    )
 
 # 2. ROL COORDINADOR: Acceso al Panel de Control de Ciclo con calibración de umbrales y nómina de Doble Riesgo.
 class CoordinadorDashboardResponse(BaseModel):
@@ -1,10 +1,16 @@
 import google.generativeai as genai
 from app.core.config import settings
+from app.services.llm_client import cliente_llm
 import re
 
 genai.configure(api_key=settings.GOOGLE_API_KEY)
+MODELO = "gemini-2.5-flash"
 generation_config = {"temperature": 0.4, "response_mime_type": "application/json"}
-model = genai.GenerativeModel("gemini-2.5-flash", generation_config=generation_config)
+model = genai.GenerativeModel(MODELO, generation_config=generation_config)
 
 def clean_json(text):
     return re.sub(r'^```json\s*|\s*```$', '', text, flags=re.MULTILINE).strip()
+
+async def generar(ruta: str, contenido, **opciones) -> str:
+    """Texto de `model` sin bloquear el event loop (cliente LLM compartido: caché, planificador, timeout)."""
+    return await cliente_llm.generar(ruta, contenido, modelo=MODELO, generation_config=generation_config, **opciones)
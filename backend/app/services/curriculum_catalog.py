@@ -0,0 +1,220 @@
+"""
+Catálogo curricular en memoria (tabla `curriculum_oas`).
+
+Los selectores encadenados nivel → asignatura → OA (/curriculum/options y
+/api/v1/motor/filtros) se responden desde índices construidos una sola vez:
+
+- `niveles` en orden pedagógico oficial,
+- `asignaturas_por_nivel` ordenadas alfabéticamente,
+- `oas` por (nivel, asignatura), ya ordenados por el correlativo de `oa_codigo`.
+
+La tabla se carga completa (paginada) la primera vez. Pasado el TTL
+(CURRICULUM_CATALOG_TTL) solo se consulta una huella barata (conteo + último
+`updated_at`, ver migración 20260620_curriculum_oas_updated_at.sql); si cambió
+se reconstruye el catálogo, si no se sigue sirviendo el mismo. Mientras la
+columna no exista no hay forma barata de detectar ediciones de un OA, así que
+cada TTL recarga la tabla completa.
+Sin Supabase, o si la carga falla, se usa el snapshot empaquetado
+`assets/indicadores_curriculum_PERFECTO.json`.
+"""
+import re
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from postgrest.exceptions import APIError
+
+from app.core.config import settings
+from app.db.supabase import supabase
+
+logger = logging.getLogger(__name__)
+
+TABLA_CURRICULUM = "curriculum_oas"
+COLUMNAS_CATALOGO = "id,nivel,asignatura,oa_codigo,descripcion"
+TAM_PAGINA = 1000
+SNAPSHOT_PATH = Path(__file__).resolve().parents[2] / "assets" / "indicadores_curriculum_PERFECTO.json"
+
+ORDEN_NIVEL_OFICIAL = {
+    "NT1": 1, "Pre-Kinder": 1,
+    "NT2": 2, "Kinder": 2,
+    "1° Básico": 3, "2° Básico": 4, "3° Básico": 5,
+    "4° Básico": 6, "5° Básico": 7, "6° Básico": 8,
+    "7° Básico": 9, "8° Básico": 10,
+    "1° Medio": 11, "2° Medio": 12,
+    "3° Medio": 13, "4° Medio": 14,
+    "3° y 4° Medio": 15
+}
+
+_NUMERO_FINAL = re.compile(r"\d+$")
+
+
+def correlativo_oa(codigo: Optional[str]) -> int:
+    """Número al final del código (ej: 'MA08 OA 04' -> 4); sin número va al final."""
+    nums = _NUMERO_FINAL.findall((codigo or "").strip())
+    return int(nums[0]) if nums else 999
+
+
+@dataclass(frozen=True)
+class Catalogo:
+    niveles: List[str]
+    asignaturas: List[str]
+    asignaturas_por_nivel: Dict[str, List[str]]
+    oas: Dict[Tuple[str, str], List[Dict[str, Any]]]
+    version: str
+    origen: str
+
+
+def construir_catalogo(filas: List[Dict[str, Any]], origen: str) -> Catalogo:
+    mapping = defaultdict(set)
+    oas = defaultdict(list)
+    for fila in filas:
+        nivel = fila.get("nivel")
+        asignatura = fila.get("asignatura")
+        if not nivel:
+            continue
+        mapping[nivel]  # un nivel sin asignaturas también se lista
+        if not asignatura:
+            continue
+        mapping[nivel].add(asignatura)
+        oas[(nivel, asignatura)].append({
+            "id": fila.get("id"),
+            "oa_codigo": fila.get("oa_codigo"),
+            "descripcion": fila.get("descripcion")
+        })
+
+    niveles = sorted(mapping, key=lambda x: ORDEN_NIVEL_OFICIAL.get(x, 99))
+    firma = hashlib.sha256(
+        json.dumps(filas, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    ).hexdigest()[:16]
+    return Catalogo(
+        niveles=niveles,
+        asignaturas=sorted({a for asigs in mapping.values() for a in asigs}),
+        asignaturas_por_nivel={n: sorted(mapping[n]) for n in niveles},
+        oas={k: sorted(v, key=lambda oa: correlativo_oa(oa["oa_codigo"])) for k, v in oas.items()},
+        version=firma,
+        origen=origen
+    )
+
+
+def _leer_tabla() -> List[Dict[str, Any]]:
+    filas = []
+    inicio = 0
+    while True:
+        resp = supabase.table(TABLA_CURRICULUM).select(COLUMNAS_CATALOGO).order("id").range(inicio, inicio + TAM_PAGINA - 1).execute()
+        filas.extend(resp.data)
+        if len(resp.data) < TAM_PAGINA:
+            return filas
+        inicio += TAM_PAGINA
+
+
+def _huella_tabla() -> Optional[str]:
+    """
+    Conteo exacto + última edición: cambia con altas, bajas y ediciones sin traer la tabla.
+    None (recarga completa) si `curriculum_oas` aún no tiene `updated_at`.
+    """
+    try:
+        resp = supabase.table(TABLA_CURRICULUM).select("updated_at", count="exact").order("updated_at", desc=True).limit(1).execute()
+    except APIError as e:
+        logger.debug("curriculum_oas sin updated_at (%s); se recarga completa en cada TTL.", e)
+        return None
+    ultima = resp.data[0]["updated_at"] if resp.data else None
+    return f"{resp.count}:{ultima}"
+
+
+def _leer_snapshot() -> List[Dict[str, Any]]:
+    with open(SNAPSHOT_PATH, encoding="utf-8") as f:
+        registros = json.load(f)
+    return [{
+        "id": None,
+        "nivel": r.get("nivel"),
+        "asignatura": r.get("asignatura"),
+        "oa_codigo": r.get("oa_codigo"),
+        # El snapshot no trae la redacción oficial del OA: se usan sus indicadores
+        "descripcion": " ".join(r.get("indicadores") or [])
+    } for r in registros]
+
+
+class CatalogoCurricular:
+    """Catálogo compartido con recarga perezosa por huella de versión."""
+
+    def __init__(
+        self,
+        leer_tabla: Optional[Callable[[], List[Dict[str, Any]]]] = None,
+        huella: Optional[Callable[[], Optional[str]]] = None,
+        leer_snapshot: Callable[[], List[Dict[str, Any]]] = _leer_snapshot,
+        ttl: Optional[float] = None,
+        reloj: Callable[[], float] = time.monotonic
+    ):
+        self._leer_tabla = leer_tabla or (_leer_tabla if supabase else None)
+        self._huella = huella or (_huella_tabla if supabase else None)
+        self._leer_snapshot = leer_snapshot
+        self.ttl = settings.CURRICULUM_CATALOG_TTL if ttl is None else ttl
+        self._reloj = reloj
+        self._catalogo: Optional[Catalogo] = None
+        self._huella_actual: Optional[str] = None
+        self._verificado = 0.0
+        self._lock = threading.Lock()
+
+    def _fresco(self) -> bool:
+        return self._catalogo is not None and self._reloj() - self._verificado < self.ttl
+
+    def _cargar(self) -> None:
+        if self._leer_tabla:
+            try:
+                huella = self._huella() if self._huella else None
+                if self._catalogo is not None and huella is not None and huella == self._huella_actual:
+                    return
+                filas = self._leer_tabla()
+                if filas:
+                    self._catalogo = construir_catalogo(filas, "supabase_live")
+                    self._huella_actual = huella
+                    logger.info("Catálogo curricular cargado: %d OA (versión %s)", len(filas), self._catalogo.version)
+                    return
+            except Exception as e:
+                logger.warning("No se pudo cargar curriculum_oas: %s", str(e))
+                if self._catalogo is not None:
+                    return  # Se sigue sirviendo la última versión buena
+
+        try:
+            self._catalogo = construir_catalogo(self._leer_snapshot(), "snapshot")
+        except Exception as e:
+            logger.error("No se pudo leer el snapshot curricular: %s", str(e))
+
+    def obtener(self) -> Optional[Catalogo]:
+        """Catálogo vigente; None solo si no hay ni Supabase ni snapshot."""
+        if self._fresco():
+            return self._catalogo
+        with self._lock:
+            if not self._fresco():
+                self._cargar()
+                self._verificado = self._reloj()
+        return self._catalogo
+
+    async def obtener_async(self) -> Optional[Catalogo]:
+        """Igual que `obtener`, pero la (re)carga corre fuera del event loop."""
+        if self._fresco():
+            return self._catalogo
+        return await asyncio.to_thread(self.obtener)
+
+    def invalidar(self) -> None:
+        """Fuerza la verificación de versión en la próxima lectura."""
+        self._verificado = float("-inf")
+
+
+def opciones_curriculum(catalogo: Catalogo, nivel: Optional[str], asignatura: Optional[str]) -> Dict[str, Any]:
+    """Respuesta de /curriculum/options para el paso del selector encadenado."""
+    if not nivel:
+        return {"type": "niveles", "data": catalogo.niveles}
+    if not asignatura:
+        return {"type": "asignaturas", "data": catalogo.asignaturas_por_nivel.get(nivel, [])}
+    return {"type": "oas", "data": catalogo.oas.get((nivel, asignatura), [])}
+
+
+catalogo_curricular = CatalogoCurricular()
@@ -0,0 +1,98 @@
+"""
+Plantillas DOCX con la marca ProfeIC.
+
+Cada exportación armaba desde cero la tabla de encabezado (logo + textos fijos)
+y, en SIMCE, volvía a abrir el logo con PIL y a recodificarlo a PNG para cada
+documento. Ahora:
+
+- `logo_png(nombre, ancho_px)` decodifica el logo una vez, lo reduce al ancho
+  con que se imprime (si eso lo aligera) y lo guarda como PNG en memoria;
+- `PlantillaDocx(construir)` arma el esqueleto (estilos, tabla de encabezado,
+  parte de imagen del logo) una sola vez, lo guarda como bytes `.docx` y
+  `nueva()` devuelve un `Document` clonado de esos bytes, listo para agregar
+  los campos variables (asignatura, nivel, tipo) y el contenido.
+
+`precargar()` (al arrancar la app, antes de que existan los procesos del pool
+de render) arma todas las plantillas registradas, así cada worker las hereda ya
+construidas.
+"""
+import io
+import logging
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from docx import Document
+
+logger = logging.getLogger(__name__)
+
+ASSETS_DIR: Path = Path(__file__).resolve().parent.parent.parent / "assets"
+
+# El logo se imprime a 1" en los encabezados: 300 px bastan para 300 dpi
+ANCHO_LOGO_PX = 300
+
+_plantillas: List["PlantillaDocx"] = []
+
+
+@lru_cache(maxsize=None)
+def logo_png(nombre: str, ancho_px: int = ANCHO_LOGO_PX) -> Optional[bytes]:
+    """PNG del logo `assets/<nombre>` reducido a `ancho_px` si eso lo aligera, o None si no existe o no se puede leer."""
+    ruta = ASSETS_DIR / nombre
+    if not ruta.exists():
+        return None
+    try:
+        from PIL import Image
+
+        def png(img) -> bytes:
+            # PNG normalizado: también evita el error de python-docx con JPEG progresivos o EXIF raros
+            buf = io.BytesIO()
+            img.save(buf, format="PNG", optimize=True)
+            return buf.getvalue()
+
+        with Image.open(ruta) as img:
+            img.load()
+            original = png(img)
+            if img.width <= ancho_px:
+                return original
+            reducido = png(img.resize((ancho_px, round(img.height * ancho_px / img.width)), Image.LANCZOS))
+            # Un logo de pocos colores puede pesar más reducido (el suavizado agrega colores)
+            return min(original, reducido, key=len)
+    except Exception as e:
+        logger.warning("No se pudo preparar el logo %s: %s", ruta, e)
+        return None
+
+
+class PlantillaDocx:
+    """Esqueleto `.docx` construido una vez por proceso y clonado en cada exportación."""
+
+    def __init__(self, construir: Callable[[Document], None]):
+        """`construir(doc)` agrega a un `Document()` vacío todo lo que es igual en cada exportación."""
+        self._construir = construir
+        self._bytes: Optional[bytes] = None
+        self._lock = threading.Lock()
+        _plantillas.append(self)
+
+    def esqueleto(self) -> bytes:
+        if self._bytes is None:
+            with self._lock:
+                if self._bytes is None:
+                    doc = Document()
+                    self._construir(doc)
+                    buf = io.BytesIO()
+                    doc.save(buf)
+                    self._bytes = buf.getvalue()
+        return self._bytes
+
+    def nueva(self) -> Document:
+        """Documento nuevo con el esqueleto ya armado."""
+        return Document(io.BytesIO(self.esqueleto()))
+
+
+def precargar() -> None:
+    """Arma todas las plantillas registradas (se llama al arrancar la app). Un error solo se registra."""
+    for plantilla in _plantillas:
+        try:
+            plantilla.esqueleto()
+        except Exception as e:
+            logger.warning("No se pudo precargar una plantilla DOCX: %s", e)
@@ -0,0 +1,168 @@
+"""
+Motor de render DOCX.
+
+Los endpoints de exportación (`routers/export.py`, cuadernillo y hoja OMR de
+SIMCE, informe PME, adecuación NEE) armaban el `Document` de python-docx y
+llamaban `doc.save()` dentro del handler `async`: un paquete didáctico de 30
+documentos dejaba al worker sin atender nada durante segundos.
+
+Ahora cada endpoint expone una función síncrona de módulo `docx_x(req) -> bytes`
+y la entrega a este motor, que la ejecuta en el pool de procesos compartido
+(`app.core.executors`), dimensionado a los núcleos. Las peticiones que exceden
+los procesos esperan en la cola del pool sin bloquear el event loop.
+
+Por render se registra: espera en cola, duración en el worker, tamaño del
+archivo y memoria (RSS máximo del proceso y cuánto lo hizo crecer ese render).
+`estadisticas()` resume esas métricas por nombre de documento.
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.executors import get_process_pool
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Renders recientes que se conservan por documento para los percentiles
+MUESTRAS_RENDER = 200
+
+
+def _rss_max_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    # ru_maxrss viene en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _render_medido(funcion: Callable[..., bytes], args: Tuple[Any, ...]) -> Dict[str, Any]:
+    """Punto de entrada en el worker: renderiza y mide tiempo y memoria del propio proceso."""
+    rss_antes = _rss_max_mb()
+    inicio = time.perf_counter()
+    datos = funcion(*args)
+    duracion = time.perf_counter() - inicio
+    rss = _rss_max_mb()
+    return {
+        "datos": datos,
+        "duracion": duracion,
+        "rss_max_mb": rss,
+        "rss_delta_mb": (rss - rss_antes) if rss is not None else None,
+        "pid": os.getpid()
+    }
+
+
+class _MetricasRender:
+    def __init__(self):
+        self.renders = 0
+        self.errores = 0
+        self.bytes = 0
+        self.duraciones = deque(maxlen=MUESTRAS_RENDER)
+        self.esperas = deque(maxlen=MUESTRAS_RENDER)
+        self.rss_max_mb = 0.0
+
+    def resumen(self) -> Dict[str, Any]:
+        def percentil(valores, p: float) -> Optional[float]:
+            ordenadas = sorted(valores)
+            return round(ordenadas[min(len(ordenadas) - 1, int(p * len(ordenadas)))], 4) if ordenadas else None
+
+        return {
+            "renders": self.renders,
+            "errores": self.errores,
+            "bytes": self.bytes,
+            "duracion_p50": percentil(self.duraciones, 0.5),
+            "duracion_p95": percentil(self.duraciones, 0.95),
+            "espera_p95": percentil(self.esperas, 0.95),
+            "rss_max_mb": round(self.rss_max_mb, 1)
+        }
+
+
+class MotorRender:
+    def __init__(self, executor: Optional[Executor] = None):
+        """`executor` permite inyectar un pool (tests); por defecto, el pool de procesos compartido."""
+        self._executor = executor
+        self._metricas: Dict[str, _MetricasRender] = defaultdict(_MetricasRender)
+        self._lock = threading.Lock()
+        self.en_curso = 0
+
+    def enviar(self, funcion: Callable[..., bytes], *args, nombre: str = "docx") -> Future:
+        """Encola `funcion(*args)` (función de módulo, argumentos serializables). El futuro entrega los bytes."""
+        executor = self._executor or get_process_pool()
+        enviado = time.perf_counter()
+        with self._lock:
+            self.en_curso += 1
+        interno = executor.submit(_render_medido, funcion, args)
+        resultado: Future = Future()
+
+        def terminar(f: Future) -> None:
+            total = time.perf_counter() - enviado
+            metricas = self._metricas[nombre]
+            with self._lock:
+                self.en_curso -= 1
+                if f.cancelled():
+                    # Pool cerrado con cancel_futures o cliente desconectado: nadie debe quedar esperando
+                    logger.warning("Render %s cancelado tras %.2fs.", nombre, total)
+                    resultado.cancel()
+                    return
+                error = f.exception()
+                if error is not None:
+                    metricas.errores += 1
+                else:
+                    medida = f.result()
+                    metricas.renders += 1
+                    metricas.bytes += len(medida["datos"])
+                    metricas.duraciones.append(medida["duracion"])
+                    metricas.esperas.append(max(0.0, total - medida["duracion"]))
+                    metricas.rss_max_mb = max(metricas.rss_max_mb, medida["rss_max_mb"] or 0.0)
+            if resultado.done():
+                # `resultado` se canceló mientras el render ya corría en el worker
+                return
+            if error is not None:
+                logger.error("Render %s falló tras %.2fs: %s", nombre, total, error)
+                resultado.set_exception(error)
+                return
+            logger.info(
+                "Render %s: %.2fs en worker %s (cola %.2fs), %d KB, RSS máx %s MB (+%s)",
+                nombre, medida["duracion"], medida["pid"], max(0.0, total - medida["duracion"]),
+                len(medida["datos"]) // 1024, _mb(medida["rss_max_mb"]), _mb(medida["rss_delta_mb"])
+            )
+            resultado.set_result(medida["datos"])
+
+        def propagar_cancelacion(r: Future) -> None:
+            # Cliente desconectado: sacar el render de la cola si aún no empezó
+            if r.cancelled():
+                interno.cancel()
+
+        resultado.add_done_callback(propagar_cancelacion)
+        interno.add_done_callback(terminar)
+        return resultado
+
+    def renderizar(self, funcion: Callable[..., bytes], *args, nombre: str = "docx") -> bytes:
+        """Versión bloqueante, para hilos de fondo (p. ej. los trabajos de exportación)."""
+        return self.enviar(funcion, *args, nombre=nombre).result()
+
+    async def renderizar_async(self, funcion: Callable[..., bytes], *args, nombre: str = "docx") -> bytes:
+        """`await motor_render.renderizar_async(docx_x, req, nombre="export.x")` sin bloquear el event loop."""
+        return await asyncio.wrap_future(self.enviar(funcion, *args, nombre=nombre))
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "en_curso": self.en_curso,
+                "documentos": {nombre: m.resumen() for nombre, m in self._metricas.items()}
+            }
+
+
+def _mb(valor: Optional[float]) -> str:
+    return f"{valor:.0f}" if valor is not None else "?"
+
+
+motor_render = MotorRender()
@@ -0,0 +1,180 @@
+"""
+Pipeline de embeddings para documentos institucionales (RAG multi-tenant).
+
+- Los fragmentos idénticos (encabezados y pies de página repetidos, artículos
+  copiados) se vectorizan una sola vez: se deduplican por hash SHA-256.
+- Los fragmentos únicos se agrupan en lotes (una llamada al proveedor por lote)
+  y los lotes corren en paralelo en hilos, acotados por un semáforo, sin
+  bloquear el event loop.
+- `TrabajosEmbedding` guarda el estado de los trabajos en segundo plano para
+  consultarlo por polling.
+- `FakeEmbedder` produce vectores deterministas sin red, con latencia simulada,
+  para tests y benchmarks offline (EMBEDDER=fake).
+
+Configuración: EMBEDDER, EMBEDDING_BATCH_SIZE, EMBEDDING_CONCURRENCY.
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = "models/text-embedding-004"
+EMBEDDING_DIM = 768
+# Límite de contenidos por llamada batch de la API de embeddings de Gemini
+MAX_LOTE_PROVEEDOR = 100
+
+
+def hash_contenido(texto: str) -> str:
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+class GeminiEmbedder:
+    """Embeddings de documentos con Gemini; un lote completo por llamada."""
+
+    def __init__(self, model: str = EMBEDDING_MODEL, title: str = "Contexto Institucional"):
+        self.model = model
+        self.title = title
+
+    def embed_batch(self, textos: List[str]) -> List[List[float]]:
+        import google.generativeai as genai
+
+        result = genai.embed_content(
+            model=self.model,
+            content=textos,
+            task_type="retrieval_document",
+            title=self.title
+        )
+        return result["embedding"]
+
+
+class FakeEmbedder:
+    """Embedder local determinista: mismo texto → mismo vector. `latencia` simula el RTT por llamada."""
+
+    def __init__(self, dim: int = EMBEDDING_DIM, latencia: float = 0.0):
+        self.dim = dim
+        self.latencia = latencia
+        self.llamadas = 0
+        self.textos = 0
+        self._lock = threading.Lock()
+
+    def _vector(self, texto: str) -> List[float]:
+        semilla = hashlib.sha256(texto.encode("utf-8")).digest()
+        crudo = (semilla * (self.dim // len(semilla) + 1))[:self.dim]
+        return [(b - 127.5) / 127.5 for b in crudo]
+
+    def embed_batch(self, textos: List[str]) -> List[List[float]]:
+        with self._lock:
+            self.llamadas += 1
+            self.textos += len(textos)
+        if self.latencia:
+            time.sleep(self.latencia)
+        return [self._vector(t) for t in textos]
+
+
+def crear_embedder():
+    if settings.EMBEDDER == "fake":
+        return FakeEmbedder()
+    return GeminiEmbedder()
+
+
+async def vectorizar_fragmentos(
+    fragmentos: List[str],
+    embedder=None,
+    tam_lote: Optional[int] = None,
+    concurrencia: Optional[int] = None,
+    on_progreso: Optional[Callable[[int, int], None]] = None
+) -> List[List[float]]:
+    """
+    Devuelve un vector por fragmento (mismo orden). Los duplicados se vectorizan una vez;
+    los lotes corren en hilos, como máximo `concurrencia` a la vez.
+    `on_progreso(unicos_listos, unicos_totales)` se llama al terminar cada lote.
+    """
+    embedder = embedder or crear_embedder()
+    tam_lote = max(1, min(tam_lote or settings.EMBEDDING_BATCH_SIZE, MAX_LOTE_PROVEEDOR))
+    semaforo = asyncio.Semaphore(max(1, concurrencia or settings.EMBEDDING_CONCURRENCY))
+
+    # Deduplicar por hash, conservando el primer texto de cada hash
+    hashes = [hash_contenido(f) for f in fragmentos]
+    unicos: Dict[str, str] = {}
+    for h, f in zip(hashes, fragmentos):
+        unicos.setdefault(h, f)
+    claves = list(unicos)
+    lotes = [claves[i:i + tam_lote] for i in range(0, len(claves), tam_lote)]
+
+    vectores: Dict[str, List[float]] = {}
+    listos = 0
+
+    async def _lote(claves_lote: List[str]):
+        nonlocal listos
+        async with semaforo:
+            resultado = await asyncio.to_thread(embedder.embed_batch, [unicos[h] for h in claves_lote])
+        if len(resultado) != len(claves_lote):
+            raise ValueError(f"El proveedor devolvió {len(resultado)} vectores para {len(claves_lote)} fragmentos.")
+        vectores.update(zip(claves_lote, resultado))
+        listos += len(claves_lote)
+        if on_progreso:
+            on_progreso(listos, len(claves))
+
+    await asyncio.gather(*(_lote(l) for l in lotes))
+    return [vectores[h] for h in hashes]
+
+
+class TrabajosEmbedding:
+    """
+    Estado en memoria de los trabajos de vectorización (los terminados más antiguos se descartan).
+
+    Es por proceso: con varios workers (o instancias sin afinidad de sesión) el GET de
+    estado puede caer en otro proceso y responder 404; requiere un único worker.
+    """
+
+    def __init__(self, max_trabajos: int = 200):
+        self.max_trabajos = max_trabajos
+        self._trabajos: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def crear(self, **datos) -> Dict[str, Any]:
+        trabajo = {
+            "job_id": uuid.uuid4().hex,
+            "estado": "pendiente",
+            "fragmentos": 0,
+            "fragmentos_unicos": 0,
+            "vectorizados": 0,
+            "error": None,
+            "resultado": None,
+            "creado": time.time(),
+            **datos
+        }
+        with self._lock:
+            self._trabajos[trabajo["job_id"]] = trabajo
+            self._podar()
+        return trabajo
+
+    def actualizar(self, job_id: str, **cambios) -> None:
+        with self._lock:
+            if job_id in self._trabajos:
+                self._trabajos[job_id].update(cambios)
+
+    def obtener(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            trabajo = self._trabajos.get(job_id)
+            return dict(trabajo) if trabajo else None
+
+    def _podar(self) -> None:
+        if len(self._trabajos) <= self.max_trabajos:
+            return
+        terminados = sorted(
+            (t for t in self._trabajos.values() if t["estado"] in ("completado", "error")),
+            key=lambda t: t["creado"]
+        )
+        for t in terminados[:len(self._trabajos) - self.max_trabajos]:
+            del self._trabajos[t["job_id"]]
+
+
+trabajos_embedding = TrabajosEmbedding()
@@ -0,0 +1,186 @@
+"""
+Trabajos de exportación DOCX (biblioteca: documento genérico y paquete didáctico).
+
+Antes `/export/prepare-*` guardaba el request completo en `download_cache`, un
+dict de módulo sin límite, y el GET de descarga lo renderizaba: lo que nunca se
+descargaba quedaba en memoria para siempre, y el GET fallaba si caía en otro
+worker. Ahora:
+
+- `prepare` registra el trabajo y empieza a renderizar de inmediato en un hilo
+  (EXPORT_HILOS);
+- el DOCX terminado se guarda en un `AlmacenExportaciones` SQLite en disco
+  local, compartido por los workers del mismo host (EXPORT_STORE_PATH);
+- el almacén está acotado por TTL (EXPORT_TTL) y por bytes totales
+  (EXPORT_STORE_MAX_BYTES, se expulsan primero los más antiguos);
+- la descarga lee el archivo del almacén; si aún se está renderizando, espera
+  hasta EXPORT_ESPERA segundos.
+"""
+import os
+import time
+import uuid
+import asyncio
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PENDIENTE = "pendiente"
+LISTO = "listo"
+ERROR = "error"
+
+# Cada cuánto se revisa el almacén mientras se espera un render de otro worker
+INTERVALO_ESPERA = 0.1
+
+
+class TrabajoNoEncontrado(KeyError):
+    """El trabajo no existe o expiró."""
+
+
+class ErrorDeRender(RuntimeError):
+    """El render del trabajo falló o quedó interrumpido."""
+
+
+class AlmacenExportaciones:
+    """Tabla id → (estado, nombre de archivo, DOCX) con expiración y tope de bytes."""
+
+    def __init__(self, path: str, max_bytes: int, ttl: float, reloj: Callable[[], float] = time.time):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._reloj = reloj
+        self._lock = threading.Lock()
+        self.expulsiones = 0
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS export_jobs ("
+            "id TEXT PRIMARY KEY, estado TEXT NOT NULL, filename TEXT NOT NULL, docx BLOB, "
+            "error TEXT, bytes INTEGER NOT NULL DEFAULT 0, creado REAL NOT NULL, expira REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS export_jobs_creado ON export_jobs (creado)")
+
+    def crear(self, job_id: str, filename: str) -> None:
+        ahora = self._reloj()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO export_jobs (id, estado, filename, creado, expira) VALUES (?, ?, ?, ?, ?)",
+                (job_id, PENDIENTE, filename, ahora, ahora + self.ttl)
+            )
+
+    def completar(self, job_id: str, docx: bytes) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE export_jobs SET estado = ?, docx = ?, bytes = ? WHERE id = ?",
+                (LISTO, docx, len(docx), job_id)
+            )
+            self._purgar()
+
+    def fallar(self, job_id: str, error: str) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE export_jobs SET estado = ?, error = ? WHERE id = ?", (ERROR, error, job_id))
+
+    def estado(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Metadatos del trabajo (sin el DOCX), o None si no existe o expiró."""
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT estado, filename, error, bytes, creado FROM export_jobs WHERE id = ? AND expira > ?",
+                (job_id, self._reloj())
+            ).fetchone()
+        if fila is None:
+            return None
+        return {"estado": fila[0], "filename": fila[1], "error": fila[2], "bytes": fila[3], "creado": fila[4]}
+
+    def leer(self, job_id: str) -> Optional[bytes]:
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT docx FROM export_jobs WHERE id = ? AND estado = ? AND expira > ?", (job_id, LISTO, self._reloj())
+            ).fetchone()
+        return fila[0] if fila else None
+
+    def _purgar(self) -> None:
+        # Primero los vencidos; después los más antiguos hasta respetar el tope de bytes
+        self._conn.execute("DELETE FROM export_jobs WHERE expira <= ?", (self._reloj(),))
+        total = self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM export_jobs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for job_id, tam in self._conn.execute("SELECT id, bytes FROM export_jobs WHERE estado = ? ORDER BY creado", (LISTO,)).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM export_jobs WHERE id = ?", (job_id,))
+            total -= tam
+            self.expulsiones += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            filas = self._conn.execute("SELECT estado, COUNT(*), COALESCE(SUM(bytes), 0) FROM export_jobs GROUP BY estado").fetchall()
+        return {
+            "trabajos": {estado: n for estado, n, _ in filas},
+            "bytes": sum(b for _, _, b in filas),
+            "max_bytes": self.max_bytes,
+            "expulsiones": self.expulsiones
+        }
+
+
+class TrabajosExportacion:
+    """Arranca renders en segundo plano y sirve sus resultados desde el almacén."""
+
+    def __init__(self, almacen: AlmacenExportaciones, espera: Optional[float] = None, hilos: Optional[int] = None):
+        self.almacen = almacen
+        self.espera = settings.EXPORT_ESPERA if espera is None else espera
+        # Pool propio: el render no depende de que siga vivo el event loop del request que lo pidió
+        self._pool = ThreadPoolExecutor(max_workers=hilos or settings.EXPORT_HILOS, thread_name_prefix="export")
+
+    def iniciar(self, filename: str, render: Callable[[], bytes]) -> str:
+        """Registra el trabajo y lanza `render()` (síncrono, devuelve el DOCX) en segundo plano. Devuelve su id."""
+        job_id = str(uuid.uuid4())
+        self.almacen.crear(job_id, filename)
+        self._pool.submit(self._ejecutar, job_id, render)
+        return job_id
+
+    def _ejecutar(self, job_id: str, render: Callable[[], bytes]) -> None:
+        try:
+            self.almacen.completar(job_id, render())
+        except Exception as e:
+            logger.error("Export %s: error renderizando DOCX: %s", job_id, e, exc_info=True)
+            self.almacen.fallar(job_id, str(e))
+
+    async def resultado(self, job_id: str) -> tuple:
+        """(filename, DOCX) del trabajo, esperando a que termine si sigue en curso."""
+        limite = time.monotonic() + self.espera
+        while True:
+            estado = self.almacen.estado(job_id)
+            if estado is None:
+                raise TrabajoNoEncontrado(job_id)
+            if estado["estado"] == ERROR:
+                raise ErrorDeRender(estado["error"])
+            if estado["estado"] == LISTO:
+                docx = await asyncio.to_thread(self.almacen.leer, job_id)
+                if docx is None:
+                    raise TrabajoNoEncontrado(job_id)
+                return estado["filename"], docx
+            if time.monotonic() >= limite:
+                raise ErrorDeRender("El documento no terminó de generarse a tiempo.")
+            await asyncio.sleep(INTERVALO_ESPERA)
+
+    def cerrar(self) -> None:
+        """Termina los renders en curso de este proceso (apagado ordenado)."""
+        self._pool.shutdown(wait=True)
+
+
+def _crear_almacen() -> AlmacenExportaciones:
+    try:
+        return AlmacenExportaciones(settings.EXPORT_STORE_PATH, max_bytes=settings.EXPORT_STORE_MAX_BYTES, ttl=settings.EXPORT_TTL)
+    except Exception as e:
+        logger.warning("No se pudo abrir el almacén de exportaciones en %s (%s). Usando SQLite en memoria.", settings.EXPORT_STORE_PATH, e)
+        return AlmacenExportaciones(":memory:", max_bytes=settings.EXPORT_STORE_MAX_BYTES, ttl=settings.EXPORT_TTL)
+
+
+trabajos_exportacion = TrabajosExportacion(_crear_almacen())
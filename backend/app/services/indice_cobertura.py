@@ -0,0 +1,244 @@
+"""
+Índice incremental de cobertura curricular y uso de la biblioteca.
+
+Al guardar un recurso, sus OAs se registran en `cobertura_curricular` y los
+triggers de la migración 20260615_indice_cobertura.sql suman en contadores
+por docente y por colegio:
+
+- `indice_uso_recursos`: (nivel, asignatura, tipo) → recursos, dok1..3 y
+  última actividad;
+- `indice_cobertura_oa`: (nivel, asignatura, OA, tipo) → recursos.
+
+Los dashboards leen esas filas (pocas, y no crecen con la biblioteca) en vez de
+descargar los `contenido` completos. Mientras la migración no esté aplicada,
+`leer_uso` arma las mismas filas desde los últimos recursos con `acumular_uso`
+(mismas reglas que los triggers), y `guardar_recurso` hace los dos inserts de
+siempre en vez de la función `guardar_recurso_con_cobertura`.
+"""
+import json
+import logging
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from postgrest.exceptions import APIError
+from supabase import Client
+
+from app.db.supabase import ejecutar
+
+logger = logging.getLogger(__name__)
+
+AMBITOS = ("usuario", "colegio")
+# Etiquetas de nivel/asignatura que no corresponden a un curso real
+ETIQUETAS_GENERICAS = {"", "general", "manual"}
+MAX_LARGO_OA = 255
+# Sin migración: cuántos recursos recientes se agregan en Python
+RECURSOS_SIN_INDICE = 50
+DIAS_ACTIVIDAD_RECIENTE = 30
+
+
+def extraer_oas(contenido: Dict[str, Any]) -> List[str]:
+    """OAs declarados en el `contenido` de un recurso, sin repetir y en orden de aparición."""
+    oas: Dict[str, None] = {}
+
+    def agregar(valor: Any) -> None:
+        if valor:
+            oas.setdefault(str(valor)[:MAX_LARGO_OA], None)
+
+    # 1. oaId u oaDescripcion (Rúbricas, etc)
+    if contenido.get("oaId") and str(contenido["oaId"]).lower() != "manual":
+        agregar(contenido["oaId"])
+    elif contenido.get("oaDescripcion"):
+        agregar(contenido["oaDescripcion"])
+    # 2. oaTexts (Evaluaciones)
+    if isinstance(contenido.get("oaTexts"), list):
+        for oa in contenido["oaTexts"]:
+            agregar(oa)
+    # 3. customOa
+    agregar(contenido.get("customOa"))
+    # 4. Arreglos propios: oas_asociados (IA) y mochila (Planificador)
+    if isinstance(contenido.get("oas_asociados"), list):
+        for oa in contenido["oas_asociados"]:
+            agregar(oa)
+    if isinstance(contenido.get("mochila"), list):
+        for oa_item in contenido["mochila"]:
+            if isinstance(oa_item, dict) and "descripcion" in oa_item:
+                agregar(oa_item["descripcion"])
+    return list(oas)
+
+
+def es_curso_real(asignatura: Optional[str], nivel: Optional[str]) -> bool:
+    """La cobertura solo se registra para asignatura y nivel concretos (evita basura)."""
+    return (asignatura or "").lower() not in ETIQUETAS_GENERICAS and (nivel or "").lower() not in ETIQUETAS_GENERICAS
+
+
+def dok_recurso(tipo: Optional[str], contenido: Any) -> Tuple[int, int, int]:
+    """Espejo de `indice_dok()`: distribución DOK declarada por una evaluación, o ceros."""
+    if str(tipo or "").upper() != "EVALUACION" or not contenido:
+        return (0, 0, 0)
+    try:
+        if isinstance(contenido, str):
+            contenido = json.loads(contenido)
+        dist = (contenido.get("config") or {}).get("dokDistribution") or {}
+        return tuple(int(float(dist.get(k) or 0)) for k in ("dok1", "dok2", "dok3"))
+    except Exception:
+        return (0, 0, 0)
+
+
+def acumular_uso(recursos: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Espejo de las filas de `indice_uso_recursos` de un ámbito: una por (nivel, asignatura, tipo)."""
+    filas: Dict[tuple, Dict[str, Any]] = {}
+    for r in recursos:
+        clave = (r.get("nivel") or "", r.get("asignatura") or "", r.get("tipo") or "")
+        fila = filas.setdefault(clave, {
+            "nivel": clave[0], "asignatura": clave[1], "tipo": clave[2],
+            "recursos": 0, "dok1": 0, "dok2": 0, "dok3": 0, "ultima_actividad": None
+        })
+        fila["recursos"] += 1
+        for k, v in zip(("dok1", "dok2", "dok3"), dok_recurso(r.get("tipo"), r.get("contenido"))):
+            fila[k] += v
+        creado = r.get("created_at")
+        if creado and (fila["ultima_actividad"] is None or _fecha(creado) > _fecha(fila["ultima_actividad"])):
+            fila["ultima_actividad"] = creado
+    return list(filas.values())
+
+
+def _fecha(valor: str) -> datetime:
+    fecha = datetime.fromisoformat(valor.replace("Z", "+00:00"))
+    return fecha if fecha.tzinfo else fecha.replace(tzinfo=timezone.utc)
+
+
+def resumir_uso(filas: List[Dict[str, Any]], ahora: Optional[datetime] = None) -> Dict[str, Any]:
+    """Estadísticas del dashboard a partir de las filas de uso de un ámbito."""
+    ahora = ahora or datetime.now(timezone.utc)
+    tipos: Counter = Counter()
+    asignaturas: Counter = Counter()
+    dok = {"dok1": 0, "dok2": 0, "dok3": 0}
+    ultima_por_asignatura: Dict[str, datetime] = {}
+
+    for f in filas:
+        tipos[f.get("tipo") or "GENERAL"] += f["recursos"]
+        asignatura = f.get("asignatura") or "General"
+        asignaturas[asignatura] += f["recursos"]
+        for k in dok:
+            dok[k] += f.get(k) or 0
+        if f.get("ultima_actividad"):
+            fecha = _fecha(f["ultima_actividad"])
+            if asignatura not in ultima_por_asignatura or fecha > ultima_por_asignatura[asignatura]:
+                ultima_por_asignatura[asignatura] = fecha
+
+    limite = ahora - timedelta(days=DIAS_ACTIVIDAD_RECIENTE)
+    ultimo = max(ultima_por_asignatura.values(), default=None)
+    return {
+        "total_recursos": sum(tipos.values()),
+        "tipos": tipos,
+        "asignaturas": asignaturas,
+        "dok": dok,
+        "sin_actividad_reciente": [a for a, _ in asignaturas.most_common() if a in ultima_por_asignatura and ultima_por_asignatura[a] < limite],
+        "ultimo_recurso": ultimo.isoformat() if ultimo else None
+    }
+
+
+async def leer_uso(supabase: Client, ambito: str, ambito_id: str) -> List[Dict[str, Any]]:
+    """Filas de `indice_uso_recursos` de un docente o colegio."""
+    try:
+        res = await ejecutar(
+            supabase.table("indice_uso_recursos")
+            .select("nivel, asignatura, tipo, recursos, dok1, dok2, dok3, ultima_actividad")
+            .eq("ambito", ambito).eq("ambito_id", ambito_id),
+            "indice_uso_recursos.leer"
+        )
+        return res.data or []
+    except APIError as e:
+        logger.warning("Índice de uso no disponible (%s); agregando los últimos recursos.", e)
+
+    consulta = supabase.table("biblioteca_recursos").select("tipo, asignatura, nivel, created_at, contenido")
+    if ambito == "usuario":
+        consulta = consulta.eq("user_id", ambito_id)
+    else:
+        perfiles = await ejecutar(supabase.table("profiles").select("id").eq("school_id", ambito_id), "profiles.colegio")
+        consulta = consulta.in_("user_id", [p["id"] for p in perfiles.data or []])
+    res = await ejecutar(consulta.order("created_at", desc=True).limit(RECURSOS_SIN_INDICE), "biblioteca_recursos.uso")
+    return acumular_uso(res.data or [])
+
+
+async def leer_cobertura(supabase: Client, ambito: str, ambito_id: str) -> List[Dict[str, Any]]:
+    """Filas de `indice_cobertura_oa` de un docente o colegio (o de cobertura_curricular sin migración)."""
+    try:
+        res = await ejecutar(
+            supabase.table("indice_cobertura_oa")
+            .select("nivel, asignatura, oa_id, tipo_recurso, recursos, ultima_fecha")
+            .eq("ambito", ambito).eq("ambito_id", ambito_id),
+            "indice_cobertura_oa.leer"
+        )
+        return res.data or []
+    except APIError as e:
+        logger.warning("Índice de cobertura no disponible (%s); leyendo cobertura_curricular.", e)
+
+    consulta = supabase.table("cobertura_curricular").select("nivel, asignatura, oa_id, tipo_recurso, fecha")
+    if ambito == "usuario":
+        consulta = consulta.eq("user_id", ambito_id)
+    else:
+        perfiles = await ejecutar(supabase.table("profiles").select("id").eq("school_id", ambito_id), "profiles.colegio")
+        consulta = consulta.in_("user_id", [p["id"] for p in perfiles.data or []])
+    filas: Dict[tuple, Dict[str, Any]] = {}
+    for c in (await ejecutar(consulta, "cobertura_curricular.leer")).data or []:
+        clave = (c["nivel"], c["asignatura"], c["oa_id"], c.get("tipo_recurso") or "")
+        fila = filas.setdefault(clave, dict(zip(("nivel", "asignatura", "oa_id", "tipo_recurso"), clave), recursos=0, ultima_fecha=None))
+        fila["recursos"] += 1
+        fila["ultima_fecha"] = max(filter(None, (fila["ultima_fecha"], c.get("fecha"))), default=None)
+    return list(filas.values())
+
+
+def agrupar_cobertura(filas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Una entrada por curso (nivel, asignatura) con los recursos por OA y por tipo."""
+    cursos: Dict[tuple, Dict[str, Any]] = {}
+    for f in filas:
+        curso = cursos.setdefault((f["nivel"], f["asignatura"]), {
+            "nivel": f["nivel"], "asignatura": f["asignatura"], "oas": Counter(), "tipos": Counter()
+        })
+        curso["oas"][f["oa_id"]] += f["recursos"]
+        curso["tipos"][f.get("tipo_recurso") or ""] += f["recursos"]
+    return [
+        {**c, "oas": dict(c["oas"]), "tipos": dict(c["tipos"]), "oas_cubiertos": len(c["oas"])}
+        for c in sorted(cursos.values(), key=lambda c: (c["nivel"], c["asignatura"]))
+    ]
+
+
+async def guardar_recurso(supabase: Client, registro: Dict[str, Any]) -> str:
+    """Inserta el recurso y sus OAs (un solo viaje con la migración aplicada). Devuelve el id."""
+    oas = extraer_oas(registro["contenido"]) if es_curso_real(registro["asignatura"], registro["nivel"]) else []
+    try:
+        res = await ejecutar(
+            supabase.rpc("guardar_recurso_con_cobertura", {"registro": registro, "oas": oas}),
+            "biblioteca_recursos.guardar"
+        )
+        return res.data
+    except APIError as e:
+        # PGRST202: la función aún no existe; cualquier otro error es del guardado mismo
+        if getattr(e, "code", None) != "PGRST202":
+            raise
+        logger.warning("guardar_recurso_con_cobertura no disponible; insertando en dos pasos.")
+
+    res = await ejecutar(supabase.table("biblioteca_recursos").insert(registro), "biblioteca_recursos.insert")
+    if not res.data:
+        raise Exception("No se recibió confirmación de Supabase")
+    recurso_id = res.data[0]["id"]
+
+    if oas:
+        try:
+            await ejecutar(supabase.table("cobertura_curricular").insert([
+                {
+                    "user_id": registro["user_id"],
+                    "nivel": registro["nivel"],
+                    "asignatura": registro["asignatura"],
+                    "oa_id": oa,
+                    "recurso_id": recurso_id,
+                    "tipo_recurso": registro["tipo"]
+                }
+                for oa in oas
+            ]), "cobertura_curricular.insert")
+        except Exception as ex:
+            # No bloqueamos el guardado del recurso principal si falla el registro de cobertura
+            logger.warning("Error al registrar cobertura curricular: %s", ex)
+    return recurso_id
@@ -0,0 +1,333 @@
+"""
+Caché de respuestas del LLM direccionada por contenido.
+
+Los generadores (planificador, rúbricas, evaluaciones, NEE, elevador, analizador,
+lectura inteligente, insights, PME, mejora continua) arman un prompt y llaman a
+Gemini. Dos docentes que piden lo mismo (mismo OA, nivel, configuración DOK)
+producen el mismo prompt, así que la segunda respuesta se sirve desde la caché.
+
+- La clave es el SHA-256 de (modelo, prompt normalizado, generation_config,
+  hash de cada archivo adjunto). La normalización quita la indentación y los
+  espacios sobrantes de cada línea, que no cambian el significado del prompt.
+- Backends intercambiables, ambos con expulsión LRU + TTL:
+  "sqlite" (por defecto, sobrevive reinicios y se comparte entre workers del
+  mismo host) o "memory" (el `MemoryBackend` de la caché del motor).
+- Opt-in/opt-out por ruta: LLM_CACHE_RUTAS (solo esas rutas; vacío = todas) y
+  LLM_CACHE_EXCLUIR; cada llamada puede además pasar `cache=False`.
+- Solo se cachea lo que el router puede usar: `validar(texto)` (p. ej. su
+  parser de JSON) debe devolver algo no vacío. Si no, la respuesta se entrega
+  igual pero no se guarda, y el "intenta de nuevo" vuelve a llamar al modelo;
+  una entrada que ya no valida se borra al leerla.
+- Métricas por ruta: aciertos, fallos, hit rate y segundos de LLM ahorrados.
+
+Configuración: LLM_CACHE_BACKEND (sqlite | memory | off), LLM_CACHE_PATH,
+LLM_CACHE_MAXSIZE, LLM_CACHE_TTL, LLM_CACHE_RUTAS, LLM_CACHE_EXCLUIR.
+"""
+import os
+import json
+import time
+import base64
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.config import settings
+from app.services.motor_cache import MemoryBackend
+
+logger = logging.getLogger(__name__)
+
+# Cambiar la versión invalida todas las entradas (p. ej. si cambia el formato guardado)
+VERSION_CLAVE = "v1"
+
+
+# ─── Clave ────────────────────────────────────────────────────────────────────
+
+def normalizar_prompt(texto: str) -> str:
+    """Quita la indentación y los espacios al final de cada línea, y las líneas en blanco de los extremos."""
+    return "\n".join(linea.strip() for linea in texto.strip().splitlines())
+
+
+def _hash_bytes(datos: Any) -> str:
+    if isinstance(datos, str):
+        try:
+            datos = base64.b64decode(datos, validate=True)
+        except ValueError:
+            datos = datos.encode("utf-8")
+    return hashlib.sha256(bytes(datos)).hexdigest()
+
+
+class ContenidoNoCacheable(TypeError):
+    """El contenido trae partes opacas (archivos subidos, imágenes PIL) sin una representación estable."""
+
+
+def _normalizar_parte(parte: Any) -> Any:
+    if isinstance(parte, str):
+        return normalizar_prompt(parte)
+    if isinstance(parte, (bytes, bytearray)):
+        return {"sha256": _hash_bytes(parte)}
+    if isinstance(parte, (list, tuple)):
+        return [_normalizar_parte(p) for p in parte]
+    if isinstance(parte, dict):
+        # Archivos adjuntos ({"mime_type", "data"} o {"inline_data": {...}}): solo su hash entra en la clave
+        if "data" in parte:
+            return {"mime_type": parte.get("mime_type"), "sha256": _hash_bytes(parte["data"])}
+        return {k: _normalizar_parte(v) for k, v in parte.items()}
+    if parte is None or isinstance(parte, (int, float, bool)):
+        return parte
+    raise ContenidoNoCacheable(type(parte).__name__)
+
+
+def clave_llm(modelo: str, contenido: Any, generation_config: Optional[Dict[str, Any]] = None) -> str:
+    carga = {
+        "v": VERSION_CLAVE,
+        "modelo": modelo,
+        "contenido": _normalizar_parte(contenido),
+        "config": generation_config or {}
+    }
+    return hashlib.sha256(json.dumps(carga, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+def json_valido(texto: str) -> Any:
+    """Validador para respuestas JSON: el valor parseado tras quitar los cercos ```json, o None."""
+    try:
+        return json.loads((texto or "").replace("```json", "").replace("```", "").strip())
+    except ValueError:
+        return None
+
+
+# ─── Backend SQLite ───────────────────────────────────────────────────────────
+
+class SQLiteBackend:
+    """
+    Tabla clave → valor JSON con expiración absoluta y marca de último acceso para el LRU.
+    Usa el reloj de pared, porque las entradas sobreviven reinicios del proceso.
+    """
+
+    def __init__(self, path: str, maxsize: int = 5000, ttl: float = 7 * 24 * 3600, reloj: Callable[[], float] = time.time):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._reloj = reloj
+        self._lock = threading.Lock()
+        self.expulsiones = 0
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "clave TEXT PRIMARY KEY, valor TEXT NOT NULL, expira REAL NOT NULL, accedido REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accedido ON llm_cache (accedido)")
+
+    def get(self, key: str) -> Optional[Any]:
+        ahora = self._reloj()
+        with self._lock:
+            fila = self._conn.execute("SELECT valor, expira FROM llm_cache WHERE clave = ?", (key,)).fetchone()
+            if fila is None:
+                return None
+            if fila[1] <= ahora:
+                self._conn.execute("DELETE FROM llm_cache WHERE clave = ?", (key,))
+                return None
+            self._conn.execute("UPDATE llm_cache SET accedido = ? WHERE clave = ?", (ahora, key))
+        return json.loads(fila[0])
+
+    def set(self, key: str, value: Any) -> None:
+        ahora = self._reloj()
+        valor = json.dumps(value, ensure_ascii=False, default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (clave, valor, expira, accedido) VALUES (?, ?, ?, ?)",
+                (key, valor, ahora + self.ttl, ahora)
+            )
+            sobrantes = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.maxsize
+            if sobrantes > 0:
+                # Primero las vencidas, después las de acceso más antiguo
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE clave IN ("
+                    "SELECT clave FROM llm_cache ORDER BY expira > ?, accedido LIMIT ?)",
+                    (ahora, sobrantes)
+                )
+                self.expulsiones += sobrantes
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache WHERE clave = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+# ─── Caché ────────────────────────────────────────────────────────────────────
+
+def _lista(valor: str) -> set:
+    return {r.strip() for r in (valor or "").split(",") if r.strip()}
+
+
+class CacheLLM:
+    """Caché de textos generados con métricas por ruta."""
+
+    def __init__(self, backend, rutas: Optional[set] = None, excluir: Optional[set] = None):
+        self.backend = backend
+        self.rutas = rutas or set()
+        self.excluir = excluir or set()
+        self._metricas: Dict[str, Dict[str, float]] = defaultdict(lambda: {"hits": 0, "misses": 0, "segundos_ahorrados": 0.0})
+
+    def habilitada(self, ruta: str) -> bool:
+        if self.backend is None or ruta in self.excluir:
+            return False
+        return not self.rutas or ruta in self.rutas
+
+    def _clave(self, ruta: str, modelo: str, contenido: Any, generation_config: Optional[Dict[str, Any]], cache: bool) -> Optional[str]:
+        """Clave de la llamada, o None si no se debe (o no se puede) cachear."""
+        if not (cache and self.habilitada(ruta)):
+            return None
+        try:
+            return clave_llm(modelo, contenido, generation_config)
+        except ContenidoNoCacheable:
+            return None
+
+    @staticmethod
+    def _valido(texto: Optional[str], validar: Optional[Callable[[str], Any]]) -> bool:
+        if not texto:
+            return False  # Una respuesta vacía o bloqueada no se cachea
+        if validar is None:
+            return True
+        try:
+            return bool(validar(texto))
+        except Exception:
+            return False
+
+    def _buscar(self, ruta: str, clave: str, validar: Optional[Callable[[str], Any]] = None) -> Optional[str]:
+        try:
+            entrada = self.backend.get(clave)
+        except Exception as e:
+            logger.warning("Caché LLM no disponible al leer (%s): %s", ruta, e)
+            entrada = None
+        if entrada is not None and not self._valido(entrada["texto"], validar):
+            # Guardada antes de validar la ruta: se descarta y se vuelve a generar
+            self._descartar(ruta, clave)
+            entrada = None
+        metricas = self._metricas[ruta]
+        if entrada is None:
+            metricas["misses"] += 1
+            return None
+        metricas["hits"] += 1
+        metricas["segundos_ahorrados"] += entrada.get("latencia", 0.0)
+        return entrada["texto"]
+
+    def _descartar(self, ruta: str, clave: str) -> None:
+        try:
+            self.backend.delete(clave)
+        except Exception as e:
+            logger.warning("Caché LLM no disponible al borrar (%s): %s", ruta, e)
+
+    def _guardar(self, ruta: str, clave: str, texto: Optional[str], latencia: float, validar: Optional[Callable[[str], Any]] = None) -> None:
+        if not self._valido(texto, validar):
+            if texto:
+                logger.warning("Respuesta LLM inválida para %s: no se cachea.", ruta)
+            return
+        try:
+            self.backend.set(clave, {"texto": texto, "latencia": round(latencia, 3), "ruta": ruta})
+        except Exception as e:
+            logger.warning("Caché LLM no disponible al escribir (%s): %s", ruta, e)
+
+    def obtener_o_generar(
+        self,
+        ruta: str,
+        modelo: str,
+        contenido: Any,
+        generar: Callable[[], Optional[str]],
+        generation_config: Optional[Dict[str, Any]] = None,
+        cache: bool = True,
+        validar: Optional[Callable[[str], Any]] = None
+    ) -> Optional[str]:
+        """
+        Devuelve el texto cacheado para (modelo, contenido, config) o lo genera con `generar()`;
+        lo guarda solo si `validar(texto)` (opcional) devuelve algo no vacío.
+        """
+        clave = self._clave(ruta, modelo, contenido, generation_config, cache)
+        if clave is None:
+            return generar()
+        texto = self._buscar(ruta, clave, validar)
+        if texto is not None:
+            return texto
+        inicio = time.perf_counter()
+        texto = generar()
+        self._guardar(ruta, clave, texto, time.perf_counter() - inicio, validar)
+        return texto
+
+    async def obtener_o_generar_async(
+        self,
+        ruta: str,
+        modelo: str,
+        contenido: Any,
+        generar: Callable[[], Awaitable[Optional[str]]],
+        generation_config: Optional[Dict[str, Any]] = None,
+        cache: bool = True,
+        validar: Optional[Callable[[str], Any]] = None
+    ) -> Optional[str]:
+        """Igual que `obtener_o_generar`, con un `generar` asíncrono."""
+        clave = self._clave(ruta, modelo, contenido, generation_config, cache)
+        if clave is None:
+            return await generar()
+        texto = self._buscar(ruta, clave, validar)
+        if texto is not None:
+            return texto
+        inicio = time.perf_counter()
+        texto = await generar()
+        self._guardar(ruta, clave, texto, time.perf_counter() - inicio, validar)
+        return texto
+
+    def limpiar(self) -> None:
+        if self.backend is not None and hasattr(self.backend, "clear"):
+            self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        por_ruta = {}
+        for ruta, m in self._metricas.items():
+            total = m["hits"] + m["misses"]
+            por_ruta[ruta] = {
+                "hits": m["hits"],
+                "misses": m["misses"],
+                "hit_rate": round(m["hits"] / total, 4) if total else 0.0,
+                "segundos_ahorrados": round(m["segundos_ahorrados"], 1)
+            }
+        hits = sum(m["hits"] for m in por_ruta.values())
+        total = hits + sum(m["misses"] for m in por_ruta.values())
+        return {
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "entradas": len(self.backend) if self.backend is not None else 0,
+            "hits": hits,
+            "misses": total - hits,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "expulsiones_lru": getattr(self.backend, "expulsiones", None),
+            "rutas": por_ruta
+        }
+
+
+def _crear_backend():
+    if settings.LLM_CACHE_BACKEND == "off":
+        return None
+    if settings.LLM_CACHE_BACKEND == "sqlite":
+        try:
+            return SQLiteBackend(settings.LLM_CACHE_PATH, maxsize=settings.LLM_CACHE_MAXSIZE, ttl=settings.LLM_CACHE_TTL)
+        except Exception as e:
+            logger.warning("No se pudo abrir la caché LLM en SQLite (%s). Usando caché en memoria.", str(e))
+    return MemoryBackend(maxsize=settings.LLM_CACHE_MAXSIZE, ttl=settings.LLM_CACHE_TTL)
+
+
+llm_cache = CacheLLM(
+    _crear_backend(),
+    rutas=_lista(settings.LLM_CACHE_RUTAS),
+    excluir=_lista(settings.LLM_CACHE_EXCLUIR)
+)
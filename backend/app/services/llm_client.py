@@ -0,0 +1,164 @@
+"""
+Cliente asíncrono compartido para Gemini.
+
+Los handlers `async def` llamaban a `model.generate_content(...)`, que bloquea el
+event loop de uvicorn entre 5 y 60 s: mientras tanto nadie más en ese worker
+recibía respuesta. Todas las generaciones pasan ahora por
+`cliente_llm.generar(ruta, contenido, ...)`, que:
+
+- usa `generate_content_async` (gRPC asíncrono), sin ocupar el event loop;
+- consulta primero la caché de respuestas (`llm_cache`) y, si falla, pasa por el
+  planificador compartido (`planificador_llm`: tasa, concurrencia, reintentos);
+- aplica un timeout total (cola + reintentos + respuesta), LLM_TIMEOUT por defecto;
+- si recibe el `Request`, cancela la llamada cuando el cliente se desconecta;
+- registra la latencia de cada llamada por ruta (p50/p95/máx, errores, timeouts,
+  cancelaciones).
+"""
+import time
+import asyncio
+import logging
+from collections import defaultdict, deque
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException, Request
+
+from app.core.config import settings
+from app.services.llm_cache import llm_cache, json_valido
+from app.services.llm_scheduler import planificador_llm, PRIORIDAD_INTERACTIVA
+
+logger = logging.getLogger(__name__)
+
+MODELO_DEFAULT = "gemini-2.5-flash"
+# Cada cuánto se revisa si el cliente HTTP sigue conectado
+INTERVALO_DESCONEXION = 0.5
+# Latencias recientes que se conservan por ruta para los percentiles
+MUESTRAS_LATENCIA = 500
+
+
+def _modelo_gemini(modelo: str, generation_config: Optional[Dict[str, Any]], safety_settings: Any):
+    import google.generativeai as genai
+
+    return genai.GenerativeModel(modelo, generation_config=generation_config, safety_settings=safety_settings)
+
+
+def _percentil(valores, p: float) -> Optional[float]:
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return round(ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))], 3)
+
+
+class _MetricasRuta:
+    def __init__(self):
+        self.llamadas = 0
+        self.errores = 0
+        self.timeouts = 0
+        self.cancelaciones = 0
+        self.latencias = deque(maxlen=MUESTRAS_LATENCIA)
+
+    def resumen(self) -> Dict[str, Any]:
+        return {
+            "llamadas": self.llamadas,
+            "errores": self.errores,
+            "timeouts": self.timeouts,
+            "cancelaciones": self.cancelaciones,
+            "latencia_p50": _percentil(self.latencias, 0.5),
+            "latencia_p95": _percentil(self.latencias, 0.95),
+            "latencia_max": round(max(self.latencias), 3) if self.latencias else None
+        }
+
+
+class ClienteLLM:
+    def __init__(
+        self,
+        planificador=planificador_llm,
+        cache=llm_cache,
+        timeout: Optional[float] = None,
+        crear_modelo: Callable[..., Any] = _modelo_gemini
+    ):
+        self.planificador = planificador
+        self.cache = cache
+        self.timeout = settings.LLM_TIMEOUT if timeout is None else timeout
+        self._crear_modelo = crear_modelo
+        self._metricas: Dict[str, _MetricasRuta] = defaultdict(_MetricasRuta)
+
+    async def generar(
+        self,
+        ruta: str,
+        contenido: Any,
+        modelo: str = MODELO_DEFAULT,
+        generation_config: Optional[Dict[str, Any]] = None,
+        safety_settings: Any = None,
+        timeout: Optional[float] = None,
+        cache: bool = True,
+        prioridad: int = PRIORIDAD_INTERACTIVA,
+        request: Optional[Request] = None,
+        validar: Optional[Callable[[str], Any]] = None
+    ) -> str:
+        """
+        Texto generado por `modelo` para `contenido` (str o lista de partes).
+        `validar(texto)` decide qué se cachea (por defecto, JSON parseable si se pidió
+        `response_mime_type` JSON); la respuesta se devuelve igual aunque no valide.
+        Lanza HTTPException 504 si se agota el timeout y 499 si el cliente se desconectó.
+        """
+        timeout = timeout or self.timeout
+        if validar is None and (generation_config or {}).get("response_mime_type") == "application/json":
+            validar = json_valido
+
+        async def _llamar() -> str:
+            model = self._crear_modelo(modelo, generation_config, safety_settings)
+            response = await model.generate_content_async(contenido, request_options={"timeout": timeout})
+            return response.text
+
+        async def _generar() -> str:
+            return await self.planificador.ejecutar(modelo, _llamar, prioridad=prioridad)
+
+        operacion = self.cache.obtener_o_generar_async(
+            ruta, modelo, contenido, _generar,
+            generation_config={**(generation_config or {}), "safety_settings": safety_settings} if safety_settings else generation_config,
+            cache=cache,
+            validar=validar
+        )
+
+        metricas = self._metricas[ruta]
+        metricas.llamadas += 1
+        inicio = time.perf_counter()
+        try:
+            tarea = asyncio.ensure_future(asyncio.wait_for(operacion, timeout))
+            if request is None:
+                return await tarea
+            return await self._vigilar_desconexion(tarea, request, ruta)
+        except asyncio.TimeoutError:
+            metricas.timeouts += 1
+            logger.warning("LLM %s (%s) superó el timeout de %.0fs", modelo, ruta, timeout)
+            raise HTTPException(status_code=504, detail="El modelo IA no respondió a tiempo. Intenta nuevamente.")
+        except HTTPException:
+            raise
+        except asyncio.CancelledError:
+            metricas.cancelaciones += 1
+            raise
+        except Exception:
+            metricas.errores += 1
+            raise
+        finally:
+            metricas.latencias.append(time.perf_counter() - inicio)
+
+    async def _vigilar_desconexion(self, tarea: asyncio.Future, request: Request, ruta: str) -> str:
+        try:
+            while True:
+                hechas, _ = await asyncio.wait({tarea}, timeout=INTERVALO_DESCONEXION)
+                if hechas:
+                    return tarea.result()
+                if await request.is_disconnected():
+                    self._metricas[ruta].cancelaciones += 1
+                    logger.info("Cliente desconectado: se cancela la generación (%s)", ruta)
+                    raise HTTPException(status_code=499, detail="El cliente cerró la conexión.")
+        finally:
+            if not tarea.done():
+                tarea.cancel()
+
+    def estadisticas(self) -> Dict[str, Dict[str, Any]]:
+        return {ruta: m.resumen() for ruta, m in self._metricas.items()}
+
+
+cliente_llm = ClienteLLM()
@@ -0,0 +1,277 @@
+"""
+Planificador compartido de llamadas al LLM.
+
+Todas las llamadas a Gemini pasan por `planificador_llm.ejecutar(modelo, llamada, prioridad)`:
+
+- Concurrencia máxima por modelo; los cupos se entregan por prioridad
+  (PRIORIDAD_INTERACTIVA antes que PRIORIDAD_LOTE) y, a igual prioridad, en orden
+  de llegada. Así una consulta de un docente no espera detrás de un ensayo de 45 ítems.
+- Token bucket por modelo (LLM_RPM). La tasa es adaptativa (AIMD): cada 429 la
+  reduce a la mitad y cada éxito la recupera de a poco hasta el máximo
+  configurado, de modo que el rendimiento sigue la cuota real del proveedor.
+- Reintentos con backoff exponencial y jitter completo ante 429/5xx/timeouts;
+  durante la espera se libera el cupo de concurrencia.
+
+Límites por defecto: LLM_RPM, LLM_CONCURRENCIA, LLM_REINTENTOS. Por modelo:
+LLM_LIMITES_MODELOS='{"gemini-2.5-flash": {"rpm": 1000, "concurrencia": 16}}'.
+"""
+import json
+import heapq
+import time
+import random
+import asyncio
+import logging
+import itertools
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+PRIORIDAD_INTERACTIVA = 0
+PRIORIDAD_LOTE = 10
+
+_NOMBRES_REINTENTABLES = {
+    "ResourceExhausted": 429,
+    "TooManyRequests": 429,
+    "InternalServerError": 500,
+    "ServiceUnavailable": 503,
+    "DeadlineExceeded": 504,
+}
+
+
+def codigo_http(exc: BaseException) -> Optional[int]:
+    """Código HTTP de un error del SDK (google.genai, google.api_core o similar), si lo trae."""
+    for attr in ("code", "status_code"):
+        valor = getattr(exc, attr, None)
+        if isinstance(valor, int) and 100 <= valor < 600:
+            return valor
+    respuesta = getattr(exc, "response", None)
+    valor = getattr(respuesta, "status_code", None)
+    if isinstance(valor, int):
+        return valor
+    return _NOMBRES_REINTENTABLES.get(type(exc).__name__)
+
+
+def es_reintentable(exc: BaseException) -> bool:
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError)):
+        return True
+    codigo = codigo_http(exc)
+    return codigo is not None and (codigo == 429 or 500 <= codigo < 600)
+
+
+@dataclass
+class LimitesModelo:
+    rpm: float
+    concurrencia: int
+    rafaga: Optional[float] = None  # tokens acumulables; por defecto = concurrencia
+
+
+class TokenBucket:
+    """Token bucket con tasa AIMD (disminución multiplicativa, aumento aditivo)."""
+
+    def __init__(self, tasa: float, capacidad: float, reloj: Callable[[], float] = time.monotonic):
+        self.tasa_max = tasa
+        self.tasa = tasa
+        self.tasa_min = tasa / 32
+        self.capacidad = max(1.0, capacidad)
+        self.tokens = self.capacidad
+        self._reloj = reloj
+        self._ultimo = reloj()
+        self._ultima_reduccion = float("-inf")
+
+    def _rellenar(self) -> None:
+        ahora = self._reloj()
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self._ultimo) * self.tasa)
+        self._ultimo = ahora
+
+    def demora(self) -> float:
+        """Segundos hasta que haya un token disponible (0 si ya lo hay)."""
+        self._rellenar()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.tasa
+
+    def tomar(self) -> None:
+        self.tokens -= 1
+
+    def reducir(self, enfriamiento: float = 1.0) -> None:
+        """
+        El proveedor respondió 429: la cuota real es menor que la tasa actual.
+        Una ráfaga de 429 simultáneos cuenta como una sola reducción.
+        """
+        self._rellenar()
+        if self._ultimo - self._ultima_reduccion >= enfriamiento:
+            self.tasa = max(self.tasa_min, self.tasa / 2)
+            self._ultima_reduccion = self._ultimo
+        self.tokens = min(self.tokens, 0.0)
+
+    def recuperar(self) -> None:
+        self._rellenar()
+        self.tasa = min(self.tasa_max, self.tasa + self.tasa_max / 100)
+
+
+class _Espera:
+    """Solicitud en la cola de admisión; se ordena por (prioridad, llegada)."""
+
+    __slots__ = ("prioridad", "secuencia", "aviso")
+
+    def __init__(self, prioridad: int, secuencia: int):
+        self.prioridad = prioridad
+        self.secuencia = secuencia
+        self.aviso: Optional[asyncio.Future] = None
+
+    def __lt__(self, otra: "_Espera") -> bool:
+        return (self.prioridad, self.secuencia) < (otra.prioridad, otra.secuencia)
+
+
+class _EstadoModelo:
+    def __init__(self, limites: LimitesModelo, reloj: Callable[[], float]):
+        self.limites = limites
+        self.bucket = TokenBucket(limites.rpm / 60, limites.rafaga or limites.concurrencia, reloj)
+        self.en_curso = 0
+        self.cola: List[_Espera] = []
+        self.completadas = 0
+        self.fallidas = 0
+        self.reintentos = 0
+        self.limitadas = 0  # respuestas 429
+
+
+class PlanificadorLLM:
+    def __init__(
+        self,
+        limites_por_modelo: Optional[Dict[str, LimitesModelo]] = None,
+        limites_default: Optional[LimitesModelo] = None,
+        reintentos: Optional[int] = None,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+        reloj: Callable[[], float] = time.monotonic,
+        dormir: Callable[[float], Awaitable[None]] = asyncio.sleep
+    ):
+        self.limites_por_modelo = limites_por_modelo if limites_por_modelo is not None else _limites_configurados()
+        self.limites_default = limites_default or LimitesModelo(settings.LLM_RPM, settings.LLM_CONCURRENCIA)
+        self.reintentos = settings.LLM_REINTENTOS if reintentos is None else reintentos
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._reloj = reloj
+        self._dormir = dormir
+        self._modelos: Dict[str, _EstadoModelo] = {}
+        self._secuencia = itertools.count()
+
+    def _estado(self, modelo: str) -> _EstadoModelo:
+        estado = self._modelos.get(modelo)
+        if estado is None:
+            limites = self.limites_por_modelo.get(modelo, self.limites_default)
+            estado = self._modelos[modelo] = _EstadoModelo(limites, self._reloj)
+        return estado
+
+    async def _admitir(self, estado: _EstadoModelo, prioridad: int) -> None:
+        """
+        Solo la cabeza de la cola (mayor prioridad, más antigua) puede tomar cupo y token;
+        el resto espera a que se le avise que pasó a ser la cabeza o que se liberó un cupo.
+        """
+        espera = _Espera(prioridad, next(self._secuencia))
+        heapq.heappush(estado.cola, espera)
+        try:
+            while True:
+                if estado.cola[0] is espera and estado.en_curso < estado.limites.concurrencia:
+                    demora = estado.bucket.demora()
+                    if demora <= 0:
+                        heapq.heappop(estado.cola)
+                        estado.bucket.tomar()
+                        estado.en_curso += 1
+                        self._avisar_cabeza(estado)
+                        return
+                    await self._dormir(demora)
+                else:
+                    espera.aviso = asyncio.get_running_loop().create_future()
+                    await espera.aviso
+                    espera.aviso = None
+        except asyncio.CancelledError:
+            if espera in estado.cola:
+                estado.cola.remove(espera)
+                heapq.heapify(estado.cola)
+                self._avisar_cabeza(estado)
+            raise
+
+    def _avisar_cabeza(self, estado: _EstadoModelo) -> None:
+        if estado.cola:
+            aviso = estado.cola[0].aviso
+            if aviso is not None and not aviso.done():
+                aviso.set_result(None)
+
+    def _liberar(self, estado: _EstadoModelo) -> None:
+        estado.en_curso -= 1
+        self._avisar_cabeza(estado)
+
+    async def ejecutar(
+        self,
+        modelo: str,
+        llamada: Callable[[], Awaitable[T]],
+        prioridad: int = PRIORIDAD_INTERACTIVA
+    ) -> T:
+        """
+        Ejecuta `llamada()` (una corrutina nueva por intento) respetando cupo, tasa y prioridad.
+        Relanza el último error si no es reintentable o se agotan los reintentos.
+        """
+        estado = self._estado(modelo)
+        intento = 0
+        while True:
+            await self._admitir(estado, prioridad)
+            try:
+                resultado = await llamada()
+            except Exception as e:
+                codigo = codigo_http(e)
+                if codigo == 429:
+                    estado.limitadas += 1
+                    estado.bucket.reducir()
+                if intento >= self.reintentos or not es_reintentable(e):
+                    estado.fallidas += 1
+                    raise
+                intento += 1
+                estado.reintentos += 1
+                pausa = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** intento))
+                logger.warning("LLM %s respondió %s; reintento %d en %.1fs", modelo, codigo or type(e).__name__, intento, pausa)
+            else:
+                estado.bucket.recuperar()
+                estado.completadas += 1
+                return resultado
+            finally:
+                self._liberar(estado)
+            await self._dormir(pausa)
+
+    def estadisticas(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            modelo: {
+                "en_curso": e.en_curso,
+                "en_cola": len(e.cola),
+                "completadas": e.completadas,
+                "fallidas": e.fallidas,
+                "reintentos": e.reintentos,
+                "respuestas_429": e.limitadas,
+                "rpm_actual": round(e.bucket.tasa * 60, 1),
+                "rpm_max": round(e.bucket.tasa_max * 60, 1),
+                "concurrencia": e.limites.concurrencia
+            }
+            for modelo, e in self._modelos.items()
+        }
+
+
+def _limites_configurados() -> Dict[str, LimitesModelo]:
+    try:
+        crudo = json.loads(settings.LLM_LIMITES_MODELOS or "{}")
+    except ValueError:
+        logger.error("LLM_LIMITES_MODELOS no es un JSON válido; se usan los límites por defecto.")
+        return {}
+    return {
+        modelo: LimitesModelo(
+            rpm=float(lim.get("rpm", settings.LLM_RPM)),
+            concurrencia=int(lim.get("concurrencia", settings.LLM_CONCURRENCIA)),
+            rafaga=lim.get("rafaga")
+        )
+        for modelo, lim in crudo.items()
+    }
+
+
+planificador_llm = PlanificadorLLM()
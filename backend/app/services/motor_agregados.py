@@ -0,0 +1,174 @@
+"""
+Resumen agregado del Motor de Conducción Preventiva.
+
+Los gráficos de evolución (/motor/evolucion) y el desglose por curso
+(/motor/evolucion/cursos) solo necesitan cuatro cifras por registro: promedio,
+aprobación, minutos de atraso y alumnos en riesgo. En vez de traer los JSONB
+completos de `motor_conduccion_preventiva` y volver a sumarlos en cada petición,
+cada ingesta o validación HITL recalcula la fila de su clave
+(periodo, corte, curso, asignatura) en `motor_resumen_agregado`, y los endpoints
+leen solo esas columnas.
+
+Orden de lectura:
+1. `motor_resumen_agregado` (migración 20260602_motor_resumen_agregado.sql).
+2. Si la tabla aún no existe o está vacía: proyección JSON de la tabla principal
+   (`datos_academicos->promedio_general`, etc.), sin descargar los blobs.
+3. Sin Supabase: el espejo en memoria que mantiene `actualizar_resumenes`.
+"""
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from app.db.supabase import supabase
+
+logger = logging.getLogger(__name__)
+
+TABLA_RESUMEN = "motor_resumen_agregado"
+COLUMNAS_RESUMEN = "periodo_id,corte_temporal,curso_id,asignatura,promedio,aprobacion,atrasos,alumnos_riesgo"
+# Proyección sobre la tabla principal cuando aún no hay resumen materializado
+COLUMNAS_PROYECCION = (
+    "periodo_id,corte_temporal,curso_id,asignatura,"
+    "promedio:datos_academicos->promedio_general,"
+    "aprobacion:datos_academicos->porcentaje_aprobacion,"
+    "atrasos:datos_convivencia->minutos_atraso_acumulados,"
+    "riesgo:datos_convivencia->alumnos_doble_riesgo"
+)
+
+# Espejo en memoria: una fila de pocos bytes por clave, para trabajar sin Supabase
+_RESUMENES: Dict[tuple, Dict[str, Any]] = {}
+_lock = threading.Lock()
+
+
+def minutos_atraso(conv: Dict[str, Any]) -> int:
+    """Minutos de atraso de un registro: total del curso, o reconstruido desde el detalle."""
+    atrasos = conv.get("minutos_atraso_acumulados", 0)
+    if not atrasos and conv.get("atrasos_por_rut"):
+        atrasos = sum(conv["atrasos_por_rut"].values())
+    if not atrasos and conv.get("alumnos_doble_riesgo_detalle"):
+        atrasos = sum(x.get("atraso_minutos", 0) for x in conv["alumnos_doble_riesgo_detalle"])
+    return int(atrasos or 0)
+
+
+def resumen_registro(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce un registro del motor a su fila de resumen."""
+    acad = record.get("datos_academicos") or {}
+    conv = record.get("datos_convivencia") or {}
+
+    riesgo = len(conv.get("alumnos_doble_riesgo", []))
+    if not riesgo and "alumnos_doble_riesgo_detalle" in conv:
+        riesgo = len(conv["alumnos_doble_riesgo_detalle"])
+
+    return {
+        "periodo_id": record.get("periodo_id"),
+        "corte_temporal": record.get("corte_temporal", "General"),
+        "curso_id": record.get("curso_id", "S/C"),
+        "asignatura": record.get("asignatura"),
+        "promedio": round(float(acad.get("promedio_general", 0) or 0), 2),
+        "aprobacion": round(float(acad.get("porcentaje_aprobacion", 0) or 0), 2),
+        "atrasos": minutos_atraso(conv),
+        "alumnos_riesgo": riesgo
+    }
+
+
+def _clave(resumen: Dict[str, Any]) -> tuple:
+    return (
+        resumen["periodo_id"],
+        resumen["corte_temporal"],
+        resumen["curso_id"],
+        str(resumen["asignatura"]).lower()
+    )
+
+
+def actualizar_resumenes(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Recalcula el resumen de los registros recién escritos (ingesta, ingesta masiva o
+    validación HITL) y lo persiste con un único upsert. Un fallo de base de datos no
+    interrumpe al llamador: el espejo en memoria queda igualmente actualizado.
+    """
+    resumenes = [resumen_registro(r) for r in records]
+    if not resumenes:
+        return []
+
+    with _lock:
+        for resumen in resumenes:
+            _RESUMENES[_clave(resumen)] = resumen
+
+    if supabase:
+        try:
+            supabase.table(TABLA_RESUMEN).upsert(
+                resumenes, on_conflict="periodo_id, corte_temporal, curso_id, asignatura"
+            ).execute()
+        except Exception as e_db:
+            logger.warning("No se pudo actualizar %s: %s", TABLA_RESUMEN, str(e_db))
+    return resumenes
+
+
+def _desde_proyeccion(fila: Dict[str, Any]) -> Dict[str, Any]:
+    riesgo = fila.get("riesgo")
+    return {
+        "periodo_id": fila.get("periodo_id"),
+        "corte_temporal": fila.get("corte_temporal", "General"),
+        "curso_id": fila.get("curso_id", "S/C"),
+        "asignatura": fila.get("asignatura"),
+        "promedio": float(fila.get("promedio") or 0),
+        "aprobacion": float(fila.get("aprobacion") or 0),
+        "atrasos": int(fila.get("atrasos") or 0),
+        "alumnos_riesgo": len(riesgo) if isinstance(riesgo, list) else 0
+    }
+
+
+def _filtrar(query, curso_id: Optional[str], asignatura: Optional[str], corte_temporal: Optional[str]):
+    if curso_id is not None:
+        query = query.eq("curso_id", curso_id)
+    if asignatura is not None:
+        query = query.eq("asignatura", asignatura)
+    if corte_temporal is not None:
+        query = query.eq("corte_temporal", corte_temporal)
+    return query
+
+
+def consultar_resumenes(
+    periodo_id: str,
+    curso_id: Optional[str] = None,
+    asignatura: Optional[str] = None,
+    corte_temporal: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Filas de resumen del periodo. Los filtros en `None` no se aplican
+    (equivalen a "Todos" en los endpoints).
+    """
+    if supabase:
+        try:
+            res = _filtrar(
+                supabase.table(TABLA_RESUMEN).select(COLUMNAS_RESUMEN).eq("periodo_id", periodo_id),
+                curso_id, asignatura, corte_temporal
+            ).execute()
+            if res and getattr(res, "data", None):
+                return [
+                    {**r, "promedio": float(r.get("promedio") or 0), "aprobacion": float(r.get("aprobacion") or 0)}
+                    for r in res.data
+                ]
+        except Exception as e_db:
+            logger.warning("Fallo leyendo %s: %s", TABLA_RESUMEN, str(e_db))
+
+        try:
+            res = _filtrar(
+                supabase.table("motor_conduccion_preventiva").select(COLUMNAS_PROYECCION).eq("periodo_id", periodo_id),
+                curso_id, asignatura, corte_temporal
+            ).execute()
+            if res and getattr(res, "data", None):
+                return [_desde_proyeccion(r) for r in res.data]
+        except Exception as e_db:
+            logger.warning("Fallo leyendo la proyección de motor_conduccion_preventiva: %s", str(e_db))
+
+    # BUG FIX heredado: comparar en minúsculas para evitar mismatches por case en curso/asignatura
+    curso = curso_id.lower() if curso_id is not None else None
+    asig = asignatura.lower() if asignatura is not None else None
+    with _lock:
+        return [
+            dict(r) for r in _RESUMENES.values()
+            if r["periodo_id"] == periodo_id
+            and (curso is None or str(r["curso_id"]).lower() == curso)
+            and (asig is None or str(r["asignatura"]).lower() == asig)
+            and (corte_temporal is None or r["corte_temporal"] == corte_temporal)
+        ]
@@ -0,0 +1,175 @@
+"""
+Caché de registros del Motor de Conducción Preventiva.
+
+Reemplaza al antiguo `IN_MEMORY_DB` (un dict de módulo sin límite) por una caché
+acotada con expulsión LRU + TTL, lectura read-through (si la clave no está se
+carga desde Supabase y se guarda) y escritura write-through desde los endpoints
+que modifican registros. El backend es intercambiable:
+
+- "memory" (por defecto): en el proceso, `OrderedDict` con LRU + TTL.
+- "redis": cualquier servidor compatible con Redis (Redis, KeyDB, Dragonfly o
+  `fakeredis` en local), compartido entre workers. Requiere el paquete `redis`.
+
+Configuración por entorno: MOTOR_CACHE_BACKEND, MOTOR_CACHE_MAXSIZE,
+MOTOR_CACHE_TTL (segundos) y REDIS_URL.
+"""
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """Backend en proceso: LRU acotado por `maxsize` con expiración por entrada."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0, reloj: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._reloj = reloj
+        self._datos: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.expulsiones = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._datos.get(key)
+            if item is None:
+                return None
+            expira, valor = item
+            if expira <= self._reloj():
+                del self._datos[key]
+                return None
+            self._datos.move_to_end(key)
+            return valor
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """`ttl` reemplaza al TTL del backend para esta entrada."""
+        with self._lock:
+            self._datos[key] = (self._reloj() + (self.ttl if ttl is None else ttl), value)
+            self._datos.move_to_end(key)
+            while len(self._datos) > self.maxsize:
+                self._datos.popitem(last=False)
+                self.expulsiones += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._datos.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._datos.clear()
+
+    def values_with_prefix(self, prefix: str) -> List[Any]:
+        ahora = self._reloj()
+        prefix = prefix.lower()
+        with self._lock:
+            return [v for k, (expira, v) in self._datos.items() if expira > ahora and k.lower().startswith(prefix)]
+
+    def __len__(self) -> int:
+        return len(self._datos)
+
+
+class RedisBackend:
+    """Backend compartido sobre un cliente compatible con redis-py (valores serializados en JSON)."""
+
+    def __init__(self, client, ttl: float = 300.0, namespace: str = "motor:"):
+        self.client = client
+        self.ttl = ttl
+        self.namespace = namespace
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.client.get(self.namespace + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """`ttl` reemplaza al TTL del backend para esta entrada (en ms, para no redondear TTLs cortos)."""
+        # Redis aplica su propia política LRU (maxmemory-policy allkeys-lru) además del TTL.
+        segundos = self.ttl if ttl is None else ttl
+        self.client.set(self.namespace + key, json.dumps(value, ensure_ascii=False, default=str), px=max(1, int(segundos * 1000)))
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.namespace + key)
+
+    def values_with_prefix(self, prefix: str) -> List[Any]:
+        prefix = prefix.lower()
+        claves = [
+            k for k in self.client.scan_iter(match=self.namespace + "*")
+            if (k.decode() if isinstance(k, bytes) else k)[len(self.namespace):].lower().startswith(prefix)
+        ]
+        if not claves:
+            return []
+        return [json.loads(v) for v in self.client.mget(claves) if v is not None]
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.client.scan_iter(match=self.namespace + "*"))
+
+
+class MotorCache:
+    """Caché read-through / write-through con contadores de aciertos y fallos."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        valor = self.backend.get(key)
+        if valor is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return valor
+
+    def get_or_load(self, key: str, loader: Callable[[], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """Read-through: devuelve la entrada cacheada o la carga con `loader` y la guarda."""
+        valor = self.get(key)
+        if valor is not None:
+            return valor
+        self.loads += 1
+        valor = loader()
+        if valor is not None:
+            self.backend.set(key, valor)
+        return valor
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        self.backend.set(key, value)
+
+    def invalidate(self, key: str) -> None:
+        self.backend.delete(key)
+
+    def values_with_prefix(self, prefix: str) -> List[Dict[str, Any]]:
+        return self.backend.values_with_prefix(prefix)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entradas": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "cargas_read_through": self.loads,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "expulsiones_lru": getattr(self.backend, "expulsiones", None)
+        }
+
+
+def _crear_backend():
+    if settings.MOTOR_CACHE_BACKEND == "redis":
+        try:
+            import redis
+            client = redis.Redis.from_url(settings.REDIS_URL)
+            client.ping()
+            return RedisBackend(client, ttl=settings.MOTOR_CACHE_TTL)
+        except Exception as e:
+            logger.warning("No se pudo usar Redis para la caché del motor (%s). Usando caché en memoria.", str(e))
+    return MemoryBackend(maxsize=settings.MOTOR_CACHE_MAXSIZE, ttl=settings.MOTOR_CACHE_TTL)
+
+
+motor_cache = MotorCache(_crear_backend())
@@ -0,0 +1,455 @@
+"""
+Motor columnar de parsers Edufácil.
+
+Versión vectorizada de los parsers de `motor_service`: en lugar de recorrer cada
+fila con `iterrows()`, opera sobre columnas completas de pandas/NumPy
+(normalización de RUT con `.str`, bandas de notas con `np.histogram`,
+agregación de atrasos y anotaciones con `groupby`). Devuelve exactamente las
+mismas estructuras de diccionario que los parsers originales, por lo que el
+endpoint de ingesta puede usarlos de forma transparente.
+
+Ver `bench_motor_parsers.py` para la comparación de rendimiento contra los
+parsers por fila.
+"""
+import io
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.services.motor_service import (
+    MOTIVOS_GRAVE,
+    MOTIVOS_GRAVISIMA,
+    _parse_frecuencia_calificaciones,
+    logger,
+)
+
+# Bordes de las bandas de notas: <4.0 | 4.0–4.9 | 5.0–5.9 | >=6.0
+_BANDAS_NOTAS = np.array([-np.inf, 4.0, 5.0, 6.0, np.inf])
+_CLAVES_BANDAS = ("reprobados", "4_0_4_9", "5_0_5_9", "6_0_7_0")
+
+_RE_GRAVISIMA = "|".join(re.escape(x) for x in MOTIVOS_GRAVISIMA)
+_RE_GRAVE = "|".join(re.escape(x) for x in MOTIVOS_GRAVE)
+
+
+# --- PRIMITIVAS VECTORIZADAS ---
+
+def normalize_rut_series(ruts: pd.Series) -> pd.Series:
+    """Equivalente columnar de `normalize_rut`: deja solo dígitos y K mayúscula."""
+    return ruts.astype(str).str.replace(r"[^0-9Kk]", "", regex=True).str.upper()
+
+
+def _to_float(values: pd.Series) -> pd.Series:
+    """Convierte una columna a float aceptando coma decimal; lo no numérico queda NaN."""
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        numeros = values.astype(float)
+    else:
+        limpio = values.astype(str).str.strip().str.replace(",", ".", regex=False)
+        numeros = pd.to_numeric(limpio, errors="coerce").astype(float)
+    return numeros.where(np.isfinite(numeros.to_numpy()))
+
+
+def _clean_text(values: pd.Series) -> pd.Series:
+    """Texto recortado con las celdas vacías (NaN) convertidas en ''."""
+    return values.astype(object).where(values.notna(), "").astype(str).str.strip()
+
+
+def _frecuencias(notas: np.ndarray) -> dict:
+    """Cuenta las cuatro bandas de notas en una sola pasada con `np.histogram`."""
+    conteos, _ = np.histogram(notas, bins=_BANDAS_NOTAS)
+    return {clave: int(n) for clave, n in zip(_CLAVES_BANDAS, conteos)}
+
+
+def _resumen_notas(notas: np.ndarray) -> dict:
+    return {
+        "promedio_general": round(float(notas.mean()), 2),
+        "porcentaje_aprobacion": round(float((notas >= 4.0).mean()) * 100, 2),
+        "frecuencias": _frecuencias(notas),
+    }
+
+
+def _flat_columns(df: pd.DataFrame) -> List[str]:
+    """Nombres de columna en mayúsculas, tomando el segundo nivel de los MultiIndex."""
+    return [str(c[1] if isinstance(c, tuple) else c).upper().strip() for c in df.columns]
+
+
+def _find_col(cols: List[str], predicate) -> Optional[int]:
+    """Posición de la primera columna que cumple el predicado (None si no existe)."""
+    return next((i for i, c in enumerate(cols) if predicate(c)), None)
+
+
+def _nombres_validos(nombres: pd.Series) -> pd.Series:
+    return (nombres != "") & ~nombres.str.lower().str.contains("no hay", regex=False)
+
+
+# --- PARSERS ---
+
+def _parse_situacion_detallado(dfs: list) -> dict:
+    """
+    Versión columnar del parser del 'Informe de Situación Detallado'.
+    Misma lectura de tablas que `motor_service._parse_situacion_detallado`.
+    """
+    bloques_notas = []
+    alumnos_buenos: List[dict] = []
+    alumnos_insuficientes: List[dict] = []
+    total_alumnos = 0
+    distribucion_asignaturas = {}
+
+    # Tabla 1: total de alumnos
+    if len(dfs) > 1:
+        t1 = dfs[1]
+        try:
+            total_col = next((c for c in t1.columns if "TOTAL" in str(c).upper()), None)
+            if total_col:
+                total_alumnos = int(t1[total_col].iloc[0])
+        except Exception:
+            pass
+
+    # Tabla 2: distribución por asignatura
+    if len(dfs) > 2:
+        t2 = dfs[2]
+        cols = [str(c).upper().strip() for c in t2.columns]
+        asig_idx = _find_col(cols, lambda c: "ASIG" in c)
+        if asig_idx is not None:
+            asignaturas = t2.iloc[:, asig_idx].astype(str).str.strip()
+            rep_idx = _find_col(cols, lambda c: c == "<=3.9")
+            if rep_idx is not None:
+                reprobados = pd.to_numeric(t2.iloc[:, rep_idx], errors="coerce").fillna(0).astype(int)
+            else:
+                reprobados = pd.Series(0, index=t2.index)
+            mask = asignaturas != ""
+            distribucion_asignaturas = {
+                asig: {"reprobados": int(rep)}
+                for asig, rep in zip(asignaturas[mask], reprobados[mask])
+            }
+
+    # Tablas 3 y 4: alumnos con rendimiento destacado y suficiente
+    for idx, excluir_centesima in ((3, True), (4, False)):
+        if len(dfs) <= idx:
+            continue
+        t = dfs[idx]
+        cols = _flat_columns(t)
+        prom_idx = _find_col(
+            cols, lambda c: "PROMEDIO" in c and not (excluir_centesima and "CENT" in c)
+        )
+        if prom_idx is None:
+            continue
+        notas = _to_float(t.iloc[:, prom_idx])
+        en_rango = notas.between(1.0, 7.0)
+        bloques_notas.append(notas[en_rango].to_numpy())
+
+        nombre_idx = _find_col(cols, lambda c: "NOMBRE" in c or "ESTUDIANTE" in c)
+        if nombre_idx is not None:
+            nombres = _clean_text(t.iloc[:, nombre_idx])
+            mask = en_rango & _nombres_validos(nombres)
+            alumnos_buenos.extend(
+                {"nombre": n, "promedio": float(p)} for n, p in zip(nombres[mask], notas[mask])
+            )
+
+    # Tabla 6: alumnos con asignaturas insuficientes (una fila por asignatura)
+    if len(dfs) > 6:
+        t6 = dfs[6]
+        cols = _flat_columns(t6)
+        nombre_idx = _find_col(cols, lambda c: "NOMBRE" in c or "ESTUDIANTE" in c)
+        prom_idx = _find_col(cols, lambda c: "PROMEDIO" in c)
+        asig_idx = _find_col(cols, lambda c: "ASIGNATURA" in c or "ASIG" in c)
+        nota_idx = _find_col(cols, lambda c: "NOTA" in c and (prom_idx is None or c != cols[prom_idx]))
+
+        if nombre_idx is not None and len(t6):
+            nombres = _clean_text(t6.iloc[:, nombre_idx])
+            promedios = _to_float(t6.iloc[:, prom_idx]) if prom_idx is not None else pd.Series(3.9, index=t6.index)
+            notas_asig = _to_float(t6.iloc[:, nota_idx]) if nota_idx is not None else pd.Series(3.9, index=t6.index)
+            asignaturas = (
+                _clean_text(t6.iloc[:, asig_idx]) if asig_idx is not None
+                else pd.Series("Asignatura", index=t6.index)
+            )
+            filas = pd.DataFrame({
+                "nombre": nombres,
+                "promedio": promedios,
+                "nota": notas_asig,
+                "asignatura": asignaturas,
+            })
+            filas = filas[_nombres_validos(nombres) & promedios.notna() & notas_asig.notna()]
+
+            if not filas.empty:
+                # Primera fila de cada alumno + todas sus asignaturas concatenadas
+                por_alumno = filas.drop_duplicates("nombre")
+                asignaturas_por_alumno = filas.groupby("nombre", sort=False)["asignatura"].agg(", ".join)
+                sinteticos = por_alumno["nombre"].str.replace(" ", "", regex=False).str[:12] + "K"
+                bloques_notas.append(por_alumno["promedio"].to_numpy())
+                alumnos_insuficientes = [
+                    {"rut": rut, "nombre": nombre, "asignatura": asignaturas_por_alumno[nombre], "nota": nota}
+                    for nombre, rut, nota in zip(
+                        por_alumno["nombre"], normalize_rut_series(sinteticos), por_alumno["nota"].tolist()
+                    )
+                ]
+
+    notas_todas = np.concatenate(bloques_notas) if bloques_notas else np.empty(0)
+    if notas_todas.size == 0:
+        if total_alumnos > 0:
+            notas_todas = np.full(total_alumnos, 5.2)
+        else:
+            raise ValueError("El informe de situación no contiene datos de notas procesables.")
+
+    return {
+        **_resumen_notas(notas_todas),
+        "total_alumnos": total_alumnos,
+        "alumnos_insuficientes": alumnos_insuficientes,
+        "alumnos_buenos": alumnos_buenos,
+        "distribucion_asignaturas": distribucion_asignaturas,
+        "curso_info": {}
+    }
+
+
+def _parse_generico(df: pd.DataFrame) -> Optional[dict]:
+    """Tabla genérica con columnas RUT y Nota/Promedio. Retorna None si no aplica."""
+    cols = [str(c).upper().strip() for c in df.columns]
+    rut_idx = _find_col(cols, lambda c: "RUT" in c or "RUN" in c)
+    nota_idx = _find_col(cols, lambda c: "NOTA" in c or "PROMEDIO" in c or "PROM" in c)
+    if rut_idx is None or nota_idx is None:
+        return None
+
+    notas = _to_float(df.iloc[:, nota_idx])
+    validas = notas.notna()
+    if not validas.any():
+        return None
+    notas = notas[validas]
+    ruts = normalize_rut_series(df.iloc[:, rut_idx][validas])
+
+    insuf = notas < 4.0
+    valores = notas.to_numpy()
+    return {
+        **_resumen_notas(valores),
+        "total_alumnos": int(valores.size),
+        "alumnos_insuficientes": [
+            {"rut": rut, "nombre": "", "asignatura": "", "nota": float(nota)}
+            for rut, nota in zip(ruts[insuf], notas[insuf])
+        ],
+        "distribucion_asignaturas": {},
+        "curso_info": {}
+    }
+
+
+def parse_calificaciones(file_content: bytes) -> dict:
+    """
+    Parser columnar de calificaciones. Misma detección de formato que
+    `motor_service.parse_calificaciones` (Situación Detallado, Frecuencia o genérico).
+    """
+    if not file_content:
+        raise ValueError(
+            "Archivo de calificaciones vacío. Adjunte el 'Informe de Situación Detallado' "
+            "o el reporte 'Frecuencia_Calificaciones' exportado desde Edufácil."
+        )
+
+    # --- INTENTO 1: HTML de Edufácil ---
+    dfs = None
+    try:
+        dfs = pd.read_html(io.BytesIO(file_content))
+    except Exception:
+        pass
+
+    if dfs:
+        if len(dfs) >= 6:
+            header_text = ""
+            try:
+                header_text = str(dfs[0].iloc[0, 0]).lower()
+            except Exception:
+                pass
+            if any(x in header_text for x in ["situaci", "informe", "profesor", "curso", "básico", "medio"]):
+                return _parse_situacion_detallado(dfs)
+
+        row_sample = ""
+        try:
+            row_sample = str(dfs[0].iloc[0, 0]).lower()
+        except Exception:
+            pass
+        if "calif" in row_sample or "entre" in row_sample:
+            # Tabla de ~5 filas: el parser original ya es O(1) en la práctica.
+            return _parse_frecuencia_calificaciones(dfs)
+
+        generico = _parse_generico(dfs[0])
+        if generico:
+            return generico
+
+    # --- INTENTO 2: Excel nativo (.xlsx) ---
+    try:
+        generico = _parse_generico(pd.read_excel(io.BytesIO(file_content)))
+        if generico:
+            return generico
+    except Exception as e:
+        raise ValueError(f"No se pudo leer el archivo de calificaciones. Detalle: {e}")
+
+    raise ValueError(
+        "El archivo de calificaciones no contiene datos procesables. "
+        "Use el 'Informe de Situación Detallado' o 'Frecuencia_Calificaciones' de Edufácil."
+    )
+
+
+def _minutos_atraso(tiempos: pd.Series) -> pd.Series:
+    """
+    Minutos de atraso por fila. Si la celda es una hora 'HH:MM' entre las 07 y las 14
+    se interpreta como hora de llegada (minutos desde las 08:00); si no, como duración.
+    """
+    texto = tiempos.astype(object).where(tiempos.notna(), "").astype(str).str.strip()
+    con_hora = texto.str.contains(":", regex=False)
+
+    partes = texto.str.split(":", n=2, expand=True).reindex(columns=[0, 1])
+    h_txt = partes[0].fillna("").str.strip()
+    m_txt = partes[1].fillna("").str.strip()
+    h = pd.to_numeric(h_txt.where(h_txt.str.isdigit()), errors="coerce").fillna(0)
+    m = pd.to_numeric(m_txt.where(m_txt.str.isdigit()), errors="coerce").fillna(0)
+    total = h * 60 + m
+    # Edufácil guarda la HORA de llegada → calcular minutos desde inicio jornada 08:00
+    desde_jornada = (total - 8 * 60).clip(lower=0)
+    por_hora = desde_jornada.where(h.between(7, 14), total)
+
+    duracion = pd.to_numeric(texto.where(~con_hora), errors="coerce")
+    duracion = duracion.where(np.isfinite(duracion), 0).fillna(0)
+    por_duracion = np.trunc(duracion)
+
+    return por_hora.where(con_hora, por_duracion).astype(np.int64)
+
+
+def parse_atrasos(file_content: bytes) -> Dict[str, int]:
+    """Versión columnar de `motor_service.parse_atrasos` (suma de minutos por RUT con groupby)."""
+    if not file_content:
+        raise ValueError("Archivo de atrasos vacío. Adjunte 'Excel_Atrasos_*.xlsx' de Edufácil.")
+
+    try:
+        df = pd.read_excel(io.BytesIO(file_content))
+    except Exception as e:
+        raise ValueError(f"No se pudo leer el archivo de atrasos. Detalle: {e}")
+
+    cols = [str(c).upper().strip() for c in df.columns]
+    rut_idx = _find_col(cols, lambda c: "RUT" in c or "RUN" in c)
+    tiempo_idx = _find_col(cols, lambda c: "TIEMPO" in c or "ATRASO" in c or "MINUTO" in c or "DURACION" in c)
+
+    if rut_idx is None:
+        raise ValueError(f"Sin columna RUT/RUN. Columnas detectadas: {cols}")
+    if tiempo_idx is None:
+        raise ValueError(f"Sin columna de tiempo. Columnas detectadas: {cols}")
+
+    ruts = normalize_rut_series(df.iloc[:, rut_idx])
+    minutos = _minutos_atraso(df.iloc[:, tiempo_idx])
+    validos = ruts != ""
+
+    totales = minutos[validos].groupby(ruts[validos], sort=False).sum()
+    atrasos_por_rut = {rut: int(m) for rut, m in totales.items()}
+
+    if not atrasos_por_rut:
+        raise ValueError("Sin registros procesables en el archivo de atrasos.")
+
+    return atrasos_por_rut
+
+
+def clasificar_motivos(motivos: pd.Series) -> pd.Series:
+    """Equivalente columnar de `clasificar_motivo` para una columna completa."""
+    m = motivos.str.lower().str.strip()
+    gravedad = np.select(
+        [m.str.contains(_RE_GRAVISIMA, regex=True), m.str.contains(_RE_GRAVE, regex=True)],
+        ["Gravísima", "Grave"],
+        default="Leve",
+    )
+    return pd.Series(gravedad, index=motivos.index)
+
+
+def parse_anotaciones(file_content: bytes) -> dict:
+    """Versión columnar de `motor_service.parse_anotaciones` (conteo por tipo con groupby)."""
+    if not file_content:
+        raise ValueError("Archivo de anotaciones vacío. Adjunte 'Excel_Anotaciones_*.xlsx' de Edufácil.")
+
+    try:
+        df = pd.read_excel(io.BytesIO(file_content))
+    except Exception as e:
+        raise ValueError(f"No se pudo leer el archivo de anotaciones. Detalle: {e}")
+
+    cols = [str(c).upper().strip() for c in df.columns]
+    rut_idx = _find_col(cols, lambda c: "RUT" in c or "RUN" in c)
+    tipo_idx = _find_col(cols, lambda c: "TIPO" in c)
+    motivo_idx = _find_col(cols, lambda c: "MOTIVO" in c or "DESCRIPCION" in c or "TEXTO" in c or "OBSERVACION" in c)
+    nombre_idx = _find_col(cols, lambda c: "ALUMNO" in c or "NOMBRE" in c or "ESTUDIANTE" in c)
+
+    if rut_idx is None:
+        raise ValueError(f"Sin columna RUT/RUN. Columnas detectadas: {cols}")
+    if tipo_idx is None:
+        raise ValueError(f"Sin columna TIPO. Columnas detectadas: {cols}")
+
+    ruts = normalize_rut_series(df.iloc[:, rut_idx])
+    validos = (ruts != "").to_numpy()
+    if not validos.any():
+        return {}
+    df = df[validos]
+    ruts = ruts[validos]
+
+    tipo_raw = df.iloc[:, tipo_idx]
+    tipos = tipo_raw.astype(object).where(tipo_raw.notna(), "NEUTRA").astype(str).str.upper().str.strip()
+    vacio = pd.Series("", index=df.index)
+    motivos = _clean_text(df.iloc[:, motivo_idx]) if motivo_idx is not None else vacio
+    nombres = _clean_text(df.iloc[:, nombre_idx]) if nombre_idx is not None else vacio
+    gravedades = clasificar_motivos(motivos)
+
+    categoria = np.select(
+        [
+            tipos.str.contains("NEGATIVA", regex=False),
+            tipos.str.contains("POSITIVA", regex=False),
+            tipos.str.contains("NEUTRA", regex=False),
+            tipos.str.contains("FORMATIVA", regex=False) | tipos.str.contains("ACCION", regex=False),
+        ],
+        ["negativas", "positivas", "neutras", "acciones_formativas"],
+        default="",
+    )
+    conteos = (
+        pd.crosstab(ruts, categoria)
+        .reindex(columns=["negativas", "positivas", "neutras", "acciones_formativas"], fill_value=0)
+    )
+    primer_nombre = nombres.where(nombres != "").groupby(ruts, sort=False).first()
+
+    detalles = [
+        {"tipo": t, "motivo": m, "gravedad": g}
+        for t, m, g in zip(tipos, motivos, gravedades)
+    ]
+
+    anotaciones_por_rut: dict = {}
+    for rut, posiciones in ruts.reset_index(drop=True).groupby(ruts.to_numpy(), sort=False).indices.items():
+        fila = conteos.loc[rut]
+        nombre = primer_nombre.get(rut)
+        anotaciones_por_rut[rut] = {
+            "nombre": nombre if isinstance(nombre, str) else "",
+            "negativas": int(fila["negativas"]),
+            "positivas": int(fila["positivas"]),
+            "neutras": int(fila["neutras"]),
+            "acciones_formativas": int(fila["acciones_formativas"]),
+            "detalles": [detalles[i] for i in posiciones]
+        }
+
+    return anotaciones_por_rut
+
+
+def parse_asistencia(file_content: bytes) -> dict:
+    """Versión columnar de `motor_service.parse_asistencia` (porcentaje de asistencia por RUT)."""
+    if not file_content:
+        return {}
+
+    try:
+        if b"<html" in file_content.lower()[:500]:
+            dfs = pd.read_html(io.BytesIO(file_content))
+            df = dfs[0] if dfs else pd.DataFrame()
+        else:
+            df = pd.read_excel(io.BytesIO(file_content))
+
+        rut_col = next((c for c in df.columns if 'rut' in str(c).lower()), None)
+        asi_col = next((c for c in df.columns if 'asi' in str(c).lower() or '%' in str(c) or 'porcentaje' in str(c).lower()), None)
+        if rut_col is None or asi_col is None:
+            return {}
+
+        rut_raw = df[rut_col]
+        rut_txt = rut_raw.astype(str).str.strip()
+        validos = rut_raw.notna() & ~rut_txt.isin(["", "nan", "None"])
+        ruts = normalize_rut_series(rut_txt[validos])
+        # Limpiar porcentaje (ej. "85%", "85.5", "85,5"); lo ilegible cuenta como 100%
+        asistencia = _to_float(df[asi_col][validos].astype(str).str.replace("%", "", regex=False)).fillna(100.0)
+        return dict(zip(ruts, asistencia.astype(float).tolist()))
+    except Exception as e:
+        logger.warning(f"Error parseando asistencia: {e}")
+        return {}
@@ -0,0 +1,177 @@
+"""
+Motor de agregación del dashboard RBAC (/api/v1/motor/dashboard).
+
+La vista del director trae una sola vez, con una proyección JSON de
+`motor_conduccion_preventiva`, solo las columnas que usa el tablero. Cada fila
+se compacta en un `RegistroDashboard` y un único recorrido calcula los KPI
+macro, la nómina única de Doble Riesgo, las distribuciones DOK y el desglose
+por curso.
+
+`Cronometro` mide las fases fetch / compute / serialize de cada petición; el
+endpoint las devuelve en la cabecera estándar `Server-Timing`.
+"""
+import time
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from app.db.supabase import supabase
+from app.services.motor_agregados import minutos_atraso
+from app.services.motor_service import normalize_rut
+
+logger = logging.getLogger(__name__)
+
+COLUMNAS_DASHBOARD = (
+    "curso_id,asignatura,"
+    "promedio:datos_academicos->promedio_general,"
+    "aprobacion:datos_academicos->porcentaje_aprobacion,"
+    "dok:datos_academicos->distribucion_dok,"
+    "minutos_atraso_acumulados:datos_convivencia->minutos_atraso_acumulados,"
+    "alumnos_doble_riesgo_detalle:datos_convivencia->alumnos_doble_riesgo_detalle"
+)
+
+DOK_DEFAULT = {"dok_1": 38, "dok_2": 47, "dok_3": 15}
+
+
+@dataclass(slots=True)
+class RegistroDashboard:
+    """Fila compacta de un curso/asignatura con solo lo que consume el dashboard."""
+
+    curso_id: str
+    asignatura: str
+    promedio: float
+    aprobacion: float
+    atrasos: int
+    riesgo_detalle: List[Dict[str, Any]]
+    dok: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class AgregadoDirector:
+    """Resultado del recorrido único sobre los registros del colegio."""
+
+    promedio: float = 0.0
+    aprobacion: float = 0.0
+    atrasos: int = 0
+    total_registros: int = 0
+    riesgo_unico: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    dok: Dict[str, List[float]] = field(default_factory=lambda: {"dok1": [], "dok2": [], "dok3": []})
+    por_curso: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+
+class Cronometro:
+    """Acumula la duración (ms) de las fases de una petición."""
+
+    def __init__(self):
+        self.tramos: Dict[str, float] = {}
+
+    @contextmanager
+    def tramo(self, nombre: str):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.tramos[nombre] = self.tramos.get(nombre, 0.0) + (time.perf_counter() - inicio) * 1000
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{nombre};dur={ms:.1f}" for nombre, ms in self.tramos.items())
+
+
+def compactar(fila: Dict[str, Any]) -> RegistroDashboard:
+    """Convierte una fila (proyectada o un registro completo del motor) en un `RegistroDashboard`."""
+    if "datos_academicos" in fila or "datos_convivencia" in fila:
+        acad = fila.get("datos_academicos") or {}
+        conv = fila.get("datos_convivencia") or {}
+        fila = {
+            "curso_id": fila.get("curso_id"),
+            "asignatura": fila.get("asignatura"),
+            "promedio": acad.get("promedio_general"),
+            "aprobacion": acad.get("porcentaje_aprobacion"),
+            "dok": acad.get("distribucion_dok"),
+            "atrasos": minutos_atraso(conv),
+            "alumnos_doble_riesgo_detalle": conv.get("alumnos_doble_riesgo_detalle")
+        }
+    else:
+        fila = {**fila, "atrasos": minutos_atraso(fila)}
+
+    return RegistroDashboard(
+        curso_id=fila.get("curso_id") or "S/C",
+        asignatura=fila.get("asignatura") or "",
+        promedio=float(fila.get("promedio") or 0),
+        aprobacion=float(fila.get("aprobacion") or 0),
+        atrasos=fila["atrasos"],
+        riesgo_detalle=fila.get("alumnos_doble_riesgo_detalle") or [],
+        dok=fila.get("dok") or None
+    )
+
+
+def cargar_registros_director(
+    periodo_id: str,
+    corte_temporal: str,
+    curso_id: str,
+    departamento_id: str
+) -> List[RegistroDashboard]:
+    """Una sola consulta, con proyección de columnas, para toda la vista del director."""
+    if not supabase:
+        return []
+    try:
+        query = supabase.table("motor_conduccion_preventiva").select(COLUMNAS_DASHBOARD).eq("periodo_id", periodo_id).eq("corte_temporal", corte_temporal)
+        # Si filtró por un curso pero es director, solo sumamos de ese curso:
+        if curso_id != "Todos":
+            query = query.eq("curso_id", curso_id)
+        if departamento_id != "Todos" and departamento_id != "0":
+            query = query.eq("asignatura", departamento_id)
+        res = query.execute()
+        if res and getattr(res, "data", None):
+            return [compactar(r) for r in res.data]
+    except Exception as e_db:
+        logger.warning("Fallo en agregación macro de director: %s", str(e_db))
+    return []
+
+
+def agregar_director(registros: List[RegistroDashboard]) -> AgregadoDirector:
+    """KPI macro, nómina única de Doble Riesgo (por RUT), DOK y desglose por curso en un recorrido."""
+    agg = AgregadoDirector()
+    for r in registros:
+        curso = agg.por_curso.get(r.curso_id)
+        if curso is None:
+            curso = agg.por_curso[r.curso_id] = {"promedios": [], "aprobaciones": [], "atrasos": 0, "ruts": set()}
+
+        if r.promedio > 0:
+            agg.promedio += r.promedio
+            agg.aprobacion += r.aprobacion
+            agg.total_registros += 1
+            curso["promedios"].append(r.promedio)
+            curso["aprobaciones"].append(r.aprobacion)
+
+        agg.atrasos += r.atrasos
+        curso["atrasos"] += r.atrasos
+
+        for al_riesgo in r.riesgo_detalle:
+            rut_norm = normalize_rut(al_riesgo.get("rut", ""))
+            if not rut_norm:
+                continue
+            curso["ruts"].add(rut_norm)
+            if rut_norm not in agg.riesgo_unico:
+                agg.riesgo_unico[rut_norm] = al_riesgo
+
+        if r.dok:
+            agg.dok["dok1"].append(r.dok.get("dok_1", DOK_DEFAULT["dok_1"]))
+            agg.dok["dok2"].append(r.dok.get("dok_2", DOK_DEFAULT["dok_2"]))
+            agg.dok["dok3"].append(r.dok.get("dok_3", DOK_DEFAULT["dok_3"]))
+    return agg
+
+
+def desglose_por_curso(agg: AgregadoDirector) -> List[Dict[str, Any]]:
+    """Drill-down por curso a partir del agregado (ordenado por curso)."""
+    desglose = []
+    for curso_id, c in sorted(agg.por_curso.items()):
+        desglose.append({
+            "curso": curso_id,
+            "promedio": round(sum(c["promedios"]) / len(c["promedios"]), 2) if c["promedios"] else 0.0,
+            "aprobacion": round(sum(c["aprobaciones"]) / len(c["aprobaciones"]), 2) if c["aprobaciones"] else 0.0,
+            "atrasos": c["atrasos"],
+            "alumnos_riesgo": len(c["ruts"])
+        })
+    return desglose
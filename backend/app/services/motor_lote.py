@@ -0,0 +1,231 @@
+"""
+Ingesta masiva del Motor de Conducción Preventiva.
+
+Permite cargar todos los cursos de un corte temporal en una sola petición:
+los archivos se parsean en el pool de procesos (cada archivo una sola vez,
+aunque lo compartan varios cursos, como el Excel de atrasos de todo el
+colegio), se cruzan por curso y se devuelven como eventos de progreso. Un
+archivo inválido solo hace fallar a los cursos que dependen de él.
+"""
+import io
+import json
+import asyncio
+import posixpath
+import zipfile
+from typing import Any, AsyncIterator, Dict, List
+
+from app.core.config import settings
+from app.core.executors import get_process_pool
+from app.services.motor_columnar import (
+    parse_calificaciones,
+    parse_atrasos,
+    parse_anotaciones,
+    parse_asistencia
+)
+from app.services.motor_service import ejecutar_cruce_predictivo
+
+TIPOS_ARCHIVO = ("calificaciones", "atrasos", "anotaciones", "asistencia")
+UMBRALES_DEFAULT = {"asistencia_limite": 85.0, "peso_atrasos": 0.4}
+MAX_ARCHIVOS_LOTE = 500
+
+_PARSERS = {
+    "calificaciones": parse_calificaciones,
+    "atrasos": parse_atrasos,
+    "anotaciones": parse_anotaciones,
+    "asistencia": parse_asistencia,
+}
+
+
+def _parsear_archivo(tipo: str, contenido: bytes) -> dict:
+    """Punto de entrada en el worker del pool (debe ser una función de módulo, serializable)."""
+    return _PARSERS[tipo](contenido)
+
+
+def tipo_por_nombre(nombre_archivo: str) -> str:
+    """Deduce el tipo de reporte Edufácil a partir del nombre del archivo."""
+    n = posixpath.basename(nombre_archivo).lower()
+    if "atraso" in n:
+        return "atrasos"
+    if "anotacion" in n:
+        return "anotaciones"
+    if "asistencia" in n:
+        return "asistencia"
+    return "calificaciones"
+
+
+def leer_zip(contenido: bytes, max_bytes: int = None, max_ratio: float = None) -> Dict[str, bytes]:
+    """
+    Extrae los archivos de un ZIP (ignorando carpetas y metadatos de macOS).
+    Antes de descomprimir nada rechaza el lote si el tamaño descomprimido total supera
+    `max_bytes` o algún archivo se expande más de `max_ratio` veces (ZIP bomb).
+    zipfile nunca entrega más bytes que el tamaño declarado, así que el límite se cumple.
+    """
+    max_bytes = settings.MOTOR_LOTE_MAX_BYTES if max_bytes is None else max_bytes
+    max_ratio = settings.MOTOR_LOTE_MAX_RATIO if max_ratio is None else max_ratio
+    try:
+        zf = zipfile.ZipFile(io.BytesIO(contenido))
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"El archivo del lote no es un ZIP válido: {e}")
+
+    with zf:
+        miembros = [
+            info for info in zf.infolist()
+            if not (info.is_dir() or info.filename.startswith("__MACOSX/") or posixpath.basename(info.filename).startswith("."))
+        ]
+        if len(miembros) > MAX_ARCHIVOS_LOTE:
+            raise ValueError(f"El lote supera el máximo de {MAX_ARCHIVOS_LOTE} archivos.")
+        if sum(info.file_size for info in miembros) > max_bytes:
+            raise ValueError(f"El lote descomprimido supera el máximo de {max_bytes // (1024 * 1024)} MB.")
+        for info in miembros:
+            if info.file_size > max_ratio * max(info.compress_size, 1):
+                raise ValueError(f"{info.filename}: tasa de compresión sospechosa (más de {max_ratio:.0f}x).")
+        return {info.filename: zf.read(info) for info in miembros}
+
+
+def inferir_manifiesto(nombres: List[str]) -> List[Dict[str, Any]]:
+    """
+    Arma el manifiesto a partir de la estructura de carpetas del ZIP:
+        <curso>/<asignatura>/<archivo>  → archivo propio del curso y asignatura
+        <archivo> (en la raíz)           → archivo de todo el colegio (atrasos, anotaciones, asistencia)
+    """
+    globales: Dict[str, str] = {}
+    cursos: Dict[tuple, Dict[str, Any]] = {}
+
+    for nombre in sorted(nombres):
+        partes = [p for p in nombre.split("/") if p]
+        tipo = tipo_por_nombre(nombre)
+        if len(partes) == 1:
+            if tipo != "calificaciones":
+                globales[tipo] = nombre
+            continue
+        if len(partes) < 3:
+            continue
+        clave = (partes[-3], partes[-2])
+        entrada = cursos.setdefault(clave, {"curso_id": clave[0], "asignatura_nombre": clave[1]})
+        entrada[tipo] = nombre
+
+    manifiesto = []
+    for entrada in cursos.values():
+        for tipo, nombre in globales.items():
+            entrada.setdefault(tipo, nombre)
+        manifiesto.append(entrada)
+    return manifiesto
+
+
+def validar_manifiesto(manifiesto: Any, archivos: Dict[str, bytes]) -> List[Dict[str, Any]]:
+    """Valida la estructura del manifiesto y que cada archivo referenciado exista en el lote."""
+    if isinstance(manifiesto, str):
+        try:
+            manifiesto = json.loads(manifiesto)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Manifiesto JSON inválido: {e}")
+    if not isinstance(manifiesto, list) or not manifiesto:
+        raise ValueError("El manifiesto debe ser una lista no vacía de cursos.")
+
+    for i, entrada in enumerate(manifiesto):
+        if not isinstance(entrada, dict) or not entrada.get("curso_id") or not entrada.get("asignatura_nombre"):
+            raise ValueError(f"Entrada {i} del manifiesto sin 'curso_id' o 'asignatura_nombre'.")
+        for tipo in TIPOS_ARCHIVO:
+            nombre = entrada.get(tipo)
+            if nombre and nombre not in archivos:
+                raise ValueError(f"El archivo '{nombre}' ({tipo}) del curso {entrada['curso_id']} no viene en el lote.")
+    return manifiesto
+
+
+def construir_registro(
+    periodo_id: str,
+    curso_id: str,
+    asignatura: str,
+    corte_temporal: str,
+    cruce_res: dict
+) -> Dict[str, Any]:
+    """Fila de `motor_conduccion_preventiva` para un curso recién triangulado."""
+    return {
+        "periodo_id": periodo_id,
+        "curso_id": curso_id,
+        "asignatura": asignatura,
+        "corte_temporal": corte_temporal,
+        "datos_academicos": cruce_res["datos_academicos"],
+        "datos_convivencia": cruce_res["datos_convivencia"],
+        "configuracion_umbrales": dict(UMBRALES_DEFAULT),
+        "contexto_coordinador": "",
+        "comentarios_aula": [],
+        "roadmap_sugerido": None
+    }
+
+
+async def procesar_lote(
+    periodo_id: str,
+    corte_temporal: str,
+    manifiesto: List[Dict[str, Any]],
+    archivos: Dict[str, bytes],
+    executor=None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Parsea en paralelo los archivos del lote y emite un evento por curso a medida que
+    termina su cruce predictivo. Los registros exitosos quedan en el evento final
+    `{"evento": "fin", "registros": [...]}` para que el llamador los persista en bloque.
+    """
+    loop = asyncio.get_running_loop()
+    executor = executor or get_process_pool()
+
+    # Cada archivo se parsea una sola vez aunque lo referencien varios cursos
+    parseos: Dict[tuple, asyncio.Future] = {}
+    for entrada in manifiesto:
+        for tipo in TIPOS_ARCHIVO:
+            nombre = entrada.get(tipo)
+            if nombre and (tipo, nombre) not in parseos:
+                parseos[(tipo, nombre)] = loop.run_in_executor(executor, _parsear_archivo, tipo, archivos[nombre])
+
+    async def _procesar_curso(entrada: Dict[str, Any]) -> Dict[str, Any]:
+        curso_id = entrada["curso_id"]
+        asignatura = entrada["asignatura_nombre"]
+        datos: Dict[str, dict] = {}
+        for tipo in TIPOS_ARCHIVO:
+            nombre = entrada.get(tipo)
+            if not nombre:
+                datos[tipo] = {}
+                continue
+            try:
+                datos[tipo] = await parseos[(tipo, nombre)]
+            except Exception as e:
+                return {
+                    "evento": "curso", "status": "error", "curso_id": curso_id, "asignatura": asignatura,
+                    "detalle": f"Error en formato de archivo de {tipo} ({nombre}): {e}"
+                }
+
+        if not datos["calificaciones"]:
+            return {
+                "evento": "curso", "status": "error", "curso_id": curso_id, "asignatura": asignatura,
+                "detalle": "El curso no trae archivo de calificaciones."
+            }
+
+        cruce_res = ejecutar_cruce_predictivo(
+            datos["calificaciones"],
+            datos["atrasos"],
+            datos["anotaciones"],
+            datos["asistencia"],
+            umbrales=UMBRALES_DEFAULT
+        )
+        registro = construir_registro(periodo_id, curso_id, asignatura, corte_temporal, cruce_res)
+        return {
+            "evento": "curso", "status": "success", "curso_id": curso_id, "asignatura": asignatura,
+            "promedio_general": cruce_res["datos_academicos"]["promedio_general"],
+            "alumnos_doble_riesgo": len(cruce_res["datos_convivencia"]["alumnos_doble_riesgo"]),
+            "registro": registro
+        }
+
+    total = len(manifiesto)
+    registros: Dict[tuple, Dict[str, Any]] = {}
+    for i, tarea in enumerate(asyncio.as_completed([_procesar_curso(e) for e in manifiesto]), start=1):
+        evento = await tarea
+        registro = evento.pop("registro", None)
+        if registro:
+            # Un curso/asignatura repetido en el lote se queda con el último procesado
+            registros[(registro["curso_id"], registro["asignatura"])] = registro
+        evento["progreso"] = f"{i}/{total}"
+        yield evento
+
+    # Recoger los parseos que ningún curso alcanzó a esperar (cursos cortados por un error previo)
+    await asyncio.gather(*parseos.values(), return_exceptions=True)
+    yield {"evento": "fin", "registros": list(registros.values())}
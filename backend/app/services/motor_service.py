@@ -1,9 +1,16 @@
 import pandas as pd
 import io
 import re
+import logging
 import unicodedata
 from typing import Dict, Any, List
 
+logger = logging.getLogger(__name__)
+
+# Palabras clave del RICE para clasificar la gravedad de una anotación.
+MOTIVOS_GRAVISIMA = ["agresion", "pelea", "bullying", "robo", "hurto", "droga", "alcohol", "arma", "ciberacoso", "acoso"]
+MOTIVOS_GRAVE = ["falta de respeto", "insulto", "groseria", "fuga", "cimarra", "copia", "plagio", "desobedecer"]
+
 
 def normalize_rut(rut_str: str) -> str:
     """Remueve puntos, guiones, espacios y fuerza mayúsculas de un RUT chileno."""
@@ -12,6 +19,11 @@ def normalize_rut(rut_str: str) -> str:
     return re.sub(r'[^0-9Kk]', '', str(rut_str)).upper().strip()
 
 
+def rut_sintetico(nombre: str) -> str:
+    """RUT sintético que el Informe de Situación asigna a alumnos identificados solo por nombre."""
+    return normalize_rut(nombre.replace(" ", "")[:12] + "K")
+
+
 def normalize_subject_name(subject_string: str) -> int:
     """
     Recibe un nombre de asignatura y devuelve el depto_id mapeado a public.departamentos.
@@ -41,11 +53,9 @@ def clasificar_motivo(motivo: str) -> str:
     if not motivo:
         return "Leve"
     m = motivo.lower().strip()
-    gravisima = ["agresion", "pelea", "bullying", "robo", "hurto", "droga", "alcohol", "arma", "ciberacoso", "acoso"]
-    grave = ["falta de respeto", "insulto", "groseria", "fuga", "cimarra", "copia", "plagio", "desobedecer"]
-    if any(x in m for x in gravisima):
+    if any(x in m for x in MOTIVOS_GRAVISIMA):
         return "Gravísima"
-    if any(x in m for x in grave):
+    if any(x in m for x in MOTIVOS_GRAVE):
         return "Grave"
     return "Leve"
 
@@ -64,6 +74,7 @@ def _parse_situacion_detallado(dfs: list) -> dict:
       - tabla[6]: alumnos con asignaturas insuficientes (con detalle)
     """
     alumnos_insuficientes = []
+    alumnos_buenos = []
     notas_todas = []
     total_alumnos = 0
     distribucion_asignaturas = {}
@@ -148,13 +159,13 @@ def _parse_situacion_detallado(dfs: list) -> dict:
                 promedio_alumno = float(str(row.get(prom_col, 3.9)).replace(",", ".")) if prom_col else 3.9
                 asignatura = str(row.get(asig_col, "Asignatura")).strip() if asig_col else "Asignatura"
                 nota_asig = float(str(row.get(nota_col, 3.9)).replace(",", ".")) if nota_col else 3.9
-                rut_sintetico = normalize_rut(nombre.replace(" ", "")[:12] + "K")
+                rut_alumno = rut_sintetico(nombre)
 
                 if nombre not in alumnos_vistos:
                     alumnos_vistos.add(nombre)
                     notas_todas.append(promedio_alumno)
                     alumnos_insuficientes.append({
-                        "rut": rut_sintetico,
+                        "rut": rut_alumno,
                         "nombre": nombre,
                         "asignatura": asignatura,
                         "nota": nota_asig
@@ -531,19 +542,57 @@ def parse_asistencia(file_content: bytes) -> dict:
 
 # --- EL CRUCE PREDICTIVO DE TRAYECTORIAS (TRIANGULACIÓN) ---
 
+def construir_indice_rut(
+    calificaciones: dict,
+    atrasos: Dict[str, int],
+    anotaciones: dict,
+    asistencias: dict
+) -> dict:
+    """
+    Construye, una sola vez por ingesta, el índice RUT normalizado → datos de cada fuente
+    (notas, atrasos, anotaciones y asistencia). El cruce predictivo hace luego un hash
+    join O(1) por alumno en vez de re-escanear las listas de calificaciones por cada RUT.
+    """
+    notas: Dict[str, dict] = {}
+    nombres: Dict[str, str] = {}
+
+    # Los alumnos con asignaturas insuficientes tienen prioridad sobre los destacados/suficientes
+    for al in calificaciones.get("alumnos_buenos", []):
+        rut = rut_sintetico(al["nombre"])
+        notas.setdefault(rut, {"promedio": al.get("promedio", 5.5), "reprobados": 0})
+    for al in calificaciones.get("alumnos_insuficientes", []):
+        notas[normalize_rut(al["rut"])] = {"promedio": 3.5, "reprobados": 3}
+
+    for al in calificaciones.get("alumnos_insuficientes", []):
+        nombres[normalize_rut(al["rut"])] = al["nombre"]
+    for al in calificaciones.get("alumnos_buenos", []):
+        nombres[rut_sintetico(al["nombre"])] = al["nombre"]
+
+    return {
+        "notas": notas,
+        "nombres": nombres,
+        "atrasos": {normalize_rut(k): v for k, v in atrasos.items()},
+        "anotaciones": {normalize_rut(k): v for k, v in anotaciones.items()},
+        "asistencias": {normalize_rut(k): v for k, v in asistencias.items()},
+    }
+
+
 def ejecutar_cruce_predictivo(
     calificaciones: dict,
     atrasos: Dict[str, int],
     anotaciones: dict,
     asistencias: dict,
     umbrales: dict,
-    historico_logro_dia: float = 68.0
+    historico_logro_dia: float = 68.0,
+    indice: dict = None
 ) -> dict:
     """
     Cruza datos de trayectoria académica y convivencia para calcular:
     - Doble Riesgo (rezago académico + ausentismo crítico)
     - Brecha de Sinceramiento (notas internas vs histórico SIMCE/DIA)
     - Camuflaje Cognitivo (notas altas con rezago conductual)
+
+    Si se entrega `indice` (ver `construir_indice_rut`) se reutiliza; si no, se construye aquí.
     """
     asistencia_limite = umbrales.get("asistencia_limite", 85.0)
     peso_atrasos = umbrales.get("peso_atrasos", 0.4)
@@ -551,65 +600,52 @@ def ejecutar_cruce_predictivo(
     aprobacion_interna = calificaciones.get("porcentaje_aprobacion", 88.5)
     brecha_sinceramiento = aprobacion_interna - historico_logro_dia
 
-    alumnos_doble_riesgo = []
-    
-    # 1. Extraer TODOS los RUTs/Nombres del curso desde Calificaciones
-    ruts_curso = set()
-    nombres_curso = {} # rut -> nombre
-    
-    for al in calificaciones.get("alumnos_insuficientes", []):
-        rut = normalize_rut(al["rut"])
-        ruts_curso.add(rut)
-        nombres_curso[rut] = al["nombre"]
-        
-    for al in calificaciones.get("alumnos_buenos", []):
-        rut = normalize_rut(al["nombre"].replace(" ", "")[:12] + "K")
-        ruts_curso.add(rut)
-        nombres_curso[rut] = al["nombre"]
+    if indice is None:
+        indice = construir_indice_rut(calificaciones, atrasos, anotaciones, asistencias)
+    idx_notas = indice["notas"]
+    idx_nombres = indice["nombres"]
+    idx_atrasos = indice["atrasos"]
+    idx_anotaciones = indice["anotaciones"]
+    idx_asistencias = indice["asistencias"]
 
     # Si se subió un archivo de calificaciones, forzamos a que SOLO se crucen los alumnos de ese curso
     # para evitar que un archivo de Atrasos global contamine el curso con todo el colegio.
     # Si NO hay calificaciones (ingesta 100% global), usamos todos los RUTs encontrados.
-    if ruts_curso:
-        ruts_comunes = ruts_curso
+    if idx_nombres:
+        ruts_comunes = idx_nombres.keys()
     else:
-        ruts_comunes = {normalize_rut(r) for r in atrasos.keys()} | {normalize_rut(r) for r in anotaciones.keys()} | {normalize_rut(r) for r in asistencias.keys()}
+        ruts_comunes = idx_atrasos.keys() | idx_anotaciones.keys() | idx_asistencias.keys()
+
+    sin_notas = {"promedio": 5.5, "reprobados": 0}
+    sin_anotaciones = {"nombre": "", "negativas": 0, "positivas": 0, "detalles": []}
+    graves = ("Grave", "Gravísima")
 
     alumnos_totales = []
+    alumnos_doble_riesgo = []
 
     for rut in ruts_comunes:
-        minutos_atraso = atrasos.get(rut, 0)
-        
+        minutos_atraso = idx_atrasos.get(rut, 0)
+
         # Asistencia Real (si no existe el alumno en el archivo, asumimos 100% por defecto)
-        asistencia = asistencias.get(rut, 100.0)
+        asistencia = idx_asistencias.get(rut, 100.0)
 
-        # Promedio: buscar en insuficientes o buenos, sino 5.5
-        alumno_insuf = next((x for x in calificaciones.get("alumnos_insuficientes", []) if normalize_rut(x["rut"]) == rut), None)
-        alumno_bueno = next((x for x in calificaciones.get("alumnos_buenos", []) if normalize_rut(x["nombre"].replace(" ", "")[:12] + "K") == rut), None)
-        
-        if alumno_insuf:
-            promedio = 3.5
-            reprobados_count = 3
-        elif alumno_bueno:
-            promedio = alumno_bueno.get("promedio", 5.5)
-            reprobados_count = 0
-        else:
-            promedio = 5.5
-            reprobados_count = 0
+        notas = idx_notas.get(rut, sin_notas)
+        promedio = notas["promedio"]
+        reprobados_count = notas["reprobados"]
+
+        anotacion_info = idx_anotaciones.get(rut, sin_anotaciones)
 
         # Intentar obtener nombre real
-        nombre_anotacion = anotaciones.get(rut, {}).get("nombre", "")
-        nombre_cal = nombres_curso.get(rut, "")
-        nombre = nombre_anotacion or nombre_cal or f"Estudiante {rut[-5:]}"
+        nombre = anotacion_info.get("nombre", "") or idx_nombres.get(rut, "") or f"Estudiante {rut[-5:]}"
 
         alerta_doble_riesgo = asistencia < asistencia_limite and (promedio < 4.0 or reprobados_count > 2)
 
-        anotacion_info = anotaciones.get(rut, {"nombre": "", "negativas": 0, "positivas": 0, "detalles": []})
-        anotaciones_graves = len([x for x in anotacion_info.get("detalles", []) if x["gravedad"] in ["Grave", "Gravísima"]])
+        negativas = anotacion_info["negativas"]
+        anotaciones_graves = sum(1 for x in anotacion_info.get("detalles", []) if x["gravedad"] in graves)
 
         indice_camuflaje = 0.0
-        if promedio >= 6.0 and (minutos_atraso > 150 or anotacion_info["negativas"] > 2):
-            indice_camuflaje = round((minutos_atraso / 100.0) * 0.5 + (anotacion_info["negativas"] * 0.2), 2)
+        if promedio >= 6.0 and (minutos_atraso > 150 or negativas > 2):
+            indice_camuflaje = round((minutos_atraso / 100.0) * 0.5 + (negativas * 0.2), 2)
             indice_camuflaje = min(1.0, indice_camuflaje)
 
         alumno_dict = {
@@ -618,7 +654,7 @@ def ejecutar_cruce_predictivo(
             "asistencia": round(asistencia, 1),
             "promedio": round(promedio, 2),
             "atraso_minutos": minutos_atraso,
-            "anotaciones_negativas": anotacion_info["negativas"],
+            "anotaciones_negativas": negativas,
             "anotaciones_graves": anotaciones_graves,
             "alerta_doble_riesgo": alerta_doble_riesgo,
             "indice_camuflaje": indice_camuflaje
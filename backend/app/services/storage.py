@@ -1,7 +1,8 @@
 import os
 import io
 from fastapi import UploadFile, HTTPException
-from supabase import create_client, Client
+from supabase import Client
+from app.db.supabase import obtener_cliente
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -16,7 +17,7 @@ class StorageService:
             print("⚠️ ADVERTENCIA: Credenciales de Supabase no encontradas en environment.")
             self.client: Client = None
         else:
-            self.client = create_client(self.url, self.key)
+            self.client = obtener_cliente(self.url, self.key)
 
     def upload_file(self, file: UploadFile, user_id: str) -> dict:
         """
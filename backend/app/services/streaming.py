@@ -0,0 +1,58 @@
+"""
+Respuestas en streaming (NDJSON o Server-Sent Events) para pipelines largos.
+
+Un pipeline es un generador asíncrono de eventos `{"evento": ..., ...}`. El
+primer evento se espera antes de abrir la respuesta, así los errores de
+validación (blueprint inexistente, permisos) siguen llegando como códigos HTTP.
+Un error posterior se emite como evento `error` y cierra el stream; si el
+cliente se desconecta, el pipeline se cierra y cancela su trabajo pendiente.
+"""
+import json
+import logging
+from typing import Any, AsyncIterator, Dict
+
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+MEDIA_NDJSON = "application/x-ndjson"
+MEDIA_SSE = "text/event-stream"
+
+
+def quiere_sse(request: Request) -> bool:
+    return MEDIA_SSE in request.headers.get("accept", "")
+
+
+def formatear_evento(evento: Dict[str, Any], sse: bool) -> str:
+    datos = json.dumps(evento, ensure_ascii=False, default=str)
+    if sse:
+        return f"event: {evento.get('evento', 'message')}\ndata: {datos}\n\n"
+    return datos + "\n"
+
+
+async def respuesta_streaming(eventos: AsyncIterator[Dict[str, Any]], sse: bool = False) -> StreamingResponse:
+    try:
+        primero = await eventos.__anext__()
+    except StopAsyncIteration:
+        primero = None
+
+    async def cuerpo():
+        try:
+            if primero is not None:
+                yield formatear_evento(primero, sse)
+                async for evento in eventos:
+                    yield formatear_evento(evento, sse)
+        except HTTPException as e:
+            yield formatear_evento({"evento": "error", "status_code": e.status_code, "detalle": e.detail}, sse)
+        except Exception as e:
+            logger.error("Error en pipeline en streaming: %s", e)
+            yield formatear_evento({"evento": "error", "status_code": 500, "detalle": str(e)}, sse)
+        finally:
+            await eventos.aclose()
+
+    return StreamingResponse(
+        cuerpo(),
+        media_type=MEDIA_SSE if sse else MEDIA_NDJSON,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
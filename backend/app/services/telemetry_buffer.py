@@ -0,0 +1,139 @@
+"""
+Buffer de ingesta de telemetría.
+
+`/telemetry/track` hacía un `insert` síncrono a `telemetry_events` por cada clic
+del frontend: un viaje a PostgREST con el worker esperando. Ahora el endpoint
+solo encola el evento (un `append` a una cola acotada, microsegundos) y una
+tarea de fondo lo escribe en lotes:
+
+- se vacía cuando hay `lote` eventos pendientes o cada `intervalo` segundos;
+- si la cola está llena el evento se descarta y se cuenta (`descartados`), sin
+  bloquear ni hacer esperar al cliente;
+- si un lote falla se reencola (mientras quepa) para el siguiente intento;
+- `detener()` (apagado de la app) escribe lo pendiente antes de salir.
+
+Configuración: TELEMETRY_BUFFER_MAX, TELEMETRY_LOTE, TELEMETRY_INTERVALO.
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.db.supabase import en_hilo
+
+logger = logging.getLogger(__name__)
+
+
+class BufferTelemetria:
+    def __init__(
+        self,
+        escribir: Callable[[List[Dict[str, Any]]], Any],
+        maxsize: Optional[int] = None,
+        lote: Optional[int] = None,
+        intervalo: Optional[float] = None
+    ):
+        """`escribir(filas)` inserta un lote de forma síncrona; se ejecuta fuera del event loop."""
+        self._escribir = escribir
+        self.maxsize = maxsize or settings.TELEMETRY_BUFFER_MAX
+        self.lote = lote or settings.TELEMETRY_LOTE
+        self.intervalo = intervalo or settings.TELEMETRY_INTERVALO
+        self._cola: deque = deque()
+        self._tarea: Optional[asyncio.Task] = None
+        self._despertar: Optional[asyncio.Event] = None
+        self._vaciando: Optional[asyncio.Lock] = None
+        self.encolados = 0
+        self.escritos = 0
+        self.descartados = 0
+        self.lotes = 0
+        self.errores = 0
+
+    # ─── Productor ────────────────────────────────────────────────────────────
+
+    def encolar(self, evento: Dict[str, Any]) -> bool:
+        """Agrega un evento sin esperar a la base de datos. False si se descartó por cola llena."""
+        if len(self._cola) >= self.maxsize:
+            self.descartados += 1
+            return False
+        self._cola.append(evento)
+        self.encolados += 1
+        self._asegurar_tarea()
+        if len(self._cola) >= self.lote:
+            self._despertar.set()
+        return True
+
+    def _asegurar_tarea(self) -> None:
+        # La tarea se crea perezosamente en el loop que atiende las peticiones
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._tarea is None or self._tarea.done() or self._tarea.get_loop() is not loop:
+            self._despertar = asyncio.Event()
+            self._vaciando = asyncio.Lock()
+            self._tarea = loop.create_task(self._bucle())
+
+    # ─── Consumidor ───────────────────────────────────────────────────────────
+
+    async def _bucle(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._despertar.wait(), timeout=self.intervalo)
+            except asyncio.TimeoutError:
+                pass
+            self._despertar.clear()
+            await self.vaciar()
+
+    async def vaciar(self) -> int:
+        """Escribe lo pendiente en lotes de `lote`. Devuelve cuántos eventos se escribieron."""
+        if self._vaciando is None:
+            self._vaciando = asyncio.Lock()
+        escritos = 0
+        async with self._vaciando:
+            while self._cola:
+                filas = [self._cola.popleft() for _ in range(min(self.lote, len(self._cola)))]
+                try:
+                    await en_hilo(self._escribir, filas, nombre="telemetry_events.insertar_lote")
+                except Exception as e:
+                    self.errores += 1
+                    self._reencolar(filas)
+                    logger.warning("No se pudo escribir un lote de %d eventos de telemetría: %s", len(filas), e)
+                    break
+                self.lotes += 1
+                self.escritos += len(filas)
+                escritos += len(filas)
+        return escritos
+
+    def _reencolar(self, filas: List[Dict[str, Any]]) -> None:
+        espacio = max(0, self.maxsize - len(self._cola))
+        if espacio < len(filas):
+            self.descartados += len(filas) - espacio
+            filas = filas[:espacio]
+        self._cola.extendleft(reversed(filas))
+
+    async def detener(self) -> None:
+        """Detiene la tarea de fondo y escribe lo que quede en la cola."""
+        if self._tarea is not None and not self._tarea.done():
+            # Se toma el lock para no cancelar un lote a medio escribir
+            async with self._vaciando:
+                self._tarea.cancel()
+                try:
+                    await self._tarea
+                except asyncio.CancelledError:
+                    pass
+        self._tarea = None
+        pendientes = len(self._cola)
+        await self.vaciar()
+        if self._cola:
+            logger.warning("Apagado: %d de %d eventos de telemetría no se pudieron escribir.", len(self._cola), pendientes)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        return {
+            "pendientes": len(self._cola),
+            "capacidad": self.maxsize,
+            "encolados": self.encolados,
+            "escritos": self.escritos,
+            "descartados": self.descartados,
+            "lotes": self.lotes,
+            "errores": self.errores
+        }
@@ -0,0 +1,105 @@
+import sys
+import os
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from routers import analytics_service
+from routers.analytics_service import acumular_rollups, calculate_global_stats
+
+AHORA = datetime.now(timezone.utc)
+
+
+def _hace(dias):
+    return (AHORA - timedelta(days=dias)).isoformat()
+
+
+PROFILES = [
+    {"id": "u1", "email": "ana@colegio.cl", "full_name": "Ana", "school_id": "s1", "updated_at": _hace(40)},
+    {"id": "u2", "email": "beto@colegio.cl", "full_name": "Beto", "school_id": "s2", "updated_at": _hace(60)},
+    {"id": "u3", "email": "caro@colegio.cl", "full_name": "Caro", "school_id": "s1", "updated_at": None},
+]
+EVENTOS = [
+    {"id": f"e{i}", "event_name": nombre, "module": modulo, "email": email, "metadata": {}, "created_at": _hace(dias)}
+    for i, (nombre, modulo, email, dias) in enumerate([
+        ("page_view", "/app/planificador", "ana@colegio.cl", 1),
+        ("generar_success", "planificador", "ana@colegio.cl", 1),
+        ("regenerate_question", "lectura_inteligente", "ana@colegio.cl", 3),
+        ("export_docx", "rubricas", "beto@colegio.cl", 20),
+        ("page_view", "dashboard", None, 2),
+        ("generar", "nee", "beto@colegio.cl", 50),
+    ])
+]
+RECURSOS = [
+    {"tipo": "PLANIFICACION", "user_id": "u1", "created_at": _hace(2)},
+    {"tipo": "rubrica", "user_id": "u2", "created_at": _hace(10)},
+    {"tipo": "SIMCE", "user_id": "desconocido", "created_at": _hace(5)},
+]
+
+
+class _Consulta:
+    def __init__(self, db, tabla=None, rpc=None):
+        self.db, self.tabla, self.rpc_params = db, tabla, rpc
+        self.rango = None
+        self.limite = None
+
+    def select(self, *a, **k): return self
+    def order(self, *a, **k): return self
+    def limit(self, n): self.limite = n; return self
+    def range(self, a, b): self.rango = (a, b); return self
+
+    def execute(self):
+        if self.rpc_params is not None:
+            if not self.db.con_rollups:
+                raise RuntimeError("function analytics_resumen does not exist")
+            desde = self.rpc_params["desde"]
+            filas = acumular_rollups(EVENTOS, RECURSOS, {p["id"]: p["email"] for p in PROFILES},
+                                     datetime.fromisoformat(desde).date() if desde else None)
+        else:
+            self.db.lecturas.append((self.tabla, self.rango))
+            filas = {
+                "profiles": PROFILES, "telemetry_events": sorted(EVENTOS, key=lambda e: e["created_at"], reverse=True),
+                "biblioteca_recursos": RECURSOS, "schools": [{"id": "s1", "name": "Liceo 1"}], "authorized_users": [{}] * 4
+            }[self.tabla]
+        todas = len(filas)
+        if self.rango:
+            filas = filas[self.rango[0]:self.rango[1] + 1]
+        if self.limite is not None:
+            filas = filas[:self.limite]
+        return type("Respuesta", (), {"data": filas, "count": todas})()
+
+
+class SupabaseFalso:
+    def __init__(self, con_rollups):
+        self.con_rollups = con_rollups
+        self.lecturas = []
+
+    def table(self, nombre): return _Consulta(self, tabla=nombre)
+    def rpc(self, nombre, params): return _Consulta(self, rpc=params)
+
+
+def _sin_marca(stats):
+    return {k: v for k, v in stats.items() if k != "last_updated"}
+
+
+def test_rollups_y_tablas_crudas_dan_lo_mismo():
+    for period, school in (("all", None), ("7d", None), ("30d", "s1")):
+        con = SupabaseFalso(con_rollups=True)
+        sin = SupabaseFalso(con_rollups=False)
+        assert _sin_marca(calculate_global_stats(con, period, school)) == _sin_marca(calculate_global_stats(sin, period, school))
+        # Con rollups no se pagina ninguna tabla cruda: solo los eventos recientes
+        assert ("telemetry_events", None) in con.lecturas
+        assert not any(t in ("telemetry_events", "biblioteca_recursos") and r for t, r in con.lecturas)
+
+
+def test_metricas_del_periodo():
+    stats = calculate_global_stats(SupabaseFalso(con_rollups=True), "7d")
+    resumen = stats["summary"]
+    assert resumen["total_events"] == 6 and resumen["total_resources"] == 3
+    assert resumen["impactful_events_count"] == 4
+    assert resumen["friction_count"] == 1
+    assert resumen["active_users_count"] == 1  # Solo Ana tuvo actividad en los últimos 7 días
+    # 85 (planificación guardada) + 45 (SIMCE anónimo) + 0.4 × 85 (generar_success en planificador)
+    assert resumen["saved_hours"] == round((85 + 45 + 0.4 * 85) / 60, 1)
+    assert [e["id"] for e in stats["recent_events"]] == ["e0", "e1", "e4", "e2", "e3", "e5"][:analytics_service.RECENT_EVENTS_LIMIT]
+    assert [t["email"] for t in stats["inactive_teachers"]] == ["caro@colegio.cl"]  # Beto guardó un recurso hace 10 días
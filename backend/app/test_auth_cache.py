@@ -0,0 +1,74 @@
+import sys
+import os
+import time
+import asyncio
+from unittest.mock import MagicMock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+
+from routers import deps
+
+SECRETO = "secreto-de-prueba-con-largo-suficiente-para-hs256"
+
+
+def _token(clave, alg="HS256", exp_en=3600, **claims):
+    carga = {"sub": "user-1", "email": "profe@colegio.cl", "aud": "authenticated", "exp": int(time.time()) + exp_en, **claims}
+    return jwt.encode(carga, clave, algorithm=alg, headers={"kid": "k1"} if alg != "HS256" else None)
+
+
+@pytest.fixture(autouse=True)
+def aislado(monkeypatch):
+    deps._tokens.clear()
+    deps._roles.clear()
+
+    async def _sin_red(token):
+        raise AssertionError("No debería validar contra la API de Supabase")
+
+    monkeypatch.setattr(deps, "_verificar_remoto", _sin_red)
+    monkeypatch.setattr(deps, "SUPABASE_JWT_SECRET", SECRETO)
+
+
+def test_hs256_local_y_cache_por_token(monkeypatch):
+    token = _token(SECRETO)
+    assert asyncio.run(deps.get_current_user_id(f"Bearer {token}")) == "user-1"
+
+    # Segunda vez sale de la caché: ni siquiera se vuelve a verificar la firma
+    monkeypatch.setattr(deps, "SUPABASE_JWT_SECRET", "")
+    assert asyncio.run(deps.get_current_user_id(f"Bearer {token}")) == "user-1"
+
+    monkeypatch.setattr(deps, "SUPABASE_JWT_SECRET", SECRETO)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(deps.get_current_user_id(f"Bearer {_token(SECRETO, exp_en=-10)}"))
+    assert exc.value.detail == "Token expirado."
+
+
+def test_rs256_con_jwks_cacheado(monkeypatch):
+    privada = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwks = MagicMock()
+    jwks.get_signing_key_from_jwt.return_value = MagicMock(key=privada.public_key())
+    monkeypatch.setattr(deps, "_jwks", lambda: jwks)
+
+    usuario = asyncio.run(deps.verificar_token(_token(privada, alg="RS256")))
+    assert (usuario.id, usuario.email) == ("user-1", "profe@colegio.cl")
+    assert jwks.get_signing_key_from_jwt.call_count == 1
+
+
+def test_rol_admin_cacheado(monkeypatch):
+    consultas = []
+
+    async def _ejecutar(query, nombre):
+        consultas.append(nombre)
+        return MagicMock(data={"role": "admin"})
+
+    monkeypatch.setattr(deps, "obtener_cliente", lambda *a: MagicMock())
+    monkeypatch.setattr(deps, "ejecutar", _ejecutar)
+
+    token = _token(SECRETO, email="directora@colegio.cl")
+    for _ in range(3):
+        assert asyncio.run(deps.verify_super_admin(f"Bearer {token}")).email == "directora@colegio.cl"
+    assert consultas == ["authorized_users.rol"]
@@ -0,0 +1,133 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from postgrest.exceptions import APIError
+
+from app.main import app
+from app.services import curriculum_catalog
+from app.services.curriculum_catalog import CatalogoCurricular, opciones_curriculum
+
+client = TestClient(app)
+
+FILAS = [
+    {"id": 3, "nivel": "1° Medio", "asignatura": "Matemática", "oa_codigo": "MA1M OA 10", "descripcion": "c"},
+    {"id": 1, "nivel": "1° Medio", "asignatura": "Matemática", "oa_codigo": "MA1M OA 02", "descripcion": "a"},
+    {"id": 2, "nivel": "NT2", "asignatura": "Lenguaje Verbal", "oa_codigo": "LV OA 01", "descripcion": "b"},
+    {"id": 4, "nivel": "1° Medio", "asignatura": "Historia", "oa_codigo": "HI1M OA 01", "descripcion": "d"},
+]
+
+
+class Reloj:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_catalogo_indices_y_recarga_por_huella():
+    filas = list(FILAS)
+    lecturas = []
+    huella = {"valor": "4:4"}
+    reloj = Reloj()
+
+    def leer_tabla():
+        lecturas.append(1)
+        return list(filas)
+
+    catalogo = CatalogoCurricular(leer_tabla=leer_tabla, huella=lambda: huella["valor"], ttl=60, reloj=reloj)
+
+    c = catalogo.obtener()
+    assert c.origen == "supabase_live"
+    assert c.niveles == ["NT2", "1° Medio"]
+    assert opciones_curriculum(c, "1° Medio", None)["data"] == ["Historia", "Matemática"]
+    assert [oa["oa_codigo"] for oa in opciones_curriculum(c, "1° Medio", "Matemática")["data"]] == ["MA1M OA 02", "MA1M OA 10"]
+
+    # Dentro del TTL no se consulta nada; vencido, sin cambios de huella, tampoco se recarga
+    catalogo.obtener()
+    reloj.t = 61
+    assert catalogo.obtener() is c
+    assert len(lecturas) == 1
+
+    filas.append({"id": 5, "nivel": "2° Medio", "asignatura": "Física", "oa_codigo": "FI2M OA 01", "descripcion": "e"})
+    huella["valor"] = "5:5"
+    catalogo.invalidar()
+    assert catalogo.obtener().niveles == ["NT2", "1° Medio", "2° Medio"]
+    assert len(lecturas) == 2
+
+
+class _Respuesta:
+    def __init__(self, data, count):
+        self.data, self.count = data, count
+
+
+class _TablaCurriculum:
+    """Fake mínimo de supabase.table("curriculum_oas") para la consulta de la huella."""
+
+    def __init__(self, filas, con_updated_at=True):
+        self.filas, self.con_updated_at = filas, con_updated_at
+
+    def table(self, nombre):
+        return self
+
+    def select(self, columnas, count=None):
+        if "updated_at" in columnas and not self.con_updated_at:
+            raise APIError({"message": "column curriculum_oas.updated_at does not exist", "code": "42703"})
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def limit(self, n):
+        return self
+
+    def execute(self):
+        ultima = max(f["updated_at"] for f in self.filas)
+        return _Respuesta([{"updated_at": ultima}], len(self.filas))
+
+
+def test_huella_cambia_al_editar_un_oa(monkeypatch):
+    filas = [dict(f, updated_at="2026-06-20T10:00:00+00:00") for f in FILAS]
+    monkeypatch.setattr(curriculum_catalog, "supabase", _TablaCurriculum(filas))
+    antes = curriculum_catalog._huella_tabla()
+
+    # Edición en sitio: mismo conteo y mismo último id, nueva marca del trigger
+    filas[1].update(descripcion="a corregida", updated_at="2026-06-21T08:00:00+00:00")
+    assert curriculum_catalog._huella_tabla() != antes
+
+    # Sin la columna no hay huella: el catálogo se recarga completo en cada TTL
+    monkeypatch.setattr(curriculum_catalog, "supabase", _TablaCurriculum(filas, con_updated_at=False))
+    assert curriculum_catalog._huella_tabla() is None
+    lecturas, reloj = [], Reloj()
+    catalogo = CatalogoCurricular(
+        leer_tabla=lambda: lecturas.append(1) or list(FILAS),
+        huella=curriculum_catalog._huella_tabla, ttl=60, reloj=reloj
+    )
+    catalogo.obtener()
+    reloj.t = 61
+    catalogo.obtener()
+    assert len(lecturas) == 2
+
+
+def test_catalogo_cae_al_snapshot_si_supabase_falla():
+    def leer_tabla():
+        raise ConnectionError("sin red")
+
+    c = CatalogoCurricular(leer_tabla=leer_tabla, huella=lambda: "x").obtener()
+    assert c.origen == "snapshot"
+    assert "4° Básico" in c.niveles
+    oas = opciones_curriculum(c, "4° Básico", "Ciencias Naturales")["data"]
+    assert oas[0]["oa_codigo"] == "CN04 OA 01" and oas[0]["descripcion"]
+
+
+def test_filtros_etag():
+    response = client.get("/api/v1/motor/filtros")
+    assert response.status_code == 200
+    assert response.json()["niveles"]
+    etag = response.headers["etag"]
+
+    response = client.get("/api/v1/motor/filtros", headers={"If-None-Match": etag})
+    assert response.status_code == 304
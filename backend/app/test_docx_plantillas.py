@@ -0,0 +1,50 @@
+import sys
+import os
+import io
+import zipfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SUPABASE_URL", "https://test.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+
+from PIL import Image
+
+from app.services.docx_plantillas import PlantillaDocx, logo_png, ANCHO_LOGO_PX, ASSETS_DIR as ASSETS
+from routers.export import documento_con_encabezado
+from routers.simce_generator import _docx_omr, DescargaOMRRequest
+
+
+def test_logo_se_decodifica_y_reduce_una_vez():
+    logo = logo_png("logo_profeic.svg.png")
+    assert logo is logo_png("logo_profeic.svg.png")
+    assert len(logo) < os.path.getsize(os.path.join(ASSETS, "logo_profeic.svg.png"))
+    # El logo grande se imprime a 1": se guarda al ancho de impresión
+    assert Image.open(io.BytesIO(logo_png("logo.png"))).width == ANCHO_LOGO_PX
+    assert logo_png("no_existe.png") is None
+
+
+def test_plantilla_se_arma_una_vez_y_se_clona():
+    construcciones = []
+
+    def construir(doc):
+        construcciones.append(1)
+        doc.add_paragraph("fijo")
+
+    plantilla = PlantillaDocx(construir)
+    a, b = plantilla.nueva(), plantilla.nueva()
+    a.add_paragraph("solo en a")
+    assert len(construcciones) == 1
+    assert [p.text for p in b.paragraphs] == ["fijo"]
+
+    doc = documento_con_encabezado("Lenguaje", "5° Básico", "Planificación")
+    info = doc.tables[0].cell(0, 1).text
+    assert "PROFE IC" in info and "Asignatura: Lenguaje | Nivel: 5° Básico" in info and "Planificación" in info
+    assert "Lenguaje" not in documento_con_encabezado("Historia", "1° Medio").tables[0].cell(0, 1).text
+
+
+def test_hoja_omr_lleva_el_logo_en_cache():
+    datos = _docx_omr(DescargaOMRRequest(titulo="Ensayo", asignatura="Lenguaje", nivel="4° Básico", cantidad_preguntas=30))
+    with zipfile.ZipFile(io.BytesIO(datos)) as z:
+        imagenes = [n for n in z.namelist() if n.startswith("word/media/")]
+        assert len(imagenes) == 1
+        assert z.read(imagenes[0]) == logo_png("logo_profeic.svg.png")
@@ -0,0 +1,103 @@
+import sys
+import os
+import io
+import time
+import asyncio
+import threading
+from concurrent.futures import CancelledError, ProcessPoolExecutor, ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SUPABASE_URL", "https://test.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+
+from docx import Document
+import pytest
+
+from app.services.docx_render import MotorRender
+from routers.export import docx_paquete, PaqueteExportRequest, GenericExportRequest
+
+
+def _paquete(n):
+    return PaqueteExportRequest(documentos=[
+        GenericExportRequest(
+            titulo_unidad=f"Unidad {i}", nivel="5° Básico", asignatura="Lenguaje",
+            contenido={"objetivo": "Comprender textos narrativos", "actividades": [f"Actividad {j}" for j in range(20)]}
+        )
+        for i in range(n)
+    ])
+
+
+def test_render_en_procesos_no_bloquea_el_loop():
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        motor = MotorRender(executor=pool)
+
+        async def escenario():
+            latidos = []
+
+            async def latido():
+                while True:
+                    inicio = time.perf_counter()
+                    await asyncio.sleep(0.01)
+                    latidos.append(time.perf_counter() - inicio)
+
+            tarea = asyncio.create_task(latido())
+            docs = await asyncio.gather(*[
+                motor.renderizar_async(docx_paquete, _paquete(10), nombre="export.paquete") for _ in range(3)
+            ])
+            tarea.cancel()
+            return docs, max(latidos)
+
+        docs, peor_latido = asyncio.run(escenario())
+
+    assert all(d[:2] == b"PK" for d in docs)
+    assert len(Document(io.BytesIO(docs[0])).paragraphs) > 10 * 20
+    assert peor_latido < 0.5  # El event loop siguió atendiendo mientras se renderizaba
+    stats = motor.estadisticas()
+    paquete = stats["documentos"]["export.paquete"]
+    assert stats["en_curso"] == 0
+    assert paquete["renders"] == 3 and paquete["errores"] == 0
+    assert paquete["bytes"] == sum(len(d) for d in docs)
+    assert paquete["duracion_p50"] > 0 and paquete["rss_max_mb"] > 0
+
+
+def _bloquear(evento):
+    evento.wait(5)
+    return b"PK-bloqueado"
+
+
+def _anotar(ejecutados):
+    ejecutados.append(True)
+    return b"PK-encolado"
+
+
+def test_render_cancelado_no_deja_esperas_colgadas():
+    # Pool cerrado con cancel_futures: el render encolado se resuelve como cancelado
+    liberar, ejecutados = threading.Event(), []
+    pool = ThreadPoolExecutor(max_workers=1)
+    motor = MotorRender(executor=pool)
+    primero = motor.enviar(_bloquear, liberar)
+    encolado = motor.enviar(_anotar, ejecutados)
+    pool.shutdown(wait=False, cancel_futures=True)
+    with pytest.raises(CancelledError):
+        encolado.result(timeout=1)
+    liberar.set()
+    assert primero.result(timeout=5) == b"PK-bloqueado"
+    assert not ejecutados
+
+    # Cliente desconectado: cancelar el resultado saca el render de la cola
+    liberar, ejecutados = threading.Event(), []
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        motor = MotorRender(executor=pool)
+
+        async def escenario():
+            bloqueante = motor.enviar(_bloquear, liberar)
+            tarea = asyncio.create_task(motor.renderizar_async(_anotar, ejecutados))
+            await asyncio.sleep(0.05)
+            tarea.cancel()
+            await asyncio.sleep(0.05)
+            liberar.set()
+            return await asyncio.wrap_future(bloqueante)
+
+        assert asyncio.run(escenario()) == b"PK-bloqueado"
+    assert not ejecutados
+    assert motor.estadisticas()["en_curso"] == 0
@@ -0,0 +1,55 @@
+import sys
+import os
+import asyncio
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.embeddings import FakeEmbedder, vectorizar_fragmentos, TrabajosEmbedding
+
+
+class EmbedderContador(FakeEmbedder):
+    """FakeEmbedder que registra el máximo de lotes simultáneos."""
+
+    def __init__(self, latencia):
+        super().__init__(dim=8, latencia=latencia)
+        self.activos = 0
+        self.max_activos = 0
+        self._lock_activos = threading.Lock()
+
+    def embed_batch(self, textos):
+        with self._lock_activos:
+            self.activos += 1
+            self.max_activos = max(self.max_activos, self.activos)
+        try:
+            return super().embed_batch(textos)
+        finally:
+            with self._lock_activos:
+                self.activos -= 1
+
+
+def test_vectorizar_deduplica_y_conserva_orden():
+    fragmentos = [f"fragmento {i % 7}" for i in range(30)]
+    embedder = EmbedderContador(latencia=0.02)
+
+    vectores = asyncio.run(vectorizar_fragmentos(fragmentos, embedder, tam_lote=2, concurrencia=3))
+
+    referencia = FakeEmbedder(dim=8)
+    assert vectores == [referencia._vector(f) for f in fragmentos]
+    assert embedder.textos == 7  # cada texto distinto se vectoriza una sola vez
+    assert embedder.llamadas == 4  # ceil(7 / 2) lotes
+    assert 1 < embedder.max_activos <= 3
+
+
+def test_trabajos_descartan_los_terminados_mas_antiguos():
+    trabajos = TrabajosEmbedding(max_trabajos=2)
+    viejo = trabajos.crear(user_id="u")
+    trabajos.actualizar(viejo["job_id"], estado="completado")
+    time.sleep(0.001)
+    en_curso = trabajos.crear(user_id="u")
+    nuevo = trabajos.crear(user_id="u")
+
+    assert trabajos.obtener(viejo["job_id"]) is None
+    assert trabajos.obtener(en_curso["job_id"])["estado"] == "pendiente"
+    assert trabajos.obtener(nuevo["job_id"]) is not None
@@ -0,0 +1,64 @@
+import sys
+import os
+import time
+import asyncio
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.export_jobs import (
+    AlmacenExportaciones, TrabajosExportacion, TrabajoNoEncontrado, ErrorDeRender
+)
+
+
+class Reloj:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_descarga_espera_render_y_sirve_desde_el_almacen(tmp_path):
+    ruta = str(tmp_path / "export_jobs.sqlite3")
+    trabajos = TrabajosExportacion(AlmacenExportaciones(ruta, max_bytes=10_000, ttl=60), espera=5)
+
+    def render_lento():
+        time.sleep(0.2)
+        return b"DOCX" * 10
+
+    async def escenario():
+        inicio = time.perf_counter()
+        job_id = trabajos.iniciar("Unidad.docx", render_lento)
+        preparar = time.perf_counter() - inicio
+        fallido = trabajos.iniciar("Roto.docx", lambda: 1 / 0)
+        resultado = await trabajos.resultado(job_id)
+        with pytest.raises(ErrorDeRender):
+            await trabajos.resultado(fallido)
+        return job_id, preparar, resultado
+
+    job_id, preparar, resultado = asyncio.run(escenario())
+    assert preparar < 0.1  # prepare no espera el render
+    assert resultado == ("Unidad.docx", b"DOCX" * 10)
+
+    # Otro worker con el mismo archivo ve el DOCX terminado
+    otro = TrabajosExportacion(AlmacenExportaciones(ruta, max_bytes=10_000, ttl=60), espera=0)
+    assert asyncio.run(otro.resultado(job_id)) == resultado
+    with pytest.raises(TrabajoNoEncontrado):
+        asyncio.run(otro.resultado("no-existe"))
+
+
+def test_almacen_acotado_por_ttl_y_bytes():
+    reloj = Reloj()
+    almacen = AlmacenExportaciones(":memory:", max_bytes=250, ttl=60, reloj=reloj)
+    for i in range(3):
+        reloj.t += 1
+        almacen.crear(f"j{i}", f"{i}.docx")
+        almacen.completar(f"j{i}", bytes(100))
+    # 300 bytes > 250: se expulsa el más antiguo
+    assert almacen.leer("j0") is None and almacen.leer("j1") == bytes(100)
+    assert almacen.stats()["bytes"] == 200 and almacen.expulsiones == 1
+
+    reloj.t += 61
+    assert almacen.estado("j2") is None and almacen.leer("j2") is None
@@ -0,0 +1,116 @@
+import sys
+import os
+import json
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from postgrest.exceptions import APIError
+
+from app.services import indice_cobertura
+from app.services.indice_cobertura import acumular_uso, agrupar_cobertura, dok_recurso, extraer_oas, resumir_uso
+
+AHORA = datetime.now(timezone.utc)
+
+
+def _hace(dias):
+    return (AHORA - timedelta(days=dias)).isoformat()
+
+
+RECURSOS = [
+    {"tipo": "EVALUACION", "asignatura": "Lenguaje", "nivel": "4° Básico", "created_at": _hace(2),
+     "contenido": {"config": {"dokDistribution": {"dok1": 6, "dok2": 3, "dok3": 1}}}},
+    # Contenido guardado como string JSON
+    {"tipo": "EVALUACION", "asignatura": "Lenguaje", "nivel": "4° Básico", "created_at": _hace(5),
+     "contenido": json.dumps({"config": {"dokDistribution": {"dok1": 2, "dok2": "4", "dok3": 4}}})},
+    {"tipo": "PLANIFICACION", "asignatura": "Historia", "nivel": "5° Básico", "created_at": _hace(45),
+     "contenido": {"config": {"dokDistribution": {"dok1": 99}}}},
+    {"tipo": "RUBRICA", "asignatura": "Lenguaje", "nivel": "4° Básico", "created_at": _hace(1), "contenido": "no es json"},
+]
+
+
+def test_extraer_oas_de_todas_las_formas():
+    contenido = {
+        "oaId": "OA 3",
+        "oaTexts": ["OA 4", "", "OA 3"],
+        "customOa": "Mi objetivo",
+        "oas_asociados": ["OA 7"],
+        "mochila": [{"descripcion": "OA 8 leer"}, {"codigo": "sin descripción"}, "OA 9"],
+    }
+    assert extraer_oas(contenido) == ["OA 3", "OA 4", "Mi objetivo", "OA 7", "OA 8 leer"]
+    assert extraer_oas({"oaId": "manual", "oaDescripcion": "x" * 300}) == ["x" * 255]
+
+
+def test_dok_solo_evaluaciones():
+    assert [dok_recurso(r["tipo"], r["contenido"]) for r in RECURSOS] == [(6, 3, 1), (2, 4, 4), (0, 0, 0), (0, 0, 0)]
+
+
+def test_resumen_desde_contadores():
+    resumen = resumir_uso(acumular_uso(RECURSOS), ahora=AHORA)
+    assert resumen["total_recursos"] == 4
+    assert resumen["tipos"] == {"EVALUACION": 2, "PLANIFICACION": 1, "RUBRICA": 1}
+    assert resumen["asignaturas"] == {"Lenguaje": 3, "Historia": 1}
+    assert resumen["dok"] == {"dok1": 8, "dok2": 7, "dok3": 5}
+    assert resumen["sin_actividad_reciente"] == ["Historia"]
+    assert resumen["ultimo_recurso"] == RECURSOS[3]["created_at"]
+
+
+def test_agrupar_cobertura_por_curso():
+    filas = [
+        {"nivel": "4° Básico", "asignatura": "Lenguaje", "oa_id": "OA 3", "tipo_recurso": "EVALUACION", "recursos": 2},
+        {"nivel": "4° Básico", "asignatura": "Lenguaje", "oa_id": "OA 3", "tipo_recurso": "RUBRICA", "recursos": 1},
+        {"nivel": "4° Básico", "asignatura": "Lenguaje", "oa_id": "OA 4", "tipo_recurso": "EVALUACION", "recursos": 1},
+    ]
+    (curso,) = agrupar_cobertura(filas)
+    assert curso["oas"] == {"OA 3": 3, "OA 4": 1}
+    assert curso["tipos"] == {"EVALUACION": 3, "RUBRICA": 1}
+    assert curso["oas_cubiertos"] == 2
+
+
+class _Consulta:
+    def __init__(self, db, nombre, datos=None):
+        self.db, self.nombre, self.datos = db, nombre, datos
+
+    def insert(self, filas):
+        self.datos = filas
+        return self
+
+    def execute(self):
+        self.db.llamadas.append((self.nombre, self.datos))
+        if self.nombre == "rpc" and not self.db.con_funcion:
+            raise APIError({"code": "PGRST202", "message": "Could not find the function"})
+        return type("Res", (), {"data": "r1" if self.nombre == "rpc" else [{"id": "r1"}]})()
+
+
+class _Supabase:
+    def __init__(self, con_funcion):
+        self.con_funcion = con_funcion
+        self.llamadas = []
+
+    def rpc(self, nombre, params):
+        return _Consulta(self, "rpc", params)
+
+    def table(self, nombre):
+        return _Consulta(self, nombre)
+
+
+REGISTRO = {"user_id": "u1", "tipo": "EVALUACION", "titulo": "Prueba", "asignatura": "Lenguaje", "nivel": "4° Básico",
+            "contenido": {"oaTexts": ["OA 3", "OA 4"]}}
+
+
+def test_guardar_en_un_viaje():
+    db = _Supabase(con_funcion=True)
+    assert asyncio.run(indice_cobertura.guardar_recurso(db, REGISTRO)) == "r1"
+    assert db.llamadas == [("rpc", {"registro": REGISTRO, "oas": ["OA 3", "OA 4"]})]
+
+
+def test_guardar_sin_migracion_y_sin_curso_real():
+    db = _Supabase(con_funcion=False)
+    assert asyncio.run(indice_cobertura.guardar_recurso(db, REGISTRO)) == "r1"
+    assert [n for n, _ in db.llamadas] == ["rpc", "biblioteca_recursos", "cobertura_curricular"]
+    assert [f["oa_id"] for f in db.llamadas[2][1]] == ["OA 3", "OA 4"]
+
+    db = _Supabase(con_funcion=True)
+    asyncio.run(indice_cobertura.guardar_recurso(db, {**REGISTRO, "nivel": "General"}))
+    assert db.llamadas[0][1]["oas"] == []
@@ -0,0 +1,96 @@
+import sys
+import os
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.llm_cache import CacheLLM, SQLiteBackend, clave_llm, json_valido
+
+
+class Reloj:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_clave_ignora_indentacion_pero_no_config_ni_archivo():
+    prompt = """
+        NIVEL: 8° Básico
+        OA: MA08 OA 03
+    """
+    base = clave_llm("gemini-2.5-flash", prompt, {"response_mime_type": "application/json"})
+
+    assert clave_llm("gemini-2.5-flash", "NIVEL: 8° Básico\n    OA: MA08 OA 03", {"response_mime_type": "application/json"}) == base
+    assert clave_llm("gemini-2.5-flash", prompt) != base
+    assert clave_llm("gemini-2.0-flash", prompt, {"response_mime_type": "application/json"}) != base
+
+    adjunto = lambda data: [prompt, {"inline_data": {"mime_type": "application/pdf", "data": data}}]
+    assert clave_llm("m", adjunto("QUJD")) == clave_llm("m", adjunto("QUJD"))
+    assert clave_llm("m", adjunto("QUJD")) != clave_llm("m", adjunto("WFla"))
+
+
+def test_sqlite_persiste_expira_y_expulsa_lru(tmp_path):
+    reloj = Reloj()
+    path = str(tmp_path / "llm.sqlite3")
+    backend = SQLiteBackend(path, maxsize=2, ttl=60, reloj=reloj)
+    backend.set("a", {"texto": "A"})
+    reloj.t += 1
+    backend.set("b", {"texto": "B"})
+    reloj.t += 1
+    assert backend.get("a") == {"texto": "A"}  # "a" pasa a ser la más reciente
+    reloj.t += 1
+    backend.set("c", {"texto": "C"})
+    assert backend.get("b") is None and backend.expulsiones == 1
+
+    # Otro proceso (nueva conexión) ve las mismas entradas
+    reabierto = SQLiteBackend(path, maxsize=2, ttl=60, reloj=reloj)
+    assert reabierto.get("c") == {"texto": "C"}
+    reloj.t += 61
+    assert reabierto.get("c") is None and len(reabierto) == 1
+
+
+def test_cache_por_ruta_con_metricas(tmp_path):
+    cache = CacheLLM(SQLiteBackend(str(tmp_path / "llm.sqlite3")), excluir={"insights"})
+    llamadas = []
+
+    def generar():
+        llamadas.append(1)
+        return "respuesta"
+
+    for _ in range(3):
+        assert cache.obtener_o_generar("rubricas", "m", "prompt", generar) == "respuesta"
+    cache.obtener_o_generar("insights", "m", "prompt", generar)
+    cache.obtener_o_generar("rubricas", "m", "prompt", generar, cache=False)
+    assert len(llamadas) == 3  # 1 fallo en rúbricas + ruta excluida + opt-out de la llamada
+
+    async def generar_async():
+        llamadas.append(1)
+        return ""  # Las respuestas vacías no se guardan
+
+    for _ in range(2):
+        asyncio.run(cache.obtener_o_generar_async("pme", "m", "otro", generar_async))
+    assert len(llamadas) == 5
+
+    stats = cache.stats()
+    assert stats["rutas"]["rubricas"] == {"hits": 2, "misses": 1, "hit_rate": 0.6667, "segundos_ahorrados": 0.0}
+    assert "insights" not in stats["rutas"]
+    assert stats["rutas"]["pme"]["misses"] == 2
+
+
+def test_solo_cachea_respuestas_validas(tmp_path):
+    cache = CacheLLM(SQLiteBackend(str(tmp_path / "llm.sqlite3")))
+    respuestas = iter(['{"titulo": "Prueba", "items": [', '```json\n{"titulo": "Prueba", "items": []}\n```'])
+    generar = lambda: next(respuestas)
+
+    # JSON truncado: se devuelve, pero el reintento vuelve a llamar al modelo
+    assert cache.obtener_o_generar("evaluaciones", "m", "p", generar, validar=json_valido) == '{"titulo": "Prueba", "items": ['
+    assert cache.obtener_o_generar("evaluaciones", "m", "p", generar, validar=json_valido).startswith("```json")
+    assert cache.obtener_o_generar("evaluaciones", "m", "p", generar, validar=json_valido).startswith("```json")
+    assert cache.stats()["rutas"]["evaluaciones"]["hits"] == 1
+
+    # Una entrada inválida guardada antes de validar la ruta se descarta al leerla
+    cache.backend.set(clave_llm("m", "q"), {"texto": "no es json", "latencia": 1.0})
+    assert cache.obtener_o_generar("evaluaciones", "m", "q", lambda: "[1, 2]", validar=json_valido) == "[1, 2]"
+    assert cache.backend.get(clave_llm("m", "q"))["texto"] == "[1, 2]"
@@ -0,0 +1,72 @@
+import sys
+import os
+import time
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.llm_cache import CacheLLM
+from app.services.llm_client import ClienteLLM
+from app.services.llm_scheduler import LimitesModelo, PlanificadorLLM
+
+
+class ModeloFalso:
+    """Imita a genai.GenerativeModel: `generate_content_async` tarda `latencia` segundos."""
+
+    def __init__(self, latencia):
+        self.latencia = latencia
+        self.canceladas = 0
+
+    async def generate_content_async(self, contenido, request_options=None):
+        try:
+            await asyncio.sleep(self.latencia)
+        except asyncio.CancelledError:
+            self.canceladas += 1
+            raise
+        return type("Respuesta", (), {"text": f"ok: {contenido}"})()
+
+
+class RequestDesconectado:
+    async def is_disconnected(self):
+        return True
+
+
+def _cliente(modelo, timeout=5.0):
+    planificador = PlanificadorLLM(limites_por_modelo={}, limites_default=LimitesModelo(rpm=60000, concurrencia=32), reintentos=0)
+    return ClienteLLM(planificador=planificador, cache=CacheLLM(None), timeout=timeout, crear_modelo=lambda *a: modelo)
+
+
+def test_llamadas_concurrentes_no_se_serializan():
+    cliente = _cliente(ModeloFalso(0.2))
+
+    async def escenario():
+        inicio = time.perf_counter()
+        textos = await asyncio.gather(*(cliente.generar("rubricas", f"p{i}") for i in range(20)))
+        return textos, time.perf_counter() - inicio
+
+    textos, total = asyncio.run(escenario())
+    assert textos == [f"ok: p{i}" for i in range(20)]
+    assert total < 1.0  # 20 × 0.2 s en serie serían 4 s
+    assert cliente.estadisticas()["rubricas"]["llamadas"] == 20
+
+
+def test_timeout_y_desconexion_cancelan_la_llamada():
+    modelo = ModeloFalso(5.0)
+    cliente = _cliente(modelo, timeout=0.1)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(cliente.generar("nee", "lento"))
+    assert exc.value.status_code == 504
+
+    cliente.timeout = 5.0
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(cliente.generar("nee", "lento", request=RequestDesconectado()))
+    assert exc.value.status_code == 499
+
+    assert modelo.canceladas == 2
+    stats = cliente.estadisticas()["nee"]
+    assert (stats["timeouts"], stats["cancelaciones"]) == (1, 1)
+    assert stats["latencia_max"] < 1.0
@@ -0,0 +1,79 @@
+import sys
+import os
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from app.services.llm_scheduler import (
+    LimitesModelo, PlanificadorLLM, PRIORIDAD_INTERACTIVA, PRIORIDAD_LOTE
+)
+from bench_llm_scheduler import ErrorCuota, FakeLLM
+
+
+def _planificador(concurrencia=1, rpm=60000, reintentos=3):
+    return PlanificadorLLM(
+        limites_por_modelo={"m": LimitesModelo(rpm=rpm, concurrencia=concurrencia)},
+        reintentos=reintentos, backoff_base=0.001, backoff_max=0.01
+    )
+
+
+def test_interactivas_pasan_antes_que_el_lote():
+    planificador = _planificador(concurrencia=1)
+    orden = []
+
+    async def llamada(nombre):
+        orden.append(nombre)
+        await asyncio.sleep(0.01)
+
+    async def escenario():
+        tareas = [asyncio.create_task(planificador.ejecutar("m", lambda: llamada("lote-0"), PRIORIDAD_LOTE))]
+        await asyncio.sleep(0)
+        for i in range(1, 4):
+            tareas.append(asyncio.create_task(planificador.ejecutar("m", lambda i=i: llamada(f"lote-{i}"), PRIORIDAD_LOTE)))
+        tareas.append(asyncio.create_task(planificador.ejecutar("m", lambda: llamada("docente"), PRIORIDAD_INTERACTIVA)))
+        await asyncio.gather(*tareas)
+
+    asyncio.run(escenario())
+    assert orden == ["lote-0", "docente", "lote-1", "lote-2", "lote-3"]
+
+
+def test_reintenta_429_y_ajusta_la_tasa():
+    planificador = _planificador(concurrencia=4)
+    intentos = {"n": 0}
+
+    async def llamada():
+        intentos["n"] += 1
+        if intentos["n"] < 3:
+            raise ErrorCuota("429")
+        return "ok"
+
+    assert asyncio.run(planificador.ejecutar("m", llamada)) == "ok"
+    stats = planificador.estadisticas()["m"]
+    assert stats["reintentos"] == 2 and stats["respuestas_429"] == 2 and stats["completadas"] == 1
+    assert stats["rpm_actual"] < stats["rpm_max"]
+
+
+def test_error_no_reintentable_se_relanza():
+    planificador = _planificador()
+
+    async def llamada():
+        raise ValueError("prompt inválido")
+
+    with pytest.raises(ValueError):
+        asyncio.run(planificador.ejecutar("m", llamada))
+    assert planificador.estadisticas()["m"]["reintentos"] == 0
+
+
+def test_respeta_concurrencia_y_completa_bajo_cuota():
+    llm = FakeLLM(cuota=40, ventana=1.0, latencia=0.02, jitter=0)
+    planificador = _planificador(concurrencia=3, rpm=40 * 60 * 2, reintentos=8)
+
+    async def escenario():
+        return await asyncio.gather(*(
+            planificador.ejecutar("m", lambda i=i: llm.generar(f"p{i}"), PRIORIDAD_LOTE) for i in range(30)
+        ))
+
+    assert len(asyncio.run(escenario())) == 30
+    assert llm.max_en_curso <= 3
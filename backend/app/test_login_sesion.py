@@ -0,0 +1,38 @@
+import sys
+import os
+import json
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SUPABASE_URL", "https://test.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.db import supabase as db
+from routers import login
+
+USUARIO = {
+    "id": "11111111-1111-1111-1111-111111111111", "aud": "authenticated", "email": "profe@colegio.cl",
+    "app_metadata": {}, "user_metadata": {}, "created_at": "2026-01-01T00:00:00Z"
+}
+
+
+def _auth_falso(request: httpx.Request) -> httpx.Response:
+    sesion = {"access_token": "token-del-profe", "refresh_token": "r", "token_type": "bearer", "expires_in": 3600, "user": USUARIO}
+    return httpx.Response(200, json=sesion if request.url.path.endswith("/token") else {**sesion, **USUARIO})
+
+
+def test_login_no_cambia_el_cliente_compartido(monkeypatch):
+    monkeypatch.setattr(db, "_http_auth", httpx.Client(transport=httpx.MockTransport(_auth_falso)))
+    compartido = db.obtener_cliente(login.SUPABASE_URL, login.SUPABASE_KEY)
+    antes = compartido.options.headers.get("Authorization")
+
+    app = FastAPI()
+    app.include_router(login.router)
+    r = TestClient(app).post("/auth/login", json={"email": USUARIO["email"], "password": "secreta"})
+
+    assert r.status_code == 200
+    assert r.json()["session"]["access_token"] == "token-del-profe"
+    assert compartido.options.headers.get("Authorization") == antes == f"Bearer {login.SUPABASE_KEY}"
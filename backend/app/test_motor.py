@@ -6,7 +6,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from fastapi.testclient import TestClient
 from app.main import app
-from app.services.motor_service import normalize_subject_name
+from app.services.motor_service import normalize_subject_name, ejecutar_cruce_predictivo, rut_sintetico
+from app.services.motor_dashboard import compactar, agregar_director, desglose_por_curso
 
 # Bypasear autenticación Supabase en los tests de integración
 try:
@@ -42,6 +43,30 @@ def test_subject_normalization():
         print(f"  ✅ '{name}' normalizado a Departamento ID: {res}")
     print("🎉 Normalización validada con éxito.")
 
+def test_cruce_predictivo_indice_rut():
+    print("\n🧪 Probando el cruce predictivo indexado por RUT...")
+    rut_ana, rut_luis = "111111111", rut_sintetico("LUIS SOTO")
+    calificaciones = {
+        "porcentaje_aprobacion": 90.0,
+        "alumnos_insuficientes": [{"rut": "11.111.111-1", "nombre": "ANA PEREZ", "asignatura": "MAT", "nota": 3.1}],
+        "alumnos_buenos": [{"nombre": "LUIS SOTO", "promedio": 6.5}],
+    }
+    res = ejecutar_cruce_predictivo(
+        calificaciones,
+        atrasos={rut_luis: 400, "99.999.999-9": 30},
+        anotaciones={rut_luis: {"nombre": "", "negativas": 3, "positivas": 0, "detalles": [{"gravedad": "Grave"}]}},
+        asistencias={"11.111.111-1": 70.0},
+        umbrales={"asistencia_limite": 85.0}
+    )
+    por_rut = {a["rut"]: a for a in res["alumnos_totales"]}
+    # Solo se cruzan los alumnos del curso (el RUT 99.999.999-9 del archivo global queda fuera)
+    assert set(por_rut) == {rut_ana, rut_luis}
+    assert por_rut[rut_ana]["promedio"] == 3.5 and por_rut[rut_ana]["alerta_doble_riesgo"]
+    assert res["datos_convivencia"]["alumnos_doble_riesgo"] == [rut_ana]
+    assert por_rut[rut_luis]["indice_camuflaje"] == 1.0
+    assert por_rut[rut_luis]["anotaciones_graves"] == 1
+    print("  ✅ Cruce por índice RUT validado.")
+
 def test_workflow_motor_conduccion():
     print("\n🧪 [TEST 2] Probando flujo completo del Motor de Conducción Preventiva...")
     
@@ -143,6 +168,108 @@ def test_workflow_motor_conduccion():
     print("      ✅ Serie temporal de cortes recuperada exitosamente.")
 
 
+def test_ingesta_lote_zip():
+    print("\n🧪 Probando ingesta masiva por ZIP (POST /api/v1/motor/ingesta/lote)...")
+    import io
+    import json
+    import zipfile
+
+    raiz = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    with open(os.path.join(raiz, "1780068150.xls"), "rb") as f:
+        informe = f.read()
+    with open(os.path.join(raiz, "Excel_Atrasos_17765_2026_20260529112332.xlsx"), "rb") as f:
+        atrasos = f.read()
+
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("Excel_Atrasos_colegio.xlsx", atrasos)
+        zf.writestr("6 Basico B/Matemática/informe.xls", informe)
+        zf.writestr("6 Basico C/Matemática/informe.xls", informe)
+        zf.writestr("7 Basico A/Matemática/informe.xls", b"archivo corrupto")
+
+    response = client.post(
+        "/api/v1/motor/ingesta/lote",
+        data={"periodo_id": "2026-S1", "corte_temporal": "Lote Test"},
+        files={"file_lote": ("lote.zip", buf.getvalue(), "application/zip")}
+    )
+    assert response.status_code == 200, f"Fallo en ingesta masiva: {response.text}"
+    eventos = [json.loads(linea) for linea in response.text.splitlines() if linea]
+    cursos = {e["curso_id"]: e for e in eventos if e["evento"] == "curso"}
+    resumen = eventos[-1]
+
+    assert set(cursos) == {"6 Basico B", "6 Basico C", "7 Basico A"}
+    assert cursos["6 Basico B"]["status"] == "success"
+    assert cursos["7 Basico A"]["status"] == "error"
+    assert resumen["evento"] == "resumen" and resumen["exitosos"] == 2 and resumen["fallidos"] == 1
+    print("  ✅ Lote procesado por curso; el archivo inválido no detuvo el resto.")
+
+    # El lote refresca el resumen agregado que leen los gráficos de evolución
+    response = client.get(
+        "/api/v1/motor/evolucion/cursos",
+        params={"periodo_id": "2026-S1", "curso_id": "Todos", "corte_temporal": "Lote Test", "role": "director"}
+    )
+    assert response.status_code == 200, response.text
+    desglose = {d["curso"]: d for d in response.json()["desglose_cursos"]}
+    assert set(desglose) == {"6 Basico B", "6 Basico C"}
+    assert desglose["6 Basico B"]["promedio"] == cursos["6 Basico B"]["promedio_general"]
+    print("  ✅ Desglose por curso servido desde el resumen agregado.")
+
+def test_lote_zip_rechaza_zip_bomb():
+    import io
+    import zipfile
+    import pytest
+    from app.services.motor_lote import leer_zip
+
+    def zip_con(**archivos):
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for nombre, datos in archivos.items():
+                zf.writestr(nombre, datos)
+        return buf.getvalue()
+
+    # 50 MB de ceros se comprimen ~1000x: se rechaza sin descomprimir
+    with pytest.raises(ValueError, match="compresión"):
+        leer_zip(zip_con(**{"a.xlsx": b"\0" * (50 * 1024 * 1024)}))
+    with pytest.raises(ValueError, match="supera el máximo"):
+        leer_zip(zip_con(**{"a.xlsx": os.urandom(600_000), "b.xlsx": os.urandom(600_000)}), max_bytes=1024 * 1024)
+    assert set(leer_zip(zip_con(**{"a.xlsx": os.urandom(1000), "__MACOSX/._a": b"x"}))) == {"a.xlsx"}
+
+
+def test_dashboard_director_una_pasada():
+    print("\n🧪 Probando agregación del dashboard del director en una pasada...")
+    alumno = {"rut": "12.345.678-5", "nombre": "Ana", "promedio": 3.2, "asistencia": 70.0, "atraso_minutos": 40}
+    registros = [
+        # Fila proyectada desde Supabase
+        compactar({
+            "curso_id": "1 Medio A", "asignatura": "Matemática", "promedio": 5.0, "aprobacion": 90.0,
+            "minutos_atraso_acumulados": 120, "alumnos_doble_riesgo_detalle": [alumno]
+        }),
+        # Registro completo del motor (misma alumna en otra asignatura)
+        compactar({
+            "curso_id": "1 Medio A", "asignatura": "Lengua y Literatura",
+            "datos_academicos": {"promedio_general": 4.0, "porcentaje_aprobacion": 70.0, "distribucion_dok": {"dok_1": 30}},
+            "datos_convivencia": {"alumnos_doble_riesgo_detalle": [dict(alumno, rut="123456785")]}
+        }),
+        compactar({"curso_id": "1 Medio B", "asignatura": "Matemática", "promedio": 0, "minutos_atraso_acumulados": 10}),
+    ]
+    agg = agregar_director(registros)
+
+    assert agg.total_registros == 2
+    assert round(agg.promedio / agg.total_registros, 2) == 4.5
+    assert agg.atrasos == 120 + 40 + 10
+    assert list(agg.riesgo_unico) == ["123456785"]
+    assert agg.dok["dok1"] == [30] and agg.dok["dok2"] == [47]
+
+    desglose = {d["curso"]: d for d in desglose_por_curso(agg)}
+    assert desglose["1 Medio A"]["alumnos_riesgo"] == 1
+    assert desglose["1 Medio B"]["promedio"] == 0.0 and desglose["1 Medio B"]["atrasos"] == 10
+
+    response = client.get("/api/v1/motor/dashboard?periodo_id=2026-S1&curso_id=Todos&role=director&departamento_id=Todos")
+    assert response.status_code == 200, response.text
+    tramos = [t.split(";")[0] for t in response.headers["server-timing"].split(", ")]
+    assert tramos == ["fetch", "compute", "serialize"]
+    print("  ✅ KPI macro, nómina única y desglose por curso en un recorrido; Server-Timing expuesto.")
+
 def test_rbac_security():
     print("\n🧪 [TEST 3] Validando restricciones de seguridad por rol (RBAC)...")
     
@@ -0,0 +1,131 @@
+import sys
+import os
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.motor_cache import MemoryBackend, MotorCache, RedisBackend
+
+
+class RelojFalso:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+class RedisFalso:
+    """Subconjunto de redis-py que usa RedisBackend, con expiración según `ex`/`px`."""
+
+    def __init__(self, reloj):
+        self.reloj = reloj
+        self.datos = {}
+
+    def get(self, key):
+        valor, expira = self.datos.get(key, (None, None))
+        if expira is not None and expira <= self.reloj():
+            self.datos.pop(key)
+            return None
+        return valor
+
+    def set(self, key, value, ex=None, px=None):
+        segundos = px / 1000 if px is not None else ex
+        self.datos[key] = (value, self.reloj() + segundos if segundos is not None else None)
+
+    def delete(self, key):
+        self.datos.pop(key, None)
+
+    def scan_iter(self, match="*"):
+        return [k for k in list(self.datos) if k.startswith(match.rstrip("*")) and self.get(k) is not None]
+
+    def mget(self, claves):
+        return [self.get(k) for k in claves]
+
+
+def _memoria(reloj):
+    return MemoryBackend(maxsize=10, ttl=30, reloj=reloj)
+
+
+def _redis(reloj):
+    return RedisBackend(RedisFalso(reloj), ttl=30)
+
+
+def test_expulsion_lru():
+    backend = MemoryBackend(maxsize=2, ttl=60, reloj=RelojFalso())
+    backend.set("a", {"v": 1})
+    backend.set("b", {"v": 2})
+    # Tocar "a" la deja como la más reciente; "b" debe salir al insertar "c"
+    assert backend.get("a") == {"v": 1}
+    backend.set("c", {"v": 3})
+
+    assert backend.get("b") is None
+    assert backend.get("a") == {"v": 1}
+    assert backend.get("c") == {"v": 3}
+    assert len(backend) == 2
+    assert backend.expulsiones == 1
+
+
+def test_expiracion_ttl():
+    reloj = RelojFalso()
+    backend = MemoryBackend(maxsize=10, ttl=30, reloj=reloj)
+    backend.set("2026_1A_Lenguaje_General", {"v": 1})
+
+    reloj.t = 29
+    assert backend.get("2026_1A_Lenguaje_General") == {"v": 1}
+    reloj.t = 31
+    assert backend.get("2026_1A_Lenguaje_General") is None
+    assert backend.values_with_prefix("2026_1A_") == []
+
+
+@pytest.mark.parametrize("crear", [_memoria, _redis])
+def test_ttl_por_entrada_en_ambos_backends(crear):
+    # Los backends son intercambiables: ambos aceptan `ttl=` en set (lo usa deps.verificar_token)
+    reloj = RelojFalso()
+    backend = crear(reloj)
+    backend.set("token", {"v": 1}, ttl=5.5)
+    backend.set("rol", {"v": 2})
+
+    reloj.t = 5
+    assert backend.get("token") == {"v": 1}
+    reloj.t = 6
+    assert backend.get("token") is None
+    assert backend.get("rol") == {"v": 2}
+    reloj.t = 31
+    assert backend.get("rol") is None
+
+
+def test_read_through_e_invalidacion():
+    cache = MotorCache(MemoryBackend(maxsize=10, ttl=60, reloj=RelojFalso()))
+    llamadas = []
+
+    def loader():
+        llamadas.append(1)
+        return {"curso_id": "1A"}
+
+    assert cache.get_or_load("k", loader) == {"curso_id": "1A"}
+    assert cache.get_or_load("k", loader) == {"curso_id": "1A"}
+    assert len(llamadas) == 1
+
+    cache.invalidate("k")
+    cache.get_or_load("k", loader)
+    assert len(llamadas) == 2
+
+    # Un loader sin datos no deja entradas vacías en la caché
+    assert cache.get_or_load("vacio", lambda: None) is None
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 3
+    assert stats["cargas_read_through"] == 3
+    assert stats["entradas"] == 1
+
+
+def test_prefijo_insensible_a_mayusculas():
+    cache = MotorCache(MemoryBackend(maxsize=10, ttl=60, reloj=RelojFalso()))
+    cache.set("2026_1A_Lengua y Literatura_General", {"corte_temporal": "General"})
+    cache.set("2026_1A_Lengua y Literatura_Marzo", {"corte_temporal": "Marzo"})
+    cache.set("2026_1B_Lengua y Literatura_General", {"corte_temporal": "General"})
+
+    cortes = {r["corte_temporal"] for r in cache.values_with_prefix("2026_1a_lengua y literatura_")}
+    assert cortes == {"General", "Marzo"}
@@ -0,0 +1,75 @@
+import sys
+import os
+import glob
+import io
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import motor_service, motor_columnar
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _xlsx(df: pd.DataFrame) -> bytes:
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def test_paridad_archivos_de_ejemplo():
+    print("\n🧪 Comparando motor columnar vs. parsers por fila en los archivos de ejemplo...")
+    archivos = sorted(glob.glob(os.path.join(RAIZ_REPO, "*.xls*")))
+    assert archivos, "No se encontraron archivos de ejemplo en la raíz del repositorio"
+
+    for ruta in archivos:
+        with open(ruta, "rb") as f:
+            contenido = f.read()
+        for parser in ["parse_calificaciones", "parse_atrasos", "parse_anotaciones", "parse_asistencia"]:
+            try:
+                esperado = getattr(motor_service, parser)(contenido)
+            except ValueError as e:
+                esperado = ("ValueError", str(e))
+            try:
+                obtenido = getattr(motor_columnar, parser)(contenido)
+            except ValueError as e:
+                obtenido = ("ValueError", str(e))
+            assert obtenido == esperado, f"Diferencia en {parser} para {os.path.basename(ruta)}"
+        print(f"  ✅ {os.path.basename(ruta)}")
+
+
+def test_atrasos_hora_de_llegada_y_duracion():
+    contenido = _xlsx(pd.DataFrame({
+        "RUT": ["11.111.111-1", "11.111.111-1", "22.222.222-k", "", "33.333.333-3"],
+        "Tiempo de atraso": ["08:15", "07:50", "25", "08:30", "03:03"],
+    }))
+    esperado = motor_service.parse_atrasos(contenido)
+    assert motor_columnar.parse_atrasos(contenido) == esperado
+    assert esperado == {"111111111": 15, "22222222K": 25, "333333333": 183}
+
+
+def test_anotaciones_gravedad_y_conteos():
+    contenido = _xlsx(pd.DataFrame({
+        "RUT": ["11.111.111-1", "11.111.111-1", "11.111.111-1", "22.222.222-2"],
+        "Alumno": [None, "ANA PÉREZ", "ANA P.", "LUIS SOTO"],
+        "Motivo": ["Pelea en el patio", "Falta de respeto", None, "Se destaca"],
+        "Tipo": ["Negativa", "NEGATIVA", "Acción formativa", None],
+    }))
+    esperado = motor_service.parse_anotaciones(contenido)
+    obtenido = motor_columnar.parse_anotaciones(contenido)
+    assert obtenido == esperado
+    assert obtenido["111111111"]["nombre"] == "ANA PÉREZ"
+    assert [d["gravedad"] for d in obtenido["111111111"]["detalles"]] == ["Gravísima", "Grave", "Leve"]
+
+
+def test_calificaciones_genericas_y_bandas():
+    notas = [3.2, 4.0, 4.9, 5.0, 5.95, 6.0, 7.0]
+    contenido = _xlsx(pd.DataFrame({
+        "RUT": [f"{i}.111.111-{i}" for i in range(1, len(notas) + 1)],
+        "Nota": notas,
+    }))
+    esperado = motor_service.parse_calificaciones(contenido)
+    obtenido = motor_columnar.parse_calificaciones(contenido)
+    assert obtenido == esperado
+    assert obtenido["frecuencias"] == {"reprobados": 1, "4_0_4_9": 2, "5_0_5_9": 2, "6_0_7_0": 2}
@@ -0,0 +1,105 @@
+import sys
+import os
+import io
+import json
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from reportlab.lib.pagesizes import LETTER
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from routers import omr_vision
+from services.vision_service import CV2_AVAILABLE
+
+if CV2_AVAILABLE:
+    from app.hojas_omr_sinteticas import hoja_aleatoria
+
+app = FastAPI()
+app.include_router(omr_vision.router)
+client = TestClient(app)
+
+
+def _pdf_escaneado(imagenes):
+    """PDF con una imagen JPEG por página, como lo entrega un escáner."""
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=LETTER)
+    for img in imagenes:
+        c.drawImage(ImageReader(io.BytesIO(img)), 0, 0, width=LETTER[0], height=LETTER[1])
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+@pytest.mark.skipif(not CV2_AVAILABLE, reason="OpenCV no disponible")
+def test_lote_omr_imagenes_y_pdf():
+    hojas = [hoja_aleatoria(n) for n in range(3)]
+    pdf = _pdf_escaneado([hojas[1][2], hojas[2][2]])
+
+    response = client.post(
+        "/api/v1/omr/process/lote",
+        files=[
+            ("files", ("hoja_0.jpg", hojas[0][2], "image/jpeg")),
+            ("files", ("ensayo.pdf", pdf, "application/pdf")),
+            ("files", ("borrosa.jpg", b"no es una imagen", "image/jpeg")),
+        ]
+    )
+    assert response.status_code == 200, response.text
+    eventos = [json.loads(linea) for linea in response.text.splitlines() if linea]
+    por_archivo = {e["archivo"]: e for e in eventos if e["evento"] == "hoja"}
+    resumen = eventos[-1]
+
+    assert set(por_archivo) == {"hoja_0.jpg", "ensayo.pdf#p1", "ensayo.pdf#p2", "borrosa.jpg"}
+    for archivo, (respuestas, rut, _) in zip(["hoja_0.jpg", "ensayo.pdf#p1", "ensayo.pdf#p2"], hojas):
+        assert por_archivo[archivo]["status"] == "success"
+        assert por_archivo[archivo]["rut"] == rut
+        assert por_archivo[archivo]["answers"] == respuestas
+    assert por_archivo["borrosa.jpg"]["status"] == "error"
+    assert resumen == {"evento": "resumen", "total_hojas": 4, "exitosas": 3, "fallidas": 1}
+
+
+def test_lote_omr_rechaza_otros_formatos():
+    response = client.post(
+        "/api/v1/omr/process/lote",
+        files=[("files", ("notas.txt", b"hola", "text/plain"))]
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.skipif(not CV2_AVAILABLE, reason="OpenCV no disponible")
+def test_densidades_integral_equivalen_a_count_nonzero():
+    import cv2
+    import numpy as np
+    from services.vision_service import densidades_burbujas, plantilla_compilada
+
+    rng = np.random.default_rng(7)
+    thresh = np.where(rng.random((2200, 1700)) > 0.6, 255, 0).astype(np.uint8)
+    integral = cv2.integral(thresh // 255, sdepth=cv2.CV_32S)
+
+    for modo in ("fiduciales", "hoja"):
+        cajas = plantilla_compilada()[modo]["preguntas"].reshape(-1, 4)
+        esperado = [cv2.countNonZero(thresh[y0:y1, x0:x1]) for y0, y1, x0, x1 in cajas]
+        assert densidades_burbujas(integral, cajas).tolist() == esperado
+
+
+@pytest.mark.skipif(not CV2_AVAILABLE, reason="OpenCV no disponible")
+def test_alineacion_foto_12mp_con_perspectiva():
+    import cv2
+    import numpy as np
+    from services.vision_service import OMRVisionService
+
+    respuestas, rut, jpeg = hoja_aleatoria(11, (3024, 4032))
+    hoja = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_GRAYSCALE)
+    h, w = hoja.shape
+    # Hoja inclinada sobre una mesa clara, como en una foto de celular
+    foto = np.full((int(h * 1.1), int(w * 1.1)), 210, np.uint8)
+    origen = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
+    destino = np.float32([[0.06 * w, 0.04 * h], [1.04 * w, 0.06 * h], [1.05 * w, 1.05 * h], [0.05 * w, 1.04 * h]])
+    cv2.warpPerspective(hoja, cv2.getPerspectiveTransform(origen, destino), foto.shape[::-1], dst=foto, borderMode=cv2.BORDER_TRANSPARENT)
+
+    result = OMRVisionService.process_image(cv2.imencode(".jpg", foto)[1].tobytes())
+    assert result["rut"] == rut
+    assert result["answers"] == respuestas
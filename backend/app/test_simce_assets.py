@@ -0,0 +1,38 @@
+import sys
+import os
+import json
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simce_assets
+from simce_assets import IndiceEstimulos, canonical, cargar_json
+
+
+def test_indice_estimulos_aplica_lista_negra_y_claves_canonicas():
+    data = [
+        {"asignatura": "Lenguaje y Literatura", "nivel": "8° Básico", "tipo": "texto_plano", "contenido_real": "Un cuento.", "imagen_adjunta": "a.png"},
+        {"asignatura": "Lengua y Literatura", "nivel": "8 Básico", "tipo": "texto_plano", "contenido_real": "Pauta de corrección SIMCE", "imagen_adjunta": "b.png"},
+        {"asignatura": "Lengua y Literatura", "nivel": "8° Básico", "tipo": "imagen_adjunta_solo", "contenido_real": "", "imagen_adjunta": "c.png"},
+        {"asignatura": "Lengua y Literatura", "nivel": "8° Básico", "tipo": "texto_plano", "contenido_real": "Sin imagen", "imagen_adjunta": ""},
+    ]
+    indice = IndiceEstimulos(data)
+
+    aptos = indice.aptos(canonical("Lengua y Literatura"), canonical("8° Básico"))
+    assert [e["imagen_adjunta"] for e in aptos] == ["a.png"]
+    assert len(indice.exactos("Lengua y Literatura", "8° Básico")) == 1
+
+
+def test_cargar_json_recarga_por_mtime(tmp_path):
+    archivo = tmp_path / "tabla.json"
+    archivo.write_text(json.dumps([{"v": 1}]), "utf-8")
+    assert cargar_json(archivo) == [{"v": 1}]
+    assert cargar_json(archivo) is cargar_json(archivo)
+
+    archivo.write_text(json.dumps([{"v": 2}]), "utf-8")
+    os.utime(archivo, ns=(1, 1))
+    assert cargar_json(archivo) == [{"v": 2}]
+
+
+def test_indicadores_del_asset_empaquetado():
+    inds = simce_assets.indicadores().indicadores(canonical("Matemática"), canonical("4° Básico"))
+    assert inds and all(isinstance(i, str) for i in inds)
@@ -0,0 +1,116 @@
+import sys
+import os
+import io
+import asyncio
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SUPABASE_URL", "https://test.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+
+from app.services.docx_render import MotorRender
+from services import simce_lote
+from services.omr_template_service import OMRTemplateGenerator
+
+
+CURSOS = [
+    {"nombre": "4° Básico A", "alumnos": [
+        {"rut": "12.345.678-5", "nombre": "Ana Pérez", "curso": "4° Básico A"},
+        {"rut": "9876543-K", "nombre": "Benjamín Soto", "curso": "4° Básico A"},
+    ]},
+    {"nombre": "4° Básico B", "alumnos": [
+        {"rut": None, "nombre": "Carla Ríos", "curso": "4° Básico B"},
+    ]},
+]
+
+
+def _falla(*args):
+    raise ValueError("sin datos")
+
+
+def _zip(documentos, monkeypatch, ventana=2):
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        monkeypatch.setattr(simce_lote, "motor_render", MotorRender(executor=pool))
+
+        async def leer():
+            return b"".join([trozo async for trozo in simce_lote.zip_ensayo(
+                documentos, extras=[("nomina.csv", simce_lote.nomina_csv("EV-1", CURSOS))], ventana=ventana
+            )])
+
+        return zipfile.ZipFile(io.BytesIO(asyncio.run(leer())))
+
+
+def test_digitos_rut():
+    assert "".join(OMRTemplateGenerator.digitos_rut("12.345.678-5")) == "123456785"
+    assert "".join(OMRTemplateGenerator.digitos_rut("9876543-k")) == "09876543K"
+    assert OMRTemplateGenerator.digitos_rut("") is None
+
+
+def test_zip_por_alumno_en_orden(monkeypatch):
+    zf = _zip(simce_lote.documentos_omr("EV-1", CURSOS, 10, None), monkeypatch)
+    assert zf.namelist() == [
+        "nomina.csv",
+        "4_Basico_A/001_Ana_Perez.pdf",
+        "4_Basico_A/002_Benjamin_Soto.pdf",
+        "4_Basico_B/001_Carla_Rios.pdf",
+    ]
+    assert zf.read("4_Basico_A/001_Ana_Perez.pdf").startswith(b"%PDF")
+    assert "12.345.678-5" in zf.read("nomina.csv").decode("utf-8-sig")
+
+
+def test_zip_por_curso_y_errores(monkeypatch):
+    documentos = list(simce_lote.documentos_omr("EV-1", CURSOS, 10, None, agrupar="curso"))
+    documentos.insert(1, ("Cuadernillo.docx", _falla, ()))
+    zf = _zip(documentos, monkeypatch, ventana=1)
+    assert zf.namelist() == ["nomina.csv", "Hojas_OMR_4_Basico_A.pdf", "Hojas_OMR_4_Basico_B.pdf", "ERRORES.txt"]
+    assert b"/Count 2" in zf.read("Hojas_OMR_4_Basico_A.pdf")
+    assert "Cuadernillo.docx: sin datos" in zf.read("ERRORES.txt").decode()
+
+
+class _Consulta:
+    def __init__(self, filas):
+        self.filas, self.rango = filas, None
+
+    def select(self, *a): return self
+    def eq(self, *a): return self
+    def in_(self, *a): return self
+    def order(self, *a): return self
+    def maybe_single(self): self.filas = self.filas[0]; return self
+    def range(self, a, b): self.rango = (a, b); return self
+
+    def execute(self):
+        if not isinstance(self.filas, list):
+            return type("Res", (), {"data": self.filas})()
+        # Como PostgREST: nunca más de 1000 filas por respuesta
+        desde, hasta = self.rango or (0, len(self.filas))
+        filas = self.filas[desde:min(hasta + 1, desde + 1000)]
+        return type("Res", (), {"data": filas})()
+
+
+class _Supabase:
+    def __init__(self, n_alumnos):
+        self.tablas = {
+            "profiles": [{"school_id": "s1"}],
+            "courses": [{"id": "c1", "nivel": "4° Básico", "letra": "A"}, {"id": "c2", "nivel": "4° Básico", "letra": "B"}],
+            "students": [
+                {"rut": f"{i}-K", "nombres": f"Alumno {i}", "apellidos": f"A{i:05d}", "course_id": "c1" if i % 2 else "c2"}
+                for i in range(n_alumnos)
+            ],
+        }
+
+    def table(self, nombre):
+        return _Consulta(self.tablas[nombre])
+
+
+def test_nomina_paginada_mas_alla_de_1000_filas(monkeypatch):
+    import simce_router
+
+    monkeypatch.setattr(simce_router, "cliente_service", lambda: _Supabase(2500))
+    cursos = asyncio.run(simce_router._cursos_con_alumnos("u1", "4° Básico", None))
+    assert [len(c["alumnos"]) for c in cursos] == [1250, 1250]
+
+    # Sobre el máximo del lote se deja de leer: el endpoint responde 413
+    monkeypatch.setattr(simce_router, "cliente_service", lambda: _Supabase(simce_lote.MAX_ALUMNOS_LOTE + 500))
+    cursos = asyncio.run(simce_router._cursos_con_alumnos("u1", "4° Básico", None))
+    assert sum(len(c["alumnos"]) for c in cursos) > simce_lote.MAX_ALUMNOS_LOTE
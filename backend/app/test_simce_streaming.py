@@ -0,0 +1,83 @@
+import sys
+import os
+import json
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+import simce_router
+from app.services.streaming import respuesta_streaming
+
+app = FastAPI()
+app.include_router(simce_router.router)
+client = TestClient(app)
+
+PAYLOAD = {"nivel": "8° Básico", "asignatura": "Matemática", "cantidad_preguntas": 5}
+
+
+async def _bloque_falso(index, block_skills, nivel, asignatura, indicadores_texto, posibles_estimulos, pregunta_start_num):
+    await asyncio.sleep(0)
+    preguntas = [
+        simce_router.Pregunta(**simce_router._fallback_question(pregunta_start_num + i, skill))
+        for i, skill in enumerate(block_skills)
+    ]
+    return simce_router.BloqueEnsayo(tipo_estimulo="caso", contenido_estimulo="Estímulo", preguntas=preguntas)
+
+
+def test_generate_stream_emite_bloques_y_resumen_igual_al_endpoint_clasico(monkeypatch):
+    monkeypatch.setattr(simce_router, "generar_un_bloque", _bloque_falso)
+
+    response = client.post("/api/v1/simce/generate/stream", json=PAYLOAD)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    eventos = [json.loads(linea) for linea in response.text.splitlines() if linea]
+
+    assert [e["evento"] for e in eventos] == ["inicio", "bloque", "resumen"]
+    assert [p["numero"] for p in eventos[1]["preguntas"]] == [1, 2, 3, 4, 5]
+
+    resumen = eventos[-1]
+    resumen.pop("evento")
+    clasico = client.post("/api/v1/simce/generate", json=PAYLOAD)
+    assert clasico.status_code == 200
+    # El estímulo se sortea por petición; las preguntas deben coincidir en lo demás
+    sin_estimulo = lambda ps: [{k: v for k, v in p.items() if not k.startswith("estimulo")} for p in ps]
+    assert sin_estimulo(clasico.json()["preguntas"]) == sin_estimulo(resumen["preguntas"])
+    assert clasico.json()["cantidad_preguntas"] == resumen["cantidad_preguntas"] == 5
+
+
+def test_generate_stream_sse(monkeypatch):
+    monkeypatch.setattr(simce_router, "generar_un_bloque", _bloque_falso)
+
+    response = client.post("/api/v1/simce/generate/stream", json=PAYLOAD, headers={"Accept": "text/event-stream"})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    nombres = [linea.split(": ", 1)[1] for linea in response.text.splitlines() if linea.startswith("event: ")]
+    assert nombres == ["inicio", "bloque", "resumen"]
+
+
+def test_respuesta_streaming_errores_antes_y_despues_del_primer_evento():
+    async def falla_al_validar():
+        raise HTTPException(status_code=422, detail="Nivel inválido")
+        yield
+
+    async def falla_a_medias():
+        yield {"evento": "inicio"}
+        raise RuntimeError("LLM caído")
+
+    mini = FastAPI()
+
+    @mini.get("/antes")
+    async def antes():
+        return await respuesta_streaming(falla_al_validar())
+
+    @mini.get("/despues")
+    async def despues():
+        return await respuesta_streaming(falla_a_medias())
+
+    mini_client = TestClient(mini)
+    assert mini_client.get("/antes").status_code == 422
+
+    eventos = [json.loads(l) for l in mini_client.get("/despues").text.splitlines() if l]
+    assert eventos == [{"evento": "inicio"}, {"evento": "error", "status_code": 500, "detalle": "LLM caído"}]
@@ -0,0 +1,47 @@
+import sys
+import os
+import time
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db import supabase as db
+
+URL = "https://pool-test.supabase.co"
+
+
+class ConsultaLenta:
+    """Imita un builder de PostgREST: `.execute()` es HTTP síncrono."""
+
+    def __init__(self, latencia):
+        self.latencia = latencia
+
+    def execute(self):
+        time.sleep(self.latencia)
+        return type("Respuesta", (), {"data": [{"ok": True}]})()
+
+
+def test_un_cliente_y_un_pool_http_por_clave():
+    anon = db.obtener_cliente(URL, "clave-anon")
+    assert db.obtener_cliente(URL, "clave-anon") is anon
+    service = db.obtener_cliente(URL, "clave-service")
+    assert service is not anon
+
+    # PostgREST usa el httpx.Client compartido (HTTP/2 + keep-alive) en vez de crear el suyo
+    assert anon.postgrest.session is anon.options.httpx_client
+    assert anon.options.httpx_client is not service.options.httpx_client
+
+
+def test_ejecutar_no_bloquea_el_event_loop():
+    async def escenario():
+        inicio = time.perf_counter()
+        respuestas = await asyncio.gather(*(db.ejecutar(ConsultaLenta(0.2), "test.lenta") for _ in range(8)))
+        return respuestas, time.perf_counter() - inicio
+
+    respuestas, total = asyncio.run(escenario())
+    assert all(r.data == [{"ok": True}] for r in respuestas)
+    assert total < 0.8  # 8 × 0.2 s en serie serían 1.6 s
+
+    stats = db.estadisticas()["consultas"]["test.lenta"]
+    assert stats["consultas"] == 8 and stats["errores"] == 0
+    assert stats["latencia_p50"] >= 0.2
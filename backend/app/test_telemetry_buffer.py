@@ -0,0 +1,60 @@
+import sys
+import os
+import time
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.telemetry_buffer import BufferTelemetria
+
+
+class EscritorFalso:
+    def __init__(self, fallas=0):
+        self.lotes = []
+        self.fallas = fallas
+
+    def __call__(self, filas):
+        if self.fallas:
+            self.fallas -= 1
+            raise ConnectionError("PostgREST no disponible")
+        self.lotes.append([f["n"] for f in filas])
+
+
+def test_lotes_por_tamano_y_descarte_con_cola_llena():
+    escritor = EscritorFalso()
+    buffer = BufferTelemetria(escritor, maxsize=5, lote=3, intervalo=60)
+
+    async def escenario():
+        aceptados = [buffer.encolar({"n": i}) for i in range(7)]
+        await asyncio.sleep(0.2)  # El lote de 3 despierta a la tarea sin esperar el intervalo
+        pendientes = len(buffer._cola)
+        await buffer.detener()
+        return aceptados, pendientes
+
+    aceptados, pendientes = asyncio.run(escenario())
+    assert aceptados == [True] * 5 + [False] * 2
+    assert escritor.lotes[0] == [0, 1, 2] and pendientes == 0
+    assert sum(escritor.lotes, []) == [0, 1, 2, 3, 4]
+    stats = buffer.estadisticas()
+    assert (stats["escritos"], stats["descartados"], stats["pendientes"]) == (5, 2, 0)
+
+
+def test_reintenta_lote_fallido_y_vacia_al_apagar():
+    escritor = EscritorFalso(fallas=1)
+    buffer = BufferTelemetria(escritor, maxsize=100, lote=50, intervalo=0.05)
+
+    async def escenario():
+        inicio = time.perf_counter()
+        for i in range(10):
+            buffer.encolar({"n": i})
+        encolar = time.perf_counter() - inicio
+        await asyncio.sleep(0.3)  # Primer intento falla, el siguiente intervalo lo escribe
+        for i in range(10, 12):
+            buffer.encolar({"n": i})
+        await buffer.detener()
+        return encolar
+
+    encolar = asyncio.run(escenario())
+    assert encolar < 0.05  # Encolar no espera a la base de datos
+    assert sum(escritor.lotes, []) == list(range(12))
+    assert buffer.estadisticas()["errores"] == 1
@@ -0,0 +1,76 @@
+"""
+Benchmark: vectorización de un documento institucional, fragmento por fragmento
+vs. el pipeline por lotes concurrentes con deduplicación.
+
+Usa `FakeEmbedder` (sin red) con una latencia por llamada que simula el RTT de
+la API de embeddings. El documento sintético repite encabezados y artículos,
+como un reglamento real, para que la deduplicación tenga efecto.
+
+- "Serial": una llamada por fragmento (lo que hacía /upload-contexto).
+- "Pipeline": `vectorizar_fragmentos` con EMBEDDING_BATCH_SIZE y
+  EMBEDDING_CONCURRENCY (o los valores de --lote / --concurrencia).
+
+Uso:
+    cd backend
+    python bench_embeddings.py [--paginas 120] [--latencia 0.15] [--lote 100] [--concurrencia 4]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.embeddings import FakeEmbedder, vectorizar_fragmentos  # noqa: E402
+from routers.contexto import _fragmentar  # noqa: E402
+
+
+def documento_sintetico(paginas: int, semilla: int = 0) -> str:
+    """
+    Páginas de 2700 caracteres (múltiplo del paso de fragmentación de 900) para que
+    un anexo repetido produzca fragmentos idénticos; 1 de cada 4 páginas es el anexo.
+    """
+    rng = random.Random(semilla)
+    palabras = ["convivencia", "evaluación", "estudiante", "apoderado", "docente", "protocolo",
+                "medida", "formativa", "reglamento", "establecimiento", "artículo", "plazo"]
+    anexo = " ".join(rng.choice(palabras) for _ in range(400))[:2700]
+    texto = []
+    for n in range(paginas):
+        if n % 4 == 3:
+            texto.append(anexo)
+        else:
+            texto.append(" ".join(rng.choice(palabras) for _ in range(400))[:2700])
+    return "".join(texto)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paginas", type=int, default=120)
+    parser.add_argument("--latencia", type=float, default=0.15, help="Segundos por llamada al proveedor")
+    parser.add_argument("--lote", type=int, default=None)
+    parser.add_argument("--concurrencia", type=int, default=None)
+    args = parser.parse_args()
+
+    chunks = _fragmentar(documento_sintetico(args.paginas))
+    print(f"{args.paginas} páginas → {len(chunks)} fragmentos, latencia {args.latencia * 1000:.0f} ms/llamada")
+
+    serial = FakeEmbedder(latencia=args.latencia)
+    inicio = time.perf_counter()
+    for chunk in chunks:
+        serial.embed_batch([chunk])
+    t_serial = time.perf_counter() - inicio
+
+    pipeline = FakeEmbedder(latencia=args.latencia)
+    inicio = time.perf_counter()
+    asyncio.run(vectorizar_fragmentos(chunks, pipeline, args.lote, args.concurrencia))
+    t_pipeline = time.perf_counter() - inicio
+
+    print(f"{'Modo':<10} {'Tiempo (s)':>11} {'Llamadas':>9} {'Textos':>7}")
+    print(f"{'Serial':<10} {t_serial:>11.2f} {serial.llamadas:>9} {serial.textos:>7}")
+    print(f"{'Pipeline':<10} {t_pipeline:>11.2f} {pipeline.llamadas:>9} {pipeline.textos:>7}")
+
+
+if __name__ == "__main__":
+    main()
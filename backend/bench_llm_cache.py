@@ -0,0 +1,72 @@
+"""
+Banco offline para la caché de respuestas del LLM.
+
+Simula docentes de un mismo colegio pidiendo rúbricas: un conjunto pequeño de
+prompts distintos (mismo OA/nivel/configuración) repetidos muchas veces, con
+un generador falso que tarda `latencia` segundos como Gemini. Compara la
+latencia de las solicitudes que llegan al "LLM" con las servidas desde la
+caché SQLite, y verifica que las entradas sobreviven a reabrir la base.
+
+Uso:
+    cd backend
+    python bench_llm_cache.py [--solicitudes 200] [--prompts 20] [--latencia 0.2]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.llm_cache import CacheLLM, SQLiteBackend
+
+
+def prompt_rubrica(i: int) -> str:
+    return f"""
+        ACTÚA COMO: Experto en evaluación.
+        NIVEL: {i % 12 + 1}° Básico
+        OA: OA {i:02d}
+        DOK: 2-3
+    """
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--solicitudes", type=int, default=200)
+    parser.add_argument("--prompts", type=int, default=20, help="Prompts distintos entre todas las solicitudes")
+    parser.add_argument("--latencia", type=float, default=0.2, help="Latencia simulada del LLM (s)")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    path = os.path.join(tempfile.mkdtemp(), "llm_cache.sqlite3")
+    cache = CacheLLM(SQLiteBackend(path))
+
+    def generar():
+        time.sleep(args.latencia)
+        return '{"titulo": "Rúbrica", "tabla": []}'
+
+    fallos, aciertos = [], []
+    for _ in range(args.solicitudes):
+        prompt = prompt_rubrica(rng.randrange(args.prompts))
+        antes = cache.stats()["hits"]
+        t0 = time.perf_counter()
+        cache.obtener_o_generar("rubricas", "gemini-2.5-flash", prompt, generar, generation_config={"response_mime_type": "application/json"})
+        (aciertos if cache.stats()["hits"] > antes else fallos).append(time.perf_counter() - t0)
+
+    stats = cache.stats()
+    print(f"{args.solicitudes} solicitudes, {args.prompts} prompts distintos, latencia LLM {args.latencia}s")
+    print(f"hit rate {stats['hit_rate']:.1%} | LLM ahorrado {stats['rutas']['rubricas']['segundos_ahorrados']} s")
+    print(f"fallo  p50 {statistics.median(fallos) * 1000:8.2f} ms  (n={len(fallos)})")
+    print(f"acierto p50 {statistics.median(aciertos) * 1000:7.3f} ms  máx {max(aciertos) * 1000:.3f} ms  (n={len(aciertos)})")
+
+    # Un reinicio del proceso no pierde la caché
+    reabierta = CacheLLM(SQLiteBackend(path))
+    reabierta.obtener_o_generar("rubricas", "gemini-2.5-flash", prompt_rubrica(0), generar, generation_config={"response_mime_type": "application/json"})
+    print(f"tras reabrir: {reabierta.stats()['hits']} acierto(s), {len(reabierta.backend)} entradas")
+
+
+if __name__ == "__main__":
+    main()
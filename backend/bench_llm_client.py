@@ -0,0 +1,101 @@
+"""
+Prueba de carga offline: ¿las generaciones concurrentes se serializan?
+
+Se montan dos versiones de la misma ruta de rúbricas en una app FastAPI y se
+disparan N solicitudes simultáneas (httpx + ASGITransport, un solo event loop
+como un worker de uvicorn). Gemini se reemplaza por un modelo falso con
+`latencia` segundos por respuesta:
+
+- "Bloqueante": lo que hacía el router antes, `model.generate_content(...)`
+  síncrono dentro de un `async def` (el modelo falso duerme con time.sleep).
+- "Cliente LLM": el router real `routers/rubricas.py`, que ahora usa
+  `cliente_llm.generar` (el modelo falso duerme con asyncio.sleep, como
+  `generate_content_async`). La caché LLM se desactiva para medir solo la espera.
+
+Uso:
+    cd backend
+    python bench_llm_client.py [--solicitudes 20] [--latencia 0.5]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+from fastapi import FastAPI
+
+from routers import rubricas
+from app.services.llm_cache import CacheLLM
+from app.services.llm_client import cliente_llm
+from app.services.llm_scheduler import LimitesModelo, PlanificadorLLM
+
+RESPUESTA = '{"titulo": "Rúbrica", "descripcion": "", "tabla": []}'
+
+
+class _Respuesta:
+    text = RESPUESTA
+
+
+class ModeloFalso:
+    def __init__(self, latencia: float):
+        self.latencia = latencia
+
+    def generate_content(self, contenido, request_options=None):
+        time.sleep(self.latencia)
+        return _Respuesta()
+
+    async def generate_content_async(self, contenido, request_options=None):
+        await asyncio.sleep(self.latencia)
+        return _Respuesta()
+
+
+def crear_app(latencia: float) -> FastAPI:
+    app = FastAPI()
+    modelo = ModeloFalso(latencia)
+
+    @app.post("/bloqueante")
+    async def bloqueante(req: rubricas.RubricRequest):
+        return rubricas.limpiar_rubrica_json(modelo.generate_content(req.actividad).text)
+
+    app.include_router(rubricas.router)
+    cliente_llm._crear_modelo = lambda *a: modelo
+    cliente_llm.cache = CacheLLM(None)
+    cliente_llm.planificador = PlanificadorLLM(limites_por_modelo={}, limites_default=LimitesModelo(rpm=60000, concurrencia=64))
+    return app
+
+
+async def disparar(app: FastAPI, ruta: str, n: int):
+    payload = {"nivel": "8° Básico", "asignatura": "Matemática", "oaId": "MA08 OA 03", "oaDescripcion": "Resolver problemas", "actividad": "Guía"}
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as client:
+        async def una(i: int):
+            r = await client.post(ruta, json={**payload, "actividad": f"Guía {i}"})
+            r.raise_for_status()
+            return time.perf_counter() - inicio  # Tiempo hasta la respuesta desde la ráfaga
+
+        inicio = time.perf_counter()
+        latencias = await asyncio.gather(*(una(i) for i in range(n)))
+        return time.perf_counter() - inicio, latencias
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--solicitudes", type=int, default=20)
+    parser.add_argument("--latencia", type=float, default=0.5, help="Latencia simulada de Gemini (s)")
+    args = parser.parse_args()
+
+    app = crear_app(args.latencia)
+    print(f"{args.solicitudes} solicitudes simultáneas, latencia LLM {args.latencia}s")
+    print(f"{'Modo':<12} {'Total s':>8} {'p50 s':>7} {'máx s':>7}")
+    for nombre, ruta in (("Bloqueante", "/bloqueante"), ("Cliente LLM", "/generate-rubric")):
+        total, latencias = asyncio.run(disparar(app, ruta, args.solicitudes))
+        print(f"{nombre:<12} {total:8.2f} {statistics.median(latencias):7.2f} {max(latencias):7.2f}")
+    print(f"métricas cliente: {cliente_llm.estadisticas().get('rubricas')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Banco de carga offline para el planificador de llamadas al LLM.
+
+`FakeLLM` imita a Gemini sin red: latencia configurable y una cuota de
+`cuota` solicitudes por `ventana` segundos; pasada la cuota responde con un
+error 429, como el proveedor real.
+
+Se compara, para un ensayo masivo con consultas interactivas en paralelo:
+
+- "Retrasos fijos": lo que hacía el generador SIMCE (gather con
+  `asyncio.sleep(i * escalon)` y sin reintentos).
+- "Planificador": `PlanificadorLLM` configurado con el doble de la cuota real
+  (para que tenga que adaptarse a los 429), concurrencia acotada y las
+  consultas interactivas con prioridad.
+
+Uso:
+    cd backend
+    python bench_llm_scheduler.py [--lote 120] [--interactivas 10] [--cuota 20] [--latencia 0.3]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.llm_scheduler import (  # noqa: E402
+    LimitesModelo, PlanificadorLLM, PRIORIDAD_INTERACTIVA, PRIORIDAD_LOTE
+)
+
+MODELO = "fake-llm"
+
+
+class ErrorCuota(Exception):
+    code = 429
+
+
+class FakeLLM:
+    """Proveedor simulado con cuota por ventana deslizante y latencia con jitter."""
+
+    def __init__(self, cuota: int, ventana: float = 60.0, latencia: float = 0.3, jitter: float = 0.2, semilla: int = 0):
+        self.cuota = cuota
+        self.ventana = ventana
+        self.latencia = latencia
+        self.jitter = jitter
+        self._rng = random.Random(semilla)
+        self._llamadas = []
+        self.aceptadas = 0
+        self.rechazadas = 0
+        self.en_curso = 0
+        self.max_en_curso = 0
+
+    async def generar(self, prompt: str) -> str:
+        ahora = time.monotonic()
+        self._llamadas = [t for t in self._llamadas if ahora - t < self.ventana]
+        if len(self._llamadas) >= self.cuota:
+            self.rechazadas += 1
+            raise ErrorCuota("429 Resource has been exhausted")
+        self._llamadas.append(ahora)
+        self.aceptadas += 1
+        self.en_curso += 1
+        self.max_en_curso = max(self.max_en_curso, self.en_curso)
+        try:
+            await asyncio.sleep(self.latencia * (1 + self._rng.uniform(-self.jitter, self.jitter)))
+        finally:
+            self.en_curso -= 1
+        return json.dumps({"prompt": prompt[:20], "preguntas": []})
+
+
+async def _medir(llamar, lote: int, interactivas: int, retraso_interactivas: float):
+    """Lanza `lote` llamadas masivas y, tras `retraso_interactivas`, las interactivas."""
+    latencias = []
+    fallidas = 0
+
+    async def una(i, interactiva):
+        nonlocal fallidas
+        inicio = time.perf_counter()
+        try:
+            await llamar(i, interactiva)
+            if interactiva:
+                latencias.append(time.perf_counter() - inicio)
+        except Exception:
+            fallidas += 1
+
+    async def interactivas_tardias():
+        await asyncio.sleep(retraso_interactivas)
+        await asyncio.gather(*(una(i, True) for i in range(interactivas)))
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(una(i, False) for i in range(lote)), interactivas_tardias())
+    return time.perf_counter() - inicio, fallidas, latencias
+
+
+async def escenario_retrasos_fijos(llm: FakeLLM, lote: int, interactivas: int, escalon: float):
+    async def llamar(i, interactiva):
+        if not interactiva:
+            await asyncio.sleep(i * escalon)
+        return await llm.generar(f"pregunta {i}")
+    return await _medir(llamar, lote, interactivas, retraso_interactivas=1.0)
+
+
+async def escenario_planificador(llm: FakeLLM, lote: int, interactivas: int, rpm_configurado: float, concurrencia: int):
+    planificador = PlanificadorLLM(
+        limites_por_modelo={MODELO: LimitesModelo(rpm=rpm_configurado, concurrencia=concurrencia)},
+        reintentos=8, backoff_base=0.2, backoff_max=3.0
+    )
+
+    async def llamar(i, interactiva):
+        prioridad = PRIORIDAD_INTERACTIVA if interactiva else PRIORIDAD_LOTE
+        return await planificador.ejecutar(MODELO, lambda: llm.generar(f"pregunta {i}"), prioridad=prioridad)
+    resultado = await _medir(llamar, lote, interactivas, retraso_interactivas=1.0)
+    return resultado + (planificador.estadisticas()[MODELO],)
+
+
+def _fila(nombre, llm, total, fallidas, latencias, n):
+    p50 = statistics.median(latencias) if latencias else float("nan")
+    peor = max(latencias) if latencias else float("nan")
+    print(f"{nombre:<16} {total:>8.1f} {n - fallidas:>5}/{n:<5} {llm.rechazadas:>6} {p50:>9.2f} {peor:>9.2f}")
+
+
+def main():
+    logging.getLogger("app.services.llm_scheduler").setLevel(logging.ERROR)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lote", type=int, default=120, help="Llamadas del ensayo masivo")
+    parser.add_argument("--interactivas", type=int, default=10)
+    parser.add_argument("--cuota", type=int, default=20, help="Solicitudes aceptadas por segundo")
+    parser.add_argument("--latencia", type=float, default=0.3)
+    parser.add_argument("--escalon", type=float, default=0.05, help="Retraso fijo entre llamadas del modo antiguo")
+    args = parser.parse_args()
+    n = args.lote + args.interactivas
+
+    print(f"{args.lote} llamadas de lote + {args.interactivas} interactivas, cuota {args.cuota}/s, latencia {args.latencia}s")
+    print(f"{'Modo':<16} {'Total s':>8} {'OK':>11} {'429':>6} {'p50 int.':>9} {'máx int.':>9}")
+
+    llm = FakeLLM(cuota=args.cuota, ventana=1.0, latencia=args.latencia)
+    _fila("Retrasos fijos", llm, *asyncio.run(escenario_retrasos_fijos(llm, args.lote, args.interactivas, args.escalon)), n)
+
+    llm = FakeLLM(cuota=args.cuota, ventana=1.0, latencia=args.latencia)
+    total, fallidas, latencias, stats = asyncio.run(
+        escenario_planificador(llm, args.lote, args.interactivas, rpm_configurado=args.cuota * 60 * 2, concurrencia=16)
+    )
+    _fila("Planificador", llm, total, fallidas, latencias, n)
+    print(f"  reintentos={stats['reintentos']} rpm final={stats['rpm_actual']} (máx {stats['rpm_max']})")
+
+
+if __name__ == "__main__":
+    main()
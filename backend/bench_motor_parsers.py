@@ -0,0 +1,119 @@
+"""
+Benchmark: parsers por fila (motor_service) vs. motor columnar (motor_columnar).
+
+Usa los archivos de ejemplo de Edufácil en la raíz del repositorio y además una
+versión "año completo" de los Excel de atrasos/anotaciones (filas replicadas)
+para medir el camino que más CPU consume cuando un colegio sube todo el año.
+
+La columna "Lectura" es el costo de `read_html`/`read_excel`, común a ambos
+motores; la diferencia entre "Por fila" y "Columnar" es el cómputo ahorrado.
+
+Uso:
+    cd backend
+    python bench_motor_parsers.py [--repeticiones 5] [--escala 10]
+"""
+import argparse
+import glob
+import io
+import os
+import sys
+import time
+import warnings
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services import motor_columnar, motor_service  # noqa: E402
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PARSERS = {
+    "Frecuencia_Calificaciones": "parse_calificaciones",
+    "Excel_Atrasos": "parse_atrasos",
+    "Excel_Anotaciones": "parse_anotaciones",
+}
+
+
+def _parser_para(nombre_archivo: str) -> str:
+    for prefijo, parser in PARSERS.items():
+        if os.path.basename(nombre_archivo).startswith(prefijo):
+            return parser
+    # Los .xls numerados son 'Informe de Situación Detallado'
+    return "parse_calificaciones"
+
+
+def _escalar_excel(contenido: bytes, factor: int) -> bytes:
+    """Replica las filas de un Excel para simular un año completo de registros."""
+    df = pd.read_excel(io.BytesIO(contenido))
+    buffer = io.BytesIO()
+    pd.concat([df] * factor, ignore_index=True).to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def _leer(contenido: bytes):
+    """Solo la lectura del archivo (HTML o Excel), común a ambos motores."""
+    if contenido[:2] == b"PK":
+        return pd.read_excel(io.BytesIO(contenido))
+    return pd.read_html(io.BytesIO(contenido))
+
+
+def _medir(funcion, contenido: bytes, repeticiones: int) -> float:
+    """Mejor tiempo (ms) de `repeticiones` ejecuciones."""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(contenido)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--escala", type=int, default=10, help="Factor de réplica para los Excel de año completo")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+
+    casos = []
+    for ruta in sorted(glob.glob(os.path.join(RAIZ_REPO, "*.xls*"))):
+        with open(ruta, "rb") as f:
+            contenido = f.read()
+        parser_nombre = _parser_para(ruta)
+        casos.append((os.path.basename(ruta), parser_nombre, contenido))
+        if ruta.endswith(".xlsx") and args.escala > 1:
+            casos.append((
+                f"{os.path.basename(ruta)} x{args.escala}",
+                parser_nombre,
+                _escalar_excel(contenido, args.escala),
+            ))
+
+    if not casos:
+        print("No se encontraron archivos .xls/.xlsx de ejemplo en la raíz del repositorio.")
+        return
+
+    print(
+        f"{'Archivo':<56} {'Parser':<22} {'Lectura (ms)':>13} "
+        f"{'Por fila (ms)':>14} {'Columnar (ms)':>14} {'Speedup':>8}  Iguales"
+    )
+    print("-" * 142)
+    for nombre, parser_nombre, contenido in casos:
+        legacy = getattr(motor_service, parser_nombre)
+        columnar = getattr(motor_columnar, parser_nombre)
+        try:
+            iguales = legacy(contenido) == columnar(contenido)
+        except Exception as e:
+            print(f"{nombre[:56]:<56} {parser_nombre:<22} error: {e}")
+            continue
+        t_lectura = _medir(_leer, contenido, args.repeticiones)
+        t_legacy = _medir(legacy, contenido, args.repeticiones)
+        t_columnar = _medir(columnar, contenido, args.repeticiones)
+        print(
+            f"{nombre[:56]:<56} {parser_nombre:<22} {t_lectura:>13.1f} {t_legacy:>14.1f} {t_columnar:>14.1f} "
+            f"{t_legacy / t_columnar:>7.1f}x  {'sí' if iguales else 'NO'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark: lectura OMR hoja por hoja vs. lote en el pool de procesos.
+
+Genera hojas sintéticas (app/hojas_omr_sinteticas.py, misma geometría que
+`OMRTemplateGenerator`), opcionalmente reescaladas al tamaño de una foto de
+celular de 12 MP, y mide hojas por segundo:
+
+- "Secuencial": `OMRVisionService.process_image` en un solo proceso (lo que
+  hacía /api/v1/omr/process sobre el event loop).
+- "Pool": `procesar_lote_omr`, que reparte las hojas en el pool de procesos
+  compartido (PROFEIC_POOL_WORKERS o un worker por núcleo).
+
+Uso:
+    cd backend
+    python bench_omr_lote.py [--hojas 24] [--foto-12mp]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.vision_service import OMRVisionService  # noqa: E402
+from services.omr_lote import procesar_lote_omr  # noqa: E402
+from app.core.executors import get_process_pool, shutdown_process_pool  # noqa: E402
+from app.hojas_omr_sinteticas import hoja_aleatoria  # noqa: E402
+
+
+async def _lote(hojas):
+    async for _ in procesar_lote_omr(hojas):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hojas", type=int, default=24)
+    parser.add_argument("--foto-12mp", action="store_true", help="Reescalar las hojas a 3024x4032 (foto de celular)")
+    args = parser.parse_args()
+
+    tamano = (3024, 4032) if args.foto_12mp else None
+    hojas = []
+    for n in range(args.hojas):
+        _, _, contenido = hoja_aleatoria(n, tamano)
+        hojas.append((f"hoja_{n:03d}.jpg", contenido))
+
+    print(f"{len(hojas)} hojas {'3024x4032' if tamano else '1700x2200'}, {os.cpu_count()} núcleos")
+
+    inicio = time.perf_counter()
+    for _, contenido in hojas:
+        OMRVisionService.process_image(contenido)
+    t_secuencial = time.perf_counter() - inicio
+
+    get_process_pool()  # arrancar los workers fuera de la medición
+    inicio = time.perf_counter()
+    asyncio.run(_lote(hojas))
+    t_pool = time.perf_counter() - inicio
+    shutdown_process_pool()
+
+    print(f"{'Modo':<12} {'Tiempo (s)':>11} {'Hojas/s':>9}")
+    print(f"{'Secuencial':<12} {t_secuencial:>11.2f} {len(hojas) / t_secuencial:>9.1f}")
+    print(f"{'Pool':<12} {t_pool:>11.2f} {len(hojas) / t_pool:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -50,7 +50,11 @@ from routers import (
     pme
 )
 from app.api.v1.endpoints import motor
+from app.core.executors import shutdown_process_pool
+from app.services.export_jobs import trabajos_exportacion
+from app.services import docx_plantillas
 from simce_router import router as simce_router
+import simce_assets
 
 app = FastAPI(title="API ProfeIC", version="4.0.0")
 
@@ -101,6 +105,34 @@ app.include_router(simce_router) # Nuevo router híbrido
 app.include_router(motor.router, prefix="/api/v1/motor", tags=["motor"])
 
 
+@app.on_event("startup")
+def precargar_assets_simce():
+    simce_assets.precargar()
+
+
+@app.on_event("startup")
+def precargar_plantillas_docx():
+    # Antes de que se cree el pool de procesos: los workers heredan las plantillas armadas
+    docx_plantillas.precargar()
+
+
+# Los handlers de shutdown corren en orden de registro: las exportaciones en curso
+# renderizan en el pool de procesos, así que terminan antes de cerrarlo
+@app.on_event("shutdown")
+def terminar_exportaciones():
+    trabajos_exportacion.cerrar()
+
+
+@app.on_event("shutdown")
+def cerrar_pools():
+    shutdown_process_pool()
+
+
+@app.on_event("shutdown")
+async def vaciar_telemetria():
+    await telemetry.buffer_eventos.detener()
+
+
 @app.get("/")
 def read_root():
     return {"status": "ProfeIC API is running smoothly!"}
@@ -3,9 +3,10 @@ import csv
 import google.generativeai as genai
 import os
 import io
-from fastapi import APIRouter, HTTPException, UploadFile, File, Depends
+from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, Request
 from pydantic import BaseModel
-from supabase import create_client, Client
+from supabase import Client
+from app.db.supabase import obtener_cliente
 from docx import Document
 from docx.shared import Pt, Inches, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
@@ -14,6 +15,8 @@ import time
 import json
 from fastapi.responses import StreamingResponse
 from routers.deps import get_current_user_id
+from app.services.llm_client import cliente_llm
+from app.services.llm_cache import json_valido
 
 router = APIRouter()
 
@@ -27,7 +30,7 @@ supabase_key = role_key if role_key and role_key != "false_role_key" else os.get
 if api_key:
     genai.configure(api_key=api_key)
 
-supabase: Client = create_client(supabase_url, supabase_key)
+supabase: Client = obtener_cliente(supabase_url, supabase_key)
 
 # --- MODELOS ---
 class FlashFeedbackRequest(BaseModel):
@@ -47,7 +50,7 @@ def sanitize_text(text: str) -> str:
 
 # --- ENDPOINT: FLASH FEEDBACK (NIVEL 1) ---
 @router.post("/acompanamiento/flash-feedback")
-async def generate_flash_feedback(req: FlashFeedbackRequest, user_id: str = Depends(get_current_user_id)):
+async def generate_flash_feedback(req: FlashFeedbackRequest, request: Request, user_id: str = Depends(get_current_user_id)):
     try:
         # 1. Obtener Datos del Ciclo
         # Fetch Cycle & Profile
@@ -110,13 +113,12 @@ async def generate_flash_feedback(req: FlashFeedbackRequest, user_id: str = Depe
         """
 
         # 4. Llamada a Gemini
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        response = model.generate_content(prompt)
+        texto = await cliente_llm.generar("acompanamiento", prompt, request=request, validar=json_valido)
         
         import json
         try:
             # Intentar limpiar si viene con markdown ```json ... ```
-            clean_text = response.text.replace("```json", "").replace("```", "").strip()
+            clean_text = texto.replace("```json", "").replace("```", "").strip()
             result_json = json.loads(clean_text)
             return result_json
         except json.JSONDecodeError:
@@ -137,9 +139,6 @@ async def transcribe_observation(file: UploadFile = File(...)):
         # 1. Leer contenido del audio
         audio_content = await file.read()
         
-        # 2. Configurar el modelo (usando gemini-2.5-flash)
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        
         # 3. Prompt de transcripción pedagógica
         prompt = """
         TRANSCRIPCIÓN PEDAGÓGICA:
@@ -151,15 +150,15 @@ async def transcribe_observation(file: UploadFile = File(...)):
         """
         
         # 4. Llamada multimodal
-        response = model.generate_content([
+        texto = await cliente_llm.generar("acompanamiento", [
             prompt,
             {
                 "mime_type": file.content_type or "audio/webm",
                 "data": audio_content
             }
-        ], request_options={"timeout": 120})
+        ], timeout=120)
         
-        return {"text": response.text.strip()}
+        return {"text": texto.strip()}
 
     except Exception as e:
         print(f"Error Transcripción: {e}")
@@ -322,11 +321,14 @@ FORMATO JSON ESPERADO (NO USAR COMILLAS TRIPLES, SÓLO JSON VÁLIDO):
   "suggested_training": ["...", "..."]
 }}"""
     
-    model = genai.GenerativeModel('gemini-2.5-flash', generation_config={"response_mime_type": "application/json", "temperature": 0.0})
-    response = model.generate_content(prompt, request_options={"timeout": 120})
+    texto = await cliente_llm.generar(
+        "acompanamiento", prompt,
+        generation_config={"response_mime_type": "application/json", "temperature": 0.0},
+        timeout=120
+    )
     
     try:
-        clean_text = response.text.replace("```json", "").replace("```", "").strip()
+        clean_text = texto.replace("```json", "").replace("```", "").strip()
         analysis = json.loads(clean_text)
     except Exception as e:
         import logging
@@ -540,7 +542,7 @@ class ExecutiveRequest(BaseModel):
     author_id: Optional[str] = None 
 
 @router.post("/acompanamiento/executive-report")
-async def generate_executive_report(req: ExecutiveRequest):
+async def generate_executive_report(req: ExecutiveRequest, request: Request):
     try:
         # 1. Build Query for Completed Cycles with Teacher Data AND Observer Data explicitly for DOCX
         query = supabase.table('observation_cycles')\
@@ -888,16 +890,20 @@ async def generate_executive_report(req: ExecutiveRequest):
 
         # 6. Call Gemini
         # We enforce JSON output to prevent parsing errors due to markdown or unescaped characters
-        model = genai.GenerativeModel('gemini-2.5-flash', generation_config={"response_mime_type": "application/json"})
-        response = model.generate_content(prompt, request_options={"timeout": 120})
+        texto = await cliente_llm.generar(
+            "acompanamiento", prompt,
+            generation_config={"response_mime_type": "application/json"},
+            timeout=120,
+            request=request,
+            validar=lambda t: json.loads(t.strip())
+        )
         
-        import json
         try:
-             clean_text = response.text.strip()
+             clean_text = texto.strip()
              ai_result = json.loads(clean_text)
         except Exception as e:
             print(f"ERROR PARSING GEMINI JSON: {e}")
-            print(f"RAW TEXT: {response.text}")
+            print(f"RAW TEXT: {texto}")
             ai_result = {
                 "systemic_summary": {
                     "fortalezas_clave": [],
@@ -1,9 +1,15 @@
 import os
 from fastapi import APIRouter, HTTPException, Depends, Header
 from pydantic import BaseModel
-from supabase import create_client, Client
+from supabase import Client
+from app.db.supabase import obtener_cliente, en_hilo, estadisticas as estadisticas_db
 from .analytics_service import calculate_global_stats
 from .deps import verify_super_admin
+from app.services.llm_cache import llm_cache
+from app.services.llm_client import cliente_llm
+from app.services.llm_scheduler import planificador_llm
+from app.services.docx_render import motor_render
+from app.services.export_jobs import trabajos_exportacion
 
 router = APIRouter(prefix="/admin", tags=["SuperAdmin"])
 
@@ -21,7 +27,7 @@ if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY or "false" in SUPABASE_URL:
     supabase_admin: Client = None
 else:
     try:
-        supabase_admin = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+        supabase_admin = obtener_cliente(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
     except Exception as e:
         print(f"ERROR: Failed to initialize Supabase Admin: {e}")
         supabase_admin = None
@@ -248,10 +254,45 @@ async def get_admin_stats(_ = Depends(verify_super_admin)):
 
     print("📈 Admin Stats: Start (Centralized)...")
     try:
-        stats = calculate_global_stats(supabase_admin)
+        stats = await en_hilo(calculate_global_stats, supabase_admin, nombre="analytics.global")
         stats["version"] = "v1.2.1-FinalSync" 
         return stats
 
     except Exception as e:
         print(f"❌ Error en stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/llm-cache")
+async def get_llm_cache_stats(_ = Depends(verify_super_admin)):
+    """Aciertos, fallos, hit rate y segundos de LLM ahorrados por la caché de respuestas, por ruta."""
+    return llm_cache.stats()
+
+
+@router.delete("/llm-cache")
+async def clear_llm_cache(_ = Depends(verify_super_admin)):
+    """Vacía la caché de respuestas del LLM (p. ej. tras cambiar un prompt de sistema)."""
+    llm_cache.limpiar()
+    return {"status": "ok"}
+
+
+@router.get("/llm-metricas")
+async def get_llm_metrics(_ = Depends(verify_super_admin)):
+    """Latencias por ruta del cliente LLM, estado del planificador (cupos, cola, 429) y de la caché."""
+    return {
+        "cliente": cliente_llm.estadisticas(),
+        "planificador": planificador_llm.estadisticas(),
+        "cache": llm_cache.stats()
+    }
+
+
+@router.get("/db-metricas")
+async def get_db_metrics(_ = Depends(verify_super_admin)):
+    """Clientes Supabase compartidos y latencia por consulta de la capa de acceso a datos."""
+    return estadisticas_db()
+
+
+@router.get("/render-metricas")
+async def get_render_metrics(_ = Depends(verify_super_admin)):
+    """Renders DOCX en el pool de procesos (cola, duración, memoria) y almacén de exportaciones."""
+    return {"render": motor_render.estadisticas(), "exportaciones": trabajos_exportacion.almacen.stats()}
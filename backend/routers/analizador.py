@@ -1,12 +1,14 @@
-from fastapi import APIRouter, HTTPException, Header, Depends
+from fastapi import APIRouter, HTTPException, Header, Depends, Request
 from pydantic import BaseModel
 from typing import Optional
 import os
 import json
 import google.generativeai as genai
-from supabase import create_client, Client
+from supabase import Client
+from app.db.supabase import obtener_cliente
 from collections import Counter
 from routers.deps import get_current_user_id
+from app.services.llm_client import cliente_llm
 
 
 # --- CONFIGURACIÓN DB (SUPABASE) ---
@@ -15,7 +17,7 @@ SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv(
 
 supabase: Client = None
 if SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY:
-    supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+    supabase = obtener_cliente(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
 else:
     print("⚠️ ADVERTENCIA: No se configuró Supabase. El guardado no funcionará.")
 
@@ -108,7 +110,7 @@ def build_analysis_prompt(oa: str, evaluacion: str, contexto_escenario: str) ->
 
 
 @router.post("/audit")
-async def auditar_instrumento(request: AnalisisRequest, user_id: str = Depends(get_current_user_id)):
+async def auditar_instrumento(request: AnalisisRequest, http_request: Request, user_id: str = Depends(get_current_user_id)):
     try:
         print(f"🧠 Analizando DOK con {MODEL_NAME} (temperatura=0, Webb+Mentoría)...")
 
@@ -118,19 +120,16 @@ async def auditar_instrumento(request: AnalisisRequest, user_id: str = Depends(g
             contexto_escenario=request.contexto_escenario
         )
 
-        model = genai.GenerativeModel(
-            model_name=MODEL_NAME,
+        texto = (await cliente_llm.generar(
+            "analizador", prompt,
+            modelo=MODEL_NAME,
             generation_config={
                 "response_mime_type": "application/json",
                 "temperature": 0.0,
-            }
-        )
-
-        response = model.generate_content(
-            prompt,
-            request_options={"timeout": 120}
-        )
-        texto = response.text.strip()
+            },
+            timeout=120,
+            request=http_request
+        )).strip()
 
         # Limpieza robusta de markdown
         if texto.startswith("```json"):
@@ -1,7 +1,20 @@
-import os
-from typing import Dict, Any, List, Set
+"""
+Product analytics for /telemetry/analytics and /admin/stats.
+
+Aggregates are read from the daily rollups in `analytics_rollup_diario`
+(migration 20260610_analytics_rollups.sql). Triggers keep them up to date on
+every telemetry event and library resource, and the `analytics_resumen(desde)`
+RPC returns one row per (email, module, source). Each request therefore reads
+those rows plus the 25 most recent events, no matter how much telemetry has
+accumulated. Until the migration is applied, the same rows are built here
+from the raw tables (`acumular_rollups`, same rules as the SQL triggers).
+"""
+import logging
+from typing import Dict, Any, List, Optional, Set
 from supabase import Client
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
+
+logger = logging.getLogger(__name__)
 
 SAVED_MINUTES_MAP = {
     "planificador": 85,
@@ -50,12 +63,77 @@ def parse_datetime_to_utc(dt_str: str) -> datetime:
         dt = dt.astimezone(timezone.utc)
     return dt
 
-def calculate_global_stats(supabase: Client, period: str = "all", school_id: str = None):
+RECENT_EVENTS_LIMIT = 25
+ROLLUP_PAGE_SIZE = 1000
+SUPER_ADMIN_EMAIL = "re.se.alvarez@gmail.com"
+
+
+def modulo_evento(module: Optional[str]) -> str:
+    """Normalize a telemetry module: last path segment, underscores as dashes."""
+    mod = module or 'unknown'
+    return mod.split('/')[-1].replace('_', '-')
+
+
+def es_exito(event_name: Optional[str]) -> bool:
+    """Events that count as a successful use of a tool (generation, export)."""
+    name = (event_name or '').lower()
+    return 'success' in name or 'generar' in name or 'export' in name
+
+
+def acumular_rollups(events: List[Dict[str, Any]], lib_items: List[Dict[str, Any]], email_by_user: Dict[str, str], desde: Optional[date] = None) -> List[Dict[str, Any]]:
     """
-    Core logic to calculate global engagement and impact metrics.
-    Ensures consistency between Admin and Telemetry dashboards.
-    Supports period parameter ('7d', '30d', 'all') and computes inactivity radar with school isolation.
+    Python mirror of `analytics_resumen(desde)`: one row per (email, modulo, fuente)
+    with total, page_views, exitos, regeneraciones and ultima_actividad.
     """
+    rows: Dict[tuple, Dict[str, Any]] = {}
+
+    def add(email: str, modulo: str, fuente: str, created_at: Optional[str], **counters):
+        dt = parse_datetime_to_utc(created_at) if created_at else None
+        if desde and dt and dt.date() < desde:
+            return
+        row = rows.setdefault((email, modulo, fuente), {
+            "email": email, "modulo": modulo, "fuente": fuente,
+            "total": 0, "page_views": 0, "exitos": 0, "regeneraciones": 0, "ultima_actividad": None
+        })
+        row["total"] += 1
+        for key, value in counters.items():
+            row[key] += value
+        if dt and (row["ultima_actividad"] is None or dt > row["ultima_actividad"]):
+            row["ultima_actividad"] = dt
+
+    for ev in events:
+        name = ev.get('event_name', '') or ''
+        add(
+            ev.get('email') or 'anonymous', modulo_evento(ev.get('module')), 'evento', ev.get('created_at'),
+            page_views=int(name == 'page_view'), exitos=int(es_exito(name)), regeneraciones=int(name == 'regenerate_question')
+        )
+    for item in lib_items:
+        add(
+            email_by_user.get(item.get('user_id')) or 'anonymous', LIB_MAP.get(str(item.get('tipo', '')).upper(), 'unknown'),
+            'recurso', item.get('created_at')
+        )
+
+    for row in rows.values():
+        if row["ultima_actividad"] is not None:
+            row["ultima_actividad"] = row["ultima_actividad"].isoformat()
+    return list(rows.values())
+
+
+def _leer_rollups(supabase: Client, desde: Optional[date]) -> List[Dict[str, Any]]:
+    """Rows of the `analytics_resumen` RPC, paginated (PostgREST caps each response)."""
+    rows: List[Dict[str, Any]] = []
+    params = {"desde": desde.isoformat() if desde else None}
+    offset = 0
+    while True:
+        data = supabase.rpc("analytics_resumen", params).range(offset, offset + ROLLUP_PAGE_SIZE - 1).execute().data or []
+        rows.extend(data)
+        if len(data) < ROLLUP_PAGE_SIZE:
+            return rows
+        offset += ROLLUP_PAGE_SIZE
+
+
+def _rollups_desde_tablas(supabase: Client, desde_periodo: Optional[date], profiles: List[Dict[str, Any]]):
+    """Fallback while the rollup migration is not applied: pages through the raw tables."""
     def fetch_all_rows(table_name: str, select_query: str = '*'):
         # Get real total to avoid guessing loop ends (Lighter query using limit(0))
         try:
@@ -81,44 +159,78 @@ def calculate_global_stats(supabase: Client, period: str = "all", school_id: str
                 break
         return all_rows
 
-    # 1. Fetch Data with Exact Counts for UI clarity
+    events = fetch_all_rows('telemetry_events', 'event_name, module, email, created_at')
+    lib_items = fetch_all_rows('biblioteca_recursos', 'tipo, user_id, created_at')
+    email_by_user = {p['id']: p.get('email') for p in profiles if p.get('email')}
+    historico = acumular_rollups(events, lib_items, email_by_user)
+    periodo = acumular_rollups(events, lib_items, email_by_user, desde_periodo) if desde_periodo else historico
+    return periodo, historico
+
+
+def calculate_global_stats(supabase: Client, period: str = "all", school_id: str = None):
+    """
+    Core logic to calculate global engagement and impact metrics.
+    Ensures consistency between Admin and Telemetry dashboards.
+    Supports period parameter ('7d', '30d', 'all') and computes inactivity radar with school isolation.
+    """
+    # Parse period time range (rollups are daily: the first day counts whole)
+    ahora = datetime.now(timezone.utc)
+    threshold = None
+    if period == "7d":
+        threshold = ahora - timedelta(days=7)
+    elif period == "30d":
+        threshold = ahora - timedelta(days=30)
+    desde_periodo = threshold.date() if threshold else None
+
     try:
         res_auth = supabase.table('authorized_users').select('email', count='exact').limit(0).execute()
         total_authorized = res_auth.count or 1
-        
-        res_evt_count = supabase.table('telemetry_events').select('id', count='exact').limit(0).execute()
-        db_total_events = res_evt_count.count or 0
-        
-        res_lib_count = supabase.table('biblioteca_recursos').select('id', count='exact').limit(0).execute()
-        db_total_resources = res_lib_count.count or 0
     except Exception as e:
         print(f"⚠️ Primary counts failed: {e}")
         total_authorized = 1
-        db_total_events = 0
-        db_total_resources = 0
 
-    # Fetching only necessary columns to handle 100k rows without memory issues
-    events = fetch_all_rows('telemetry_events', 'id, event_name, module, email, metadata, created_at')
-    
-    # Sort events descending by date for recent_events
-    events.sort(key=lambda x: x.get('created_at', ''), reverse=True)
+    res_profiles = supabase.table('profiles').select('id, email, full_name, school_id, updated_at').execute()
+    all_profiles = res_profiles.data or []
 
-    lib_items = fetch_all_rows('biblioteca_recursos', 'tipo, user_id, created_at')
+    # 1. Rollups: one row per (email, module, source), for the period and for all history
+    try:
+        historico = _leer_rollups(supabase, None)
+        periodo = _leer_rollups(supabase, desde_periodo) if desde_periodo else historico
+    except Exception as e:
+        logger.warning("Rollups de analítica no disponibles (%s); agregando desde las tablas crudas.", e)
+        periodo, historico = _rollups_desde_tablas(supabase, desde_periodo, all_profiles)
+
+    try:
+        res_recent = supabase.table('telemetry_events').select('id, event_name, module, email, metadata, created_at') \
+            .order('created_at', desc=True).limit(RECENT_EVENTS_LIMIT).execute()
+        recent_events = res_recent.data or []
+    except Exception as e:
+        print(f"⚠️ Error fetching recent events: {e}")
+        recent_events = []
+
+    db_total_events = sum(r['total'] for r in historico if r['fuente'] == 'evento')
+    db_total_resources = sum(r['total'] for r in historico if r['fuente'] == 'recurso')
+    impactful_events_count = sum(r['total'] - r['page_views'] for r in historico if r['fuente'] == 'evento')
 
-    res_profiles = supabase.table('profiles').select('id, email, full_name, school_id, updated_at').execute()
-    profiles_data = res_profiles.data or []
-    
     # Filter profiles by school_id if specified (multitenancy isolation)
-    if school_id and school_id != "all" and school_id != "undefined":
+    profiles_data = all_profiles
+    school_filter = school_id and school_id != "all" and school_id != "undefined"
+    if school_filter:
         profiles_data = [p for p in profiles_data if p.get('school_id') == school_id]
         
-    profile_map = {p['id']: {"email": p.get('email', 'anon'), "name": p.get('full_name', 'Docente')} for p in profiles_data}
     email_to_name = {p.get('email'): p.get('full_name', 'Docente') for p in profiles_data if p.get('email')}
-    user_to_school = {p['id']: p.get('school_id') or "individual" for p in profiles_data}
+
+    def in_scope(row: Dict[str, Any]) -> bool:
+        # Multi-tenancy filter: anonymous events still count, anonymous resources do not
+        if not school_filter:
+            return True
+        if row['email'] == 'anonymous':
+            return row['fuente'] == 'evento'
+        return row['email'] in email_to_name
 
     # 2. Process Metrics
     total_saved_minutes = 0
-    module_usage: Dict[str, int] = {}
+    module_usage: Dict[str, float] = {}
     user_activity: Dict[str, int] = {}
     user_exploration: Dict[str, int] = {}
     user_distinct_modules: Dict[str, Set[str]] = {}
@@ -135,126 +247,57 @@ def calculate_global_stats(supabase: Client, period: str = "all", school_id: str
                     user_last_active[email] = dt
             except Exception:
                 pass
+
+    # Track absolute last active for inactivity radar (always historical)
+    for row in historico:
+        email = row['email']
+        if email == 'anonymous' or not row.get('ultima_actividad') or not in_scope(row):
+            continue
+        dt = parse_datetime_to_utc(row['ultima_actividad'])
+        if email not in user_last_active or dt > user_last_active[email]:
+            user_last_active[email] = dt
                 
     unique_active_users: Set[str] = set()
     friction_count = 0
 
-    # Parse period time range
-    ahora = datetime.now(timezone.utc)
-    threshold = None
-    if period == "7d":
-        threshold = ahora - timedelta(days=7)
-    elif period == "30d":
-        threshold = ahora - timedelta(days=30)
-
-    # 2.1 Process Library Resources (Proven Success)
-    for item in lib_items:
-        tipo = str(item.get('tipo', '')).upper()
-        uid = item.get('user_id')
-        
-        # Multi-tenancy filter
-        if school_id and school_id != "all" and school_id != "undefined":
-            if uid not in profile_map:
-                continue
-                
-        user_info = profile_map.get(uid, {"email": "anonymous", "name": "Anónimo"})
-        email = user_info["email"]
-        created_at_str = item.get('created_at', '')
-        
-        # Track absolute last active for inactivity radar (always historical)
-        if created_at_str and email != "anonymous":
-            try:
-                dt = parse_datetime_to_utc(created_at_str)
-                if email not in user_last_active or dt > user_last_active[email]:
-                    user_last_active[email] = dt
-            except Exception:
-                pass
+    for row in periodo:
+        if not in_scope(row) or row['total'] <= 0:
+            continue
+        email = row['email']
+        mod = row['modulo']
 
-        # Apply date filter for active period stats
-        if threshold and created_at_str:
-            try:
-                dt = parse_datetime_to_utc(created_at_str)
-                if dt < threshold:
-                    continue
-            except Exception:
-                pass
-        
         if email != "anonymous":
             unique_active_users.add(email)
-            user_activity[email] = user_activity.get(email, 0) + 1
-        
-        mod_key = LIB_MAP.get(tipo, "unknown")
-        if mod_key != "unknown":
-            total_saved_minutes += SAVED_MINUTES_MAP.get(mod_key, 0)
-            module_usage[mod_key] = module_usage.get(mod_key, 0) + 1
+            user_activity[email] = user_activity.get(email, 0) + row['total']
 
-    # 2.2 Process Telemetry Events (Interaction/Drift)
-    for ev in events:
-        mod = ev.get('module', 'unknown') or 'unknown'
-        # Normalize: Remove paths and convert underscores to dashes
-        mod_clean = (mod.split('/')[-1] if '/' in mod else mod).replace('_', '-')
-        email = ev.get('email', 'anonymous')
-        
-        # Multi-tenancy filter
-        if school_id and school_id != "all" and school_id != "undefined":
-            if email != "anonymous" and email not in email_to_name:
-                continue
-                
-        event_name = ev.get('event_name', '')
-        created_at_str = ev.get('created_at', '')
-        
-        # Track absolute last active for inactivity radar (always historical)
-        if created_at_str and email != "anonymous":
-            try:
-                dt = parse_datetime_to_utc(created_at_str)
-                if email not in user_last_active or dt > user_last_active[email]:
-                    user_last_active[email] = dt
-            except Exception:
-                pass
+        # 2.1 Library Resources (Proven Success)
+        if row['fuente'] == 'recurso':
+            if mod != "unknown":
+                total_saved_minutes += SAVED_MINUTES_MAP.get(mod, 0) * row['total']
+                module_usage[mod] = module_usage.get(mod, 0) + row['total']
+            continue
 
-        # Apply date filter for active period stats
-        if threshold and created_at_str:
-            try:
-                dt = parse_datetime_to_utc(created_at_str)
-                if dt < threshold:
-                    continue
-            except Exception:
-                pass
-        
+        # 2.2 Telemetry Events (Interaction/Drift)
         if email != "anonymous":
-            unique_active_users.add(email)
-            user_activity[email] = user_activity.get(email, 0) + 1
-            
             # Count navigation/exploration page views
-            if event_name == 'page_view':
-                user_exploration[email] = user_exploration.get(email, 0) + 1
-                
+            if row['page_views']:
+                user_exploration[email] = user_exploration.get(email, 0) + row['page_views']
             # Track variety of modules accessed
-            if mod_clean and mod_clean != 'unknown':
-                if email not in user_distinct_modules:
-                    user_distinct_modules[email] = set()
-                user_distinct_modules[email].add(mod_clean)
+            if mod and mod != 'unknown':
+                user_distinct_modules.setdefault(email, set()).add(mod)
 
-        if event_name == 'regenerate_question':
-            friction_count += 1
+        friction_count += row['regeneraciones']
 
         # Hybrid weight for interaction success without saving
-        if 'success' in event_name.lower() or 'generar' in event_name.lower() or 'export' in event_name.lower():
-            if mod_clean in SAVED_MINUTES_MAP:
-                # Add 40% (increased from 35%) weight for using the tool successfully
-                total_saved_minutes += (SAVED_MINUTES_MAP.get(mod_clean, 0) * 0.40)
-                module_usage[mod_clean] = module_usage.get(mod_clean, 0) + 0.40
-
-    # Filter out page_views from the "Impactful Events" count if desired,
-    # or keep them if they want "Total Raw Events". Since they requested "Total Events",
-    # and "we have many more than 1000", they are likely tracking everything.
-    # We will keep raw count but provide a clean metric.
-    impactful_events = [ev for ev in events if ev.get('event_name') != 'page_view']
+        if row['exitos'] and mod in SAVED_MINUTES_MAP:
+            # Add 40% (increased from 35%) weight for using the tool successfully
+            total_saved_minutes += SAVED_MINUTES_MAP.get(mod, 0) * 0.40 * row['exitos']
+            module_usage[mod] = module_usage.get(mod, 0) + 0.40 * row['exitos']
 
     # 3. Final Aggregations
-    if school_id and school_id != "all" and school_id != "undefined":
+    if school_filter:
         total_authorized = len(profiles_data) or 1
-        
+
     adoption_pct = round((len(unique_active_users) / total_authorized) * 100, 1) if total_authorized > 0 else 0
     
     top_users = []
@@ -306,7 +349,7 @@ def calculate_global_stats(supabase: Client, period: str = "all", school_id: str
         sid = p.get('school_id') or "individual"
         school_name = schools_name_map.get(sid, "Individual")
         
-        if not email or email == "re.se.alvarez@gmail.com":
+        if not email or email == SUPER_ADMIN_EMAIL:
             continue # Skip super admin or empty email
             
         last_active_dt = user_last_active.get(email)
@@ -345,7 +388,7 @@ def calculate_global_stats(supabase: Client, period: str = "all", school_id: str
             "saved_hours": round(total_saved_minutes / 60, 1),
             "total_resources": db_total_resources,
             "total_events": db_total_events,
-            "impactful_events_count": len(impactful_events),
+            "impactful_events_count": impactful_events_count,
             "friction_count": friction_count
         },
         "top_modules": sorted_modules,
@@ -353,6 +396,6 @@ def calculate_global_stats(supabase: Client, period: str = "all", school_id: str
         "top_explorers": top_explorers,
         "inactive_teachers": inactive_teachers,
         "school_stats": school_stats,
-        "recent_events": events[:25],
+        "recent_events": recent_events,
         "last_updated": ahora.isoformat()
     }
@@ -1,11 +1,13 @@
 from fastapi import APIRouter, HTTPException, Depends, Header
 from pydantic import BaseModel
 import os
-from supabase import create_client, Client
+from supabase import Client
+from app.db.supabase import obtener_cliente
 from fastapi import UploadFile, File, Form
 from app.services.storage import storage
 from app.services.file_engine import extract_text_from_pdf
-from routers.deps import get_current_user_id
+from routers.deps import get_current_user_id, verificar_token
+from app.services import indice_cobertura
 
 
 router = APIRouter(
@@ -20,7 +22,7 @@ SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY
 
 supabase: Client = None
 if SUPABASE_URL and SUPABASE_KEY:
-    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    supabase = obtener_cliente(SUPABASE_URL, SUPABASE_KEY)
 else:
     print("⚠️ ADVERTENCIA: Supabase no configurado en biblioteca.py")
 
@@ -77,9 +79,7 @@ async def upload_resource(
         if authorization and supabase:
             try:
                 token = authorization.replace("Bearer ", "").strip()
-                user_resp = supabase.auth.get_user(token)
-                if user_resp and user_resp.user:
-                    upload_user_id = user_resp.user.id
+                upload_user_id = (await verificar_token(token)).id
             except Exception as auth_err:
                 print(f"⚠️ No se pudo validar token en upload: {auth_err}")
         
@@ -136,69 +136,10 @@ async def guardar_recurso(
             "contenido": data.contenido
         }
         
-        res = supabase.table("biblioteca_recursos").insert(registro).execute()
-        
-        if res.data:
-            recurso_id = res.data[0]['id']
-            
-            # --- NUEVO: Registrar en cobertura_curricular ---
-            try:
-                oas_a_registrar = set()
-                contenido = data.contenido
-                
-                # 1. Extraer oas de oaId o oaDescripcion (Rúbricas, etc)
-                if "oaId" in contenido and contenido["oaId"] and str(contenido["oaId"]).lower() != "manual":
-                    oas_a_registrar.add(str(contenido["oaId"]))
-                elif "oaDescripcion" in contenido and contenido["oaDescripcion"]:
-                    oas_a_registrar.add(str(contenido["oaDescripcion"])[:255])
-                    
-                # 2. Extraer de oaTexts (usado en Evaluaciones)
-                if "oaTexts" in contenido and isinstance(contenido["oaTexts"], list):
-                    for oa in contenido["oaTexts"]:
-                        if oa: oas_a_registrar.add(str(oa)[:255])
-                        
-                # 3. Extraer de customOa
-                if "customOa" in contenido and contenido["customOa"]:
-                    oas_a_registrar.add(str(contenido["customOa"])[:255])
-
-                # 4. Planificador / Otros que envían su propio array
-                # Si en el futuro planificador envía `mochila` o la IA devuelve `oas_asociados`
-                if "oas_asociados" in contenido and isinstance(contenido["oas_asociados"], list):
-                    for oa in contenido["oas_asociados"]:
-                        if oa: oas_a_registrar.add(str(oa)[:255])
-                
-                # Para planificador, la lista de OAs seleccionados suele estar en 'mochila'
-                if "mochila" in contenido and isinstance(contenido["mochila"], list):
-                    for oa_item in contenido["mochila"]:
-                        if isinstance(oa_item, dict) and "descripcion" in oa_item:
-                            oas_a_registrar.add(str(oa_item["descripcion"])[:255])
-                
-                # Para evitar basura
-                if data.asignatura.lower() not in ["", "general", "manual"] and \
-                   data.nivel.lower() not in ["", "general", "manual"]:
-                    
-                    cobertura_records = []
-                    for oa in oas_a_registrar:
-                        cobertura_records.append({
-                            "user_id": user_id,   # ← JWT verificado
-                            "nivel": data.nivel,
-                            "asignatura": data.asignatura,
-                            "oa_id": str(oa),
-                            "recurso_id": recurso_id,
-                            "tipo_recurso": data.tipo
-                        })
-                    
-                    if cobertura_records:
-                        supabase.table("cobertura_curricular").insert(cobertura_records).execute()
-                        print(f"✅ Registrados {len(cobertura_records)} OAs en la cobertura curricular.")
-                        
-            except Exception as ex:
-                print(f"⚠️ Error al registrar cobertura curricular: {ex}")
-                # No bloqueamos el guardado del recurso principal si falla el registro de cobertura
-                
-            return {"status": "success", "id": recurso_id}
-        else:
-            raise Exception("No se recibió confirmación de Supabase")
+        # El recurso y sus OAs (cobertura_curricular) se guardan juntos; los triggers
+        # mantienen el índice de cobertura y uso que leen los dashboards
+        recurso_id = await indice_cobertura.guardar_recurso(supabase, registro)
+        return {"status": "success", "id": recurso_id}
         
     except Exception as e:
         print(f"❌ Error guardando en biblioteca_recursos: {type(e).__name__}: {e}")
@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException, Body, Header, Depends
 from typing import List, Optional, Union
 from pydantic import BaseModel
 from supabase import create_client, Client, ClientOptions
+from app.db.supabase import obtener_cliente
 from routers.deps import get_current_user_id
 import os
 
@@ -16,10 +17,10 @@ service_key: str = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 # Prefer Service Role Key for Admin/Backend operations to bypass RLS
 if service_key:
     print("🔐 Usando Service Role Key para operaciones de comunidad (Bypass RLS)")
-    supabase: Client = create_client(url, service_key)
+    supabase: Client = obtener_cliente(url, service_key)
 else:
     print("⚠️ Usando Anon Key. Es probable que RLS bloquee actualizaciones si no hay sesión.")
-    supabase: Client = create_client(url, key)
+    supabase: Client = obtener_cliente(url, key)
 
 # --- MODELS ---
 class CommunityItem(BaseModel):
@@ -111,10 +112,14 @@ async def share_resource(req: ShareRequest, authorization: Optional[str] = Heade
         if authorization:
             token = authorization.replace("Bearer ", "")
             # Crear cliente temporal con el token del usuario usando ClientOptions
+            # (reutiliza el pool HTTP del cliente compartido: sin nuevo handshake TLS)
             current_client = create_client(
                 url, 
                 key, 
-                options=ClientOptions(headers={"Authorization": f"Bearer {token}"})
+                options=ClientOptions(
+                    headers={"Authorization": f"Bearer {token}"},
+                    httpx_client=obtener_cliente(url, key).options.httpx_client
+                )
             )
             print(f"🔐 Usando contexto de usuario autenticado para actualizar recurso {req.resource_id}")
 
@@ -4,15 +4,21 @@ Propósito: Subir documentos institucionales (PEI, RICE, Reglamentos) por colegi
 y vectorizarlos para búsqueda semántica (RAG multi-tenant) de forma segura y optimizada.
 """
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Header, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Header, Depends, BackgroundTasks
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
+import asyncio
 import google.generativeai as genai
-from supabase import create_client, Client
+from supabase import Client
+from app.db.supabase import obtener_cliente
 import os
 from pypdf import PdfReader
 import io
 from routers.deps import get_current_user_id
+from app.services.embeddings import (
+    crear_embedder, vectorizar_fragmentos, hash_contenido, trabajos_embedding
+)
 
 router = APIRouter()
 
@@ -24,30 +30,101 @@ supabase_key = os.getenv("SUPABASE_KEY")
 if api_key:
     genai.configure(api_key=api_key)
 
-supabase: Client = create_client(supabase_url, supabase_key)
+if not supabase_url or not supabase_key:
+    print("⚠️ Advertencia: Falta SUPABASE_URL o SUPABASE_KEY. El servidor iniciará, pero este módulo fallará.")
+    supabase = None
+else:
+    supabase: Client = obtener_cliente(supabase_url, supabase_key)
 
 
-# --- UTILIDAD: GENERAR EMBEDDING ---
-def get_embedding(text: str):
-    result = genai.embed_content(
-        model="models/text-embedding-004",
-        content=text,
-        task_type="retrieval_document",
-        title="Contexto Institucional"
-    )
-    return result['embedding']
+def _extraer_texto_pdf(contents: bytes) -> str:
+    pdf_reader = PdfReader(io.BytesIO(contents))
+    full_text = ""
+    for page in pdf_reader.pages:
+        text = page.extract_text()
+        if text:
+            full_text += text + "\n"
+    return full_text
+
+
+def _fragmentar(full_text: str, chunk_size: int = 1000, overlap: int = 100) -> List[str]:
+    """Fragmentos de `chunk_size` caracteres con `overlap` de solapamiento (se omiten los vacíos)."""
+    chunks = []
+    i = 0
+    while i < len(full_text):
+        chunk = full_text[i:i + chunk_size]
+        if chunk.strip():
+            chunks.append(chunk)
+        i += chunk_size - overlap
+    return chunks
+
+
+async def _vectorizar_y_guardar(job_id: str, chunks: List[str], filename: str, school_id: str, tipo_documento: str, embedder=None) -> dict:
+    """Vectoriza los fragmentos (lotes concurrentes, sin duplicados) y los inserta en una sola petición."""
+    unicos = len({hash_contenido(c) for c in chunks})
+    trabajos_embedding.actualizar(job_id, estado="vectorizando", fragmentos=len(chunks), fragmentos_unicos=unicos)
+    try:
+        vectores = await vectorizar_fragmentos(
+            chunks,
+            embedder or crear_embedder(),
+            on_progreso=lambda listos, total: trabajos_embedding.actualizar(job_id, vectorizados=listos)
+        )
+
+        bulk_data = [{
+            "content": chunk,
+            "metadata": {
+                "source": filename,
+                "tipo": tipo_documento,
+                "school_id": school_id
+            },
+            "embedding": vector,
+            "tipo_documento": tipo_documento,
+            "school_id": school_id
+        } for chunk, vector in zip(chunks, vectores)]
+
+        # Ejecutamos una única petición HTTP masiva (Bulk Insert) fuera del event loop
+        trabajos_embedding.actualizar(job_id, estado="guardando")
+        if bulk_data:
+            await asyncio.to_thread(lambda: supabase.table("documentos_institucionales").insert(bulk_data).execute())
+
+        print(f"   → [OK] Insertados {len(bulk_data)} fragmentos ({unicos} vectorizados) para colegio {school_id}.")
+        resultado = {
+            "status": "success",
+            "message": f"Procesados {len(bulk_data)} fragmentos de '{filename}'",
+            "chunks": len(bulk_data),
+            "chunks_unicos": unicos,
+            "school_id": school_id,
+            "tipo_documento": tipo_documento
+        }
+        trabajos_embedding.actualizar(job_id, estado="completado", resultado=resultado)
+        return resultado
+    except Exception as e:
+        print(f"❌ Error vectorizando contexto ({filename}): {e}")
+        trabajos_embedding.actualizar(job_id, estado="error", error=str(e))
+        raise
+
+
+async def _vectorizar_en_segundo_plano(*args) -> None:
+    try:
+        await _vectorizar_y_guardar(*args)
+    except Exception:
+        pass  # El error queda registrado en el estado del trabajo
 
 
 # ─────────────────────────────────────────────────────────
 # POST /upload-contexto
 # Sube un PDF institucional, lo fragmenta y vectoriza.
 # Acepta school_id para separar documentos por colegio de forma segura.
+# Con asincrono=true responde 202 de inmediato y la vectorización
+# sigue en segundo plano (estado en GET /upload-contexto/estado/{job_id}).
 # ─────────────────────────────────────────────────────────
 @router.post("/upload-contexto")
 async def upload_contexto_pdf(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     school_id: str = Form(...),  # school_id obligatorio para garantizar multitenancy
     tipo_documento: Optional[str] = Form("general"),
+    asincrono: bool = Form(False),
     user_id: str = Depends(get_current_user_id)  # Requiere token válido!
 ):
     """
@@ -55,6 +132,7 @@ async def upload_contexto_pdf(
     - file: PDF a procesar
     - school_id: UUID del colegio (requerido para multitenancy)
     - tipo_documento: 'pei' | 'rice' | 'reglamento_evaluacion' | 'reglamento_convivencia' | 'general'
+    - asincrono: si es true, devuelve un job_id para consultar el progreso en vez de esperar
     """
     print(f"📂 [CONTEXTO] Procesando: {file.filename} | Colegio: {school_id} | Tipo: {tipo_documento} | Usuario: {user_id}")
     
@@ -71,65 +149,33 @@ async def upload_contexto_pdf(
                 detail="Acceso denegado. No tienes permisos para administrar los archivos de esta institución."
             )
 
-        # 2. Leer el PDF
+        # 2. Leer el PDF (el parseo es CPU: fuera del event loop)
         contents = await file.read()
-        pdf_reader = PdfReader(io.BytesIO(contents))
-        
-        full_text = ""
-        for page in pdf_reader.pages:
-            text = page.extract_text()
-            if text:
-                full_text += text + "\n"
+        full_text = await asyncio.to_thread(_extraer_texto_pdf, contents)
 
         if not full_text.strip():
             raise HTTPException(status_code=400, detail="No se pudo extraer texto del PDF. ¿Está escaneado como imagen?")
 
         # 3. Fragmentar (Chunking) — 1000 chars con 100 chars de overlap
-        chunk_size = 1000
-        overlap = 100
-        chunks = []
-        i = 0
-        while i < len(full_text):
-            chunk = full_text[i:i + chunk_size]
-            if chunk.strip():
-                chunks.append(chunk)
-            i += chunk_size - overlap
+        chunks = _fragmentar(full_text)
 
         print(f"   → Texto extraído ({len(full_text)} chars). Generando {len(chunks)} vectores...")
 
-        # 4. Vectorizar y guardar en lote (Bulk Insert)
-        bulk_data = []
-        for chunk in chunks:
-            if not chunk.strip():
-                continue
-            
-            vector = get_embedding(chunk)
-            
-            bulk_data.append({
-                "content": chunk,
-                "metadata": {
-                    "source": file.filename,
-                    "tipo": tipo_documento,
-                    "school_id": school_id
-                },
-                "embedding": vector,
-                "tipo_documento": tipo_documento,
-                "school_id": school_id
+        # 4. Vectorizar por lotes concurrentes y guardar en lote (Bulk Insert)
+        trabajo = trabajos_embedding.crear(user_id=user_id, school_id=school_id, archivo=file.filename)
+        if asincrono:
+            background_tasks.add_task(_vectorizar_en_segundo_plano, trabajo["job_id"], chunks, file.filename, school_id, tipo_documento)
+            return JSONResponse(status_code=202, content={
+                "status": "processing",
+                "message": f"Vectorizando {len(chunks)} fragmentos de '{file.filename}'",
+                "job_id": trabajo["job_id"],
+                "status_url": f"/upload-contexto/estado/{trabajo['job_id']}",
+                "chunks": len(chunks),
+                "school_id": school_id,
+                "tipo_documento": tipo_documento
             })
 
-        # Ejecutamos una única petición HTTP masiva (Bulk Insert)
-        if bulk_data:
-            supabase.table("documentos_institucionales").insert(bulk_data).execute()
-
-        print(f"   → [OK] Insertados {len(bulk_data)} fragmentos de forma masiva para colegio {school_id}.")
-
-        return {
-            "status": "success",
-            "message": f"Procesados {len(bulk_data)} fragmentos de '{file.filename}'",
-            "chunks": len(bulk_data),
-            "school_id": school_id,
-            "tipo_documento": tipo_documento
-        }
+        return await _vectorizar_y_guardar(trabajo["job_id"], chunks, file.filename, school_id, tipo_documento)
 
     except HTTPException:
         raise
@@ -138,6 +184,29 @@ async def upload_contexto_pdf(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ─────────────────────────────────────────────────────────
+# GET /upload-contexto/estado/{job_id}
+# Progreso de una vectorización en segundo plano. El estado vive en memoria
+# del proceso: solo es consultable con un único worker (uvicorn sin --workers).
+# ─────────────────────────────────────────────────────────
+@router.get("/upload-contexto/estado/{job_id}")
+async def upload_contexto_estado(job_id: str, user_id: str = Depends(get_current_user_id)):
+    trabajo = trabajos_embedding.obtener(job_id)
+    # Un trabajo ajeno se reporta igual que uno inexistente
+    if not trabajo or trabajo.get("user_id") != user_id:
+        raise HTTPException(status_code=404, detail="Trabajo de vectorización no encontrado.")
+    return {
+        "job_id": job_id,
+        "estado": trabajo["estado"],
+        "archivo": trabajo["archivo"],
+        "fragmentos": trabajo["fragmentos"],
+        "fragmentos_unicos": trabajo["fragmentos_unicos"],
+        "vectorizados": trabajo["vectorizados"],
+        "error": trabajo["error"],
+        "resultado": trabajo["resultado"]
+    }
+
+
 # ─────────────────────────────────────────────────────────
 # GET /documentos/{school_id}
 # Lista los documentos subidos para un colegio
@@ -7,12 +7,27 @@ Uso:
     @router.post("/mi-endpoint")
     async def endpoint(user_id: str = Depends(get_current_user_id)):
         ...
+
+Verificación de tokens (`verificar_token`), sin llamadas de red en el caso común:
+1. Caché token → claims (LRU), cada entrada vence junto con el token (`exp`).
+2. Firma local: HS256 con SUPABASE_JWT_SECRET, o RS256/ES256 con las claves
+   públicas del JWKS del proyecto (se descargan una vez y se cachean).
+3. Solo si lo anterior no es posible: `auth.get_user(token)` contra Supabase.
+El rol de `authorized_users` que consulta `verify_super_admin` se cachea por
+AUTH_ROLES_TTL segundos.
 """
 import os
+import time
+import hashlib
 import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
 import jwt  # PyJWT
 from fastapi import HTTPException, Header
-from supabase import create_client, Client
+from app.core.config import settings
+from app.db.supabase import obtener_cliente, en_hilo, ejecutar
+from app.services.motor_cache import MemoryBackend
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +35,108 @@ SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY") or os.getenv("SUPABASE_KEY", "")
 SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET", "")  # JWT Secret para descifrado local sin llamadas de red
 
+ALGORITMOS_ASIMETRICOS = ["RS256", "ES256"]
+SUPER_ADMIN_EMAIL = "re.se.alvarez@gmail.com"
+
+
+@dataclass(frozen=True)
+class UsuarioToken:
+    """Usuario autenticado según los claims del token (mismos atributos que usan los routers del `User` de Supabase)."""
+    id: str
+    email: Optional[str] = None
+    user_metadata: Dict[str, Any] = field(default_factory=dict)
+    exp: Optional[float] = None
+
+
+_tokens = MemoryBackend(maxsize=settings.AUTH_CACHE_MAXSIZE, ttl=settings.AUTH_TOKEN_TTL_MAX)
+_roles = MemoryBackend(maxsize=settings.AUTH_CACHE_MAXSIZE, ttl=settings.AUTH_ROLES_TTL)
+_jwks_client: Optional[jwt.PyJWKClient] = None
+
+
+def _jwks() -> Optional[jwt.PyJWKClient]:
+    global _jwks_client
+    if _jwks_client is None and SUPABASE_URL:
+        _jwks_client = jwt.PyJWKClient(
+            f"{SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json",
+            cache_jwk_set=True,
+            lifespan=settings.AUTH_JWKS_TTL,
+            headers={"apikey": SUPABASE_ANON_KEY}
+        )
+    return _jwks_client
+
+
+def _usuario_desde_claims(claims: Dict[str, Any]) -> Optional[UsuarioToken]:
+    if not claims.get("sub"):
+        return None
+    return UsuarioToken(
+        id=claims["sub"],
+        email=claims.get("email"),
+        user_metadata=claims.get("user_metadata") or {},
+        exp=claims.get("exp")
+    )
+
+
+async def _verificar_local(token: str) -> Optional[UsuarioToken]:
+    """Verifica la firma sin red (salvo la primera descarga del JWKS). None si no se puede verificar localmente."""
+    try:
+        alg = jwt.get_unverified_header(token).get("alg")
+    except jwt.InvalidTokenError:
+        return None
+
+    try:
+        if alg == "HS256" and SUPABASE_JWT_SECRET:
+            clave = SUPABASE_JWT_SECRET
+        elif alg in ALGORITMOS_ASIMETRICOS and _jwks() is not None:
+            clave = (await en_hilo(_jwks().get_signing_key_from_jwt, token, nombre="auth.jwks")).key
+        else:
+            return None
+        claims = jwt.decode(token, clave, algorithms=[alg], audience="authenticated")
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Token expirado.")
+    except (jwt.InvalidTokenError, jwt.PyJWKClientError) as e:
+        logger.debug("Auth: verificación local fallida (%s), se valida contra Supabase", e)
+        return None
+    return _usuario_desde_claims(claims)
+
+
+async def _verificar_remoto(token: str) -> UsuarioToken:
+    """Validación contra la API de Supabase (verifica firma en servidor)."""
+    supabase_anon = obtener_cliente(SUPABASE_URL, SUPABASE_ANON_KEY)
+    user_response = await en_hilo(supabase_anon.auth.get_user, token, nombre="auth.get_user")
+
+    if not user_response or not user_response.user:
+        raise HTTPException(status_code=401, detail="Token inválido o expirado.")
+
+    user = user_response.user
+    try:
+        exp = jwt.decode(token, options={"verify_signature": False}).get("exp")
+    except jwt.InvalidTokenError:
+        exp = None
+    return UsuarioToken(id=user.id, email=user.email, user_metadata=user.user_metadata or {}, exp=exp)
+
+
+async def verificar_token(token: str) -> UsuarioToken:
+    """Usuario dueño del token. Lanza 401 si el token es inválido o expiró."""
+    clave = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    usuario = _tokens.get(clave)
+    if usuario is not None:
+        return usuario  # La entrada vence a más tardar con el token
+
+    usuario = await _verificar_local(token) or await _verificar_remoto(token)
+
+    ttl = settings.AUTH_TOKEN_TTL_MAX
+    if usuario.exp is not None:
+        ttl = min(ttl, usuario.exp - time.time())
+    if ttl > 0:
+        _tokens.set(clave, usuario, ttl=ttl)
+    return usuario
+
+
+def _token_bearer(authorization: Optional[str]) -> str:
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Token de autorización faltante o malformado.")
+    return authorization.split("Bearer ")[1].strip()
+
 
 async def get_current_user_id(authorization: str = Header(...)) -> str:
     """
@@ -27,41 +144,13 @@ async def get_current_user_id(authorization: str = Header(...)) -> str:
     Devuelve el user_id (sub) del usuario autenticado.
     Lanza 401 si el token es inválido o falta.
     """
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Token de autorización faltante o malformado.")
-
-    token = authorization.split("Bearer ")[1].strip()
+    token = _token_bearer(authorization)
 
     if token == "mock-token":
         return "mock-user-id"
 
-    # 1. INTENTAR VALIDACIÓN LOCAL (Rápido, sin overhead de red)
-    if SUPABASE_JWT_SECRET:
-        try:
-            payload = jwt.decode(
-                token,
-                SUPABASE_JWT_SECRET,
-                algorithms=["HS256"],
-                audience="authenticated"
-            )
-            user_id = payload.get("sub")
-            if user_id:
-                return user_id
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Token expirado.")
-        except jwt.InvalidTokenError:
-            pass  # Fallback a validación vía API si falla local por secreto incorrecto
-
-    # 2. FALLBACK: Validar contra la API de Supabase (verifica firma en servidor)
     try:
-        supabase_anon = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
-        user_response = supabase_anon.auth.get_user(token)
-
-        if not user_response or not user_response.user:
-            raise HTTPException(status_code=401, detail="Token inválido o expirado.")
-
-        return user_response.user.id
-
+        return (await verificar_token(token)).id
     except HTTPException as e:
         logger.debug("Auth: HTTPException %s - %s", e.status_code, e.detail)
         raise
@@ -82,41 +171,44 @@ async def get_current_user_id_optional(authorization: str = Header(None)) -> str
         return None
 
 
+async def rol_autorizado(email: str) -> Optional[str]:
+    """Rol en authorized_users, cacheado por AUTH_ROLES_TTL segundos ("" = sin rol)."""
+    rol = _roles.get(email)
+    if rol is None:
+        supabase_anon = obtener_cliente(SUPABASE_URL, SUPABASE_ANON_KEY)
+        res = await ejecutar(supabase_anon.table("authorized_users").select("role").eq("email", email).maybe_single(), "authorized_users.rol")
+        rol = ((res.data if res else None) or {}).get("role") or ""
+        _roles.set(email, rol)
+    return rol or None
+
+
 async def verify_super_admin(authorization: str = Header(...)) -> any:
     """
     Verifica que quien llama sea Super Admin (por correo histórico o por rol DB).
     """
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Token de autorización faltante o malformado.")
+    token = _token_bearer(authorization)
 
-    token = authorization.split("Bearer ")[1].strip()
-    
     try:
-        # Obtenemos el usuario vía API de Supabase para asegurar sus claims y datos limpios
-        supabase_anon = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
-        user_response = supabase_anon.auth.get_user(token)
-        
-        if not user_response or not user_response.user:
+        try:
+            user = await verificar_token(token)
+        except HTTPException:
             raise HTTPException(status_code=401, detail="Token de administrador inválido o expirado.")
-            
-        user = user_response.user
+
         email = user.email
-        
+
         # 1. Bypass por correo de superadmin histórico
-        if email == "re.se.alvarez@gmail.com":
+        if email == SUPER_ADMIN_EMAIL:
             return user
-            
+
         # 2. Verificación de rol en base de datos (authorized_users)
-        res = supabase_anon.table("authorized_users").select("role").eq("email", email).maybeSingle().execute()
-        if res.data and res.data.get("role") == "admin":
+        if email and await rol_autorizado(email) == "admin":
             return user
-            
+
         logger.warning("🚫 verify_super_admin: Acceso denegado para %s", email)
         raise HTTPException(status_code=403, detail="Acceso denegado. No eres Super Administrador.")
-        
+
     except HTTPException:
         raise
     except Exception as e:
         logger.error("Auth: Fallo crítico en verificación de Super Admin: %s", str(e))
         raise HTTPException(status_code=401, detail=f"Autenticación de administrador fallida: {str(e)}")
-
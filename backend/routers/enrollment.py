@@ -2,14 +2,15 @@ import os
 from fastapi import APIRouter, HTTPException, Depends, Header
 from pydantic import BaseModel
 from typing import List, Dict, Any, Tuple
-from supabase import create_client, Client
+from supabase import Client
+from app.db.supabase import obtener_cliente
 from .deps import get_current_user_id
 
 router = APIRouter(prefix="/api/v1/admin/enrollment", tags=["Admin"])
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+supabase: Client = obtener_cliente(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
 
 class StudentEnrollment(BaseModel):
     rut: str
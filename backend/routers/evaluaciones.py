@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Header
+from fastapi import APIRouter, HTTPException, Header, Request
 from pydantic import BaseModel
 from typing import List, Union, Optional
 import google.generativeai as genai
@@ -7,6 +7,7 @@ import re
 import os
 import httpx
 import asyncio
+from app.services.llm_client import cliente_llm
 
 router = APIRouter()
 
@@ -72,7 +73,7 @@ def limpiar_json(texto):
         return None
 
 @router.post("/generate-assessment")
-async def generate_assessment(config: AssessmentConfig, authorization: Optional[str] = Header(None)):
+async def generate_assessment(config: AssessmentConfig, request: Request, authorization: Optional[str] = Header(None)):
     print(f"⚡ [EVALUACIONES] Generando prueba contextualizada para {config.grade} - {config.subject}")
     
     try:
@@ -193,8 +194,6 @@ Distribución Cognitiva Exigida: DOK 1: {config.dokDistribution.dok1}% | DOK 2:
 }}
 """
 
-        model = genai.GenerativeModel('gemini-2.5-flash', generation_config={"response_mime_type": "application/json"})
-        
         # If a file was provided, use multimodal content (handles scanned PDFs via Gemini vision)
         if config.archivo_base64:
             import base64
@@ -209,12 +208,14 @@ Distribución Cognitiva Exigida: DOK 1: {config.dokDistribution.dok1}% | DOK 2:
         else:
             content = prompt
         
-        response = await asyncio.to_thread(
-            model.generate_content,
-            content,
-            request_options={"timeout": 240}
+        texto = await cliente_llm.generar(
+            "evaluaciones", content,
+            generation_config={"response_mime_type": "application/json"},
+            timeout=240,
+            request=request,
+            validar=limpiar_json
         )
-        resultado = limpiar_json(response.text)
+        resultado = limpiar_json(texto)
 
         if not resultado:
             return {"title": "Error Generando", "description": "Intenta de nuevo con menos preguntas.", "items": []}
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException, Form
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, Response
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional, Union
 from docx import Document
@@ -14,13 +14,15 @@ import io
 import os
 import re
 import json
-import traceback
 import base64
 import uuid
 import unicodedata
 from urllib.parse import quote
+from app.services.export_jobs import trabajos_exportacion, TrabajoNoEncontrado, ErrorDeRender
+from app.services.docx_render import motor_render
+from app.services.docx_plantillas import PlantillaDocx, logo_png
 
-download_cache = {}
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
 
 router = APIRouter()
 
@@ -155,6 +157,11 @@ class PaqueteExportRequest(BaseModel):
 # 2. UTILIDADES DE DISEÑO
 # ==========================================
 
+def _guardar_docx(doc) -> bytes:
+    file_stream = io.BytesIO()
+    doc.save(file_stream)
+    return file_stream.getvalue()
+
 def limpiar_latex_para_word(texto: str) -> str:
     """Convierte LaTeX a Unicode legible en Word. NO elimina los símbolos, los transforma."""
     if not texto: return ""
@@ -232,7 +239,8 @@ def style_header_cell(cell, text, bg_color="2B546E", text_color="FFFFFF"):
         run.font.size = Pt(10)
     cell.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
 
-def add_header_logo(doc, asignatura, nivel, titulo_extra=""):
+def _encabezado_base(doc):
+    """Parte fija del encabezado (tabla, logo y textos de marca): va en la plantilla."""
     table = doc.add_table(rows=1, cols=2)
     table.autofit = False
     table.columns[0].width = Inches(1.2)
@@ -242,13 +250,10 @@ def add_header_logo(doc, asignatura, nivel, titulo_extra=""):
     p = cell_logo.paragraphs[0]
     run = p.add_run()
     
-    from pathlib import Path
-    base_dir = Path(__file__).resolve().parent.parent
-    logo_path = base_dir / 'assets' / 'logo_profeic.png'
-    
-    if logo_path.exists():
+    logo = logo_png('logo_profeic.png')
+    if logo:
         try:
-            run.add_picture(str(logo_path), width=Inches(1.0))
+            run.add_picture(io.BytesIO(logo), width=Inches(1.0))
         except Exception:
             run.add_text("ProfeIC")
     else:
@@ -262,12 +267,19 @@ def add_header_logo(doc, asignatura, nivel, titulo_extra=""):
     
     r2 = p_info.add_run("Recurso creado con Inteligencia Aumentada de la Plataforma ProfeIC\n")
     r2.font.size = Pt(8); r2.font.color.rgb = RGBColor(100, 100, 100)
-    
+
+    doc.add_paragraph() 
+
+PLANTILLA_ENCABEZADO = PlantillaDocx(_encabezado_base)
+
+def documento_con_encabezado(asignatura, nivel, titulo_extra=""):
+    """Documento nuevo clonado de la plantilla, con los datos variables del encabezado."""
+    doc = PLANTILLA_ENCABEZADO.nueva()
+    p_info = doc.tables[0].cell(0, 1).paragraphs[0]
     p_info.add_run(f"Asignatura: {asignatura} | Nivel: {nivel}\n").font.size = Pt(10)
     if titulo_extra:
         p_info.add_run(f"{titulo_extra}").italic = True
-
-    doc.add_paragraph() 
+    return doc
 
 # ==========================================
 # 3. MOTORES DE RENDERIZADO (Lógica Visual)
@@ -568,66 +580,75 @@ def renderizar_lectura_inteligente(doc, data: Dict[str, Any]):
 # 4. ENDPOINTS
 # ==========================================
 
+# Cada documento se arma en una función síncrona `docx_x(req) -> bytes` que el
+# motor de render ejecuta en el pool de procesos, fuera del event loop.
+
+def docx_planificacion(req: PlanExportRequest) -> bytes:
+    doc = documento_con_encabezado(req.asignatura, req.nivel, "Planificación")
+    renderizar_planificacion(doc, req.dict())
+    return _guardar_docx(doc)
+
+def docx_rubrica(req: ExportRequest) -> bytes:
+    doc = documento_con_encabezado(req.asignatura, req.nivel, "Rúbrica de Evaluación")
+    renderizar_rubrica(doc, req.dict())
+    return _guardar_docx(doc)
+
+def docx_evaluacion(req: AssessmentExportRequest) -> bytes:
+    doc = documento_con_encabezado(req.subject, req.grade, "Evaluación")
+    renderizar_evaluacion(doc, req.dict())
+    return _guardar_docx(doc)
+
+def docx_elevador(req: ElevatorExportRequest) -> bytes:
+    doc = documento_con_encabezado(req.subject, req.grade, "Elevador Cognitivo")
+    doc.add_heading("Elevador Cognitivo", 1)
+    doc.add_paragraph(f"Actividad Base: {req.activity}")
+    doc.add_heading(f"Diagnóstico: {req.dok_actual}", 2)
+    doc.add_paragraph(req.diagnostico)
+    # (Se puede expandir la lógica visual aquí si es necesario)
+    return _guardar_docx(doc)
+
+def docx_lectura(req: LecturaInteligenteExportRequest) -> bytes:
+    formato = "Pauta Docente" if req.tipo_documento == "profesor" else "Guía Estudiante"
+    doc = documento_con_encabezado(req.asignatura, req.nivel, formato)
+    renderizar_lectura_inteligente(doc, req.dict())
+    return _guardar_docx(doc)
+
 @router.post("/export/planificacion-docx")
 async def export_planificacion_docx(req: PlanExportRequest):
     try:
-        doc = Document()
-        add_header_logo(doc, req.asignatura, req.nivel, "Planificación")
-        renderizar_planificacion(doc, req.dict())
-        file_stream = io.BytesIO(); doc.save(file_stream); file_stream.seek(0)
-        return StreamingResponse(file_stream, media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document", headers={"Content-Disposition": "attachment; filename=planificacion.docx"})
+        file_stream = io.BytesIO(await motor_render.renderizar_async(docx_planificacion, req, nombre="export.planificacion"))
+        return StreamingResponse(file_stream, media_type=DOCX_MEDIA_TYPE, headers={"Content-Disposition": "attachment; filename=planificacion.docx"})
     except Exception as e: raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/export/rubrica-docx")
 async def export_rubric_docx(req: ExportRequest):
     try:
-        doc = Document()
-        add_header_logo(doc, req.asignatura, req.nivel, "Rúbrica de Evaluación")
-        renderizar_rubrica(doc, req.dict())
-        file_stream = io.BytesIO(); doc.save(file_stream); file_stream.seek(0)
-        return StreamingResponse(file_stream, media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document", headers={"Content-Disposition": "attachment; filename=rubrica.docx"})
+        file_stream = io.BytesIO(await motor_render.renderizar_async(docx_rubrica, req, nombre="export.rubrica"))
+        return StreamingResponse(file_stream, media_type=DOCX_MEDIA_TYPE, headers={"Content-Disposition": "attachment; filename=rubrica.docx"})
     except Exception as e: raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/export/evaluacion-docx")
 async def export_assessment_docx(req: AssessmentExportRequest):
     try:
-        doc = Document()
-        add_header_logo(doc, req.subject, req.grade, "Evaluación")
-        renderizar_evaluacion(doc, req.dict())
-        file_stream = io.BytesIO(); doc.save(file_stream); file_stream.seek(0)
-        return StreamingResponse(file_stream, media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document", headers={"Content-Disposition": "attachment; filename=evaluacion.docx"})
+        file_stream = io.BytesIO(await motor_render.renderizar_async(docx_evaluacion, req, nombre="export.evaluacion"))
+        return StreamingResponse(file_stream, media_type=DOCX_MEDIA_TYPE, headers={"Content-Disposition": "attachment; filename=evaluacion.docx"})
     except Exception as e: raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/export/elevador-docx")
 async def export_elevator_docx(req: ElevatorExportRequest):
     try:
-        doc = Document()
-        add_header_logo(doc, req.subject, req.grade, "Elevador Cognitivo")
-        doc.add_heading("Elevador Cognitivo", 1)
-        doc.add_paragraph(f"Actividad Base: {req.activity}")
-        doc.add_heading(f"Diagnóstico: {req.dok_actual}", 2)
-        doc.add_paragraph(req.diagnostico)
-        # (Se puede expandir la lógica visual aquí si es necesario)
-        file_stream = io.BytesIO(); doc.save(file_stream); file_stream.seek(0)
-        return StreamingResponse(file_stream, media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document", headers={"Content-Disposition": "attachment; filename=elevador.docx"})
+        file_stream = io.BytesIO(await motor_render.renderizar_async(docx_elevador, req, nombre="export.elevador"))
+        return StreamingResponse(file_stream, media_type=DOCX_MEDIA_TYPE, headers={"Content-Disposition": "attachment; filename=elevador.docx"})
     except Exception as e: raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/export/lectura-inteligente")
 async def export_lectura_docx(req: LecturaInteligenteExportRequest):
     try:
-        doc = Document()
-        formato = "Pauta Docente" if req.tipo_documento == "profesor" else "Guía Estudiante"
-        add_header_logo(doc, req.asignatura, req.nivel, formato)
-        
-        renderizar_lectura_inteligente(doc, req.dict())
-        
-        file_stream = io.BytesIO()
-        doc.save(file_stream)
-        file_stream.seek(0)
+        file_stream = io.BytesIO(await motor_render.renderizar_async(docx_lectura, req, nombre="export.lectura"))
         
         return StreamingResponse(
             file_stream, 
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document", 
+            media_type=DOCX_MEDIA_TYPE, 
             headers={"Content-Disposition": f"attachment; filename=lectura_{req.tipo_documento}.docx"}
         )
     except Exception as e:
@@ -638,16 +659,28 @@ async def export_lectura_docx(req: LecturaInteligenteExportRequest):
 
 @router.post("/export/prepare-generic")
 async def prepare_generic(req: GenericExportRequest):
-    req_id = str(uuid.uuid4())
-    download_cache[req_id] = req
+    # El render parte ya; el GET de descarga solo lee el DOCX terminado
+    req_id = trabajos_exportacion.iniciar(
+        f"{req.titulo_unidad}.docx",
+        lambda: motor_render.renderizar(docx_generico, req, nombre="export.generico")
+    )
     return {"download_id": req_id}
 
 @router.get("/export/download-generic/{req_id}/{filename}")
 async def download_generic_get(req_id: str, filename: str):
-    if req_id not in download_cache:
+    return await _descargar_trabajo(req_id)
+
+async def _descargar_trabajo(req_id: str) -> Response:
+    try:
+        nombre, docx = await trabajos_exportacion.resultado(req_id)
+    except TrabajoNoEncontrado:
         raise HTTPException(status_code=404, detail="Descarga expirada o inválida")
-    req = download_cache.pop(req_id)
-    return await render_export_generic_docx(req)
+    except ErrorDeRender as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    headers = get_safe_headers(nombre)
+    headers["Access-Control-Expose-Headers"] = "Content-Disposition"
+    return Response(content=docx, media_type=DOCX_MEDIA_TYPE, headers=headers)
 
 def detectar_y_renderizar(doc, content: Any, titulo: str):
     """Dispatcher universal: detecta el tipo de documento y llama al motor de renderizado correcto."""
@@ -744,91 +777,54 @@ def detectar_y_renderizar(doc, content: Any, titulo: str):
                         if isinstance(elem, str): doc.add_paragraph(f"• {elem}", style='List Bullet')
                         elif isinstance(elem, dict) and 'text' in elem: doc.add_paragraph(f"• {elem['text']}", style='List Bullet')
 
-async def render_export_generic_docx(req: GenericExportRequest):
-    try:
-        doc = Document()
-        add_header_logo(doc, req.asignatura, req.nivel, "Documento Exportado")
-        detectar_y_renderizar(doc, req.contenido, req.titulo_unidad)
-
-        file_stream = io.BytesIO()
-        doc.save(file_stream)
-        file_stream.seek(0)
-        
-        filename = f"{req.titulo_unidad}.docx"
-        headers = get_safe_headers(filename)
-        headers["Access-Control-Expose-Headers"] = "Content-Disposition"
-        
-        return StreamingResponse(
-            file_stream, 
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document", 
-            headers=headers
-        )
-    except Exception as e:
-        print(f"Error export genérico: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+def docx_generico(req: GenericExportRequest) -> bytes:
+    doc = documento_con_encabezado(req.asignatura, req.nivel, "Documento Exportado")
+    detectar_y_renderizar(doc, req.contenido, req.titulo_unidad)
+    return _guardar_docx(doc)
 
 @router.post("/export/prepare-paquete")
 async def prepare_paquete(req: PaqueteExportRequest):
-    req_id = str(uuid.uuid4())
-    download_cache[req_id] = req
+    req_id = trabajos_exportacion.iniciar(
+        "Paquete_Didactico_ProfeIC.docx",
+        lambda: motor_render.renderizar(docx_paquete, req, nombre="export.paquete")
+    )
     return {"download_id": req_id}
 
 @router.get("/export/download-paquete/{req_id}/{filename}")
 async def download_paquete_get(req_id: str, filename: str):
-    if req_id not in download_cache:
-        raise HTTPException(status_code=404, detail="Descarga expirada o inválida")
-    req = download_cache.pop(req_id)
-    return await render_export_paquete_docx(req)
+    return await _descargar_trabajo(req_id)
 
-async def render_export_paquete_docx(req: PaqueteExportRequest):
-    try:
-        doc = Document()
-        
-        add_header_logo(doc, "Paquete Didáctico", "Múltiples Niveles", "Documento Consolidado")
-        
-        for _ in range(5): doc.add_paragraph()
-        
-        main_title = doc.add_heading("PAQUETE DIDÁCTICO ÍNTEGRO", level=1)
-        main_title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        for run in main_title.runs:
-            run.font.size = Pt(24)
-            run.font.color.rgb = RGBColor(27, 60, 115)
-            
-        subtitle = doc.add_paragraph("ProfeIC - Transformando la Educación")
-        subtitle.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        subtitle.runs[0].font.size = Pt(16)
-        subtitle.runs[0].font.color.rgb = RGBColor(242, 174, 96)
+def docx_paquete(req: PaqueteExportRequest) -> bytes:
+    doc = documento_con_encabezado("Paquete Didáctico", "Múltiples Niveles", "Documento Consolidado")
+    
+    for _ in range(5): doc.add_paragraph()
+    
+    main_title = doc.add_heading("PAQUETE DIDÁCTICO ÍNTEGRO", level=1)
+    main_title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    for run in main_title.runs:
+        run.font.size = Pt(24)
+        run.font.color.rgb = RGBColor(27, 60, 115)
         
-        doc.add_paragraph(f"Total de recursos incluidos: {len(req.documentos)}").alignment = WD_ALIGN_PARAGRAPH.CENTER
-        doc.add_page_break()
+    subtitle = doc.add_paragraph("ProfeIC - Transformando la Educación")
+    subtitle.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    subtitle.runs[0].font.size = Pt(16)
+    subtitle.runs[0].font.color.rgb = RGBColor(242, 174, 96)
+    
+    doc.add_paragraph(f"Total de recursos incluidos: {len(req.documentos)}").alignment = WD_ALIGN_PARAGRAPH.CENTER
+    doc.add_page_break()
 
-        for idx, item in enumerate(req.documentos):
-            sep = doc.add_heading(f"--- DOCUMENTO {idx + 1}: {item.titulo_unidad} ---", level=2)
-            sep.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            doc.add_paragraph(f"Asignatura: {item.asignatura} | Nivel: {item.nivel}").alignment = WD_ALIGN_PARAGRAPH.CENTER
-            doc.add_paragraph()
+    for idx, item in enumerate(req.documentos):
+        sep = doc.add_heading(f"--- DOCUMENTO {idx + 1}: {item.titulo_unidad} ---", level=2)
+        sep.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        doc.add_paragraph(f"Asignatura: {item.asignatura} | Nivel: {item.nivel}").alignment = WD_ALIGN_PARAGRAPH.CENTER
+        doc.add_paragraph()
 
-            detectar_y_renderizar(doc, item.contenido, item.titulo_unidad)
+        detectar_y_renderizar(doc, item.contenido, item.titulo_unidad)
 
-            if idx < len(req.documentos) - 1:
-                doc.add_page_break()
+        if idx < len(req.documentos) - 1:
+            doc.add_page_break()
 
-        file_stream = io.BytesIO()
-        doc.save(file_stream)
-        file_stream.seek(0)
-        
-        headers = get_safe_headers("Paquete_Didactico_ProfeIC.docx")
-        headers["Access-Control-Expose-Headers"] = "Content-Disposition"
-        
-        return StreamingResponse(
-            file_stream, 
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document", 
-            headers=headers
-        )
-    except Exception as e:
-        print("====== ERROR EN PAQUETE DOCX ======")
-        print(traceback.format_exc())
-        raise HTTPException(status_code=500, detail=str(e))
+    return _guardar_docx(doc)
 
 # ==========================================
 # EXECUTIVE REPORT RENDERER (PREMIUM)
@@ -1214,21 +1210,20 @@ def renderizar_reporte_ejecutivo(doc, data):
             elif status == 'in_progress': set_cell_background(row[3], "EFF6FF") # Azul
             else: set_cell_background(row[3], "FEFCE8") # Amarillo
 
+def docx_ejecutivo(req: ExecutiveDocxRequest) -> bytes:
+    # Modificar logo original solo si es necesario, o lo metemos con la portada arriba
+    doc = documento_con_encabezado("Dirección Académica", "Institucional", "Reporte Confidencial")
+    renderizar_reporte_ejecutivo(doc, req)
+    return _guardar_docx(doc)
+
 @router.post("/export/executive-docx")
 async def export_executive_docx(req: ExecutiveDocxRequest):
     try:
-        doc = Document()
-        # Modificar logo original solo si es necesario, o lo metemos con la portada arriba
-        add_header_logo(doc, "Dirección Académica", "Institucional", "Reporte Confidencial")
-        renderizar_reporte_ejecutivo(doc, req)
-        
-        file_stream = io.BytesIO()
-        doc.save(file_stream)
-        file_stream.seek(0)
+        file_stream = io.BytesIO(await motor_render.renderizar_async(docx_ejecutivo, req, nombre="export.ejecutivo"))
         
         return StreamingResponse(
             file_stream, 
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document", 
+            media_type=DOCX_MEDIA_TYPE, 
             headers={"Content-Disposition": "attachment; filename=reporte_ejecutivo.docx"}
         )
     except Exception as e:
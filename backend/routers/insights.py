@@ -4,13 +4,16 @@ Propósito: Analizar el historial de uso del profesor (biblioteca_recursos,
 evaluaciones, etc.) y generar insights pedagógicos accionables via Gemini.
 """
 
-from fastapi import APIRouter, HTTPException, Header
+from fastapi import APIRouter, HTTPException, Header, Query
 from pydantic import BaseModel
 from typing import Optional
-from supabase import create_client, Client
+from supabase import Client
+from app.db.supabase import obtener_cliente, ejecutar
+from .deps import verificar_token, rol_autorizado
 import google.generativeai as genai
 import os
-import json
+from app.services.llm_client import cliente_llm
+from app.services import indice_cobertura
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
@@ -25,9 +28,9 @@ supabase_auth: Optional[Client] = None
 supabase: Optional[Client] = None
 try:
     if SUPABASE_URL and SUPABASE_KEY:
-        supabase_auth = create_client(SUPABASE_URL, SUPABASE_KEY)
+        supabase_auth = obtener_cliente(SUPABASE_URL, SUPABASE_KEY)
     if SUPABASE_URL and SUPABASE_SERVICE_KEY:
-        supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+        supabase = obtener_cliente(SUPABASE_URL, SUPABASE_SERVICE_KEY)
 except Exception as e:
     print(f"❌ [INSIGHTS] Error conectando Supabase: {e}")
 
@@ -52,23 +55,15 @@ async def get_dashboard_insights(authorization: str = Header(...)):
         raise HTTPException(status_code=500, detail="Supabase no configurado")
 
     try:
-        # 1. Obtener usuario (usando cliente anon para validar el token)
+        # 1. Obtener usuario (verificación local del token, cacheada)
         token = authorization.split("Bearer ")[-1]
-        user_resp = supabase_auth.auth.get_user(token)
-        if not user_resp or not user_resp.user:
-            raise HTTPException(status_code=401, detail="Token inválido")
+        user_id = (await verificar_token(token)).id
 
-        user_id = user_resp.user.id
-
-        # 2. Obtener recursos de la Biblioteca usando service role (bypassea RLS)
-        recursos_resp = supabase.table("biblioteca_recursos").select(
-            "tipo, asignatura, nivel, titulo, created_at, contenido"
-        ).eq("user_id", user_id).order("created_at", desc=True).limit(50).execute()
-
-        recursos = recursos_resp.data or []
+        # 2. Contadores del índice de uso (mantenidos al guardar cada recurso; service role bypassea RLS)
+        resumen = indice_cobertura.resumir_uso(await indice_cobertura.leer_uso(supabase, "usuario", user_id))
 
         # Si no hay recursos, devolver estado vacío
-        if not recursos:
+        if not resumen["total_recursos"]:
             return {
                 "has_data": False,
                 "insight_text": None,
@@ -81,46 +76,14 @@ async def get_dashboard_insights(authorization: str = Header(...)):
                 "alerts": []
             }
 
-        # 3. Calcular estadísticas base
-        from collections import Counter
-        from datetime import datetime, timezone
-
-        tipos_counter = Counter(r.get("tipo", "GENERAL") for r in recursos)
-        asig_counter = Counter(r.get("asignatura", "General") for r in recursos)
-        
-        # Fecha del último recurso vs hoy
-        ultimo_recurso_str = recursos[0].get("created_at") if recursos else None
-        
-        # Detectar asignaturas sin actividad reciente (últimos 30 días)
-        ahora = datetime.now(timezone.utc)
-        asig_reciente = set()
-        for r in recursos:
-            fecha_str = r.get("created_at", "")
-            if fecha_str:
-                try:
-                    fecha = datetime.fromisoformat(fecha_str.replace("Z", "+00:00"))
-                    dias = (ahora - fecha).days
-                    if dias <= 30:
-                        asig_reciente.add(r.get("asignatura", ""))
-                except Exception:
-                    pass
-
-        asig_sin_actividad = [a for a in asig_counter.keys() if a and a not in asig_reciente]
-
-        # Distribución DOK (si es EVALUACION, intentar extraer del contenido)
-        dok_total = {"dok1": 0, "dok2": 0, "dok3": 0}
-        evaluaciones = [r for r in recursos if r.get("tipo") == "EVALUACION"]
-        for ev in evaluaciones:
-            try:
-                contenido = ev.get("contenido") or {}
-                if isinstance(contenido, str):
-                    contenido = json.loads(contenido)
-                cfg = contenido.get("config", {})
-                dok_total["dok1"] += cfg.get("dokDistribution", {}).get("dok1", 0)
-                dok_total["dok2"] += cfg.get("dokDistribution", {}).get("dok2", 0)
-                dok_total["dok3"] += cfg.get("dokDistribution", {}).get("dok3", 0)
-            except Exception:
-                pass
+        # 3. Estadísticas base, ya agregadas por el índice
+        tipos_counter = resumen["tipos"]
+        asig_counter = resumen["asignaturas"]
+        ultimo_recurso_str = resumen["ultimo_recurso"]
+        # Asignaturas sin actividad reciente (últimos 30 días)
+        asig_sin_actividad = resumen["sin_actividad_reciente"]
+        # Distribución DOK declarada por las evaluaciones
+        dok_total = resumen["dok"]
 
         # 4. Construir contexto para Gemini
         tipos_str = ", ".join([f"{k}: {v}" for k, v in tipos_counter.most_common()])
@@ -142,7 +105,7 @@ async def get_dashboard_insights(authorization: str = Header(...)):
         UN párrafo de insight pedagógico accionable (máximo 3 oraciones) en español.
 
         DATOS DEL DOCENTE:
-        - Total de recursos generados: {len(recursos)}
+        - Total de recursos generados: {resumen["total_recursos"]}
         - Tipos de recursos: {tipos_str}
         - Asignaturas trabajadas: {asig_str}
         - Asignaturas sin actividad en los últimos 30 días: {sin_actividad_str}
@@ -162,9 +125,7 @@ async def get_dashboard_insights(authorization: str = Header(...)):
         Devuelve SOLO el párrafo de insight, sin títulos ni comillas.
         """
 
-        model = genai.GenerativeModel("gemini-2.5-flash")
-        response = model.generate_content(prompt)
-        insight_text = response.text.strip()
+        insight_text = (await cliente_llm.generar("insights", prompt)).strip()
 
         # 5. Generar alertas accionables
         alerts = []
@@ -192,7 +153,7 @@ async def get_dashboard_insights(authorization: str = Header(...)):
             "has_data": True,
             "insight_text": insight_text,
             "stats": {
-                "total_recursos": len(recursos),
+                "total_recursos": resumen["total_recursos"],
                 "tipos": dict(tipos_counter),
                 "asignaturas": dict(asig_counter.most_common(5)),
                 "ultimo_recurso": ultimo_recurso_str
@@ -205,3 +166,44 @@ async def get_dashboard_insights(authorization: str = Header(...)):
     except Exception as e:
         print(f"❌ [INSIGHTS] Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+# Roles que pueden ver la cobertura agregada de su colegio
+ROLES_COBERTURA_COLEGIO = {"admin", "director", "directivo", "utp", "gestion"}
+
+
+# ─────────────────────────────────────────────
+# GET /dashboard/cobertura
+# Cobertura curricular por curso desde el índice incremental (del docente o de su colegio)
+# ─────────────────────────────────────────────
+@router.get("/cobertura")
+async def get_cobertura(
+    authorization: str = Header(...),
+    ambito: str = Query("usuario", pattern="^(usuario|colegio)$")
+):
+    """
+    Por cada (nivel, asignatura): recursos por OA y por tipo, y cuántos OAs distintos
+    se han trabajado. `ambito=colegio` agrega a todos los docentes del colegio
+    (solo equipo directivo).
+    """
+    if not supabase or not supabase_auth:
+        raise HTTPException(status_code=500, detail="Supabase no configurado")
+
+    token = authorization.split("Bearer ")[-1]
+    usuario = await verificar_token(token)
+    ambito_id = usuario.id
+
+    if ambito == "colegio":
+        if not usuario.email or await rol_autorizado(usuario.email) not in ROLES_COBERTURA_COLEGIO:
+            raise HTTPException(status_code=403, detail="Solo el equipo directivo puede ver la cobertura del colegio.")
+        perfil = await ejecutar(supabase.table("profiles").select("school_id").eq("id", usuario.id).maybe_single(), "profiles.school_id")
+        ambito_id = ((perfil.data if perfil else None) or {}).get("school_id")
+        if not ambito_id:
+            raise HTTPException(status_code=400, detail="El usuario no tiene un colegio asociado.")
+
+    try:
+        filas = await indice_cobertura.leer_cobertura(supabase, ambito, ambito_id)
+    except Exception as e:
+        print(f"❌ [COBERTURA] Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"ambito": ambito, "cursos": indice_cobertura.agrupar_cobertura(filas)}
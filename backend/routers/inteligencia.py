@@ -2,12 +2,14 @@ import os
 import json
 import logging
 from typing import Optional, List, Dict, Any
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from supabase import create_client, Client
+from supabase import Client
+from app.db.supabase import obtener_cliente
 import google.generativeai as genai
 from routers.deps import get_current_user_id
+from app.services.llm_client import cliente_llm
 
 router = APIRouter(prefix="/api/v1/inteligencia", tags=["Inteligencia"])
 
@@ -17,7 +19,7 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY", "")
 
 try:
-    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    supabase = obtener_cliente(SUPABASE_URL, SUPABASE_KEY)
 except Exception as e:
     logger.error(f"Error creating Supabase client in inteligencia router: {e}")
     supabase = None
@@ -90,7 +92,7 @@ async def get_metrics(user_id: str = Depends(get_current_user_id)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/ask")
-async def ask_intelligence(req: AskRequest, user_id: str = Depends(get_current_user_id)):
+async def ask_intelligence(req: AskRequest, request: Request, user_id: str = Depends(get_current_user_id)):
     """
     Interactive LLM chat / analysis based on actual database metrics.
     """
@@ -127,9 +129,7 @@ async def ask_intelligence(req: AskRequest, user_id: str = Depends(get_current_u
         5. Devuelve la respuesta en formato markdown enriquecido.
         """
         
-        model = genai.GenerativeModel("gemini-2.5-flash")
-        response = model.generate_content(prompt)
-        answer = response.text.strip()
+        answer = (await cliente_llm.generar("inteligencia", prompt, cache=False, request=request)).strip()
         
         return {"response": answer}
     except Exception as e:
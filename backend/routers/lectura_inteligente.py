@@ -5,6 +5,7 @@ import os
 import json
 import httpx
 import google.generativeai as genai
+from app.services.llm_client import cliente_llm
 
 
 # --- CONFIGURACIÓN IA ---
@@ -17,6 +18,7 @@ if not api_key:
 genai.configure(api_key=api_key)
 API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
 CONTEXTO_FALLBACK = "UBICACIÓN: Chile."
+CONFIG_JSON = {"response_mime_type": "application/json"}
 
 router = APIRouter(
     prefix="/lectura-inteligente",
@@ -78,8 +80,6 @@ async def generar_texto(request: GenerarTextoRequest, authorization: Optional[st
             except Exception:
                 pass
 
-        model = genai.GenerativeModel(model_name=MODEL_NAME)
-
         prompt = f"""
         ACTÚA COMO: Un experto creador de material pedagógico para estudiantes de {request.nivel} de la asignatura de {request.asignatura}.
         
@@ -104,8 +104,7 @@ async def generar_texto(request: GenerarTextoRequest, authorization: Optional[st
         Devuelve ÚNICAMENTE el texto generado, sin introducciones ni comentarios adicionales. No uses formato Markdown como ```texto, solo el contenido directamente.
         """
 
-        response = await model.generate_content_async(prompt)
-        texto_generado = response.text.strip()
+        texto_generado = (await cliente_llm.generar("lectura_inteligente", prompt, modelo=MODEL_NAME)).strip()
             
         return {"texto": texto_generado}
 
@@ -118,11 +117,6 @@ async def generar_preguntas(request: GenerarPreguntasRequest):
     try:
         print(f"🧠 Generando {request.num_preguntas} preguntas con {MODEL_NAME}...")
         
-        model = genai.GenerativeModel(
-            model_name=MODEL_NAME,
-            generation_config={"response_mime_type": "application/json"}
-        )
-
         n1 = max(1, int(round((request.num_preguntas - 2) * 0.3)))
         n2 = max(1, int(round((request.num_preguntas - 2) * 0.4)))
         n3 = max(1, (request.num_preguntas - 2) - n1 - n2)
@@ -187,8 +181,9 @@ async def generar_preguntas(request: GenerarPreguntasRequest):
         }}
         """
 
-        response = await model.generate_content_async(prompt)
-        resultado = response.text.strip()
+        resultado = (await cliente_llm.generar(
+            "lectura_inteligente", prompt, modelo=MODEL_NAME, generation_config=CONFIG_JSON
+        )).strip()
         
         if resultado.startswith("```"):
             resultado = resultado.replace("```json", "").replace("```", "").strip()
@@ -204,11 +199,6 @@ async def regenerar_pregunta(request: RegenerarPreguntaRequest):
     try:
         print(f"🧠 Regenerando pregunta ({request.nivel_taxonomico_deseado}) con {MODEL_NAME}...")
         
-        model = genai.GenerativeModel(
-            model_name=MODEL_NAME,
-            generation_config={"response_mime_type": "application/json"}
-        )
-
         prompt = f"""
         ACTÚA COMO: Evaluador experto en diseño instruccional.
         
@@ -242,8 +232,10 @@ async def regenerar_pregunta(request: RegenerarPreguntaRequest):
         }}
         """
 
-        response = await model.generate_content_async(prompt)
-        resultado = response.text.strip()
+        # El docente pide explícitamente una pregunta distinta: nunca se sirve desde la caché
+        resultado = (await cliente_llm.generar(
+            "lectura_inteligente", prompt, modelo=MODEL_NAME, generation_config=CONFIG_JSON, cache=False
+        )).strip()
         
         # Limpieza robusta
         if resultado.startswith("```"):
@@ -1,17 +1,15 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 import os
-from supabase import create_client, Client
+from app.db.supabase import cliente_auth
 
 router = APIRouter()
 
 # --- CONEXIÓN SUPABASE ---
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase: Client = None
-
-if SUPABASE_URL and SUPABASE_KEY:
-    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Login y registro abren una sesión: cada llamada usa su propio cliente de Auth (nunca el compartido)
+AUTH_CONFIGURADO = bool(SUPABASE_URL and SUPABASE_KEY)
 
 # --- MODELO DE DATOS ---
 class LoginRequest(BaseModel):
@@ -21,9 +19,9 @@ class LoginRequest(BaseModel):
 # --- ENDPOINT LOGIN (YA LO TIENES) ---
 @router.post("/auth/login")
 def login_user(credentials: LoginRequest):
-    if not supabase: raise HTTPException(status_code=500, detail="Error servidor")
+    if not AUTH_CONFIGURADO: raise HTTPException(status_code=500, detail="Error servidor")
     try:
-        response = supabase.auth.sign_in_with_password({
+        response = cliente_auth(SUPABASE_URL, SUPABASE_KEY).sign_in_with_password({
             "email": credentials.email,
             "password": credentials.password
         })
@@ -35,10 +33,10 @@ def login_user(credentials: LoginRequest):
 # --- ENDPOINT REGISTRO (NUEVO) ---
 @router.post("/auth/register")
 def register_user(credentials: LoginRequest):
-    if not supabase: raise HTTPException(status_code=500, detail="Error servidor")
+    if not AUTH_CONFIGURADO: raise HTTPException(status_code=500, detail="Error servidor")
     try:
         # Crea el usuario en Supabase Auth
-        response = supabase.auth.sign_up({
+        response = cliente_auth(SUPABASE_URL, SUPABASE_KEY).sign_up({
             "email": credentials.email,
             "password": credentials.password
         })
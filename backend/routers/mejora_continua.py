@@ -9,6 +9,9 @@ import pandas as pd
 from pypdf import PdfReader
 import docx
 from app.core.config import settings
+from app.services.llm_client import cliente_llm
+from app.services.docx_render import motor_render
+from app.services.docx_plantillas import logo_png
 
 # Configuración de IA para este router
 if settings.GOOGLE_API_KEY:
@@ -16,6 +19,13 @@ if settings.GOOGLE_API_KEY:
 
 router = APIRouter(prefix="/api/v1/mejora-continua", tags=["Mejora Continua"])
 
+MODEL_NAME = "gemini-2.5-flash"
+CONFIG_JSON = {"response_mime_type": "application/json"}
+
+
+async def _generar_texto(prompt: str) -> str:
+    return await cliente_llm.generar("mejora_continua", prompt, modelo=MODEL_NAME, generation_config=CONFIG_JSON, validar=json.loads)
+
 class CopilotoRequest(BaseModel):
     desafio: str
     school_id: str | None = None
@@ -39,11 +49,6 @@ async def estructurar_problema_ia(req: CopilotoRequest, user_id: str = Depends(g
             print(f"⚠️ Error validando multitenancy en Copiloto: {e_ctx}")
 
     try:
-        model = genai.GenerativeModel(
-            'gemini-2.5-flash',
-            generation_config={"response_mime_type": "application/json"}
-        )
-        
         # Contexto Institucional
         contexto_colegio = ""
         if req.school_id:
@@ -97,15 +102,12 @@ Asegúrate de respetar fielmente esta estructura de JSON, ya que se usará para
 
         prompt = f"{system_instruction}\n\nDesafío del usuario: {req.desafio}"
         
-        # Como no se importó el aio module, para simplificar e ir a lo seguro
-        # usamos generate_content en vez de la versión asíncrona si no estamos seguros de si la versión SDK tiene aio nativamente fácil aquí.
-        # Las llamadas a generate_content_async son con model.generate_content_async()
-        response = await model.generate_content_async(prompt)
+        texto = await _generar_texto(prompt)
         
-        if not response.text:
+        if not texto:
             raise HTTPException(status_code=500, detail="El modelo no devolvió contenido.")
 
-        result_json = json.loads(response.text)
+        result_json = json.loads(texto)
         return result_json
 
     except json.JSONDecodeError as e:
@@ -164,11 +166,6 @@ async def importar_documento_pme(file: UploadFile = File(...)):
         # Limitamos el texto para no exceder tokens (100k chars suele ser seguro para Gemini 1.5/2.5 Flash, pero es mejor ser cautos)
         raw_text = raw_text[:80000]
 
-        model = genai.GenerativeModel(
-            'gemini-2.5-flash',
-            generation_config={"response_mime_type": "application/json"}
-        )
-        
         system_instruction = """Eres un analizador experto de datos escolares y consultor estratégico. 
 A continuación recibirás el texto crudo extraído de un documento oficial de un Plan de Mejora Educativa (PME).
 Tu trabajo es interpretar su contenido y estructurarlo ESTRICTAMENTE en nuestro formato JSON.
@@ -218,12 +215,12 @@ Genera hasta 4 fases bien estructuradas basadas únicamente en el contenido del
 
         prompt = f"{system_instruction}\n\n=== TEXTO DEL PME ===\n{raw_text}\n=====================\n"
         
-        response = await model.generate_content_async(prompt)
+        texto = await _generar_texto(prompt)
         
-        if not response.text:
+        if not texto:
             raise HTTPException(status_code=500, detail="El modelo IA no devolvió contenido.")
 
-        result_json = json.loads(response.text)
+        result_json = json.loads(texto)
         return result_json
 
     except ValueError as ve:
@@ -245,11 +242,6 @@ async def generar_informe_ia(data: Any = None):
         if settings.GOOGLE_API_KEY:
             genai.configure(api_key=settings.GOOGLE_API_KEY)
             
-        model = genai.GenerativeModel(
-            model_name="gemini-2.5-flash",
-            generation_config={"response_mime_type": "application/json"}
-        )
-        
         sys_prompt = """Eres un Consultor Estratégico de Alto Nivel evaluando un Plan de Mejora Educativa. Analiza los datos de las metas, fases e indicadores provistos. NO escribas párrafos largos. Retorna tu análisis ESTRICTAMENTE en el siguiente formato JSON:
 {
   "health_status": "Crítico" | "Estable" | "Óptimo",
@@ -273,14 +265,14 @@ Sé crudo, analítico y preciso."""
         payload_str = json.dumps(data, indent=2, ensure_ascii=False)
         prompt = f"{sys_prompt}\n\n[DATOS DEL PME PARA ANALIZAR]:\n{payload_str}"
         
-        response = await model.generate_content_async(prompt)
+        texto = await _generar_texto(prompt)
         
         # Validación de respuesta segura
-        if not response.text:
-            print(f"⚠️ [IA PME] Respuesta vacía. Candidatos: {response.candidates}")
+        if not texto:
+            print("⚠️ [IA PME] Respuesta vacía.")
             raise HTTPException(status_code=500, detail="La IA no devolvió texto. Posible bloqueo de seguridad o cuota.")
 
-        return json.loads(response.text)
+        return json.loads(texto)
 
     except Exception as e:
         import traceback
@@ -337,11 +329,6 @@ async def generar_comparativa_holding(req: ComparativaRequest):
         if not req.schools_data:
             raise HTTPException(status_code=400, detail="No hay datos de colegios para comparar.")
 
-        model = genai.GenerativeModel(
-            'gemini-2.5-flash',
-            generation_config={"response_mime_type": "application/json"}
-        )
-        
         system_instruction = """Eres un Analista Estratégico de Redes Educacionales (Holding).
 Tu misión es recibir un conjunto de Planes de Mejora Educativa (PME) de diferentes colegios y generar una visión comparativa de alto nivel.
 Debes identificar sinergias, brechas críticas y oportunidades de optimización de recursos.
@@ -367,191 +354,190 @@ Retorna ESTRICTAMENTE un JSON con esta estructura:
         payload_str = json.dumps(req.schools_data, indent=2, ensure_ascii=False)
         prompt = f"{system_instruction}\n\n[DATOS DE LOS COLEGIOS A COMPARAR]:\n{payload_str}"
         
-        response = await model.generate_content_async(prompt)
+        texto = await _generar_texto(prompt)
         
-        if not response.text:
+        if not texto:
             raise HTTPException(status_code=500, detail="La IA no pudo procesar la comparativa.")
 
-        return json.loads(response.text)
+        return json.loads(texto)
 
     except Exception as e:
         print(f"[ERROR] Comparativa Holding: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/descargar-word")
-async def descargar_informe_word(payload: dict):
-    try:
-        informe = payload.get("informe", {})
-        dashboard_data = payload.get("dashboard_data", [])
-        
-        doc = Document()
-        
-        # --- PORTADA ---
-        # Logo Centrado (Ruta Relativa Dinámica)
-        from pathlib import Path
-        CURRENT_DIR = Path(__file__).resolve().parent
-        PROJECT_ROOT = CURRENT_DIR.parent
-        logo_path = PROJECT_ROOT / "assets" / "logo_profeic.svg.png"
-        if not logo_path.exists():
-            logo_path = PROJECT_ROOT / "assets" / "logo.png"
-            
-        if logo_path.exists():
-            p_logo = doc.add_paragraph()
-            p_logo.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            r_logo = p_logo.add_run()
-            r_logo.add_picture(str(logo_path), width=Inches(2.5))
-        
-        doc.add_paragraph("\n\n\n")
-        
-        # Título Portada
-        p_title = doc.add_paragraph()
-        p_title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        r_title = p_title.add_run("INFORME DIRECTIVO ESTRATÉGICO\nPLAN DE MEJORA EDUCATIVA (PME)")
-        r_title.font.bold = True
-        r_title.font.size = Pt(24)
-        r_title.font.color.rgb = RGBColor(0x02, 0x3e, 0x8a)
-        
-        doc.add_paragraph("\n\n")
-        
-        # Subtítulo Portada
-        p_subtitle = doc.add_paragraph()
-        p_subtitle.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        r_subtitle = p_subtitle.add_run("Auditoría de Gestión Académica y Copiloto IA")
-        r_subtitle.font.size = Pt(14)
-        r_subtitle.font.italic = True
-        r_subtitle.font.color.rgb = RGBColor(0x64, 0x74, 0x8b)
+def docx_informe_pme(payload: dict) -> bytes:
+    informe = payload.get("informe", {})
+    dashboard_data = payload.get("dashboard_data", [])
+    
+    doc = Document()
+    
+    # --- PORTADA ---
+    # Logo Centrado (decodificado una vez y reducido a 2.5" a 300 dpi)
+    logo = logo_png("logo_profeic.svg.png", 750) or logo_png("logo.png", 750)
         
-        doc.add_paragraph("\n\n\n\n")
+    if logo:
+        p_logo = doc.add_paragraph()
+        p_logo.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        r_logo = p_logo.add_run()
+        r_logo.add_picture(io.BytesIO(logo), width=Inches(2.5))
+    
+    doc.add_paragraph("\n\n\n")
+    
+    # Título Portada
+    p_title = doc.add_paragraph()
+    p_title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    r_title = p_title.add_run("INFORME DIRECTIVO ESTRATÉGICO\nPLAN DE MEJORA EDUCATIVA (PME)")
+    r_title.font.bold = True
+    r_title.font.size = Pt(24)
+    r_title.font.color.rgb = RGBColor(0x02, 0x3e, 0x8a)
+    
+    doc.add_paragraph("\n\n")
+    
+    # Subtítulo Portada
+    p_subtitle = doc.add_paragraph()
+    p_subtitle.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    r_subtitle = p_subtitle.add_run("Auditoría de Gestión Académica y Copiloto IA")
+    r_subtitle.font.size = Pt(14)
+    r_subtitle.font.italic = True
+    r_subtitle.font.color.rgb = RGBColor(0x64, 0x74, 0x8b)
+    
+    doc.add_paragraph("\n\n\n\n")
+    
+    # Metadata Portada
+    p_meta = doc.add_paragraph()
+    p_meta.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    r_meta = p_meta.add_run(f"Generado el {pd.Timestamp.now().strftime('%d de %B, %Y')}\nProfeIC Analytics Service")
+    r_meta.font.size = Pt(10)
+    
+    doc.add_page_break()
+
+    # --- PIE DE PÁGINA (Paginación) ---
+    footer = doc.sections[0].footer
+    p_footer = footer.paragraphs[0]
+    p_footer.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run_footer = p_footer.add_run("Página ")
+    _add_page_number(run_footer)
+
+    # --- SECCIÓN 1: SALUD DEL PLAN ---
+    doc.add_heading("I. ESTADO GENERAL DE SALUD", level=1)
+    doc.add_paragraph("Resumen cuantitativo del avance global del Plan de Mejora Educativa basado en indicadores críticos.")
+    
+    if informe:
+        stable = doc.add_table(rows=1, cols=2)
+        stable.width = Inches(6)
+        cells = stable.rows[0].cells
         
-        # Metadata Portada
-        p_meta = doc.add_paragraph()
-        p_meta.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        r_meta = p_meta.add_run(f"Generado el {pd.Timestamp.now().strftime('%d de %B, %Y')}\nProfeIC Analytics Service")
-        r_meta.font.size = Pt(10)
+        # Celda Score con Fondo
+        _set_cell_background(cells[0], "F1F5F9")
+        p0 = cells[0].add_paragraph()
+        p0.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        r0 = p0.add_run(f"SCORE GLOBAL\n{informe.get('health_score')}%")
+        r0.font.bold = True
+        r0.font.size = Pt(20)
+        r0.font.color.rgb = RGBColor(0x02, 0x3e, 0x8a)
         
-        doc.add_page_break()
-
-        # --- PIE DE PÁGINA (Paginación) ---
-        footer = doc.sections[0].footer
-        p_footer = footer.paragraphs[0]
-        p_footer.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        run_footer = p_footer.add_run("Página ")
-        _add_page_number(run_footer)
-
-        # --- SECCIÓN 1: SALUD DEL PLAN ---
-        doc.add_heading("I. ESTADO GENERAL DE SALUD", level=1)
-        doc.add_paragraph("Resumen cuantitativo del avance global del Plan de Mejora Educativa basado en indicadores críticos.")
+        # Celda Estado
+        status = informe.get('health_status', 'N/A')
+        _set_cell_background(cells[1], "F1F5F9")
+        p1 = cells[1].add_paragraph()
+        p1.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        r1 = p1.add_run(f"CALIFICACIÓN\n{status.upper()}")
+        r1.font.bold = True
+        r1.font.size = Pt(18)
+        if status == "Óptimo": r1.font.color.rgb = RGBColor(0x10, 0xb9, 0x81)
+        elif status == "Estable": r1.font.color.rgb = RGBColor(0xf5, 0x9e, 0x0b)
+        else: r1.font.color.rgb = RGBColor(0xef, 0x44, 0x44)
+
+    doc.add_paragraph("\n")
+    
+    # --- SECCIÓN 2: ANÁLISIS ESTRATÉGICO ---
+    if informe:
+        doc.add_heading("II. ANÁLISIS ESTRATÉGICO (CO-PILOT)", level=1)
+        p_exec = doc.add_paragraph(informe.get('executive_summary', ''))
+        p_exec.style = 'Intense Quote'
         
-        if informe:
-            stable = doc.add_table(rows=1, cols=2)
-            stable.width = Inches(6)
-            cells = stable.rows[0].cells
+        if informe.get("pending_tasks"):
+            doc.add_heading("MONITOREO DE PENDIENTES CRÍTICOS", level=2)
+            doc.add_paragraph("Fases o tareas que presentan estancamiento y requieren atención inmediata.")
             
-            # Celda Score con Fondo
-            _set_cell_background(cells[0], "F1F5F9")
-            p0 = cells[0].add_paragraph()
-            p0.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            r0 = p0.add_run(f"SCORE GLOBAL\n{informe.get('health_score')}%")
-            r0.font.bold = True
-            r0.font.size = Pt(20)
-            r0.font.color.rgb = RGBColor(0x02, 0x3e, 0x8a)
+            ttable = doc.add_table(rows=1, cols=2)
+            ttable.style = 'Table Grid'
+            hdr = ttable.rows[0].cells
+            hdr[0].text = 'Acción / Tarea Pendiente'
+            hdr[1].text = 'Responsable Directo'
+            for h in hdr: 
+                h.paragraphs[0].runs[0].font.bold = True
+                _set_cell_background(h, "E2E8F0")
             
-            # Celda Estado
-            status = informe.get('health_status', 'N/A')
-            _set_cell_background(cells[1], "F1F5F9")
-            p1 = cells[1].add_paragraph()
-            p1.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            r1 = p1.add_run(f"CALIFICACIÓN\n{status.upper()}")
-            r1.font.bold = True
-            r1.font.size = Pt(18)
-            if status == "Óptimo": r1.font.color.rgb = RGBColor(0x10, 0xb9, 0x81)
-            elif status == "Estable": r1.font.color.rgb = RGBColor(0xf5, 0x9e, 0x0b)
-            else: r1.font.color.rgb = RGBColor(0xef, 0x44, 0x44)
-
-        doc.add_paragraph("\n")
+            for t in informe.get("pending_tasks", []):
+                row = ttable.add_row().cells
+                row[0].text = str(t.get("task", ""))
+                row[1].text = str(t.get("responsible", ""))
         
-        # --- SECCIÓN 2: ANÁLISIS ESTRATÉGICO ---
-        if informe:
-            doc.add_heading("II. ANÁLISIS ESTRATÉGICO (CO-PILOT)", level=1)
-            p_exec = doc.add_paragraph(informe.get('executive_summary', ''))
-            p_exec.style = 'Intense Quote'
+        doc.add_paragraph("\n")
+
+    # --- SECCIÓN 3: DETALLE DE IMPLEMENTACIÓN ---
+    doc.add_page_break()
+    doc.add_heading("III. DETALLE DE IMPLEMENTACIÓN (ACCIONES PME)", level=1)
+    doc.add_paragraph("Desglose de metas estratégicas, fases de implementación y monitoreo de indicadores.")
+    
+    if not dashboard_data:
+        doc.add_paragraph("No se detectaron datos de ejecución en el plan actual.")
+    else:
+        for i, goal in enumerate(dashboard_data, 1):
+            doc.add_heading(f"Meta Estratégica {i}: {goal.get('title', 'Sin título')}", level=2)
             
-            if informe.get("pending_tasks"):
-                doc.add_heading("MONITOREO DE PENDIENTES CRÍTICOS", level=2)
-                doc.add_paragraph("Fases o tareas que presentan estancamiento y requieren atención inmediata.")
-                
-                ttable = doc.add_table(rows=1, cols=2)
-                ttable.style = 'Table Grid'
-                hdr = ttable.rows[0].cells
-                hdr[0].text = 'Acción / Tarea Pendiente'
-                hdr[1].text = 'Responsable Directo'
-                for h in hdr: 
-                    h.paragraphs[0].runs[0].font.bold = True
-                    _set_cell_background(h, "E2E8F0")
-                
-                for t in informe.get("pending_tasks", []):
-                    row = ttable.add_row().cells
-                    row[0].text = str(t.get("task", ""))
-                    row[1].text = str(t.get("responsible", ""))
+            gtable = doc.add_table(rows=1, cols=3)
+            gtable.style = 'Table Grid'
+            hdr = gtable.rows[0].cells
+            hdr[0].text = 'Fase de Implementación'
+            hdr[1].text = 'Responsable'
+            hdr[2].text = 'Progreso'
+            for h in hdr: 
+                h.paragraphs[0].runs[0].font.bold = True
+                _set_cell_background(h, "F8FAFC")
             
+            for phase in goal.get("implementation_phases", []):
+                row = gtable.add_row().cells
+                row[0].text = f"{phase.get('title')} ({phase.get('status')})"
+                row[1].text = str(phase.get('leader_name', 'No asignado'))
+                row[2].text = f"{phase.get('average_score', 0)}%"
+                
             doc.add_paragraph("\n")
 
-        # --- SECCIÓN 3: DETALLE DE IMPLEMENTACIÓN ---
-        doc.add_page_break()
-        doc.add_heading("III. DETALLE DE IMPLEMENTACIÓN (ACCIONES PME)", level=1)
-        doc.add_paragraph("Desglose de metas estratégicas, fases de implementación y monitoreo de indicadores.")
-        
-        if not dashboard_data:
-            doc.add_paragraph("No se detectaron datos de ejecución en el plan actual.")
-        else:
-            for i, goal in enumerate(dashboard_data, 1):
-                doc.add_heading(f"Meta Estratégica {i}: {goal.get('title', 'Sin título')}", level=2)
-                
-                gtable = doc.add_table(rows=1, cols=3)
-                gtable.style = 'Table Grid'
-                hdr = gtable.rows[0].cells
-                hdr[0].text = 'Fase de Implementación'
-                hdr[1].text = 'Responsable'
-                hdr[2].text = 'Progreso'
-                for h in hdr: 
-                    h.paragraphs[0].runs[0].font.bold = True
-                    _set_cell_background(h, "F8FAFC")
-                
-                for phase in goal.get("implementation_phases", []):
-                    row = gtable.add_row().cells
-                    row[0].text = f"{phase.get('title')} ({phase.get('status')})"
-                    row[1].text = str(phase.get('leader_name', 'No asignado'))
-                    row[2].text = f"{phase.get('average_score', 0)}%"
-                    
-                doc.add_paragraph("\n")
-
-        # --- SECCIÓN 4: RECOMENDACIONES ---
-        if informe and informe.get("strategic_recommendations"):
-            doc.add_heading("IV. RECOMENDACIONES DE OPTIMIZACIÓN", level=1)
-            for rec in informe.get("strategic_recommendations", []):
-                p = doc.add_paragraph(style='List Bullet')
-                r = p.add_run(f"{rec.get('action')}: ")
-                r.font.bold = True
-                p.add_run(rec.get('detail'))
-
-        # --- CIERRE Y FIRMAS ---
-        doc.add_page_break()
-        doc.add_heading("VALIDACIÓN INSTITUCIONAL", level=1)
-        doc.add_paragraph("\n\n\n\n")
-        
-        ftable = doc.add_table(rows=1, cols=2)
-        cells = ftable.rows[0].cells
-        
-        p1 = cells[0].add_paragraph("__________________________\nFirma Director(a)\nFecha: ___/___/___")
-        p1.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        p2 = cells[1].add_paragraph("__________________________\nFirma Coordinador(a) PME\nFecha: ___/___/___")
-        p2.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    # --- SECCIÓN 4: RECOMENDACIONES ---
+    if informe and informe.get("strategic_recommendations"):
+        doc.add_heading("IV. RECOMENDACIONES DE OPTIMIZACIÓN", level=1)
+        for rec in informe.get("strategic_recommendations", []):
+            p = doc.add_paragraph(style='List Bullet')
+            r = p.add_run(f"{rec.get('action')}: ")
+            r.font.bold = True
+            p.add_run(rec.get('detail'))
+
+    # --- CIERRE Y FIRMAS ---
+    doc.add_page_break()
+    doc.add_heading("VALIDACIÓN INSTITUCIONAL", level=1)
+    doc.add_paragraph("\n\n\n\n")
+    
+    ftable = doc.add_table(rows=1, cols=2)
+    cells = ftable.rows[0].cells
+    
+    p1 = cells[0].add_paragraph("__________________________\nFirma Director(a)\nFecha: ___/___/___")
+    p1.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    
+    p2 = cells[1].add_paragraph("__________________________\nFirma Coordinador(a) PME\nFecha: ___/___/___")
+    p2.alignment = WD_ALIGN_PARAGRAPH.CENTER
 
-        buf = io.BytesIO()
-        doc.save(buf)
-        buf.seek(0)
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+@router.post("/descargar-word")
+async def descargar_informe_word(payload: dict):
+    try:
+        buf = io.BytesIO(await motor_render.renderizar_async(docx_informe_pme, payload, nombre="pme.informe"))
         
         return StreamingResponse(
             buf, 
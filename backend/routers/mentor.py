@@ -1,11 +1,15 @@
-from fastapi import APIRouter, HTTPException, Header
+from fastapi import APIRouter, HTTPException, Header, Request
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 import google.generativeai as genai
 import os
+import asyncio
 from datetime import datetime
 import locale
-from supabase import create_client, Client
+from supabase import Client
+from app.db.supabase import obtener_cliente
+from routers.deps import verificar_token
+from app.services.llm_client import cliente_llm
 
 # Configurar idioma para la fecha (intento robusto)
 try:
@@ -30,7 +34,7 @@ if not supabase_url or not supabase_key:
     print("⚠️ Advertencia: Falta SUPABASE_URL o SUPABASE_KEY. El servidor iniciará, pero este módulo fallará.")
     supabase = None
 else:
-    supabase: Client = create_client(supabase_url, supabase_key)
+    supabase: Client = obtener_cliente(supabase_url, supabase_key)
 
 # --- MODELOS DE DATOS ---
 class ChatMessage(BaseModel):
@@ -91,7 +95,7 @@ ESTILO:
 """
 
 @router.post("/chat-mentor")
-async def chat_mentor(req: ChatRequest, authorization: Optional[str] = Header(None)):
+async def chat_mentor(req: ChatRequest, request: Request, authorization: Optional[str] = Header(None)):
     try:
         if not req.history:
             return {"response": f"Hola {req.user_name}, soy Mentor IC. ¿En qué puedo ayudarte hoy?"}
@@ -106,9 +110,8 @@ async def chat_mentor(req: ChatRequest, authorization: Optional[str] = Header(No
         if authorization and supabase:
             try:
                 token = authorization.split("Bearer ")[-1]
-                user_resp = supabase.auth.get_user(token)
-                if user_resp and user_resp.user:
-                    user_id = user_resp.user.id
+                user_id = (await verificar_token(token)).id
+                if user_id:
                     profile_resp = supabase.table("profiles").select(
                         "school_id"
                     ).eq("id", user_id).maybe_single().execute()
@@ -129,7 +132,7 @@ async def chat_mentor(req: ChatRequest, authorization: Optional[str] = Header(No
         # ── 2. BUSCAR EN SUPABASE (RAG multi-tenant) ──
         rag_data = []
         try:
-            query_vector = get_query_embedding(ultima_pregunta)
+            query_vector = await asyncio.to_thread(get_query_embedding, ultima_pregunta)
             
             rpc_params = {
                 "query_embedding": query_vector,
@@ -169,10 +172,11 @@ async def chat_mentor(req: ChatRequest, authorization: Optional[str] = Header(No
 
         # 5. Generar Respuesta con IA
         try:
-            # INTENTO 1: GEMINI 2.5 FLASH
-            model = genai.GenerativeModel('gemini-2.5-flash') 
-            response = model.generate_content(full_prompt)
-            return {"response": response.text}
+            # INTENTO 1: GEMINI 2.5 FLASH (una conversación no se sirve desde la caché)
+            texto = await cliente_llm.generar("mentor", full_prompt, cache=False, request=request)
+            return {"response": texto}
+        except HTTPException:
+            raise  # Timeout o cliente desconectado: no tiene sentido reintentar con el fallback
         except Exception as e_primary:
             print(f"⚠️ Error con modelo principal: {e_primary}. Intentando fallback...")
             
@@ -183,11 +187,15 @@ async def chat_mentor(req: ChatRequest, authorization: Optional[str] = Header(No
                 {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_ONLY_HIGH"},
                 {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_ONLY_HIGH"},
             ]
-            model = genai.GenerativeModel('gemini-2.5-flash', safety_settings=safety_settings) 
-            response = model.generate_content(full_prompt)
+            try:
+                texto = await cliente_llm.generar(
+                    "mentor", full_prompt, safety_settings=safety_settings, cache=False, request=request
+                )
+            except ValueError:
+                texto = ""  # Respuesta sin partes (bloqueada por seguridad)
             
-            if response.parts:
-                return {"response": response.text}
+            if texto:
+                return {"response": texto}
             else:
                 print("⚠️ El modelo fallback devolvió una respuesta vacía.")
                 return {"response": "Lo siento, mi conexión neuronal parpadeó. ¿Podrías reformular la pregunta?"}
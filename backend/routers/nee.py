@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Header
+from fastapi import APIRouter, HTTPException, Header, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Optional
@@ -8,6 +8,10 @@ import json
 import re
 import io
 import httpx
+from app.services.llm_client import cliente_llm
+from app.services.llm_cache import json_valido
+from app.services.docx_render import motor_render
+from app.services.docx_plantillas import PlantillaDocx, logo_png
 from docx import Document
 from docx.shared import Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
@@ -88,7 +92,7 @@ FORMATO JSON:
 """
 
 @router.post("/nee/generate")
-async def generate_nee_strategies(req: NeeRequest, authorization: Optional[str] = Header(None)):
+async def generate_nee_strategies(req: NeeRequest, request: Request, authorization: Optional[str] = Header(None)):
     try:
         # Contexto institucional dinámico
         contexto_institucional = CONTEXTO_FALLBACK
@@ -106,8 +110,6 @@ async def generate_nee_strategies(req: NeeRequest, authorization: Optional[str]
             except Exception:
                 pass
 
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        
         prompt = f"""
         CONTEXTO INSTITUCIONAL: {contexto_institucional}
         
@@ -121,10 +123,9 @@ async def generate_nee_strategies(req: NeeRequest, authorization: Optional[str]
         Genera las adecuaciones prácticas en JSON. Sé empático y concreto.
         """
         
-        response = model.generate_content(SYSTEM_PROMPT + prompt)
+        texto_limpio = await cliente_llm.generar("nee", SYSTEM_PROMPT + prompt, request=request, validar=json_valido)
         
         # Limpieza de JSON
-        texto_limpio = response.text
         if "```" in texto_limpio:
             texto_limpio = re.sub(r"```json\s*", "", texto_limpio)
             texto_limpio = re.sub(r"```\s*$", "", texto_limpio)
@@ -171,10 +172,9 @@ async def generate_dua_variants(req: DUARequest):
         }}
         """
 
-        model = genai.GenerativeModel('gemini-2.5-flash', generation_config={"response_mime_type": "application/json"})
-        response = model.generate_content(prompt)
+        texto = await cliente_llm.generar("nee", prompt, generation_config={"response_mime_type": "application/json"}, validar=json.loads)
         
-        return json.loads(response.text)
+        return json.loads(texto)
 
     except Exception as e:
         print(f"❌ Error DUA: {e}")
@@ -186,81 +186,90 @@ async def generate_dua_variants(req: DUARequest):
 
 
 # --- EXPORTACIÓN A WORD ---
-@router.post("/nee/download")
-async def download_nee_docx(data: DownloadRequest):
-    try:
-        doc = Document()
-        
-        # Logo y Título
-        t = doc.add_table(rows=1, cols=2)
-        t.autofit = False
-        t.columns[0].width = Inches(1.2)
-        t.columns[1].width = Inches(5.3)
-        
-        # Logo
-        cell_logo = t.cell(0, 0)
-        base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        logo_path = os.path.join(base, "assets", "logo_profeic..png")
-        p_logo = cell_logo.paragraphs[0]
-        run_logo = p_logo.add_run()
-        if os.path.exists(logo_path):
-            try:
-                run_logo.add_picture(logo_path, width=Inches(1.0))
-            except Exception:
-                run_logo.add_text("ProfeIC")
-        else:
+def _nee_base(doc: Document) -> None:
+    """Encabezado y pie fijos del documento NEE: van en la plantilla."""
+    # Logo y Título
+    t = doc.add_table(rows=1, cols=2)
+    t.autofit = False
+    t.columns[0].width = Inches(1.2)
+    t.columns[1].width = Inches(5.3)
+    
+    # Logo
+    cell_logo = t.cell(0, 0)
+    logo = logo_png("logo_profeic..png")
+    p_logo = cell_logo.paragraphs[0]
+    run_logo = p_logo.add_run()
+    if logo:
+        try:
+            run_logo.add_picture(io.BytesIO(logo), width=Inches(1.0))
+        except Exception:
             run_logo.add_text("ProfeIC")
+    else:
+        run_logo.add_text("ProfeIC")
+
+    # Título
+    cell_info = t.cell(0, 1)
+    p_info = cell_info.paragraphs[0]
+    p_info.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+    r1 = p_info.add_run("PROFE IC\n")
+    r1.bold = True
+    r1.font.size = Pt(12)
+    r1.font.color.rgb = RGBColor(43, 84, 110)
+    p_info.add_run("Asistente de Inclusión & DUA\n").font.size = Pt(10)
+    doc.add_paragraph()
+
+    # Footer
+    section = doc.sections[0]
+    footer = section.footer
+    p = footer.paragraphs[0]
+    p.text = "Documento generado por PROFE IC - Recurso creado con Inteligencia Aumentada de la Plataforma ProfeIC"
 
-        # Título
-        cell_info = t.cell(0, 1)
-        p_info = cell_info.paragraphs[0]
-        p_info.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-        r1 = p_info.add_run("PROFE IC\n")
-        r1.bold = True
-        r1.font.size = Pt(12)
-        r1.font.color.rgb = RGBColor(43, 84, 110)
-        p_info.add_run("Asistente de Inclusión & DUA\n").font.size = Pt(10)
-        doc.add_paragraph()
-
-        # Datos del Estudiante
-        doc.add_heading('1. Contexto del Estudiante', level=1)
-        doc.add_paragraph(f"Curso: {data.grade} | Asignatura: {data.subject}")
-        p = doc.add_paragraph()
-        p.add_run("Diagnóstico/Condición: ").bold = True
-        p.add_run(data.diagnosis)
-        p = doc.add_paragraph()
-        p.add_run("Barrera Detectada: ").bold = True
-        p.add_run(data.barrier)
-
-        # Actividad Original
-        doc.add_heading('2. Actividad Original', level=1)
-        doc.add_paragraph(data.activity)
-
-        # Adecuaciones
-        doc.add_heading('3. Estrategias de Adecuación Curricular', level=1)
-        
-        p = doc.add_paragraph()
-        p.add_run("Enfoque DUA: ").bold = True
-        p.add_run(data.dua_principles).italic = True
 
-        doc.add_heading('A. Adecuación de Acceso (Preparación)', level=2)
-        doc.add_paragraph(data.estrategias.acceso)
+_PLANTILLA_NEE = PlantillaDocx(_nee_base)
 
-        doc.add_heading('B. Adecuación de la Actividad (Desarrollo)', level=2)
-        doc.add_paragraph(data.estrategias.actividad)
 
-        doc.add_heading('C. Evaluación Diversificada', level=2)
-        doc.add_paragraph(data.estrategias.evaluacion)
+def docx_nee(data: DownloadRequest) -> bytes:
+    doc = _PLANTILLA_NEE.nueva()
 
-        # Footer
-        section = doc.sections[0]
-        footer = section.footer
-        p = footer.paragraphs[0]
-        p.text = "Documento generado por PROFE IC - Recurso creado con Inteligencia Aumentada de la Plataforma ProfeIC"
+    # Datos del Estudiante
+    doc.add_heading('1. Contexto del Estudiante', level=1)
+    doc.add_paragraph(f"Curso: {data.grade} | Asignatura: {data.subject}")
+    p = doc.add_paragraph()
+    p.add_run("Diagnóstico/Condición: ").bold = True
+    p.add_run(data.diagnosis)
+    p = doc.add_paragraph()
+    p.add_run("Barrera Detectada: ").bold = True
+    p.add_run(data.barrier)
 
-        buffer = io.BytesIO()
-        doc.save(buffer)
-        buffer.seek(0)
+    # Actividad Original
+    doc.add_heading('2. Actividad Original', level=1)
+    doc.add_paragraph(data.activity)
+
+    # Adecuaciones
+    doc.add_heading('3. Estrategias de Adecuación Curricular', level=1)
+    
+    p = doc.add_paragraph()
+    p.add_run("Enfoque DUA: ").bold = True
+    p.add_run(data.dua_principles).italic = True
+
+    doc.add_heading('A. Adecuación de Acceso (Preparación)', level=2)
+    doc.add_paragraph(data.estrategias.acceso)
+
+    doc.add_heading('B. Adecuación de la Actividad (Desarrollo)', level=2)
+    doc.add_paragraph(data.estrategias.actividad)
+
+    doc.add_heading('C. Evaluación Diversificada', level=2)
+    doc.add_paragraph(data.estrategias.evaluacion)
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+@router.post("/nee/download")
+async def download_nee_docx(data: DownloadRequest):
+    try:
+        buffer = io.BytesIO(await motor_render.renderizar_async(docx_nee, data, nombre="nee.adecuacion"))
 
         return StreamingResponse(
             buffer,
@@ -1,8 +1,13 @@
 from fastapi import APIRouter, File, UploadFile, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from .deps import get_current_user_id_optional
 from services.vision_service import OMRVisionService
+from services.omr_lote import expandir_archivos, procesar_lote_omr
+from app.core.executors import get_process_pool
 from pydantic import BaseModel
-from typing import Dict, Optional
+from typing import Dict, List, Optional
+import asyncio
+import json
 import logging
 
 router = APIRouter(prefix="/api/v1/omr", tags=["OMR Vision"])
@@ -22,13 +27,15 @@ async def process_omr_scan(
 ):
     """
     Recibe un archivo de imagen, procesa el OMR y el QR, y retorna los resultados.
+    La visión corre en el pool de procesos para no bloquear el event loop.
     """
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="El archivo cargado no es una imagen.")
 
     try:
         contents = await file.read()
-        result = OMRVisionService.process_image(contents)
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(get_process_pool(), OMRVisionService.process_image, contents)
         
         return OMRProcessResponse(
             evaluation_instance_id=result["evaluation_instance_id"],
@@ -45,3 +52,41 @@ async def process_omr_scan(
         logger.error(error_msg)
         raise HTTPException(status_code=500, detail=f"Detalle del error: {str(e)}")
 
+@router.post("/process/lote")
+async def process_omr_lote(
+    files: List[UploadFile] = File(..., description="Imágenes de hojas OMR y/o PDFs escaneados (una hoja por página)"),
+    current_user_id: Optional[str] = Depends(get_current_user_id_optional)
+):
+    """
+    Lectura masiva de hojas OMR (p. ej. todas las de un ensayo SIMCE).
+    Responde NDJSON: una línea por hoja apenas se procesa (con `progreso` "i/total")
+    y una línea final `{"evento": "resumen", ...}`.
+    """
+    try:
+        archivos = [(f.filename or "hoja", f.content_type or "", await f.read()) for f in files]
+        hojas = await asyncio.get_running_loop().run_in_executor(None, expandir_archivos, archivos)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        logger.error(f"Error leyendo el lote OMR: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"No se pudo leer el lote: {str(e)}")
+
+    if not hojas:
+        raise HTTPException(status_code=400, detail="El lote no contiene hojas para procesar.")
+
+    async def _eventos():
+        exitosas = 0
+        async for resultado in procesar_lote_omr(hojas):
+            if resultado["status"] == "success":
+                exitosas += 1
+            yield json.dumps({"evento": "hoja", **resultado}, ensure_ascii=False) + "\n"
+
+        logger.info(f"Lote OMR: {exitosas}/{len(hojas)} hojas leídas")
+        yield json.dumps({
+            "evento": "resumen",
+            "total_hojas": len(hojas),
+            "exitosas": exitosas,
+            "fallidas": len(hojas) - exitosas
+        }, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(_eventos(), media_type="application/x-ndjson")
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Header
+from fastapi import APIRouter, Header, Request
 from pydantic import BaseModel
 # Eliminamos "List" y "Optional" de typing porque daban problemas en Python 3.14
 import google.generativeai as genai
@@ -6,6 +6,7 @@ import json
 import re
 import os
 import httpx
+from app.services.llm_client import cliente_llm
 
 # Configuración Inicial
 router = APIRouter()
@@ -65,7 +66,7 @@ def limpiar_y_reparar_json(texto_sucio):
 
 # --- ENDPOINT ---
 @router.post("/api/generate")
-async def generar_planificacion(request: GenerateRequest, authorization: str = Header(None)):
+async def generar_planificacion(request: GenerateRequest, http_request: Request, authorization: str = Header(None)):
     print(f"⚡ [PLANIFICADOR] Procesando: {request.nivel} | {request.asignatura}")
     
     try:
@@ -221,10 +222,14 @@ async def generar_planificacion(request: GenerateRequest, authorization: str = H
         }}
         """
 
-        model = genai.GenerativeModel('gemini-2.5-flash', generation_config={"response_mime_type": "application/json"})
-        response = model.generate_content(prompt)
+        texto = await cliente_llm.generar(
+            "planificador", prompt,
+            generation_config={"response_mime_type": "application/json"},
+            request=http_request,
+            validar=limpiar_y_reparar_json
+        )
 
-        resultado = limpiar_y_reparar_json(response.text)
+        resultado = limpiar_y_reparar_json(texto)
         
         if not resultado:
             return {
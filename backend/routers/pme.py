@@ -4,8 +4,9 @@ from fastapi import APIRouter, HTTPException, File, UploadFile, Depends
 from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 import google.generativeai as genai
-from supabase import create_client
+from app.db.supabase import obtener_cliente
 from routers.deps import get_current_user_id
+from app.services.llm_client import cliente_llm
 
 router = APIRouter(prefix="/api/v1/pme", tags=["PME"])
 
@@ -13,18 +14,20 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY", "")
 
 try:
-    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    supabase = obtener_cliente(SUPABASE_URL, SUPABASE_KEY)
 except Exception:
     supabase = None
 
 genai.configure(api_key=os.getenv("GOOGLE_API_KEY", ""))
 
 
-def get_model():
-    return genai.GenerativeModel(
-        "gemini-2.5-flash",
-        generation_config={"response_mime_type": "application/json"}
-    )
+MODEL_NAME = "gemini-2.5-flash"
+CONFIG_JSON = {"response_mime_type": "application/json"}
+
+
+async def generar_texto(prompt: str) -> str:
+    """Respuesta de Gemini en modo JSON (cliente LLM compartido: caché, planificador y timeout)."""
+    return await cliente_llm.generar("pme", prompt, modelo=MODEL_NAME, generation_config=CONFIG_JSON)
 
 
 @router.get("/analisis-progreso")
@@ -59,9 +62,7 @@ async def analisis_progreso(user_id: str = Depends(get_current_user_id)):
         Metas Operativas Vinculadas: {goals}
         """
 
-        model = get_model()
-        response = await model.generate_content_async(prompt)
-        text = response.text.replace("```json", "").replace("```", "").strip()
+        text = (await generar_texto(prompt)).replace("```json", "").replace("```", "").strip()
         import json
         try:
             parsed = json.loads(text)
@@ -221,10 +222,7 @@ async def importar_documento_pme(file: UploadFile = File(...), user_id: str = De
 
         # Enviar a Gemini con JSON mode
         import json
-        model = get_model()
-        response = await model.generate_content_async(prompt)
-        
-        result_text = response.text.replace("```json", "").replace("```", "").strip()
+        result_text = (await generar_texto(prompt)).replace("```json", "").replace("```", "").strip()
         parsed_data = json.loads(result_text)
         
         return JSONResponse(content=parsed_data)
@@ -365,9 +363,7 @@ async def validar_smart(req: ValidarSmartRequest, user_id: str = Depends(get_cur
         }}
         """
 
-        model = get_model()
-        response = await model.generate_content_async(prompt)
-        text = response.text.replace("```json", "").replace("```", "").strip()
+        text = (await generar_texto(prompt)).replace("```json", "").replace("```", "").strip()
         
         import json
         try:
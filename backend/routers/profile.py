@@ -7,7 +7,9 @@ para inyectarlo en todos los módulos de generación de IA.
 from fastapi import APIRouter, HTTPException, Header
 from pydantic import BaseModel
 from typing import Optional
-from supabase import create_client, Client
+from supabase import Client
+from app.db.supabase import obtener_cliente, ejecutar
+from routers.deps import verificar_token
 import os
 
 router = APIRouter(prefix="/profile", tags=["Profile"])
@@ -18,7 +20,7 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 supabase: Optional[Client] = None
 try:
     if SUPABASE_URL and SUPABASE_KEY:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        supabase = obtener_cliente(SUPABASE_URL, SUPABASE_KEY)
 except Exception as e:
     print(f"❌ [PROFILE] Error conectando a Supabase: {e}")
 
@@ -44,18 +46,14 @@ async def get_institutional_context(authorization: str = Header(...)):
     try:
         # 1. Obtener usuario actual desde el token
         token = authorization.split("Bearer ")[-1]
-        user_resp = supabase.auth.get_user(token)
-        if not user_resp or not user_resp.user:
-            raise HTTPException(status_code=401, detail="Token inválido")
-
-        user = user_resp.user
+        user = await verificar_token(token)
         user_id = user.id
         user_meta = user.user_metadata or {}
 
         # 2. Obtener datos del perfil (school_id + preferencia geográfica)
-        profile_resp = supabase.table("profiles").select(
+        profile_resp = await ejecutar(supabase.table("profiles").select(
             "school_id, usar_contexto_geografico"
-        ).eq("id", user_id).maybe_single().execute()
+        ).eq("id", user_id).maybe_single(), "profiles.contexto")
 
         profile_data = profile_resp.data or {}
         school_id = profile_data.get("school_id")
@@ -64,9 +62,9 @@ async def get_institutional_context(authorization: str = Header(...)):
         # 3. Obtener datos del colegio si existe
         school_data = None
         if school_id:
-            school_resp = supabase.table("schools").select(
+            school_resp = await ejecutar(supabase.table("schools").select(
                 "name, city, region, sello_institucional, valores, proyecto_educativo, attendance_avg, priority_pct, pie_neet_count, pie_neep_count, socioeconomic_level"
-            ).eq("id", school_id).maybe_single().execute()
+            ).eq("id", school_id).maybe_single(), "schools.contexto")
             school_data = school_resp.data
 
         # 4. Construir el bloque de contexto para el prompt
@@ -146,15 +144,11 @@ async def update_context_preference(
 
     try:
         token = authorization.split("Bearer ")[-1]
-        user_resp = supabase.auth.get_user(token)
-        if not user_resp or not user_resp.user:
-            raise HTTPException(status_code=401, detail="Token inválido")
-
-        user_id = user_resp.user.id
+        user_id = (await verificar_token(token)).id
 
-        supabase.table("profiles").update({
+        await ejecutar(supabase.table("profiles").update({
             "usar_contexto_geografico": req.usar_contexto_geografico
-        }).eq("id", user_id).execute()
+        }).eq("id", user_id), "profiles.preferencias")
 
         return {"message": "Preferencia actualizada", "usar_contexto_geografico": req.usar_contexto_geografico}
 
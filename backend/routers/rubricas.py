@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Header
+from fastapi import APIRouter, Header, Request
 from pydantic import BaseModel
 import google.generativeai as genai
 import json
 import re
 import os
 import httpx
+from app.services.llm_client import cliente_llm
 
 router = APIRouter()
 
@@ -43,7 +44,7 @@ def limpiar_rubrica_json(texto):
             return {"titulo": "Error de Generación", "descripcion": "Intente nuevamente.", "tabla": []}
 
 @router.post("/generate-rubric")
-async def generar_rubrica(req: RubricRequest, authorization: str = Header(None)):
+async def generar_rubrica(req: RubricRequest, request: Request, authorization: str = Header(None)):
     print(f"⚡ [RÚBRICA] Generando para: {req.actividad}")
     
     try:
@@ -118,9 +119,14 @@ async def generar_rubrica(req: RubricRequest, authorization: str = Header(None))
           ]
         }}
         """
-        model = genai.GenerativeModel('gemini-2.5-flash', generation_config={"response_mime_type": "application/json"})
-        response = model.generate_content(prompt)
-        return limpiar_rubrica_json(response.text)
+        texto = await cliente_llm.generar(
+            "rubricas", prompt,
+            generation_config={"response_mime_type": "application/json"},
+            request=request,
+            # El fallback de limpiar_rubrica_json trae la tabla vacía: eso no se cachea
+            validar=lambda t: limpiar_rubrica_json(t).get("tabla")
+        )
+        return limpiar_rubrica_json(texto)
     except Exception as e:
         print(f"❌ Error Rúbrica: {e}")
         return {"titulo": "Error Técnico", "descripcion": str(e), "tabla": []}
\ No newline at end of file
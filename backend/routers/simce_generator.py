@@ -26,7 +26,7 @@ import random
 import re
 import unicodedata
 from pathlib import Path
-from typing import Any, Literal
+from typing import Any, AsyncIterator, Literal
 from urllib.parse import quote
 
 import google.generativeai as genai
@@ -39,10 +39,15 @@ from docx.shared import Inches, Pt, RGBColor
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, field_validator
-from supabase import Client, create_client
+from supabase import Client
+from app.db.supabase import obtener_cliente, ejecutar
 
 from routers.deps import get_current_user_id
 from simce_blueprint_parser import BlueprintResult, calculate_question_distribution
+import simce_assets
+from app.services.llm_scheduler import planificador_llm, PRIORIDAD_LOTE
+from app.services.docx_render import motor_render
+from app.services.docx_plantillas import PlantillaDocx, logo_png
 
 # ─── Logger ───────────────────────────────────────────────────────────────────
 
@@ -55,7 +60,7 @@ _SB_KEY: str = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY
 
 supabase: Client | None = None
 if _SB_URL and _SB_KEY:
-    supabase = create_client(_SB_URL, _SB_KEY)
+    supabase = obtener_cliente(_SB_URL, _SB_KEY)
 else:
     logger.warning("⚠️  Supabase no configurado — el contexto RAG no funcionará.")
 
@@ -73,12 +78,12 @@ else:
 
 # ─── Ruta al JSON de tablas de especificaciones ────────────────────────────────
 
-# El parser vive en backend/ y el JSON en la raíz del proyecto (un nivel arriba)
-_BLUEPRINT_JSON: Path = Path(__file__).parent.parent.parent / "tablas_especificaciones_simce.json"
+# Todos los JSON viven en backend/assets y se sirven desde el almacén precargado
+_BLUEPRINT_JSON: Path = simce_assets.TABLAS_JSON
 
-_ASSETS_DIR: Path = Path(__file__).parent.parent / "assets"
-_ESTIMULOS_JSON: Path = _ASSETS_DIR / "banco_estimulos_unificado.json"
-_MATRIZ_JSON: Path = _ASSETS_DIR / "matriz_distractores_oficial.json"
+_ASSETS_DIR: Path = simce_assets.ASSETS_DIR
+_ESTIMULOS_JSON: Path = simce_assets.ESTIMULOS_JSON
+_MATRIZ_JSON: Path = simce_assets.MATRIZ_JSON
 
 # ─── Router ────────────────────────────────────────────────────────────────────
 
@@ -167,8 +172,7 @@ class SimceGenerateResponse(BaseModel):
 def _get_random_stimulus(asignatura: str, nivel: str) -> dict | None:
     try:
         if not _ESTIMULOS_JSON.exists(): return None
-        data = json.loads(_ESTIMULOS_JSON.read_text("utf-8"))
-        filtrados = [item for item in data if item.get("asignatura") == asignatura and item.get("nivel") == nivel and item.get("tipo") != "imagen_adjunta_solo"]
+        filtrados = simce_assets.estimulos().exactos(asignatura, nivel)
         if filtrados:
             return random.choice(filtrados)
         return None
@@ -179,8 +183,7 @@ def _get_random_stimulus(asignatura: str, nivel: str) -> dict | None:
 def _get_matriz_distractores() -> str:
     try:
         if not _MATRIZ_JSON.exists(): return ""
-        data = json.loads(_MATRIZ_JSON.read_text("utf-8"))
-        return json.dumps(data.get("tipos_error", {}), ensure_ascii=False)
+        return simce_assets.matriz_distractores_texto()
     except Exception as e:
         logger.error("Error al leer matriz: %s", e)
         return ""
@@ -208,7 +211,7 @@ def _get_blueprint(request: SimceGenerateRequest) -> BlueprintResult:
         ) from exc
 
 
-def _get_rag_context(nivel: str, asignatura: str, limit: int = 15) -> list[str]:
+async def _get_rag_context(nivel: str, asignatura: str, limit: int = 15) -> list[str]:
     """
     Obtiene indicadores de aprendizaje relevantes desde Supabase.
     Devuelve lista vacía si Supabase no está disponible o no hay resultados.
@@ -219,13 +222,13 @@ def _get_rag_context(nivel: str, asignatura: str, limit: int = 15) -> list[str]:
 
     try:
         # La tabla curriculum_indicadores tiene columnas: nivel, asignatura, indicador
-        response = (
+        response = await ejecutar(
             supabase.table("curriculum_indicadores")
             .select("indicador")
             .eq("nivel", nivel)
             .eq("asignatura", asignatura)
-            .limit(limit)
-            .execute()
+            .limit(limit),
+            "curriculum_indicadores.rag"
         )
         indicadores: list[str] = [
             row["indicador"]
@@ -364,10 +367,11 @@ Devuelve ÚNICAMENTE un JSON válido (sin markdown, sin bloques de código, sin
 }}"""
 
 
-async def _call_llm(prompt: str, file_part: dict | None = None) -> dict[str, Any] | None:
+async def _call_llm(prompt: str, file_part: dict | None = None, prioridad: int = PRIORIDAD_LOTE) -> dict[str, Any] | None:
     """
     Llamada asíncrona a Gemini usando el SDK google-generativeai.
-    Ejecuta en un thread pool para no bloquear FastAPI.
+    Ejecuta en un thread pool para no bloquear FastAPI y pasa por el planificador
+    compartido (cupo por modelo, token bucket, reintentos ante 429/5xx).
     """
     try:
         model = genai.GenerativeModel(
@@ -384,10 +388,14 @@ async def _call_llm(prompt: str, file_part: dict | None = None) -> dict[str, Any
             contents.append(file_part)
 
         # Generación en thread para prevenir bloqueo
-        response = await asyncio.to_thread(
-            model.generate_content,
-            contents,
-            request_options={"timeout": 240}
+        response = await planificador_llm.ejecutar(
+            _GEMINI_MODEL,
+            lambda: asyncio.to_thread(
+                model.generate_content,
+                contents,
+                request_options={"timeout": 240}
+            ),
+            prioridad=prioridad
         )
 
         texto: str = response.text.strip()
@@ -448,6 +456,139 @@ def _split_blueprint(blueprint: BlueprintResult, num_chunks: int = 2) -> list[Bl
     return chunks
 
 
+def _a_pregunta(p: dict[str, Any], numero_por_defecto: int) -> PreguntaGenerada:
+    return PreguntaGenerada(
+        numero=p.get("numero", numero_por_defecto),
+        habilidad_medida=p.get("habilidad_medida", "—"),
+        enunciado=p.get("enunciado", ""),
+        alternativas=p.get("alternativas", {"A":{"texto": ""}}),
+        correcta=p.get("correcta", "A"),
+        justificacion=p.get("justificacion", ""),
+        explicacion_correcta=p.get("explicacion_correcta") or p.get("justificacion", ""),
+    )
+
+
+async def _pipeline_instrumento(request: SimceGenerateRequest) -> AsyncIterator[dict[str, Any]]:
+    """
+    Genera el instrumento por chunks en paralelo y emite eventos a medida que cada chunk se parsea:
+    `inicio` (blueprint y estímulo), un `bloque` por chunk (en orden de término) y un `resumen`
+    final con la misma forma que SimceGenerateResponse.
+    """
+    # Paso 1: Blueprint y Contexto (RAG)
+    blueprint_full = _get_blueprint(request)
+    indicadores = await _get_rag_context(request.nivel, request.asignatura, 15)
+    blueprint_resumen = str(blueprint_full)
+
+    # Paso 2: Chunking
+    num_chunks = 2 if request.cantidad_preguntas > 25 else 1
+    sub_blueprints = [sb for sb in _split_blueprint(blueprint_full, num_chunks) if sb.total_preguntas > 0]
+
+    # Nuevas variables de estímulo y matriz
+    estimulo = _get_random_stimulus(request.asignatura, request.nivel)
+    estimulo_texto = estimulo.get("contenido_real") if estimulo else None
+    estimulo_imagen = estimulo.get("imagen_adjunta") if estimulo else None
+    matriz_text = _get_matriz_distractores()
+
+    file_part = None
+    if request.archivo_base64 and request.archivo_mime_type:
+        file_part = {
+            "mime_type": request.archivo_mime_type,
+            "data": request.archivo_base64
+        }
+
+    # ─── Función interna de protección por Lote ───
+    async def safe_generate_chunk(idx: int, sb: BlueprintResult, start_num: int):
+        sb_text = _build_blueprint_text(sb)
+        prompt = _build_system_prompt(
+            request=request,
+            blueprint=sb,
+            distribucion_text=sb_text,
+            indicadores=indicadores,
+            estimulo_text=estimulo_texto or "",
+            matriz_text=matriz_text,
+            sub_total=sb.total_preguntas,
+            start_number=start_num
+        )
+
+        try:
+            logger.info("🤖 Iniciando chunk %d (%d preguntas)...", start_num, sb.total_preguntas)
+            resultado = await _call_llm(prompt, file_part=file_part)
+
+            # Validación estricta anti-caídas
+            if not resultado or not isinstance(resultado, dict):
+                logger.warning("⚠️ Alerta en chunk %d: La IA no devolvió un JSON válido.", start_num)
+                resultado = {"titulo": None, "preguntas": []}
+        except Exception as e:
+            logger.error("❌ Excepción crítica en el chunk %d: %s", start_num, e)
+            resultado = {"titulo": None, "preguntas": []}
+        return idx, start_num, resultado
+
+    yield {
+        "evento": "inicio",
+        "asignatura": request.asignatura,
+        "nivel": request.nivel,
+        "modo": request.modo,
+        "cantidad_solicitada": request.cantidad_preguntas,
+        "bloques": len(sub_blueprints),
+        "blueprint_resumen": blueprint_resumen,
+        "estimulo_texto": estimulo_texto,
+        "estimulo_imagen": estimulo_imagen,
+    }
+
+    # Paso 3: Encolar las tareas (el planificador decide cuándo sale cada llamada)
+    tasks = []
+    por_chunk: dict[int, tuple[str | None, list[PreguntaGenerada]]] = {}
+    try:
+        current_start = 1
+        for idx, sb in enumerate(sub_blueprints):
+            tasks.append(asyncio.create_task(safe_generate_chunk(idx, sb, current_start)))
+            current_start += sb.total_preguntas
+
+        # Paso 4: Emitir cada chunk apenas termina
+        for terminado in asyncio.as_completed(tasks):
+            idx, start_num, res = await terminado
+            preguntas = [_a_pregunta(p, start_num + j) for j, p in enumerate(res.get("preguntas", []))]
+            por_chunk[idx] = (res.get("titulo"), preguntas)
+            yield {
+                "evento": "bloque",
+                "bloque": idx + 1,
+                "progreso": f"{len(por_chunk)}/{len(tasks)}",
+                "preguntas": [p.model_dump() for p in preguntas],
+            }
+    finally:
+        # Cliente desconectado o error: no seguir pagando llamadas al LLM
+        for t in tasks:
+            t.cancel()
+
+    # Paso 5: Consolidación de los fragmentos (en orden de chunk)
+    preguntas_finales: list[PreguntaGenerada] = []
+    final_titulo = None
+    for idx in sorted(por_chunk):
+        titulo, preguntas = por_chunk[idx]
+        preguntas_finales.extend(preguntas)
+        if not final_titulo and titulo:
+            final_titulo = titulo
+
+    if not preguntas_finales:
+        logger.error("❌ Array de preguntas final vacío.")
+        raise ValueError("No se pudo generar ninguna pregunta. Revisa los logs de Gemini.")
+
+    logger.info("✅ Generación finalizada: %d preguntas", len(preguntas_finales))
+
+    resumen = SimceGenerateResponse(
+        titulo=final_titulo or f"Ensayo SIMCE — {request.asignatura}",
+        asignatura=request.asignatura,
+        nivel=request.nivel,
+        cantidad_preguntas=len(preguntas_finales),
+        modo=request.modo,
+        blueprint_resumen=blueprint_resumen,
+        estimulo_texto=estimulo_texto,
+        estimulo_imagen=estimulo_imagen,
+        preguntas=preguntas_finales,
+    )
+    yield {"evento": "resumen", **resumen.model_dump()}
+
+
 @router.post(
     "/generate",
     response_model=SimceGenerateResponse,
@@ -458,121 +599,17 @@ async def generate_simce_instrument(
     user_id: str = Depends(get_current_user_id),
 ) -> SimceGenerateResponse:
     """
-    Orquesta la generación en paralelo con retrasos para evitar 429.
+    Orquesta la generación en paralelo; el planificador LLM regula la tasa y reintenta los 429.
     """
     logger.info("🎯 SIMCE Generate: user=%s | modo=%s", user_id, request.modo)
     
     try:
-        # Paso 1: Blueprint y Contexto (RAG)
-        blueprint_full = _get_blueprint(request)
-        indicadores = _get_rag_context(request.nivel, request.asignatura, limit=15)
-        blueprint_resumen = str(blueprint_full)
-
-        # Paso 2: Chunking (Dividimos en 2 bloques si hay más de 25 preguntas)
-        num_chunks = 2 if request.cantidad_preguntas > 25 else 1
-        sub_blueprints = _split_blueprint(blueprint_full, num_chunks)
-        
-        # Nuevas variables de estímulo y matriz
-        estimulo = _get_random_stimulus(request.asignatura, request.nivel)
-        estimulo_texto = estimulo.get("contenido_real") if estimulo else None
-        estimulo_imagen = estimulo.get("imagen_adjunta") if estimulo else None
-        matriz_text = _get_matriz_distractores()
-
-        # ─── Función interna de protección por Lote ───
-        async def safe_generate_chunk(sb, start_num, delay: float = 0):
-            if delay > 0:
-                logger.info("⏳ Esperando %.1fs para iniciar chunk %d...", delay, start_num)
-                await asyncio.sleep(delay) 
-            
-            sb_text = _build_blueprint_text(sb)
-            prompt = _build_system_prompt(
-                request=request,
-                blueprint=sb,
-                distribucion_text=sb_text,
-                indicadores=indicadores,
-                estimulo_text=estimulo_texto or "",
-                matriz_text=matriz_text,
-                sub_total=sb.total_preguntas,
-                start_number=start_num
-            )
-            
-            file_part = None
-            if request.archivo_base64 and request.archivo_mime_type:
-                file_part = {
-                    "mime_type": request.archivo_mime_type,
-                    "data": request.archivo_base64
-                }
-
-            try:
-                logger.info("🤖 Iniciando chunk %d (%d preguntas)...", start_num, sb.total_preguntas)
-                resultado = await _call_llm(prompt, file_part=file_part) 
-                
-                # Validación estricta anti-caídas
-                if not resultado or not isinstance(resultado, dict):
-                    logger.warning("⚠️ Alerta en chunk %d: La IA no devolvió un JSON válido.", start_num)
-                    return {"titulo": None, "preguntas": []}
-                    
-                return resultado
-            except Exception as e:
-                logger.error("❌ Excepción crítica en el chunk %d: %s", start_num, e)
-                return {"titulo": None, "preguntas": []}
-
-        # Paso 3: Encolar las tareas con retraso progresivo (2.5s)
-        tasks = []
-        current_start = 1
-        for i, sb in enumerate(sub_blueprints):
-            retraso = i * 2.5 
-            tasks.append(safe_generate_chunk(sb, current_start, delay=retraso))
-            current_start += sb.total_preguntas
-
-        # Paso 4: Ejecución paralela controlada
-        results_raw = await asyncio.gather(*tasks)
-
-        # Paso 5: Consolidación de los fragmentos
-        todas_las_preguntas_raw = []
-        final_titulo = None
-        for res in results_raw:
-            todas_las_preguntas_raw.extend(res.get("preguntas", []))
-            if not final_titulo and res.get("titulo"):
-                final_titulo = res.get("titulo")
-
-        if not todas_las_preguntas_raw:
-            logger.error("❌ Array de preguntas final vacío.")
-            raise ValueError("No se pudo generar ninguna pregunta. Revisa los logs de Gemini.")
-
-        # Paso 6: Estructurar para Pydantic
-        preguntas_finales = [
-            PreguntaGenerada(
-                numero=p.get("numero", i+1),
-                habilidad_medida=p.get("habilidad_medida", "—"),
-                enunciado=p.get("enunciado", ""),
-                alternativas=p.get("alternativas", {"A":{"texto": ""}}),
-                correcta=p.get("correcta", "A"),
-                justificacion=p.get("justificacion", ""),
-                explicacion_correcta=p.get("explicacion_correcta") or p.get("justificacion", ""),
-            )
-            for i, p in enumerate(todas_las_preguntas_raw)
-        ]
-
-        logger.info("✅ Generación finalizada: %d preguntas", len(preguntas_finales))
-
-        return SimceGenerateResponse(
-            titulo=final_titulo or f"Ensayo SIMCE — {request.asignatura}",
-            asignatura=request.asignatura,
-            nivel=request.nivel,
-            cantidad_preguntas=len(preguntas_finales),
-            modo=request.modo,
-            blueprint_resumen=blueprint_resumen,
-            estimulo_texto=estimulo_texto,
-            estimulo_imagen=estimulo_imagen,
-            preguntas=preguntas_finales,
-        )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error("❌ Falla general en la orquestación: %s", e)
-        raise HTTPException(status_code=500, detail=f"Error generando instrumento: {str(e)}")
+        resumen: dict[str, Any] = {}
+        async for evento in _pipeline_instrumento(request):
+            if evento["evento"] == "resumen":
+                resumen = evento
+        resumen.pop("evento")
+        return SimceGenerateResponse(**resumen)
 
     # HTTPException ya tiene status code propio — re-raise sin envolver
     except HTTPException:
@@ -585,7 +622,6 @@ async def generate_simce_instrument(
             status_code=500,
             detail="El modelo IA devolvió una respuesta JSON inválida. Reintenta.",
         ) from exc
-
     except Exception as exc:
         logger.error(
             "❌ Error inesperado en generate_simce_instrument: %s: %s",
@@ -613,6 +649,12 @@ def _docx_headers(filename: str) -> dict:
     }
 
 
+def _guardar_docx(doc: Document) -> bytes:
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
 def _add_image_safely(paragraph_or_run, image_path: Path, width=None, height=None) -> bool:
     """
     Safely opens an image using PIL, converts it to standard PNG in memory,
@@ -636,8 +678,8 @@ def _add_image_safely(paragraph_or_run, image_path: Path, width=None, height=Non
         return False
 
 
-def _add_profeic_header(doc: Document, asignatura: str, nivel: str, tipo: str) -> None:
-    """Encabezado ProfeIC estándar en tabla de 2 columnas."""
+def _encabezado_base(doc: Document) -> None:
+    """Encabezado ProfeIC estándar en tabla de 2 columnas (parte fija, va en la plantilla)."""
     t = doc.add_table(rows=1, cols=2)
     t.autofit = False
     t.columns[0].width = Inches(1.2)
@@ -645,13 +687,11 @@ def _add_profeic_header(doc: Document, asignatura: str, nivel: str, tipo: str) -
 
     # Logo (texto si no existe la imagen)
     cell_logo = t.cell(0, 0)
-    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    logo_path = os.path.join(base, "assets", "logo_profeic.svg.png")
     p_logo = cell_logo.paragraphs[0]
     run_logo = p_logo.add_run()
-    if os.path.exists(logo_path):
-        if not _add_image_safely(run_logo, Path(logo_path), width=Inches(1.0)):
-            run_logo.add_text("ProfeIC")
+    logo = logo_png("logo_profeic.svg.png")
+    if logo:
+        run_logo.add_picture(io.BytesIO(logo), width=Inches(1.0))
     else:
         run_logo.add_text("ProfeIC")
         run_logo.bold = True
@@ -667,11 +707,29 @@ def _add_profeic_header(doc: Document, asignatura: str, nivel: str, tipo: str) -
     r2 = p_info.add_run("Instrumento generado con IA · ProfeIC\n")
     r2.font.size = Pt(8)
     r2.font.color.rgb = RGBColor(120, 120, 120)
-    r3 = p_info.add_run(f"Asignatura: {asignatura} | Nivel: {nivel} | {tipo}")
-    r3.font.size = Pt(9)
     doc.add_paragraph()
 
 
+def _cuadernillo_base(doc: Document) -> None:
+    # Configurar la fuente general en Arial o Calibri tamaño 11
+    font = doc.styles["Normal"].font
+    font.name = "Calibri"
+    font.size = Pt(11)
+    _encabezado_base(doc)
+
+
+_PLANTILLA_OMR = PlantillaDocx(_encabezado_base)
+_PLANTILLA_CUADERNILLO = PlantillaDocx(_cuadernillo_base)
+
+
+def _documento_profeic(plantilla: PlantillaDocx, asignatura: str, nivel: str, tipo: str) -> Document:
+    """Documento clonado de la plantilla con la línea variable del encabezado."""
+    doc = plantilla.nueva()
+    r3 = doc.tables[0].cell(0, 1).paragraphs[0].add_run(f"Asignatura: {asignatura} | Nivel: {nivel} | {tipo}")
+    r3.font.size = Pt(9)
+    return doc
+
+
 # ─── Modelos para descarga ─────────────────────────────────────────────────────
 
 class PreguntaDescarga(BaseModel):
@@ -704,6 +762,119 @@ class DescargaOMRRequest(BaseModel):
 
 # ─── Endpoint: Descargar Cuadernillo DOCX ─────────────────────────────────────
 
+def _docx_cuadernillo(req: DescargaCuadernilloRequest) -> bytes:
+    tipo_doc = "Pauta Docente" if req.incluir_clave else "Cuadernillo del Alumno"
+    doc = _documento_profeic(_PLANTILLA_CUADERNILLO, req.asignatura, req.nivel, tipo_doc)
+
+    # Título
+    h = doc.add_heading(req.titulo, level=1)
+    h.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    for run in h.runs:
+        run.font.color.rgb = RGBColor(27, 60, 115)
+
+    subtitulo = f"{'Simulación SIMCE Estricta' if req.modo == 'simce' else 'Ensayo Formativo'} · {req.nivel}"
+    p_sub = doc.add_paragraph(subtitulo)
+    p_sub.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    p_sub.runs[0].font.color.rgb = RGBColor(200, 117, 51)
+    p_sub.runs[0].italic = True
+    doc.add_paragraph()
+
+    # Datos alumno
+    t_alumno = doc.add_table(rows=2, cols=3)
+    t_alumno.style = "Table Grid"
+    t_alumno.cell(0, 0).text = "Nombre:"
+    t_alumno.cell(0, 1).text = "Curso:"
+    t_alumno.cell(0, 2).text = "Fecha:"
+    t_alumno.cell(1, 0).text = "________________________________"
+    t_alumno.cell(1, 1).text = "__________"
+    t_alumno.cell(1, 2).text = "__________"
+    doc.add_paragraph()
+    
+    # Diagramación Multimodal
+    if req.estimulo_imagen:
+        imagen_path = Path(__file__).parent.parent.parent / "frontend" / "public" / "imgs_estimulos" / req.estimulo_imagen
+        if imagen_path.exists():
+            p_img = doc.add_paragraph()
+            p_img.alignment = WD_ALIGN_PARAGRAPH.CENTER
+            run_img = p_img.add_run()
+            _add_image_safely(run_img, imagen_path, width=Inches(5.0))
+
+    if req.estimulo_texto:
+        t_est = doc.add_table(rows=1, cols=1)
+        t_est.style = "Table Grid"
+        t_est.autofit = True
+        cell = t_est.cell(0, 0)
+        cell.text = req.estimulo_texto
+        
+        # Shading robusto
+        shading_elm = parse_xml(r'<w:shd {} w:fill="F2F2F2"/>'.format(nsdecls('w')))
+        cell._tc.get_or_add_tcPr().append(shading_elm)
+        doc.add_paragraph()
+
+    # Preguntas
+    for pregunta in req.preguntas:
+        p_enun = doc.add_paragraph()
+        run_num = p_enun.add_run(f"{pregunta.numero}. ")
+        run_num.bold = True
+        run_num.font.color.rgb = RGBColor(27, 60, 115)
+        p_enun.add_run(pregunta.enunciado)
+
+        # Habilidad (pequeño badge)
+        p_hab = doc.add_paragraph()
+        run_hab = p_hab.add_run(f"   [{pregunta.habilidad_medida}]")
+        run_hab.italic = True
+        run_hab.font.size = Pt(8)
+        run_hab.font.color.rgb = RGBColor(150, 150, 150)
+
+        for letra, alt_info in pregunta.alternativas.items():
+            texto_alt = alt_info.get("texto", str(alt_info)) if isinstance(alt_info, dict) else str(alt_info)
+            p_alt = doc.add_paragraph(f"{letra}) {texto_alt}")
+            p_alt.paragraph_format.left_indent = Inches(0.5)
+            
+            if req.incluir_clave and letra == pregunta.correcta:
+                p_alt.runs[0].bold = True
+                p_alt.runs[0].font.color.rgb = RGBColor(0, 128, 0)
+
+        doc.add_paragraph()
+
+    # Pauta docente (página separada)
+    if req.incluir_clave:
+        doc.add_page_break()
+        h_pauta = doc.add_heading("Pauta de Respuestas — Uso Exclusivo Docente", level=1)
+        h_pauta.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+        t_clave = doc.add_table(rows=1 + len(req.preguntas), cols=5)
+        t_clave.style = "Table Grid"
+
+        # Headers
+        for col, txt in enumerate(["N°", "Respuesta Correcta", "Habilidad Medida", "Explicación Correcta", "Errores Oficiales"]):
+            cell = t_clave.cell(0, col)
+            cell.text = txt
+            shd = parse_xml(r'<w:shd {} w:fill="1B3C73"/>'.format(nsdecls("w")))
+            cell._tc.get_or_add_tcPr().append(shd)
+            if cell.paragraphs[0].runs:
+                cell.paragraphs[0].runs[0].font.color.rgb = RGBColor(255, 255, 255)
+                cell.paragraphs[0].runs[0].bold = True
+
+        for i, pregunta in enumerate(req.preguntas):
+            row = t_clave.rows[i + 1]
+            row.cells[0].text = str(pregunta.numero)
+            row.cells[1].text = pregunta.correcta
+            row.cells[2].text = pregunta.habilidad_medida
+            row.cells[3].text = pregunta.explicacion_correcta or pregunta.justificacion or ""
+            
+            errores = []
+            for letra, alt_info in pregunta.alternativas.items():
+                if isinstance(alt_info, dict) and letra != pregunta.correcta:
+                    err = alt_info.get("tipo_error_oficial")
+                    if err: errores.append(f"{letra}: {err}")
+            row.cells[4].text = "\n".join(errores)
+
+        doc.add_paragraph()
+
+    return _guardar_docx(doc)
+
+
 @router.post(
     "/generate/download-cuadernillo",
     summary="Descarga el Cuadernillo de Estímulos en DOCX",
@@ -720,126 +891,7 @@ async def download_cuadernillo(
     Si `incluir_clave=True`, añade una página de pauta docente con las respuestas.
     """
     try:
-        doc = Document()
-        
-        # Configurar la fuente general en Arial o Calibri tamaño 11
-        style = doc.styles['Normal']
-        font = style.font
-        font.name = 'Calibri'
-        font.size = Pt(11)
-
-        tipo_doc = "Pauta Docente" if req.incluir_clave else "Cuadernillo del Alumno"
-        _add_profeic_header(doc, req.asignatura, req.nivel, tipo_doc)
-
-        # Título
-        h = doc.add_heading(req.titulo, level=1)
-        h.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        for run in h.runs:
-            run.font.color.rgb = RGBColor(27, 60, 115)
-
-        subtitulo = f"{'Simulación SIMCE Estricta' if req.modo == 'simce' else 'Ensayo Formativo'} · {req.nivel}"
-        p_sub = doc.add_paragraph(subtitulo)
-        p_sub.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        p_sub.runs[0].font.color.rgb = RGBColor(200, 117, 51)
-        p_sub.runs[0].italic = True
-        doc.add_paragraph()
-
-        # Datos alumno
-        t_alumno = doc.add_table(rows=2, cols=3)
-        t_alumno.style = "Table Grid"
-        t_alumno.cell(0, 0).text = "Nombre:"
-        t_alumno.cell(0, 1).text = "Curso:"
-        t_alumno.cell(0, 2).text = "Fecha:"
-        t_alumno.cell(1, 0).text = "________________________________"
-        t_alumno.cell(1, 1).text = "__________"
-        t_alumno.cell(1, 2).text = "__________"
-        doc.add_paragraph()
-        
-        # Diagramación Multimodal
-        if req.estimulo_imagen:
-            imagen_path = Path(__file__).parent.parent.parent / "frontend" / "public" / "imgs_estimulos" / req.estimulo_imagen
-            if imagen_path.exists():
-                p_img = doc.add_paragraph()
-                p_img.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                run_img = p_img.add_run()
-                _add_image_safely(run_img, imagen_path, width=Inches(5.0))
-
-        if req.estimulo_texto:
-            t_est = doc.add_table(rows=1, cols=1)
-            t_est.style = "Table Grid"
-            t_est.autofit = True
-            cell = t_est.cell(0, 0)
-            cell.text = req.estimulo_texto
-            
-            # Shading robusto
-            shading_elm = parse_xml(r'<w:shd {} w:fill="F2F2F2"/>'.format(nsdecls('w')))
-            cell._tc.get_or_add_tcPr().append(shading_elm)
-            doc.add_paragraph()
-
-        # Preguntas
-        for pregunta in req.preguntas:
-            p_enun = doc.add_paragraph()
-            run_num = p_enun.add_run(f"{pregunta.numero}. ")
-            run_num.bold = True
-            run_num.font.color.rgb = RGBColor(27, 60, 115)
-            p_enun.add_run(pregunta.enunciado)
-
-            # Habilidad (pequeño badge)
-            p_hab = doc.add_paragraph()
-            run_hab = p_hab.add_run(f"   [{pregunta.habilidad_medida}]")
-            run_hab.italic = True
-            run_hab.font.size = Pt(8)
-            run_hab.font.color.rgb = RGBColor(150, 150, 150)
-
-            for letra, alt_info in pregunta.alternativas.items():
-                texto_alt = alt_info.get("texto", str(alt_info)) if isinstance(alt_info, dict) else str(alt_info)
-                p_alt = doc.add_paragraph(f"{letra}) {texto_alt}")
-                p_alt.paragraph_format.left_indent = Inches(0.5)
-                
-                if req.incluir_clave and letra == pregunta.correcta:
-                    p_alt.runs[0].bold = True
-                    p_alt.runs[0].font.color.rgb = RGBColor(0, 128, 0)
-
-            doc.add_paragraph()
-
-        # Pauta docente (página separada)
-        if req.incluir_clave:
-            doc.add_page_break()
-            h_pauta = doc.add_heading("Pauta de Respuestas — Uso Exclusivo Docente", level=1)
-            h_pauta.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-            t_clave = doc.add_table(rows=1 + len(req.preguntas), cols=5)
-            t_clave.style = "Table Grid"
-
-            # Headers
-            for col, txt in enumerate(["N°", "Respuesta Correcta", "Habilidad Medida", "Explicación Correcta", "Errores Oficiales"]):
-                cell = t_clave.cell(0, col)
-                cell.text = txt
-                shd = parse_xml(r'<w:shd {} w:fill="1B3C73"/>'.format(nsdecls("w")))
-                cell._tc.get_or_add_tcPr().append(shd)
-                if cell.paragraphs[0].runs:
-                    cell.paragraphs[0].runs[0].font.color.rgb = RGBColor(255, 255, 255)
-                    cell.paragraphs[0].runs[0].bold = True
-
-            for i, pregunta in enumerate(req.preguntas):
-                row = t_clave.rows[i + 1]
-                row.cells[0].text = str(pregunta.numero)
-                row.cells[1].text = pregunta.correcta
-                row.cells[2].text = pregunta.habilidad_medida
-                row.cells[3].text = pregunta.explicacion_correcta or pregunta.justificacion or ""
-                
-                errores = []
-                for letra, alt_info in pregunta.alternativas.items():
-                    if isinstance(alt_info, dict) and letra != pregunta.correcta:
-                        err = alt_info.get("tipo_error_oficial")
-                        if err: errores.append(f"{letra}: {err}")
-                row.cells[4].text = "\n".join(errores)
-
-            doc.add_paragraph()
-
-        buf = io.BytesIO()
-        doc.save(buf)
-        buf.seek(0)
+        buf = io.BytesIO(await motor_render.renderizar_async(_docx_cuadernillo, req, nombre="simce.cuadernillo"))
 
         filename = f"Cuadernillo_SIMCE_{req.asignatura}_{req.nivel}.docx"
         return StreamingResponse(
@@ -855,6 +907,82 @@ async def download_cuadernillo(
 
 # ─── Endpoint: Descargar Hoja de Respuestas OMR ───────────────────────────────
 
+def _docx_omr(req: DescargaOMRRequest) -> bytes:
+    doc = _documento_profeic(_PLANTILLA_OMR, req.asignatura, req.nivel, "Hoja de Respuestas OMR")
+
+    h = doc.add_heading("HOJA DE RESPUESTAS", level=1)
+    h.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    for run in h.runs:
+        run.font.color.rgb = RGBColor(27, 60, 115)
+
+    p_inst = doc.add_paragraph(
+        "Instrucciones: Rellena completamente el círculo de la alternativa elegida con lápiz grafito. "
+        "No uses corrector. Cualquier marca fuera del círculo puede invalidar tu respuesta."
+    )
+    p_inst.italic = True
+    p_inst.font = None  # default
+    doc.add_paragraph()
+
+    # ── Grilla RUT ────────────────────────────────────────────────────────
+    p_rut = doc.add_paragraph()
+    p_rut.add_run("RUT: ").bold = True
+    p_rut.add_run("__ __ __ __ __ __ __ __ - __")
+    doc.add_paragraph()
+
+    # Tabla nombre / fecha
+    t_datos = doc.add_table(rows=2, cols=2)
+    t_datos.style = "Table Grid"
+    t_datos.cell(0, 0).text = "Nombre completo:"
+    t_datos.cell(0, 1).text = "Fecha:"
+    t_datos.cell(1, 0).text = "_______________________________________"
+    t_datos.cell(1, 1).text = "____________"
+    doc.add_paragraph()
+
+    # ── Grilla de respuestas en 3 columnas ────────────────────────────────
+    n = req.cantidad_preguntas
+    col_size = (n + 2) // 3  # distribución en 3 columnas
+    cols_data: list[list[int]] = []
+    for c in range(3):
+        start = c * col_size + 1
+        end = min((c + 1) * col_size, n)
+        cols_data.append(list(range(start, end + 1)))
+
+    max_rows = max(len(col) for col in cols_data)
+
+    # Tabla encabezado
+    header_t = doc.add_table(rows=1, cols=3)
+    header_t.style = "Table Grid"
+    for ci, label in enumerate(["Preguntas 1–{}".format(len(cols_data[0])),
+                                 "Preguntas {}–{}".format(cols_data[1][0] if cols_data[1] else "", cols_data[1][-1] if cols_data[1] else ""),
+                                 "Preguntas {}–{}".format(cols_data[2][0] if cols_data[2] else "", cols_data[2][-1] if cols_data[2] else "")]):
+        cell = header_t.cell(0, ci)
+        cell.text = label
+        shd = parse_xml(r'<w:shd {} w:fill="1B3C73"/>'.format(nsdecls("w")))
+        cell._tc.get_or_add_tcPr().append(shd)
+        if cell.paragraphs[0].runs:
+            cell.paragraphs[0].runs[0].font.color.rgb = RGBColor(255, 255, 255)
+            cell.paragraphs[0].runs[0].bold = True
+
+    grid_t = doc.add_table(rows=max_rows, cols=3)
+    grid_t.style = "Table Grid"
+    for row_i in range(max_rows):
+        for col_i in range(3):
+            nums = cols_data[col_i]
+            if row_i < len(nums):
+                num = nums[row_i]
+                grid_t.cell(row_i, col_i).text = f"{num:>2}.  ○ A    ○ B    ○ C    ○ D"
+            else:
+                grid_t.cell(row_i, col_i).text = ""
+
+    doc.add_paragraph()
+    p_footer = doc.add_paragraph("ProfeIC — IA Educativa Hecha en Chile 🇨🇱")
+    p_footer.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    p_footer.runs[0].font.size = Pt(8)
+    p_footer.runs[0].font.color.rgb = RGBColor(150, 150, 150)
+
+    return _guardar_docx(doc)
+
+
 @router.post(
     "/generate/download-omr",
     summary="Descarga la Hoja de Respuestas OMR en DOCX",
@@ -871,82 +999,7 @@ async def download_omr(
     Incluye grilla RUT (8 dígitos + DV).
     """
     try:
-        doc = Document()
-        _add_profeic_header(doc, req.asignatura, req.nivel, "Hoja de Respuestas OMR")
-
-        h = doc.add_heading("HOJA DE RESPUESTAS", level=1)
-        h.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        for run in h.runs:
-            run.font.color.rgb = RGBColor(27, 60, 115)
-
-        p_inst = doc.add_paragraph(
-            "Instrucciones: Rellena completamente el círculo de la alternativa elegida con lápiz grafito. "
-            "No uses corrector. Cualquier marca fuera del círculo puede invalidar tu respuesta."
-        )
-        p_inst.italic = True
-        p_inst.font = None  # default
-        doc.add_paragraph()
-
-        # ── Grilla RUT ────────────────────────────────────────────────────────
-        p_rut = doc.add_paragraph()
-        p_rut.add_run("RUT: ").bold = True
-        p_rut.add_run("__ __ __ __ __ __ __ __ - __")
-        doc.add_paragraph()
-
-        # Tabla nombre / fecha
-        t_datos = doc.add_table(rows=2, cols=2)
-        t_datos.style = "Table Grid"
-        t_datos.cell(0, 0).text = "Nombre completo:"
-        t_datos.cell(0, 1).text = "Fecha:"
-        t_datos.cell(1, 0).text = "_______________________________________"
-        t_datos.cell(1, 1).text = "____________"
-        doc.add_paragraph()
-
-        # ── Grilla de respuestas en 3 columnas ────────────────────────────────
-        n = req.cantidad_preguntas
-        col_size = (n + 2) // 3  # distribución en 3 columnas
-        cols_data: list[list[int]] = []
-        for c in range(3):
-            start = c * col_size + 1
-            end = min((c + 1) * col_size, n)
-            cols_data.append(list(range(start, end + 1)))
-
-        max_rows = max(len(col) for col in cols_data)
-
-        # Tabla encabezado
-        header_t = doc.add_table(rows=1, cols=3)
-        header_t.style = "Table Grid"
-        for ci, label in enumerate(["Preguntas 1–{}".format(len(cols_data[0])),
-                                     "Preguntas {}–{}".format(cols_data[1][0] if cols_data[1] else "", cols_data[1][-1] if cols_data[1] else ""),
-                                     "Preguntas {}–{}".format(cols_data[2][0] if cols_data[2] else "", cols_data[2][-1] if cols_data[2] else "")]):
-            cell = header_t.cell(0, ci)
-            cell.text = label
-            shd = parse_xml(r'<w:shd {} w:fill="1B3C73"/>'.format(nsdecls("w")))
-            cell._tc.get_or_add_tcPr().append(shd)
-            if cell.paragraphs[0].runs:
-                cell.paragraphs[0].runs[0].font.color.rgb = RGBColor(255, 255, 255)
-                cell.paragraphs[0].runs[0].bold = True
-
-        grid_t = doc.add_table(rows=max_rows, cols=3)
-        grid_t.style = "Table Grid"
-        for row_i in range(max_rows):
-            for col_i in range(3):
-                nums = cols_data[col_i]
-                if row_i < len(nums):
-                    num = nums[row_i]
-                    grid_t.cell(row_i, col_i).text = f"{num:>2}.  ○ A    ○ B    ○ C    ○ D"
-                else:
-                    grid_t.cell(row_i, col_i).text = ""
-
-        doc.add_paragraph()
-        p_footer = doc.add_paragraph("ProfeIC — IA Educativa Hecha en Chile 🇨🇱")
-        p_footer.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        p_footer.runs[0].font.size = Pt(8)
-        p_footer.runs[0].font.color.rgb = RGBColor(150, 150, 150)
-
-        buf = io.BytesIO()
-        doc.save(buf)
-        buf.seek(0)
+        buf = io.BytesIO(await motor_render.renderizar_async(_docx_omr, req, nombre="simce.omr"))
 
         filename = f"Hoja_OMR_{req.asignatura}_{req.nivel}.docx"
         return StreamingResponse(
@@ -2,7 +2,8 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional, List
 import os
-from supabase import create_client, Client
+from supabase import Client
+from app.db.supabase import obtener_cliente
 
 
 router = APIRouter(prefix="/social", tags=["Social Engine"])
@@ -13,7 +14,7 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
 supabase: Client = None
 if SUPABASE_URL and SUPABASE_KEY:
-    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    supabase = obtener_cliente(SUPABASE_URL, SUPABASE_KEY)
 else:
     print("⚠️ ADVERTENCIA SOCIAL: No se configuró Supabase.")
 
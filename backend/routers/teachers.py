@@ -3,14 +3,15 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import List
 from uuid import UUID
-from supabase import create_client, Client
+from supabase import Client
+from app.db.supabase import obtener_cliente, ejecutar
 from .deps import get_current_user_id
 
 router = APIRouter(prefix="/api/v1/admin/teachers", tags=["Admin - Teachers"])
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+supabase: Client = obtener_cliente(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
 
 class AssignmentRequest(BaseModel):
     course_ids: List[UUID]
@@ -22,7 +23,7 @@ async def get_teachers(user_id: str = Depends(get_current_user_id)):
     """
     try:
         # 1. Obtener school_id del admin
-        profile_res = supabase.table("profiles").select("school_id").eq("id", user_id).single().execute()
+        profile_res = await ejecutar(supabase.table("profiles").select("school_id").eq("id", user_id).single(), "profiles.school_id")
         school_id = profile_res.data.get("school_id")
         
         if not school_id:
@@ -30,11 +31,13 @@ async def get_teachers(user_id: str = Depends(get_current_user_id)):
 
         # 2. Consultar perfiles con rol 'teacher' o 'profesor' en ese colegio
         # Nota: Ajustamos a 'teacher' basado en el esquema común detectado en admin.py
-        teachers_res = supabase.table("profiles")\
-            .select("id, full_name, email")\
-            .eq("school_id", school_id)\
-            .in_("role", ["profesor", "teacher"])\
-            .execute()
+        teachers_res = await ejecutar(
+            supabase.table("profiles")
+            .select("id, full_name, email")
+            .eq("school_id", school_id)
+            .in_("role", ["profesor", "teacher"]),
+            "profiles.profesores"
+        )
             
         return teachers_res.data or []
 
@@ -48,10 +51,12 @@ async def get_teacher_courses(teacher_id: str, user_id: str = Depends(get_curren
     Devuelve los IDs de los cursos asignados a un profesor.
     """
     try:
-        res = supabase.table("teacher_courses")\
-            .select("course_id")\
-            .eq("teacher_id", teacher_id)\
-            .execute()
+        res = await ejecutar(
+            supabase.table("teacher_courses")
+            .select("course_id")
+            .eq("teacher_id", teacher_id),
+            "teacher_courses.listar"
+        )
         
         return [item["course_id"] for item in res.data]
     except Exception as e:
@@ -64,12 +69,12 @@ async def save_teacher_assignments(teacher_id: str, req: AssignmentRequest, user
     """
     try:
         # 1. Eliminar asignaciones previas
-        supabase.table("teacher_courses").delete().eq("teacher_id", teacher_id).execute()
+        await ejecutar(supabase.table("teacher_courses").delete().eq("teacher_id", teacher_id), "teacher_courses.borrar")
         
         # 2. Insertar nuevas si existen
         if req.course_ids:
             payload = [{"teacher_id": teacher_id, "course_id": str(cid)} for cid in req.course_ids]
-            supabase.table("teacher_courses").insert(payload).execute()
+            await ejecutar(supabase.table("teacher_courses").insert(payload), "teacher_courses.insertar")
             
         return {"status": "success", "message": "Asignaciones actualizadas correctamente."}
     except Exception as e:
@@ -1,11 +1,18 @@
 from fastapi import APIRouter, HTTPException, Query, Depends
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
-from supabase import create_client, Client
+from supabase import Client
+from postgrest.exceptions import APIError
+from app.db.supabase import obtener_cliente, en_hilo
 import os
+import logging
+from datetime import datetime, timezone
 from .analytics_service import calculate_global_stats
 from .deps import verify_super_admin
 from fastapi.responses import JSONResponse
+from app.services.telemetry_buffer import BufferTelemetria
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/telemetry",
@@ -15,10 +22,10 @@ router = APIRouter(
 # --- CONFIGURACIÓN ---
 supabase_url = os.getenv("SUPABASE_URL", "")
 # Standard client for public tracking (Anon Key)
-supabase: Client = create_client(supabase_url, os.getenv("SUPABASE_KEY", ""))
+supabase: Client = obtener_cliente(supabase_url, os.getenv("SUPABASE_KEY", ""))
 
 # Admin client for global analytics (Service Role) - Bypasses 1000 row limits
-supabase_admin: Client = create_client(
+supabase_admin: Client = obtener_cliente(
     supabase_url, 
     os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY", "")
 )
@@ -30,20 +37,57 @@ class TelemetryTrackRequest(BaseModel):
     module: Optional[str] = None
     metadata: Dict[str, Any] = {}
 
+MAX_EVENTOS_POR_LOTE = 500
+
+
+def _insertar_eventos(filas: List[Dict[str, Any]]) -> None:
+    """Escritor del buffer: un insert por lote."""
+    try:
+        supabase.table('telemetry_events').insert(filas).execute()
+    except APIError as e:
+        # Una fila rechazada por la base (p. ej. user_id inexistente) no debe bloquear el lote completo
+        logger.warning("Lote de telemetría rechazado (%s); se reintenta fila por fila.", e)
+        for fila in filas:
+            try:
+                supabase.table('telemetry_events').insert(fila).execute()
+            except APIError as e_fila:
+                logger.warning("Evento de telemetría descartado (%s): %s", fila.get("event_name"), e_fila)
+
+
+buffer_eventos = BufferTelemetria(_insertar_eventos)
+
+
+def _fila_evento(req: TelemetryTrackRequest) -> Dict[str, Any]:
+    return {
+        "user_id": req.user_id,
+        "email": req.email,
+        "event_name": req.event_name,
+        "module": req.module,
+        "metadata": req.metadata,
+        # Hora del clic, no la del lote en que se escribe
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+
+
 @router.post("/track")
 async def track_event(req: TelemetryTrackRequest):
-    try:
-        res = supabase.table('telemetry_events').insert({
-            "user_id": req.user_id,
-            "email": req.email,
-            "event_name": req.event_name,
-            "module": req.module,
-            "metadata": req.metadata
-        }).execute()
-        return {"status": "ok"}
-    except Exception as e:
-        print(f"Error tracking event: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    if not buffer_eventos.encolar(_fila_evento(req)):
+        return {"status": "dropped"}
+    return {"status": "ok"}
+
+
+@router.post("/track/batch")
+async def track_events_batch(reqs: List[TelemetryTrackRequest]):
+    if len(reqs) > MAX_EVENTOS_POR_LOTE:
+        raise HTTPException(status_code=413, detail=f"Máximo {MAX_EVENTOS_POR_LOTE} eventos por lote.")
+    aceptados = sum(buffer_eventos.encolar(_fila_evento(req)) for req in reqs)
+    return {"status": "ok", "accepted": aceptados, "dropped": len(reqs) - aceptados}
+
+
+@router.get("/buffer")
+async def get_buffer_stats(_ = Depends(verify_super_admin)):
+    """Estado del buffer de ingesta: pendientes, escritos, descartados por cola llena, errores."""
+    return buffer_eventos.estadisticas()
 
 @router.get("/analytics")
 async def get_product_analytics(period: str = "all", school_id: Optional[str] = None, admin_user: any = Depends(verify_super_admin)):
@@ -51,7 +95,7 @@ async def get_product_analytics(period: str = "all", school_id: Optional[str] =
     print(f"📊 Telemetry: Building analytics for {email} (Period: {period}, School: {school_id}, Authenticated Admin)")
     try:
         # Use supabase_admin to bypass 1000 row cap
-        stats = calculate_global_stats(supabase_admin, period=period, school_id=school_id)
+        stats = await en_hilo(calculate_global_stats, supabase_admin, period=period, school_id=school_id, nombre="analytics.global")
         stats["version"] = "v1.2.6-BuildFix"
         
         return JSONResponse(
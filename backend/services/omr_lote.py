@@ -0,0 +1,96 @@
+"""
+Lectura OMR masiva.
+
+Después de un ensayo SIMCE se escanean cientos de hojas de una vez. Cada hoja
+(una imagen o una página de un PDF escaneado) se procesa en el pool de procesos
+compartido y su resultado se emite apenas termina, sin esperar al resto ni
+bloquear el event loop. Una hoja ilegible solo produce su propio evento de error.
+"""
+import io
+import asyncio
+import logging
+import posixpath
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+from app.core.executors import get_process_pool
+from services.vision_service import OMRVisionService
+
+logger = logging.getLogger(__name__)
+
+MAX_HOJAS_LOTE = 1000
+EXTENSIONES_IMAGEN = (".jpg", ".jpeg", ".png", ".heic", ".heif", ".webp", ".tif", ".tiff", ".bmp")
+
+
+def procesar_hoja(nombre: str, contenido: bytes) -> Dict[str, Any]:
+    """Punto de entrada en el worker: nunca lanza, devuelve el resultado o el error de la hoja."""
+    if not contenido:
+        return {"archivo": nombre, "status": "error", "detalle": "La hoja no contiene una imagen escaneada."}
+    try:
+        result = OMRVisionService.process_image(contenido)
+        return {
+            "archivo": nombre,
+            "status": result.get("status", "success"),
+            "evaluation_instance_id": result["evaluation_instance_id"],
+            "rut": result["rut"],
+            "answers": result["answers"]
+        }
+    except ValueError as ve:
+        return {"archivo": nombre, "status": "error", "detalle": str(ve)}
+    except Exception as e:
+        logger.error(f"Error inesperado en OMR ({nombre}): {str(e)}")
+        return {"archivo": nombre, "status": "error", "detalle": f"Error inesperado: {str(e)}"}
+
+
+def extraer_paginas_pdf(nombre: str, contenido: bytes) -> List[Tuple[str, bytes]]:
+    """
+    Extrae la imagen escaneada de cada página de un PDF (la de mayor tamaño por página).
+    Los escáneres guardan cada hoja como una imagen embebida, así que no hace falta rasterizar.
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(contenido))
+    paginas = []
+    for n, page in enumerate(reader.pages, start=1):
+        imagenes = list(page.images)
+        if not imagenes:
+            # Se conserva la página para que emita su evento de error
+            paginas.append((f"{nombre}#p{n}", b""))
+            continue
+        mayor = max(imagenes, key=lambda img: len(img.data))
+        paginas.append((f"{nombre}#p{n}", mayor.data))
+    return paginas
+
+
+def expandir_archivos(archivos: List[Tuple[str, str, bytes]]) -> List[Tuple[str, bytes]]:
+    """
+    Convierte los archivos subidos (nombre, content_type, bytes) en una lista de hojas.
+    Las imágenes son una hoja cada una; los PDF aportan una hoja por página.
+    """
+    hojas: List[Tuple[str, bytes]] = []
+    for nombre, content_type, contenido in archivos:
+        ext = posixpath.splitext(nombre.lower())[1]
+        if content_type == "application/pdf" or ext == ".pdf":
+            hojas.extend(extraer_paginas_pdf(nombre, contenido))
+        elif (content_type or "").startswith("image/") or ext in EXTENSIONES_IMAGEN:
+            hojas.append((nombre, contenido))
+        else:
+            raise ValueError(f"El archivo '{nombre}' no es una imagen ni un PDF.")
+        if len(hojas) > MAX_HOJAS_LOTE:
+            raise ValueError(f"El lote supera el máximo de {MAX_HOJAS_LOTE} hojas.")
+    return hojas
+
+
+async def procesar_lote_omr(
+    hojas: List[Tuple[str, bytes]],
+    executor=None
+) -> AsyncIterator[Dict[str, Any]]:
+    """Reparte las hojas en el pool de procesos y emite cada resultado en orden de término."""
+    loop = asyncio.get_running_loop()
+    executor = executor or get_process_pool()
+
+    total = len(hojas)
+    tareas = [loop.run_in_executor(executor, procesar_hoja, nombre, contenido) for nombre, contenido in hojas]
+    for i, tarea in enumerate(asyncio.as_completed(tareas), start=1):
+        resultado = await tarea
+        resultado["progreso"] = f"{i}/{total}"
+        yield resultado
@@ -1,16 +1,31 @@
+import io
 import os
+import re
 import json
 import qrcode
 from reportlab.lib.pagesizes import LETTER
+from reportlab.lib.utils import ImageReader
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import mm
 from reportlab.lib.colors import HexColor, black
 
 class OMRTemplateGenerator:
+    # Versión de la geometría impresa; el lector OMR compila y cachea sus coordenadas por versión
+    TEMPLATE_VERSION = "3.5"
+
+    # Esquina inferior-izquierda (mm, origen abajo-izquierda) de cada marcador fiducial
+    FIDUCIALES_MM = {
+        "TL": (15, 264),
+        "TR": (200, 264),
+        "BR": (200, 15),
+        "BL": (15, 15)
+    }
+    FIDUCIAL_MM = 10
+
     def __init__(self):
         # 1 mm = 2.83465 points
         self.width, self.height = LETTER
-        self.fid_size = 10 * mm
+        self.fid_size = self.FIDUCIAL_MM * mm
         
         # Geometría Grilla de Respuestas (X, Y absoluto)
         self.q_col_x = [20 * mm, 85 * mm, 150 * mm]
@@ -29,19 +44,22 @@ class OMRTemplateGenerator:
     def _draw_fiducials(self, c):
         """Dibuja los 4 marcadores fiduciales en coordenadas mm ABSOLUTAS."""
         c.setFillColor(black)
-        fids = [
-            (15, 264),  # Top-Left
-            (200, 264), # Top-Right
-            (15, 15),   # Bottom-Left
-            (200, 15)   # Bottom-Right
-        ]
-        for (x_mm, y_mm) in fids:
+        for (x_mm, y_mm) in self.FIDUCIALES_MM.values():
             c.rect(x_mm * mm, y_mm * mm, self.fid_size, self.fid_size, fill=1)
 
-    def _draw_header_branding(self, c, logo_path):
+    @staticmethod
+    def digitos_rut(rut):
+        """'12.345.678-9' → ['1','2','3','4','5','6','7','8','9'] (cuerpo con ceros a la izquierda + DV), o None si no cabe en la grilla."""
+        limpio = re.sub(r"[^0-9kK]", "", str(rut or "")).upper()
+        if len(limpio) < 2 or len(limpio) > 9 or not limpio[:-1].isdigit():
+            return None
+        return list(limpio[:-1].rjust(8, "0")) + [limpio[-1]]
+
+    def _draw_header_branding(self, c, logo_path, alumno=None):
         """
         Dibuja Logo y Datos del Estudiante (X=15 a 60).
         Logo en Y=250mm. Líneas desde Y=240mm.
+        Con `alumno` ({"nombre", "curso"}) los datos se imprimen sobre las líneas.
         """
         x = 15 * mm
         logo_y = 250 * mm
@@ -58,6 +76,7 @@ class OMRTemplateGenerator:
         y_lines_start = 240 * mm
         line_step = 7 * mm
         fields = ["Nombre:", "Curso:", "Fecha:"]
+        valores = [alumno.get("nombre"), alumno.get("curso"), None] if alumno else [None] * 3
         
         c.setFont("Helvetica", 10)
         c.setFillColor(black)
@@ -65,9 +84,14 @@ class OMRTemplateGenerator:
             curr_y = y_lines_start - (i * line_step)
             c.drawString(x, curr_y, field)
             c.line(x + 18*mm, curr_y - 1*mm, 65*mm, curr_y - 1*mm)
+            if valores[i]:
+                c.setFont("Helvetica", 7 if len(valores[i]) > 22 else 9)
+                c.drawString(x + 19*mm, curr_y, valores[i][:34])
+                c.setFont("Helvetica", 10)
 
-    def _draw_rut_grid(self, c):
-        """Grilla RUT (X=70mm, Y=255mm). Título en Y=262mm."""
+    def _draw_rut_grid(self, c, rut=None):
+        """Grilla RUT (X=70mm, Y=255mm). Título en Y=262mm. Con `rut` se escriben los dígitos y se rellenan sus burbujas."""
+        digitos = self.digitos_rut(rut)
         c.setFont("Helvetica-Bold", 8)
         c.drawString(self.rut_x_start, 262 * mm, "RUT ESTUDIANTE")
         
@@ -83,31 +107,40 @@ class OMRTemplateGenerator:
             if col == 7:
                 c.line(x + 4*mm, self.rut_y_start + 4*mm, x + 6*mm, self.rut_y_start + 4*mm)
 
+            if digitos:
+                c.setFont("Helvetica-Bold", 9)
+                c.drawCentredString(x, self.rut_y_start + 2.7*mm, digitos[col])
+
             for row in range(11 if col == 8 else 10):
                 y = self.rut_y_start - 3.5*mm - (row * self.rut_y_step)
+                label = str(row) if row < 10 else "K"
+                if digitos and digitos[col] == label:
+                    c.circle(x, y, self.rut_radius, stroke=1, fill=1)
+                    continue
                 c.circle(x, y, self.rut_radius, stroke=1, fill=0)
                 
                 c.setFont("Helvetica", 6)
-                label = str(row) if row < 10 else "K"
                 c.drawCentredString(x, y - 1*mm, label)
 
-    def _draw_qr(self, c, evaluation_id):
-        """Código QR (25x25mm) en X=170, Y=235."""
+    def _draw_qr(self, c, evaluation_id, rut=None):
+        """Código QR (25x25mm) en X=170, Y=235. El lector usa la clave "id"; "rut" identifica hojas personalizadas."""
         qr_size = 25 * mm
         x = 170 * mm
         y = 235 * mm
         
-        qr_data = json.dumps({"id": str(evaluation_id)})
+        datos = {"id": str(evaluation_id)}
+        if rut:
+            datos["rut"] = str(rut)
         qr = qrcode.QRCode(box_size=1, border=0)
-        qr.add_data(qr_data)
+        qr.add_data(json.dumps(datos))
         qr.make(fit=True)
         img = qr.make_image(fill_color="black", back_color="white")
         
-        tmp_qr = f"qr_final_{evaluation_id}.png"
-        img.save(tmp_qr)
-        c.drawImage(tmp_qr, x, y, width=qr_size, height=qr_size)
-        if os.path.exists(tmp_qr):
-            os.remove(tmp_qr)
+        # En memoria: sin archivos temporales que choquen entre workers que generan la misma evaluación
+        buf = io.BytesIO()
+        img.save(buf)
+        buf.seek(0)
+        c.drawImage(ImageReader(buf), x, y, width=qr_size, height=qr_size)
 
     def _draw_answer_grid(self, c, num_questions=45):
         """Grilla de 45 preguntas en 3 columnas (X=20, 85, 150)."""
@@ -131,25 +164,36 @@ class OMRTemplateGenerator:
                 c.setFont("Helvetica", 7)
                 c.drawCentredString(bx, y - 1.2*mm, opt)
 
-    def generate_pdf(self, filename, evaluation_id, num_questions=45, logo_path=None):
-        """Generado final con correcciones de layout y branding."""
-        c = canvas.Canvas(filename, pagesize=LETTER)
-        
+    def draw_sheet(self, c, evaluation_id, num_questions=45, logo_path=None, alumno=None):
+        """Dibuja una hoja completa en la página actual del canvas y la cierra. `alumno`: {"nombre", "curso", "rut"}."""
+        rut = alumno.get("rut") if alumno else None
         self._draw_fiducials(c)
-        self._draw_header_branding(c, logo_path)
-        self._draw_rut_grid(c)
-        self._draw_qr(c, evaluation_id)
+        self._draw_header_branding(c, logo_path, alumno)
+        self._draw_rut_grid(c, rut)
+        self._draw_qr(c, evaluation_id, rut)
         self._draw_answer_grid(c, num_questions)
         
         # Pie de página
         c.setFont("Helvetica-Oblique", 8)
         c.setFillColor(HexColor("#444444"))
-        c.drawCentredString(self.width/2, 12*mm, "ProfeIC: Sistema de Monitoreo - OMR v3.5 (Absolute)")
+        c.drawCentredString(self.width/2, 12*mm, f"ProfeIC: Sistema de Monitoreo - OMR v{self.TEMPLATE_VERSION} (Absolute)")
         
         c.showPage()
+
+    def generate_pdf(self, filename, evaluation_id, num_questions=45, logo_path=None):
+        """Generado final con correcciones de layout y branding."""
+        c = canvas.Canvas(filename, pagesize=LETTER)
+        self.draw_sheet(c, evaluation_id, num_questions, logo_path)
         c.save()
         print(f"PDF Final con Layout Corregido: {filename}")
 
+    def generate_batch_pdf(self, filename, evaluation_id, alumnos, num_questions=45, logo_path=None):
+        """Un PDF con una hoja personalizada por alumno, en el orden recibido."""
+        c = canvas.Canvas(filename, pagesize=LETTER)
+        for alumno in alumnos:
+            self.draw_sheet(c, evaluation_id, num_questions, logo_path, alumno)
+        c.save()
+
 if __name__ == '__main__':
     generator = OMRTemplateGenerator()
     generator.generate_pdf("ensayo_final_v3.pdf", "PROFEIC-SIMCE-2026", num_questions=45)
@@ -0,0 +1,163 @@
+"""
+Render masivo de un ensayo SIMCE para cursos completos.
+
+Para un ensayo de todo el colegio se necesita una hoja OMR por alumno, con su
+nombre, curso y RUT ya impresos (RUT también en las burbujas y en el QR), más
+los cuadernillos. Antes había que descargar una hoja genérica por petición.
+
+`zip_ensayo()` reparte los documentos en el motor de render (pool de procesos
+compartido) y va escribiendo un ZIP a medida que terminan, en el mismo orden en
+que se pidieron:
+
+- como máximo `ventana` documentos en vuelo: la memoria depende de la ventana,
+  no de la cantidad de alumnos;
+- cada entrada del ZIP se entrega apenas se escribe (ZIP en streaming, con
+  descriptores de datos, sin volver atrás en el archivo);
+- `agrupar="alumno"` produce un PDF por alumno en la carpeta de su curso;
+  `agrupar="curso"` un PDF de varias páginas por curso, listo para imprimir;
+- un documento que falla no corta la descarga: queda listado en ERRORES.txt.
+"""
+import io
+import os
+import csv
+import asyncio
+import logging
+import unicodedata
+import re
+import zipfile
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+from services.omr_template_service import OMRTemplateGenerator
+from app.services.docx_render import motor_render
+
+logger = logging.getLogger(__name__)
+
+MAX_ALUMNOS_LOTE = 3000
+
+# (nombre en el ZIP, función de módulo que devuelve bytes, argumentos)
+Documento = Tuple[str, Callable[..., bytes], tuple]
+
+
+def hoja_omr_pdf(evaluation_id: str, alumno: Optional[Dict[str, str]], num_preguntas: int, logo_path: Optional[str]) -> bytes:
+    """Punto de entrada en el worker: una hoja OMR (personalizada si hay `alumno`)."""
+    buf = io.BytesIO()
+    if alumno is None:
+        OMRTemplateGenerator().generate_pdf(buf, evaluation_id, num_questions=num_preguntas, logo_path=logo_path)
+    else:
+        OMRTemplateGenerator().generate_batch_pdf(buf, evaluation_id, [alumno], num_questions=num_preguntas, logo_path=logo_path)
+    return buf.getvalue()
+
+
+def hojas_curso_pdf(evaluation_id: str, alumnos: List[Dict[str, str]], num_preguntas: int, logo_path: Optional[str]) -> bytes:
+    """Punto de entrada en el worker: un PDF con una hoja por alumno del curso."""
+    buf = io.BytesIO()
+    OMRTemplateGenerator().generate_batch_pdf(buf, evaluation_id, alumnos, num_questions=num_preguntas, logo_path=logo_path)
+    return buf.getvalue()
+
+
+def nombre_archivo(texto: str) -> str:
+    ascii_ = unicodedata.normalize("NFKD", texto).encode("ASCII", "ignore").decode()
+    return re.sub(r"[^\w.-]+", "_", ascii_).strip("_") or "sin_nombre"
+
+
+def documentos_omr(
+    evaluation_id: str,
+    cursos: List[Dict[str, Any]],
+    num_preguntas: int,
+    logo_path: Optional[str],
+    agrupar: str = "alumno"
+) -> Iterable[Documento]:
+    """`cursos`: [{"nombre": "4° Básico A", "alumnos": [{"rut", "nombre", "curso"}, ...]}], en orden de impresión."""
+    for curso in cursos:
+        carpeta = nombre_archivo(curso["nombre"])
+        if agrupar == "curso":
+            if curso["alumnos"]:
+                yield (f"Hojas_OMR_{carpeta}.pdf", hojas_curso_pdf, (evaluation_id, curso["alumnos"], num_preguntas, logo_path))
+            continue
+        for i, alumno in enumerate(curso["alumnos"], start=1):
+            nombre = f"{carpeta}/{i:03d}_{nombre_archivo(alumno['nombre'])}.pdf"
+            yield (nombre, hoja_omr_pdf, (evaluation_id, alumno, num_preguntas, logo_path))
+
+
+def nomina_csv(evaluation_id: str, cursos: List[Dict[str, Any]]) -> bytes:
+    buf = io.StringIO()
+    escritor = csv.writer(buf)
+    escritor.writerow(["evaluation_id", "curso", "rut", "nombre"])
+    for curso in cursos:
+        for alumno in curso["alumnos"]:
+            escritor.writerow([evaluation_id, curso["nombre"], alumno.get("rut") or "", alumno["nombre"]])
+    return buf.getvalue().encode("utf-8-sig")
+
+
+class _SalidaZip:
+    """Archivo de solo escritura y sin `seek`: zipfile escribe en modo streaming y aquí se recogen los bytes."""
+
+    def __init__(self):
+        self._partes: List[bytes] = []
+
+    def write(self, datos: bytes) -> int:
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self) -> None:
+        pass
+
+    def vaciar(self) -> bytes:
+        datos = b"".join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+async def renderizar_en_orden(documentos: Iterable[Documento], ventana: int) -> AsyncIterator[Tuple[str, Any]]:
+    """Renderiza con a lo más `ventana` documentos en vuelo; entrega (nombre, bytes | excepción) en orden."""
+    pendientes: deque = deque()
+    documentos = iter(documentos)
+
+    def llenar() -> None:
+        while len(pendientes) < ventana:
+            siguiente = next(documentos, None)
+            if siguiente is None:
+                return
+            nombre, funcion, args = siguiente
+            futuro = asyncio.wrap_future(motor_render.enviar(funcion, *args, nombre=f"lote.{funcion.__name__}"))
+            pendientes.append((nombre, futuro))
+
+    llenar()
+    while pendientes:
+        nombre, futuro = pendientes.popleft()
+        try:
+            resultado = await futuro
+        except Exception as e:
+            resultado = e
+        llenar()
+        yield nombre, resultado
+
+
+async def zip_ensayo(
+    documentos: Iterable[Documento],
+    extras: Iterable[Tuple[str, bytes]] = (),
+    ventana: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """ZIP en streaming con los documentos renderizados y archivos `extras` ya listos (p. ej. la nómina)."""
+    ventana = ventana or 2 * (os.cpu_count() or 1)
+    salida = _SalidaZip()
+    errores: List[str] = []
+    with zipfile.ZipFile(salida, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+        for nombre, datos in extras:
+            zf.writestr(nombre, datos)
+        trozo = salida.vaciar()
+        if trozo:
+            yield trozo
+
+        async for nombre, resultado in renderizar_en_orden(documentos, ventana):
+            if isinstance(resultado, Exception):
+                logger.error("Lote SIMCE: no se pudo generar %s: %s", nombre, resultado)
+                errores.append(f"{nombre}: {resultado}")
+                continue
+            zf.writestr(nombre, resultado)
+            yield salida.vaciar()
+
+        if errores:
+            zf.writestr("ERRORES.txt", "\n".join(errores))
+    yield salida.vaciar()
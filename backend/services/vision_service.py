@@ -2,6 +2,7 @@ import logging
 import ctypes
 import os
 import json
+from functools import lru_cache
 from typing import List, Tuple, Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
@@ -10,10 +11,9 @@ logger = logging.getLogger(__name__)
 try:
     import cv2
     import numpy as np
-    from imutils.perspective import four_point_transform
     CV2_AVAILABLE = True
 except ImportError as e:
-    logger.warning(f"OpenCV/numpy/imutils no disponible: {e}. OMR deshabilitado.")
+    logger.warning(f"OpenCV/numpy no disponible: {e}. OMR deshabilitado.")
     CV2_AVAILABLE = False
 
 # Ayuda para encontrar zbar en Apple Silicon / Homebrew
@@ -34,157 +34,300 @@ except Exception as e:
     logger.error(f"Error cargando pyzbar (posiblemente falta libzbar de sistema): {e}")
     PYZBAR_AVAILABLE = False
 
+# Resolución objetivo tras el warp: LETTER a 200 DPI
+TARGET_W, TARGET_H = 1700, 2200
+# Ancho del nivel reducido de la pirámide donde se buscan los fiduciales
+COARSE_W = 1000
+# Ancho de referencia para los límites de tamaño de los fiduciales (20 a 300 px a 2000 px de ancho)
+REF_W = 2000.0
+# Contornos más grandes que se prueban como borde de la hoja en el fallback
+MAX_CONTORNOS_BORDE = 5
+
+# Desplazamientos fijos de la plantilla (mm) que no son atributos de OMRTemplateGenerator
+RUT_DV_EXTRA_X_MM = 4.0      # separación visual de la columna del dígito verificador
+RUT_PRIMERA_FILA_MM = 3.5    # primera burbuja bajo el casillero manual
+UMBRAL_RESPUESTA = 0.25      # fracción mínima de la caja marcada para aceptar una respuesta
+UMBRAL_RUT = 0.3
+OPCIONES = ["A", "B", "C", "D"]
+
+# Hoja Carta en mm
+HOJA_W_MM, HOJA_H_MM = 215.9, 279.4
+
+
+@lru_cache(maxsize=4)
+def _compilar_plantilla(version: str) -> Dict[str, Any]:
+    """
+    Compila una sola vez por versión de plantilla (omr_template_service.py) todo lo que el
+    lector necesita en píxeles de la hoja rectificada: el marco de alineación y las cajas
+    (y0, y1, x0, x1) de cada burbuja, tanto para el warp por fiduciales como por borde de hoja.
+    """
+    from reportlab.lib.units import mm
+    from services.omr_template_service import OMRTemplateGenerator
+
+    tpl = OMRTemplateGenerator()
+    if version != tpl.TEMPLATE_VERSION:
+        raise ValueError(f"Versión de plantilla OMR desconocida: {version}")
+    _mm = lambda v: round(v / mm, 4)
+
+    # Centro de cada fiducial: los centroides definen el marco del warp por fiduciales
+    medio = tpl.FIDUCIAL_MM / 2.0
+    centros = {k: (x + medio, y + medio) for k, (x, y) in tpl.FIDUCIALES_MM.items()}
+    x_min, x_max = centros["TL"][0], centros["BR"][0]
+    y_min, y_max = centros["BR"][1], centros["TL"][1]
+
+    def grilla(internal_w_mm, internal_h_mm, offset_x_mm, offset_y_mm):
+        px_per_mm_x = TARGET_W / internal_w_mm
+        px_per_mm_y = TARGET_H / internal_h_mm
+
+        # Función para convertir mm (ReportLab) a Píxeles (OpenCV top-down en warped image)
+        def to_px(x_mm, y_mm_rl):
+            rel_x = x_mm - offset_x_mm
+            # ReportLab Y es desde abajo. CV_Y es desde arriba en el bbox interno:
+            rel_y = internal_h_mm - (y_mm_rl - offset_y_mm)
+            x_px = int(rel_x * px_per_mm_x)
+            y_px = int(rel_y * px_per_mm_y)
+            return min(max(x_px, 0), TARGET_W - 1), min(max(y_px, 0), TARGET_H - 1)
+
+        def caja(x_mm, y_mm, r_half):
+            px_x, px_y = to_px(x_mm, y_mm)
+            # Limites seguros para no salir del tensor numpy
+            return (max(0, px_y - r_half), min(TARGET_H, px_y + r_half),
+                    max(0, px_x - r_half), min(TARGET_W, px_x + r_half))
+
+        r_half_q = int(_mm(tpl.q_radius) * px_per_mm_x)
+        r_half_rut = int(_mm(tpl.rut_radius) * px_per_mm_x)
+
+        # Respuestas: 45 preguntas x 4 opciones, en 3 columnas de 15
+        q_col_x = [_mm(x) for x in tpl.q_col_x]
+        preguntas = np.zeros((45, len(OPCIONES), 4), dtype=np.int32)
+        for i in range(45):
+            x_base = q_col_x[i // 15]
+            y_rl = _mm(tpl.q_start_y) - ((i % 15) * _mm(tpl.q_y_step))
+            for j in range(len(OPCIONES)):
+                preguntas[i, j] = caja(x_base + (j * _mm(tpl.q_h_step)), y_rl, r_half_q)
+
+        # RUT: 9 columnas; 10 dígitos por columna y "K" solo en el dígito verificador
+        rut = np.zeros((9, 11, 4), dtype=np.int32)
+        rut_validas = np.zeros((9, 11), dtype=bool)
+        for col in range(9):
+            x_mm = _mm(tpl.rut_x_start) + (col * _mm(tpl.rut_x_step))
+            if col == 8:
+                x_mm += RUT_DV_EXTRA_X_MM
+            for row in range(11 if col == 8 else 10):
+                y_mm = _mm(tpl.rut_y_start) - RUT_PRIMERA_FILA_MM - (row * _mm(tpl.rut_y_step))
+                rut[col, row] = caja(x_mm, y_mm, r_half_rut)
+                rut_validas[col, row] = True
+
+        return {
+            "preguntas": preguntas,
+            "rut": rut,
+            "rut_validas": rut_validas,
+            "area_pregunta": (2 * r_half_q) ** 2,
+            "area_rut": (2 * r_half_rut) ** 2
+        }
+
+    return {
+        "version": version,
+        "fiducial_mm": float(tpl.FIDUCIAL_MM),
+        # Los limites de la imagen son los centroides de los fiduciales
+        "fiduciales": grilla(x_max - x_min, y_max - y_min, x_min, y_min),
+        # Los limites son el borde de la hoja tamaño Carta
+        "hoja": grilla(HOJA_W_MM, HOJA_H_MM, 0.0, 0.0)
+    }
+
+
+def plantilla_compilada() -> Dict[str, Any]:
+    """Geometría compilada de la versión vigente de la hoja OMR."""
+    from services.omr_template_service import OMRTemplateGenerator
+    return _compilar_plantilla(OMRTemplateGenerator.TEMPLATE_VERSION)
+
+
+def densidades_burbujas(integral: "np.ndarray", cajas: "np.ndarray") -> "np.ndarray":
+    """
+    Píxeles marcados en cada caja (y0, y1, x0, x1) usando la imagen integral:
+    una sola operación vectorizada para toda la grilla, equivalente a
+    `cv2.countNonZero(thresh[y0:y1, x0:x1])` caja por caja.
+    """
+    y0, y1, x0, x1 = (cajas[..., k] for k in range(4))
+    return integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0]
+
+
+def _dibujar_debug(warped: "np.ndarray", grilla: Dict[str, Any]) -> "np.ndarray":
+    """Imagen de diagnóstico: cajas ROJAS para respuestas y AZULES para el RUT."""
+    debug_warped = cv2.cvtColor(warped, cv2.COLOR_GRAY2BGR)
+    for color, cajas in (((0, 0, 255), grilla["preguntas"].reshape(-1, 4)),
+                         ((255, 0, 0), grilla["rut"][grilla["rut_validas"]])):
+        for y0, y1, x0, x1 in cajas:
+            cv2.rectangle(debug_warped, (int(x0), int(y0)), (int(x1), int(y1)), color, 2)
+    return debug_warped
+
+
+def _decodificar_gris(image_bytes: bytes) -> "np.ndarray":
+    """
+    Decodifica directamente a escala de grises: para JPEG evita reconstruir el color
+    (un tercio de la memoria de una foto de 12 MP). Pillow (+ pillow-heif) como respaldo para HEIC.
+    """
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    gray = cv2.imdecode(nparr, cv2.IMREAD_GRAYSCALE) if nparr.size else None
+
+    if gray is None:
+        # Si falla OpenCV, intentamos con Pillow (que con pillow-heif soporta HEIC)
+        try:
+            from PIL import Image, ImageOps
+            import io
+            try:
+                from pillow_heif import register_heif_opener
+                register_heif_opener()
+                logger.info("HEIF: Registrado correctamente.")
+            except ImportError:
+                logger.error("HEIF: pillow-heif NO ENCONTRADO en el entorno virtual.")
+
+            logger.info(f"PIL: Intentando Image.open sobre {len(image_bytes)} bytes...")
+            pil_image = ImageOps.exif_transpose(Image.open(io.BytesIO(image_bytes)))
+            gray = np.array(pil_image.convert("L"))
+            logger.info(f"Decodificación con Pillow exitosa. Tamaño: {gray.shape}")
+        except Exception as e:
+            logger.error(f"Falla total de decodificación: {str(e)}")
+            raise ValueError(f"ERROR_DECODIFICACION: {str(e)}. Asegúrate de ejecutar 'pip install pillow-heif' para soporte de iPhone.")
+
+    if gray is None:
+        raise ValueError("ERROR_DECODIFICACION: No se pudo convertir el archivo en una imagen válida.")
+    return gray
+
+
+def _ordenar_esquinas(pts: "np.ndarray") -> "np.ndarray":
+    """Ordena puntos como TL, TR, BR, BL (extremos por suma y diferencia de coordenadas)."""
+    rect = np.zeros((4, 2), dtype="float32")
+    s = pts.sum(axis=1)
+    rect[0] = pts[np.argmin(s)] # TL
+    rect[2] = pts[np.argmax(s)] # BR
+    diff = np.diff(pts, axis=1)
+    rect[1] = pts[np.argmin(diff)] # TR
+    rect[3] = pts[np.argmax(diff)] # BL
+    return rect
+
+
+def _refinar_fiducial(gray: "np.ndarray", bbox_full: Tuple[int, int, int, int], aprox: "np.ndarray") -> "np.ndarray":
+    """
+    Ajusta el centroide de un fiducial en una ventana a resolución completa alrededor de
+    su posición aproximada (encontrada en el nivel reducido). Si no lo encuentra, deja la aproximación.
+    """
+    x, y, w, h = bbox_full
+    pad_x, pad_y = w // 2 + 2, h // 2 + 2
+    H, W = gray.shape[:2]
+    x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+    x1, y1 = min(W, x + w + pad_x), min(H, y + h + pad_y)
+    ventana = gray[y0:y1, x0:x1]
+    if ventana.size == 0:
+        return aprox
+
+    binaria = cv2.threshold(ventana, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
+    cnts = cv2.findContours(binaria, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    cnts = cnts[0] if len(cnts) == 2 else cnts[1]
+    if not cnts:
+        return aprox
+
+    c = max(cnts, key=cv2.contourArea)
+    M = cv2.moments(c)
+    if M["m00"] == 0 or cv2.contourArea(c) < 0.25 * w * h:
+        return aprox
+    return np.array([x0 + M["m10"] / M["m00"], y0 + M["m01"] / M["m00"]], dtype="float32")
+
+
+def _alinear(gray: "np.ndarray") -> Tuple["np.ndarray", bool, float]:
+    """
+    Alineación coarse-to-fine: busca los fiduciales en un nivel reducido de la pirámide,
+    refina los 4 elegidos a resolución completa y devuelve las esquinas (TL, TR, BR, BL)
+    en píxeles de la imagen original, si se usaron fiduciales y la escala del nivel reducido.
+    """
+    h, w = gray.shape[:2]
+    escala = min(1.0, COARSE_W / float(w))
+    if escala < 1.0:
+        coarse = cv2.resize(gray, (COARSE_W, int(h * escala)), interpolation=cv2.INTER_AREA)
+    else:
+        coarse = gray
+
+    blurred = cv2.GaussianBlur(coarse, (5, 5), 0)
+    thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
+    cnts = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    cnts = cnts[0] if len(cnts) == 2 else cnts[1]
+
+    # Límites de tamaño equivalentes a 20-300 px en una imagen de 2000 px de ancho
+    ref = (coarse.shape[1] / REF_W) if escala < 1.0 else 1.0
+    lado_min, lado_max = 20 * ref, 300 * ref
+
+    candidatos = []
+    for c in cnts:
+        (x, y, bw, bh) = cv2.boundingRect(c)
+        ar = bw / float(bh)
+        if bw >= lado_min and bh >= lado_min and bw < lado_max and bh < lado_max and 0.7 <= ar <= 1.3:
+            M = cv2.moments(c)
+            if M["m00"] != 0:
+                candidatos.append(((M["m10"] / M["m00"], M["m01"] / M["m00"]), (x, y, bw, bh)))
+
+    if len(candidatos) >= 4:
+        centros = np.array([cen for cen, _ in candidatos], dtype="float32")
+        esquinas = _ordenar_esquinas(centros)
+        refinadas = []
+        for punto in esquinas:
+            idx = int(np.argmin(np.abs(centros - punto).sum(axis=1)))
+            (cx, cy), (x, y, bw, bh) = candidatos[idx]
+            aprox = np.array([cx / escala, cy / escala], dtype="float32")
+            bbox_full = (int(x / escala), int(y / escala), int(np.ceil(bw / escala)), int(np.ceil(bh / escala)))
+            refinadas.append(_refinar_fiducial(gray, bbox_full, aprox) if escala < 1.0 else aprox)
+        return np.array(refinadas, dtype="float32"), True, escala
+
+    # Fallback: intentar detectar el papel entero como un solo bloque si fallan los fiduciales.
+    # Solo los contornos más grandes pueden ser la hoja.
+    area_min = 0.2 * coarse.shape[0] * coarse.shape[1]
+    for c in sorted(cnts, key=cv2.contourArea, reverse=True)[:MAX_CONTORNOS_BORDE]:
+        if cv2.contourArea(c) < area_min:
+            break
+        peri = cv2.arcLength(c, True)
+        approx = cv2.approxPolyDP(c, 0.02 * peri, True)
+        if len(approx) == 4:
+            # Escalar de vuelta si se usó reducción
+            return _ordenar_esquinas(approx.reshape(4, 2).astype("float32") / escala), False, escala
+
+    raise ValueError("ERROR_DETECCION: No se detectaron los 4 marcadores de las esquinas ni el borde del papel. Asegúrate de que se vea toda la hoja.")
+
+
 class OMRVisionService:
     @staticmethod
-    def process_image(image_bytes: bytes) -> Dict[str, Any]:
+    def process_image(image_bytes: bytes, debug: Optional[bool] = None) -> Dict[str, Any]:
         """
         Procesa una imagen OMR usando Grilla de Coordenadas Fijas (Coordinate-based OMR).
         Basado en el generador de PDF (omr_template_service.py).
         Resolución Objetivo: 1700 x 2200 (LETTER 200 DPI).
+
+        `debug=True` (o OMR_DEBUG=1 en el entorno) dibuja la grilla sobre la hoja y la
+        guarda en `debug_omr_output.jpg`; por defecto no se renderiza ni se escribe a disco.
         """
+        if debug is None:
+            debug = os.getenv("OMR_DEBUG", "").lower() in ("1", "true", "yes")
         if not CV2_AVAILABLE:
             raise ValueError("OMR no disponible: OpenCV no está instalado en el servidor.")
         
         logger.info(f"--- NUEVO PROCESO OMR --- Bytes recibidos: {len(image_bytes)}")
         
         # --- 1. NORMALIZACIÓN DE ENTRADA (SOPORTE HEIC) ---
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if image is None:
-            # Si falla OpenCV, intentamos con Pillow (que con pillow-heif soporta HEIC)
-            try:
-                from PIL import Image
-                import io
-                try:
-                    from pillow_heif import register_heif_opener
-                    register_heif_opener()
-                    logger.info("HEIF: Registrado correctamente.")
-                except ImportError:
-                    logger.error("HEIF: pillow-heif NO ENCONTRADO en el entorno virtual.")
-                
-                logger.info(f"PIL: Intentando Image.open sobre {len(image_bytes)} bytes...")
-                pil_image = Image.open(io.BytesIO(image_bytes))
-                # Convertir a RGB y luego a formato OpenCV (BGR)
-                image = cv2.cvtColor(np.array(pil_image.convert("RGB")), cv2.COLOR_RGB2BGR)
-                logger.info(f"Decodificación con Pillow exitosa. Tamaño: {image.shape}")
-            except Exception as e:
-                logger.error(f"Falla total de decodificación: {str(e)}")
-                raise ValueError(f"ERROR_DECODIFICACION: {str(e)}. Asegúrate de ejecutar 'pip install pillow-heif' para soporte de iPhone.")
-
-        if image is None:
-            raise ValueError("ERROR_DECODIFICACION: No se pudo convertir el archivo en una imagen válida.")
-
-        # --- 2. DETECCIÓN FIDUCIARIA Y ALINEACIÓN (WARP) ---
-        # Reducción de escala temporal para detección rápida si es una foto enorme (iPhone)
-        h, w = image.shape[:2]
-        sh_scale = 1.0
-        if w > 2000:
-            sh_scale = 2000.0 / w
-            sh_img = cv2.resize(image, (2000, int(h * sh_scale)))
-        else:
-            sh_img = image.copy()
+        gray = _decodificar_gris(image_bytes)
 
-        gray_sh = cv2.cvtColor(sh_img, cv2.COLOR_BGR2GRAY)
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) # Full resolution for final warp
-        blurred = cv2.GaussianBlur(gray_sh, (5, 5), 0)
-        thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
-        
-        cnts = cv2.findContours(thresh.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        cnts = cnts[0] if len(cnts) == 2 else cnts[1]
-        
-        fiducials = []
-        for c in cnts:
-            (x, y, w, h) = cv2.boundingRect(c)
-            ar = w / float(h)
-            # Más flexible: desde 20px hasta 250px, proporción 0.7 a 1.3
-            if w >= 20 and h >= 20 and w < 300 and h < 300 and 0.7 <= ar <= 1.3:
-                fiducials.append(c)
-        
-        used_fiducials = False
-        if len(fiducials) < 4:
-            # Fallback: intentar detectar el papel entero como un solo bloque si fallan los fiduciales
-            cnts = sorted(cnts, key=cv2.contourArea, reverse=True)
-            doc_cnt = None
-            for c in cnts:
-                peri = cv2.arcLength(c, True)
-                approx = cv2.approxPolyDP(c, 0.02 * peri, True)
-                if len(approx) == 4:
-                    doc_cnt = approx
-                    break
-            if doc_cnt is None:
-                raise ValueError("ERROR_DETECCION: No se detectaron los 4 marcadores de las esquinas ni el borde del papel. Asegúrate de que se vea toda la hoja.")
-            
-            # Escalar de vuelta si se usó reducción
-            if sh_scale < 1.0:
-                doc_cnt = (doc_cnt / sh_scale).astype(np.int32)
-        else:
-            used_fiducials = True
-            # Encontrar los extremos de los fiduciales para el warp
-            pts = []
-            for f in fiducials:
-                M = cv2.moments(f)
-                if M["m00"] != 0:
-                    cX = int(M["m10"] / M["m00"])
-                    cY = int(M["m01"] / M["m00"])
-                    # Aplicar escala inversa aquí mismo
-                    if sh_scale < 1.0:
-                        cX = int(cX / sh_scale)
-                        cY = int(cY / sh_scale)
-                    pts.append([cX, cY])
-            
-            # Ordenar puntos: TL, TR, BR, BL
-            pts = np.array(pts, dtype="float32")
-            rect = np.zeros((4, 2), dtype="float32")
-            s = pts.sum(axis=1)
-            rect[0] = pts[np.argmin(s)] # TL
-            rect[2] = pts[np.argmax(s)] # BR
-            diff = np.diff(pts, axis=1)
-            rect[1] = pts[np.argmin(diff)] # TR
-            rect[3] = pts[np.argmax(diff)] # BL
-            doc_cnt = rect
-
-        # Aplicar Transformación y Normalizar a tamaño LETTER 200 DPI
-        TARGET_W, TARGET_H = 1700, 2200
-        warped = four_point_transform(gray, doc_cnt.reshape(4, 2))
-        warped = cv2.resize(warped, (TARGET_W, TARGET_H))
+        # --- 2. DETECCIÓN FIDUCIARIA (COARSE-TO-FINE) Y WARP DIRECTO A 1700x2200 ---
+        esquinas, used_fiducials, sh_scale = _alinear(gray)
+        destino = np.array([[0, 0], [TARGET_W - 1, 0], [TARGET_W - 1, TARGET_H - 1], [0, TARGET_H - 1]], dtype="float32")
+        M = cv2.getPerspectiveTransform(esquinas, destino)
+        warped = cv2.warpPerspective(gray, M, (TARGET_W, TARGET_H), flags=cv2.INTER_AREA if sh_scale < 1.0 else cv2.INTER_LINEAR)
+        del gray
         
         # Binarización para lectura de burbujas
         thresh_warped = cv2.threshold(warped, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
 
-        # --- 3. CONSTANTES GEOMÉTRICAS Y DE CONVERSIÓN ---
-        if used_fiducials:
-            # Los limites de la imagen son los centroides de los fiduciales (X: 20 a 205, Y: 20 a 269)
-            INTERNAL_W_MM = 205.0 - 20.0  # 185.0 mm
-            INTERNAL_H_MM = 269.0 - 20.0  # 249.0 mm
-            OFFSET_X_MM = 20.0
-            OFFSET_Y_MM = 20.0
-        else:
-            # Los limites son el borde de la hoja tamaño Carta
-            INTERNAL_W_MM = 215.9
-            INTERNAL_H_MM = 279.4
-            OFFSET_X_MM = 0.0
-            OFFSET_Y_MM = 0.0
-            
-        PX_PER_MM_X = TARGET_W / INTERNAL_W_MM
-        PX_PER_MM_Y = TARGET_H / INTERNAL_H_MM
-
-        # Función para convertir mm (ReportLab) a Píxeles (OpenCV top-down en warped image)
-        def to_px(x_mm, y_mm_rl):
-            rel_x = x_mm - OFFSET_X_MM
-            # ReportLab Y es desde abajo. CV_Y es desde arriba en el bbox interno:
-            rel_y = INTERNAL_H_MM - (y_mm_rl - OFFSET_Y_MM)
-            
-            x_px = int(rel_x * PX_PER_MM_X)
-            y_px = int(rel_y * PX_PER_MM_Y)
-            
-            return min(max(x_px, 0), TARGET_W - 1), min(max(y_px, 0), TARGET_H - 1)
-
-        # Extraer regiones para ROI relativas a la escala correcta
-        R_HALF_Q = int(2.5 * PX_PER_MM_X) # Radio de burbuja ~ 2.5mm
-        R_HALF_RUT = int(2.2 * PX_PER_MM_X) # Radio de RUT ~ 2.2mm
+        # --- 3. GEOMETRÍA DE LA GRILLA (compilada por versión de plantilla) ---
+        grilla = plantilla_compilada()["fiduciales" if used_fiducials else "hoja"]
 
         # --- 4. LECTURA DEL QR (ZONA SUPERIOR DERECHA) ---
+        evaluation_id = "QR_NOT_READABLE"
         if not PYZBAR_AVAILABLE:
             logger.warning("QR saltado: pyzbar no disponible.")
             evaluation_id = "QR_NOT_READABLE_NO_ZBAR"
@@ -203,102 +346,34 @@ class OMRVisionService:
             except:
                 evaluation_id = qr_data
 
-        # --- 5. EXTRACCIÓN DE RESPUESTAS (45 Preguntas) ---
-        q_col_x = [20, 85, 150]
-        q_start_y = 170
-        q_y_step = 8.5
-        q_h_step = 5.5
-        options = ["A", "B", "C", "D"]
-        results = {}
+        # --- 5. DENSIDAD DE TODAS LAS BURBUJAS (imagen integral, una pasada) ---
+        integral = cv2.integral(thresh_warped // 255, sdepth=cv2.CV_32S)
 
-        # --- MODO DEBUG VISUAL ---
-        debug_warped = cv2.cvtColor(warped, cv2.COLOR_GRAY2BGR)
-        
-        for i in range(45):
-            col_idx = i // 15
-            row_idx = i % 15
-            x_base = q_col_x[col_idx]
-            y_rl = q_start_y - (row_idx * q_y_step)
-            
-            marked_opt = None
-            max_density = 0
-            
-            r_half = R_HALF_Q
-            
-            for j, opt in enumerate(options):
-                bx_mm = x_base + (j * q_h_step)
-                px_x, px_y = to_px(bx_mm, y_rl)
-                
-                # Para evitar cortes del tensor numpy, calculamos limites seguros
-                y_start = max(0, px_y - r_half)
-                y_end = min(TARGET_H, px_y + r_half)
-                x_start = max(0, px_x - r_half)
-                x_end = min(TARGET_W, px_x + r_half)
-                
-                # Dibujar rectángulo ROJO para burbujas de respuesta
-                cv2.rectangle(debug_warped, (x_start, y_start), (x_end, y_end), (0, 0, 255), 2)
-                
-                # Análisis de densidad
-                roi = thresh_warped[y_start:y_end, x_start:x_end]
-                if roi.size == 0: continue
-                density = cv2.countNonZero(roi)
-                if density > max_density:
-                    max_density = density
-                    marked_opt = opt
-            
-            roi_area = (2 * r_half) ** 2
-            if max_density > (roi_area * 0.25):
-                results[str(i + 1)] = marked_opt
-            else:
-                results[str(i + 1)] = None
-
-        # --- RUT (9 Columnas) con DEBUG ---
-        rut_x_start = 70
-        rut_y_start_rl = 255
-        rut_y_step = 5.5
-        rut_x_step = 6
-        rut_digits = []
+        # Respuestas (45 preguntas): opción más marcada, si supera el umbral
+        dens_q = densidades_burbujas(integral, grilla["preguntas"])
+        marcadas = dens_q.argmax(axis=1)
+        max_q = dens_q.max(axis=1)
+        aceptadas = max_q > grilla["area_pregunta"] * UMBRAL_RESPUESTA
+        results = {
+            str(i + 1): (OPCIONES[marcadas[i]] if aceptadas[i] else None)
+            for i in range(len(marcadas))
+        }
 
-        for col in range(9):
-            x_mm = rut_x_start + (col * rut_x_step)
-            if col == 8: x_mm += 4
-            col_max_density = 0
-            col_marked = None
-            num_rows = 11 if col == 8 else 10
-            
-            for row in range(num_rows):
-                y_mm = rut_y_start_rl - 3.5 - (row * rut_y_step)
-                px_x, px_y = to_px(x_mm, y_mm)
-                
-                r_half = R_HALF_RUT
-                
-                y_start = max(0, px_y - r_half)
-                y_end = min(TARGET_H, px_y + r_half)
-                x_start = max(0, px_x - r_half)
-                x_end = min(TARGET_W, px_x + r_half)
-                
-                # Dibujar rectángulo AZUL para grilla RUT
-                cv2.rectangle(debug_warped, (x_start, y_start), (x_end, y_end), (255, 0, 0), 2)
-                
-                roi = thresh_warped[y_start:y_end, x_start:x_end]
-                if roi.size == 0: continue
-                density = cv2.countNonZero(roi)
-                if density > col_max_density:
-                    col_max_density = density
-                    col_marked = str(row) if row < 10 else "K"
-            
-            roi_area = (2 * r_half) ** 2
-            if col_max_density > (roi_area * 0.3):
-                rut_digits.append(col_marked)
-            else:
-                rut_digits.append("?")
-
-        # Guardar imagen de diagnóstico en la raíz del backend
-        from pathlib import Path
-        backend_dir = Path(__file__).resolve().parent.parent
-        debug_path = backend_dir / "debug_omr_output.jpg"
-        cv2.imwrite(str(debug_path), debug_warped)
-        logger.info(f"Imagen de debug generada: {debug_path}")
+        # RUT (9 columnas): fila más marcada por columna; la fila 10 es "K" (solo en el DV)
+        dens_rut = np.where(grilla["rut_validas"], densidades_burbujas(integral, grilla["rut"]), -1)
+        filas = dens_rut.argmax(axis=1)
+        max_rut = dens_rut.max(axis=1)
+        rut_digits = [
+            (str(f) if f < 10 else "K") if m > grilla["area_rut"] * UMBRAL_RUT else "?"
+            for f, m in zip(filas, max_rut)
+        ]
+
+        if debug:
+            from pathlib import Path
+            backend_dir = Path(__file__).resolve().parent.parent
+            debug_path = backend_dir / "debug_omr_output.jpg"
+            cv2.imwrite(str(debug_path), _dibujar_debug(warped, grilla))
+            logger.info(f"Imagen de debug generada: {debug_path}")
 
         # Construir RUT final (formato XXXXXXXX-X)
         body = "".join(rut_digits[:8])
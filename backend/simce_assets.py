@@ -0,0 +1,201 @@
+"""
+simce_assets.py
+───────────────
+Almacén en memoria de los JSON de `backend/assets` que usa la generación SIMCE:
+banco de estímulos, indicadores curriculares, matriz de distractores y tablas
+de especificaciones.
+
+Cada archivo se lee y se indexa una sola vez (al arrancar con `precargar()` o
+en el primer uso) y se recarga solo si cambia su mtime. Los índices ya traen
+las claves canónicas de asignatura/nivel y el filtro de lista negra aplicado,
+así que elegir un estímulo o armar los indicadores de una petición es una
+búsqueda en diccionario.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import random
+import threading
+from collections import defaultdict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+ASSETS_DIR: Path = Path(__file__).resolve().parent / "assets"
+ESTIMULOS_JSON: Path = ASSETS_DIR / "banco_estimulos_unificado.json"
+INDICADORES_JSON: Path = ASSETS_DIR / "indicadores_curriculum_PERFECTO.json"
+MATRIZ_JSON: Path = ASSETS_DIR / "matriz_distractores_oficial.json"
+TABLAS_JSON: Path = ASSETS_DIR / "tablas_especificaciones_simce.json"
+
+# Lista negra de metadatos pedagógicos para evitar alucinaciones institucionales
+BLACKLIST_ESTIMULOS = (
+    "aprendizajes esperados", "objetivo de aprendizaje", "tabla de especificaciones",
+    "clave de respuesta", "pauta de", "eje temático", "habilidad evaluada",
+    "indicadores de evaluación", "estándares de aprendizaje", "bases curriculares",
+    "niveles de aprendizaje", "simce", "agencia de calidad", "mineduc"
+)
+
+
+@lru_cache(maxsize=1024)
+def canonical(s: str) -> str:
+    if not s: return ""
+    s = s.lower().strip()
+    s = s.replace("°", "").replace("º", "").replace(".", "").replace(" ", "").replace("-", "")
+    s = s.replace("iv", "4").replace("iii", "3").replace("ii", "2").replace("i", "1")
+    s = s.replace("lenguaje", "lengua")
+    return s
+
+
+# Las consultas resueltas se memorizan; el tope evita crecer sin límite con entradas arbitrarias
+MAX_CONSULTAS_MEMORIZADAS = 512
+
+
+def _coincide_parcial(a: str, b: str) -> bool:
+    return a in b or b in a
+
+
+def _memorizar(consultas: dict, clave: tuple, valor: list) -> list:
+    if len(consultas) >= MAX_CONSULTAS_MEMORIZADAS:
+        consultas.clear()
+    consultas[clave] = valor
+    return valor
+
+
+# ─── Índices ──────────────────────────────────────────────────────────────────
+
+class IndiceEstimulos:
+    """Banco de estímulos agrupado por (asignatura, nivel), canónicos y exactos."""
+
+    def __init__(self, data: list[dict]):
+        # Aptos para el router híbrido: con imagen, no "solo imagen" y sin metadatos de la lista negra
+        self._aptos: dict[tuple[str, str], list[dict]] = defaultdict(list)
+        # Para el generador: coincidencia exacta, excluyendo solo "imagen_adjunta_solo"
+        self._exactos: dict[tuple[str, str], list[dict]] = defaultdict(list)
+        self._consultas: dict[tuple[str, str], list[dict]] = {}
+
+        for item in data:
+            if item.get("tipo") == "imagen_adjunta_solo":
+                continue
+            self._exactos[(item.get("asignatura"), item.get("nivel"))].append(item)
+
+            contenido = (item.get("contenido_real") or "").lower()
+            if item.get("imagen_adjunta") and not any(bad in contenido for bad in BLACKLIST_ESTIMULOS):
+                clave = (canonical(item.get("asignatura", "")), canonical(item.get("nivel", "")))
+                self._aptos[clave].append(item)
+
+    def aptos(self, norm_asig: str, norm_nivel: str) -> list[dict]:
+        """Estímulos aptos cuya asignatura canónica contiene o está contenida en `norm_asig`."""
+        clave = (norm_asig, norm_nivel)
+        if clave in self._consultas:
+            return self._consultas[clave]
+        return _memorizar(self._consultas, clave, [
+            item
+            for (asig, nivel), items in self._aptos.items()
+            if nivel == norm_nivel and _coincide_parcial(asig, norm_asig)
+            for item in items
+        ])
+
+    def exactos(self, asignatura: str, nivel: str) -> list[dict]:
+        return self._exactos.get((asignatura, nivel), [])
+
+
+class IndiceIndicadores:
+    """Indicadores curriculares por (asignatura, nivel) canónicos, en el orden del archivo."""
+
+    def __init__(self, data: list[dict]):
+        self._por_clave: dict[tuple[str, str], list[tuple[int, list[str]]]] = defaultdict(list)
+        for pos, item in enumerate(data):
+            clave = (canonical(item.get("asignatura", "")), canonical(item.get("nivel", "")))
+            self._por_clave[clave].append((pos, item.get("indicadores", [])))
+        self._consultas: dict[tuple[str, str], list[str]] = {}
+
+    def indicadores(self, norm_asig: str, norm_nivel: str) -> list[str]:
+        """Coincidencia exacta; si no hay, parcial por asignatura (mismo nivel)."""
+        clave = (norm_asig, norm_nivel)
+        if clave in self._consultas:
+            return self._consultas[clave]
+
+        matches = self._por_clave.get(clave)
+        if not matches:
+            matches = sorted(
+                m
+                for (asig, nivel), items in self._por_clave.items()
+                if nivel == norm_nivel and _coincide_parcial(asig, norm_asig)
+                for m in items
+            )
+        return _memorizar(self._consultas, clave, [ind for _, inds in (matches or []) for ind in inds])
+
+
+# ─── Carga con recarga por mtime ──────────────────────────────────────────────
+
+class _Asset:
+    def __init__(self, path: Path, construir: Callable[[Any], Any]):
+        self.path = path
+        self.construir = construir
+        self._mtime: int | None = None
+        self._valor: Any = None
+        self._lock = threading.Lock()
+
+    def obtener(self) -> Any:
+        """Valor indexado vigente. Lanza FileNotFoundError si el archivo no existe."""
+        mtime = self.path.stat().st_mtime_ns
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    data = json.loads(self.path.read_text("utf-8"))
+                    self._valor = self.construir(data)
+                    self._mtime = mtime
+                    logger.info("Asset SIMCE cargado: %s", self.path.name)
+        return self._valor
+
+
+def _texto_matriz(data: dict) -> str:
+    return json.dumps(data.get("tipos_error", {}), ensure_ascii=False)
+
+
+_ESTIMULOS = _Asset(ESTIMULOS_JSON, IndiceEstimulos)
+_INDICADORES = _Asset(INDICADORES_JSON, IndiceIndicadores)
+_MATRIZ = _Asset(MATRIZ_JSON, _texto_matriz)
+
+_json_crudos: dict[str, _Asset] = {}
+_json_lock = threading.Lock()
+
+
+def cargar_json(path: str | Path) -> Any:
+    """Contenido de un JSON cualquiera, leído una vez y recargado si cambia su mtime. No mutar."""
+    clave = str(path)
+    asset = _json_crudos.get(clave)
+    if asset is None:
+        with _json_lock:
+            asset = _json_crudos.setdefault(clave, _Asset(Path(path), lambda data: data))
+    return asset.obtener()
+
+
+def estimulos() -> IndiceEstimulos:
+    return _ESTIMULOS.obtener()
+
+
+def indicadores() -> IndiceIndicadores:
+    return _INDICADORES.obtener()
+
+
+def matriz_distractores_texto() -> str:
+    return _MATRIZ.obtener()
+
+
+def estimulo_aleatorio(norm_asig: str, norm_nivel: str) -> dict | None:
+    aptos = estimulos().aptos(norm_asig, norm_nivel)
+    return random.choice(aptos) if aptos else None
+
+
+def precargar() -> None:
+    """Lee e indexa todos los assets (se llama al arrancar la app). Un archivo faltante solo se registra."""
+    for cargar in (estimulos, indicadores, matriz_distractores_texto, lambda: cargar_json(TABLAS_JSON)):
+        try:
+            cargar()
+        except Exception as e:
+            logger.warning("No se pudo precargar un asset SIMCE: %s", e)
@@ -13,11 +13,12 @@ Uso básico:
 
 from __future__ import annotations
 
-import json
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Literal
 
+from simce_assets import cargar_json
+
 # ─── Data-classes de resultado ────────────────────────────────────────────────
 
 
@@ -154,8 +155,8 @@ def calculate_question_distribution(
     if not path.exists():
         raise FileNotFoundError(f"No se encontró el archivo: {path}")
 
-    with path.open(encoding="utf-8") as fh:
-        data: list[dict] = json.load(fh)
+    # Leído una vez y recargado solo si cambia su mtime
+    data: list[dict] = cargar_json(path)
 
     # ── 1. Buscar asignatura ────────────────────────────────────────────────
     asignatura_entry: dict | None = None
@@ -3,6 +3,8 @@ import os
 from pathlib import Path
 from typing import Dict
 
+from simce_assets import cargar_json
+
 def calcular_distribucion(asignatura: str, nivel: str, total_preguntas: int) -> Dict[str, int]:
     """
     Calcula la distribución exacta de preguntas por habilidad usando el método
@@ -27,9 +29,9 @@ def calcular_distribucion(asignatura: str, nivel: str, total_preguntas: int) ->
         s = s.replace("iv", "4").replace("iii", "3").replace("ii", "2").replace("i", "1")
         return s
 
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-        
+    # Leído una vez y recargado solo si cambia su mtime
+    data = cargar_json(json_path)
+
     # 2. Buscar asignatura y nivel con normalización canónica
     norm_asig = canonical(asignatura)
     norm_nivel = canonical(nivel)
@@ -6,14 +6,13 @@ import asyncio
 import io
 import re
 import unicodedata
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Literal, Optional
 from pathlib import Path
 from urllib.parse import quote
 import glob
-from fastapi import APIRouter, HTTPException, Depends, File, UploadFile
+from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Request
 from fastapi.responses import StreamingResponse, FileResponse
-from pydantic import BaseModel
-from supabase import create_client, Client
+from pydantic import BaseModel, Field
 from google import genai
 from google.genai import types
 
@@ -27,15 +26,27 @@ from docx.shared import Inches, Pt, RGBColor
 
 # Importar el calculador matemático
 from simce_parser import calcular_distribucion
+# Assets SIMCE precargados e indexados
+import simce_assets
+from simce_assets import canonical
 # Importar dependencia de autenticación
-from routers.deps import get_current_user_id_optional
+from routers.deps import get_current_user_id, get_current_user_id_optional
+# Planificador compartido de llamadas al LLM
+from app.services.llm_scheduler import planificador_llm, PRIORIDAD_LOTE
+# Respuestas NDJSON/SSE para la generación en streaming
+from app.services.streaming import quiere_sse, respuesta_streaming
+from app.services.docx_plantillas import PlantillaDocx, logo_png
+from app.db.supabase import obtener_cliente, cliente_service, ejecutar
+from app.services.docx_render import motor_render
+
+_MODELO_SIMCE = "gemini-2.5-flash"
 
 router = APIRouter(prefix="/api/v1/simce", tags=["SIMCE"])
 
 # Configuración de Rutas y Supabase
 _ASSETS_DIR = Path(__file__).resolve().parent / "assets"
-_ESTIMULOS_JSON = _ASSETS_DIR / "banco_estimulos_unificado.json"
-INDICADORES_PATH = _ASSETS_DIR / "indicadores_curriculum_PERFECTO.json"
+_ESTIMULOS_JSON = simce_assets.ESTIMULOS_JSON
+INDICADORES_PATH = simce_assets.INDICADORES_JSON
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
@@ -108,15 +119,16 @@ class DescargaOMRRequest(BaseModel):
     nivel: str
     cantidad_preguntas: int
 
-# --- Funciones de Utilidad ---
+class DescargaLoteRequest(BaseModel):
+    asignatura: str
+    nivel: str
+    cantidad_preguntas: int = Field(45, ge=1, le=45)  # La grilla de la hoja tiene 45 casilleros
+    course_ids: Optional[List[str]] = None  # None → todos los cursos del nivel
+    evaluation_id: Optional[str] = None
+    agrupar: Literal["alumno", "curso"] = "alumno"
+    cuadernillo: Optional[DescargaCuadernilloRequest] = None
 
-def canonical(s: str) -> str:
-    if not s: return ""
-    s = s.lower().strip()
-    s = s.replace("°", "").replace("º", "").replace(".", "").replace(" ", "").replace("-", "")
-    s = s.replace("iv", "4").replace("iii", "3").replace("ii", "2").replace("i", "1")
-    s = s.replace("lenguaje", "lengua")
-    return s
+# --- Funciones de Utilidad ---
 
 def extract_json(text: str) -> Any:
     text = text.strip()
@@ -130,86 +142,43 @@ def extract_json(text: str) -> Any:
     try: return json.loads(text)
     except: return None
 
-def load_local_json(path: Path) -> List[Dict[str, Any]]:
-    if not path.exists(): return []
-    try:
-        with open(path, "r", encoding="utf-8") as f: return json.load(f)
-    except: return []
-
 def get_indicadores_locales(asignatura_oficial: str, nivel: str) -> str:
-    data = load_local_json(INDICADORES_PATH)
-    
     # Normalización vía Map
     norm_asig = canonical(asignatura_oficial)
     if asignatura_oficial in SUBJECT_MAPS:
         norm_asig = canonical(SUBJECT_MAPS[asignatura_oficial].get("json", asignatura_oficial))
-    
-    norm_nivel = canonical(nivel)
-        
-    matches = [
-        item for item in data 
-        if canonical(item.get("asignatura", "")) == norm_asig 
-        and canonical(item.get("nivel", "")) == norm_nivel
-    ]
-    
-    # Intento 2: Búsqueda parcial si falla la exacta
-    if not matches:
-        matches = [
-            item for item in data 
-            if (norm_asig in canonical(item.get("asignatura", "")) or canonical(item.get("asignatura", "")) in norm_asig)
-            and canonical(item.get("nivel", "")) == norm_nivel
-        ]
 
-    if not matches: return ""
-    all_inds = []
-    for m in matches: all_inds.extend(m.get("indicadores", []))
+    try:
+        # Exacta por (asignatura, nivel) canónicos; si no hay, búsqueda parcial por asignatura
+        all_inds = simce_assets.indicadores().indicadores(norm_asig, canonical(nivel))
+    except Exception:
+        return ""
     return "\n- ".join(all_inds[:20])
 
 def _get_random_stimulus(asignatura: str, nivel: str) -> dict:
-    if not _ESTIMULOS_JSON.exists():
-        raise HTTPException(
-            status_code=500, 
-            detail=f"CRÍTICO: No se encontró la base de datos de estímulos en {_ESTIMULOS_JSON}"
-        )
-    
     norm_nivel = canonical(nivel)
     norm_asig = canonical(asignatura)
     if asignatura in SUBJECT_MAPS:
         norm_asig = canonical(SUBJECT_MAPS[asignatura].get("banco", asignatura))
 
     try:
-        data = json.loads(_ESTIMULOS_JSON.read_text("utf-8"))
+        # Índice precalculado: claves canónicas y lista negra ya aplicadas al cargar
+        estimulo = simce_assets.estimulo_aleatorio(norm_asig, norm_nivel)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"CRÍTICO: No se encontró la base de datos de estímulos en {_ESTIMULOS_JSON}"
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error leyendo base de datos JSON: {str(e)}")
 
-    # Lista negra de metadatos pedagógicos para evitar alucinaciones institucionales
-    blacklist = [
-        "aprendizajes esperados", "objetivo de aprendizaje", "tabla de especificaciones",
-        "clave de respuesta", "pauta de", "eje temático", "habilidad evaluada",
-        "indicadores de evaluación", "estándares de aprendizaje", "bases curriculares",
-        "niveles de aprendizaje", "simce", "agencia de calidad", "mineduc"
-    ]
-
-    filtrados = []
-    for item in data:
-        contenido_limpio = item.get("contenido_real", "").lower()
-        contains_garbage = any(bad_word in contenido_limpio for bad_word in blacklist)
-        
-        db_asig = canonical(item.get("asignatura", ""))
-        match_asig = (db_asig in norm_asig) or (norm_asig in db_asig)
-        db_nivel = canonical(item.get("nivel", ""))
-        match_nivel = (db_nivel == norm_nivel)
-        
-        if match_asig and match_nivel and item.get("imagen_adjunta") and item.get("tipo") != "imagen_adjunta_solo" and not contains_garbage:
-            filtrados.append(item)
-    
-    if not filtrados:
+    if not estimulo:
         raise HTTPException(
             status_code=404, 
             detail=f"No se encontraron estímulos para '{asignatura}' (canónigo: {norm_asig}) y nivel '{nivel}' (canónigo: {norm_nivel}). Revisa el JSON oficial."
         )
         
-    return random.choice(filtrados)
+    return estimulo
 
 # --- Helpers Exportación ---
 
@@ -247,21 +216,18 @@ def _docx_headers(filename: str) -> dict:
         "Access-Control-Expose-Headers": "Content-Disposition",
     }
 
-def _add_profeic_header(doc: Document, asignatura: str, nivel: str, tipo: str) -> None:
+def _encabezado_base(doc: Document) -> None:
     t = doc.add_table(rows=1, cols=2)
     t.autofit = False
     t.columns[0].width = Inches(1.2)
     t.columns[1].width = Inches(5.3)
     cell_logo = t.cell(0, 0)
-    logo_path = _ASSETS_DIR / "logo_profeic.svg.png"
-    if not logo_path.exists():
-        logo_path = _ASSETS_DIR / "logo.png"
+    logo = logo_png("logo_profeic.svg.png") or logo_png("logo.png")
         
     p_logo = cell_logo.paragraphs[0]
     run_logo = p_logo.add_run()
-    if logo_path.exists():
-        if not _add_image_safely(run_logo, logo_path, width=Inches(1.0)):
-            run_logo.add_text("ProfeIC")
+    if logo:
+        run_logo.add_picture(io.BytesIO(logo), width=Inches(1.0))
     else: run_logo.add_text("ProfeIC")
     
     cell_info = t.cell(0, 1)
@@ -269,9 +235,15 @@ def _add_profeic_header(doc: Document, asignatura: str, nivel: str, tipo: str) -
     p_info.alignment = WD_ALIGN_PARAGRAPH.RIGHT
     r1 = p_info.add_run("PROFE IC\n"); r1.bold = True; r1.font.size = Pt(12)
     r2 = p_info.add_run("Instrumento generado con IA · ProfeIC\n"); r2.font.size = Pt(8)
-    r3 = p_info.add_run(f"Asignatura: {asignatura} | Nivel: {nivel} | {tipo}"); r3.font.size = Pt(9)
     doc.add_paragraph()
 
+_PLANTILLA_ENCABEZADO = PlantillaDocx(_encabezado_base)
+
+def _documento_profeic(asignatura: str, nivel: str, tipo: str) -> Document:
+    doc = _PLANTILLA_ENCABEZADO.nueva()
+    r3 = doc.tables[0].cell(0, 1).paragraphs[0].add_run(f"Asignatura: {asignatura} | Nivel: {nivel} | {tipo}"); r3.font.size = Pt(9)
+    return doc
+
 # --- Generación Segmentada (Prompt Chaining) ---
 
 async def generar_pregunta_individual(skill: str, numero: int, nivel: str, asignatura: str, indicadores_texto: str, contexto_referencia: str, es_lenguaje: bool, historial_preguntas: str, foco_actual: str) -> dict:
@@ -312,10 +284,14 @@ REGLAS ESTRICTAS:
 }}
 """
     try:
-        res = await ai_client.aio.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=prompt_base,
-            config=types.GenerateContentConfig(response_mime_type="application/json", temperature=0.3)
+        res = await planificador_llm.ejecutar(
+            _MODELO_SIMCE,
+            lambda: ai_client.aio.models.generate_content(
+                model=_MODELO_SIMCE,
+                contents=prompt_base,
+                config=types.GenerateContentConfig(response_mime_type="application/json", temperature=0.3)
+            ),
+            prioridad=PRIORIDAD_LOTE
         )
         data = extract_json(res.text)
         if isinstance(data, dict):
@@ -408,7 +384,11 @@ async def generar_un_bloque(index: int, block_skills: List[str], nivel: str, asi
         else:
             prompt_estimulo = f"Genera un breve estímulo disciplinario inédito (ej. un caso histórico, problema matemático, o experimento científico). Nivel: {nivel}. Asignatura: {asignatura}. Basado estrictamente en: {indicadores_texto}. Máximo 150 palabras. {schema_instruccion}"
             
-        res_estimulo = await ai_client.aio.models.generate_content(model='gemini-2.5-flash', contents=prompt_estimulo, config=types.GenerateContentConfig(response_mime_type="application/json"))
+        res_estimulo = await planificador_llm.ejecutar(
+            _MODELO_SIMCE,
+            lambda: ai_client.aio.models.generate_content(model=_MODELO_SIMCE, contents=prompt_estimulo, config=types.GenerateContentConfig(response_mime_type="application/json")),
+            prioridad=PRIORIDAD_LOTE
+        )
         estimulo_data = extract_json(res_estimulo.text)
         if isinstance(estimulo_data, dict):
             texto_base = estimulo_data.get("contenido", "")
@@ -485,189 +465,244 @@ async def generar_un_bloque(index: int, block_skills: List[str], nivel: str, asi
 
 # --- Endpoints ---
 
-@router.post("/generate", response_model=SimceResponse)
-async def generar_simce(req: SimceRequest, current_user_id: Optional[str] = Depends(get_current_user_id_optional)):
+async def _pipeline_simce(req: SimceRequest):
+    """
+    Genera el ensayo por bloques de 5 preguntas y emite eventos a medida que cada bloque termina:
+    `inicio`, un `bloque` por bloque (en orden de término) y un `resumen` con la forma de SimceResponse.
+    """
+    # MODO MINI-ENSAYO DE PRUEBA: Forzamos 5 preguntas para evitar alucinaciones
+    req.cantidad_preguntas = 5
+    
     try:
-        # MODO MINI-ENSAYO DE PRUEBA: Forzamos 5 preguntas para evitar alucinaciones
-        req.cantidad_preguntas = 5
-        
+        distribucion_total = calcular_distribucion(req.asignatura, req.nivel, req.cantidad_preguntas)
+    except ValueError:
+        habilidades_fallback = ["Localizar", "Interpretar y relacionar", "Reflexionar"]
+        base_count = req.cantidad_preguntas // len(habilidades_fallback)
+        distribucion_total = {h: base_count for h in habilidades_fallback}
+        for i in range(req.cantidad_preguntas % 3): distribucion_total[habilidades_fallback[i]] += 1
+    
+    skills_pool = []
+    for hab, cant in distribucion_total.items(): skills_pool.extend([hab] * cant)
+
+    async def _indicadores_supabase() -> str:
         try:
-            distribucion_total = calcular_distribucion(req.asignatura, req.nivel, req.cantidad_preguntas)
-        except ValueError:
-            habilidades_fallback = ["Localizar", "Interpretar y relacionar", "Reflexionar"]
-            base_count = req.cantidad_preguntas // len(habilidades_fallback)
-            distribucion_total = {h: base_count for h in habilidades_fallback}
-            for i in range(req.cantidad_preguntas % 3): distribucion_total[habilidades_fallback[i]] += 1
-        
-        skills_pool = []
-        for hab, cant in distribucion_total.items(): skills_pool.extend([hab] * cant)
-
-        indicadores_texto = ""
-        if SUPABASE_URL and SUPABASE_KEY:
-            try:
-                supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-                res = supabase.table("curriculum_indicadores").select("indicador").eq("nivel", req.nivel).eq("asignatura", req.asignatura).execute()
-                if res.data: indicadores_texto = "\n- ".join([item["indicador"] for item in res.data[:20]])
-            except: pass
-        if not indicadores_texto: indicadores_texto = get_indicadores_locales(req.asignatura, req.nivel)
-        if not indicadores_texto: indicadores_texto = "Marco curricular nacional general."
-
-        tareas = []
-        for i in range((req.cantidad_preguntas + 4) // 5):
-            start = i * 5
-            block_skills = skills_pool[start:start+5]
-            if not block_skills: break
-            
-            # Obtener un estímulo específico para este bloque
-            estimulo_bloque = _get_random_stimulus(req.asignatura, req.nivel)
-            
-            async def generar_con_estimulo(idx, skills, n, a, ind_txt, est_obj, start_num):
-                bloque = await generar_un_bloque(idx, skills, n, a, ind_txt, [est_obj], start_num)
-                # Inyectar estímulo en la primera pregunta del bloque
-                if bloque.preguntas:
-                    bloque.preguntas[0].estimulo_texto = est_obj.get("contenido_real") or bloque.contenido_estimulo
-                    bloque.preguntas[0].estimulo_imagen = est_obj.get("imagen_adjunta") or bloque.ruta_local
-                return bloque
-
-            tareas.append(generar_con_estimulo(i, block_skills, req.nivel, req.asignatura, indicadores_texto, estimulo_bloque, 1 + start))
-
-        ensayo_final = await asyncio.gather(*tareas)
-        todas_las_preguntas = []
-        for b in ensayo_final: todas_las_preguntas.extend(b.preguntas)
-        
-        # Extraer primer estímulo como global (Compatibilidad Frontend)
-        est_global_txt = ensayo_final[0].preguntas[0].estimulo_texto if (ensayo_final and ensayo_final[0].preguntas) else None
-        est_global_img = ensayo_final[0].preguntas[0].estimulo_imagen if (ensayo_final and ensayo_final[0].preguntas) else None
-
-        return SimceResponse(
-            titulo=f"Ensayo SIMCE — {req.asignatura} — {req.nivel}",
-            asignatura=req.asignatura,
-            nivel=req.nivel,
-            cantidad_preguntas=len(todas_las_preguntas),
-            modo=req.modo,
-            blueprint_resumen=str(distribucion_total),
-            estimulo_texto=est_global_txt,
-            estimulo_imagen=est_global_img,
-            ensayo=list(ensayo_final), 
-            preguntas=todas_las_preguntas
-        )
-    except Exception as e:
-        print(traceback.format_exc()); raise HTTPException(status_code=500, detail=str(e))
+            supabase = obtener_cliente(SUPABASE_URL, SUPABASE_KEY)
+            res = await ejecutar(supabase.table("curriculum_indicadores").select("indicador").eq("nivel", req.nivel).eq("asignatura", req.asignatura), "curriculum_indicadores.simce")
+            if res.data: return "\n- ".join([item["indicador"] for item in res.data[:20]])
+        except: pass
+        return ""
+
+    indicadores_texto = ""
+    if SUPABASE_URL and SUPABASE_KEY:
+        indicadores_texto = await _indicadores_supabase()
+    if not indicadores_texto: indicadores_texto = get_indicadores_locales(req.asignatura, req.nivel)
+    if not indicadores_texto: indicadores_texto = "Marco curricular nacional general."
+
+    async def generar_con_estimulo(idx, skills, n, a, ind_txt, est_obj, start_num):
+        bloque = await generar_un_bloque(idx, skills, n, a, ind_txt, [est_obj], start_num)
+        # Inyectar estímulo en la primera pregunta del bloque
+        if bloque.preguntas:
+            bloque.preguntas[0].estimulo_texto = est_obj.get("contenido_real") or bloque.contenido_estimulo
+            bloque.preguntas[0].estimulo_imagen = est_obj.get("imagen_adjunta") or bloque.ruta_local
+        return idx, bloque
+
+    # Resolver todos los estímulos antes de lanzar llamadas: si uno falla, no queda nada en vuelo
+    planes = []
+    for i in range((req.cantidad_preguntas + 4) // 5):
+        start = i * 5
+        block_skills = skills_pool[start:start+5]
+        if not block_skills: break
+        planes.append((i, block_skills, _get_random_stimulus(req.asignatura, req.nivel), 1 + start))
+
+    yield {
+        "evento": "inicio",
+        "asignatura": req.asignatura,
+        "nivel": req.nivel,
+        "cantidad_preguntas": req.cantidad_preguntas,
+        "bloques": len(planes),
+        "blueprint_resumen": str(distribucion_total)
+    }
 
-@router.post("/generate/download-cuadernillo")
-async def download_cuadernillo(req: DescargaCuadernilloRequest, current_user_id: Optional[str] = Depends(get_current_user_id_optional)):
+    tareas = []
+    por_indice: Dict[int, BloqueEnsayo] = {}
     try:
-        # 0. Unificar fuente de preguntas (si viene como plana o como bloques)
-        preguntas_finales = []
-        if req.preguntas:
-            preguntas_finales = req.preguntas
-        elif req.ensayo:
-            for b in req.ensayo:
-                preguntas_finales.extend(b.preguntas)
-        
-        if not preguntas_finales:
-            raise HTTPException(status_code=400, detail="No se encontraron preguntas para elevar al cuadernillo.")
-
-        # 1. Descubrimiento robusto de la Raíz del Proyecto
-        current_dir = Path(__file__).resolve()
-        while current_dir.name != 'backend' and current_dir.parent != current_dir:
-            current_dir = current_dir.parent
-        project_root = current_dir.parent # La carpeta principal PROFEIC_...
+        for i, block_skills, estimulo_bloque, start_num in planes:
+            tareas.append(asyncio.create_task(
+                generar_con_estimulo(i, block_skills, req.nivel, req.asignatura, indicadores_texto, estimulo_bloque, start_num)
+            ))
+        for terminada in asyncio.as_completed(tareas):
+            idx, bloque = await terminada
+            por_indice[idx] = bloque
+            yield {"evento": "bloque", "bloque": idx + 1, "progreso": f"{len(por_indice)}/{len(tareas)}", **bloque.model_dump()}
+    finally:
+        # Cliente desconectado o error: cancelar los bloques que sigan en vuelo
+        for t in tareas:
+            t.cancel()
+
+    ensayo_final = [por_indice[i] for i in sorted(por_indice)]
+    todas_las_preguntas = []
+    for b in ensayo_final: todas_las_preguntas.extend(b.preguntas)
+    
+    # Extraer primer estímulo como global (Compatibilidad Frontend)
+    est_global_txt = ensayo_final[0].preguntas[0].estimulo_texto if (ensayo_final and ensayo_final[0].preguntas) else None
+    est_global_img = ensayo_final[0].preguntas[0].estimulo_imagen if (ensayo_final and ensayo_final[0].preguntas) else None
+
+    resumen = SimceResponse(
+        titulo=f"Ensayo SIMCE — {req.asignatura} — {req.nivel}",
+        asignatura=req.asignatura,
+        nivel=req.nivel,
+        cantidad_preguntas=len(todas_las_preguntas),
+        modo=req.modo,
+        blueprint_resumen=str(distribucion_total),
+        estimulo_texto=est_global_txt,
+        estimulo_imagen=est_global_img,
+        ensayo=ensayo_final, 
+        preguntas=todas_las_preguntas
+    )
+    yield {"evento": "resumen", **resumen.model_dump()}
 
-        doc = Document()
-        tipo_doc = "Pauta Docente" if req.incluir_clave else "Cuadernillo del Alumno"
-        _add_profeic_header(doc, req.asignatura, req.nivel, tipo_doc)
 
-        h = doc.add_heading(req.titulo, level=1)
-        h.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        for run in h.runs: run.font.color.rgb = RGBColor(27, 60, 115)
+@router.post("/generate", response_model=SimceResponse)
+async def generar_simce(req: SimceRequest, current_user_id: Optional[str] = Depends(get_current_user_id_optional)):
+    try:
+        resumen: Dict[str, Any] = {}
+        async for evento in _pipeline_simce(req):
+            if evento["evento"] == "resumen":
+                resumen = evento
+        resumen.pop("evento")
+        return SimceResponse(**resumen)
+    except Exception as e:
+        print(traceback.format_exc()); raise HTTPException(status_code=500, detail=str(e))
 
-        p_sub = doc.add_paragraph(f"{'Simulación SIMCE' if req.modo == 'simce' else 'Ensayo Formativo'} · {req.nivel}")
-        p_sub.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        p_sub.runs[0].italic = True
 
-        # Nueva Estética SIMCE: Fuente base
-        doc.styles['Normal'].font.name = 'Calibri'
-        doc.styles['Normal'].font.size = Pt(11)
+@router.post("/generate/stream")
+async def generar_simce_stream(req: SimceRequest, request: Request, current_user_id: Optional[str] = Depends(get_current_user_id_optional)):
+    """
+    Igual que /generate, pero emite cada bloque (estímulo + preguntas) apenas termina y cierra con
+    un evento `resumen`. SSE con `Accept: text/event-stream`; si no, NDJSON.
+    """
+    return await respuesta_streaming(_pipeline_simce(req), sse=quiere_sse(request))
 
-        # 1.5 Estímulo GLOBAL (si se envía en el request)
-        if req.estimulo_imagen:
-            imagen_path = project_root / "frontend" / "public" / "imgs_estimulos" / req.estimulo_imagen
-            if imagen_path.exists():
+def _preguntas_cuadernillo(req: DescargaCuadernilloRequest) -> List[Pregunta]:
+    # Unificar fuente de preguntas (si viene como plana o como bloques)
+    if req.preguntas:
+        return req.preguntas
+    preguntas: List[Pregunta] = []
+    for b in req.ensayo or []:
+        preguntas.extend(b.preguntas)
+    return preguntas
+
+def docx_cuadernillo(req: DescargaCuadernilloRequest) -> bytes:
+    """Cuadernillo (o pauta, con `incluir_clave`) en DOCX; se ejecuta en el motor de render."""
+    preguntas_finales = _preguntas_cuadernillo(req)
+
+    # 1. Descubrimiento robusto de la Raíz del Proyecto
+    current_dir = Path(__file__).resolve()
+    while current_dir.name != 'backend' and current_dir.parent != current_dir:
+        current_dir = current_dir.parent
+    project_root = current_dir.parent # La carpeta principal PROFEIC_...
+
+    tipo_doc = "Pauta Docente" if req.incluir_clave else "Cuadernillo del Alumno"
+    doc = _documento_profeic(req.asignatura, req.nivel, tipo_doc)
+
+    h = doc.add_heading(req.titulo, level=1)
+    h.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    for run in h.runs: run.font.color.rgb = RGBColor(27, 60, 115)
+
+    p_sub = doc.add_paragraph(f"{'Simulación SIMCE' if req.modo == 'simce' else 'Ensayo Formativo'} · {req.nivel}")
+    p_sub.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    p_sub.runs[0].italic = True
+
+    # Nueva Estética SIMCE: Fuente base
+    doc.styles['Normal'].font.name = 'Calibri'
+    doc.styles['Normal'].font.size = Pt(11)
+
+    # 1.5 Estímulo GLOBAL (si se envía en el request)
+    if req.estimulo_imagen:
+        imagen_path = project_root / "frontend" / "public" / "imgs_estimulos" / req.estimulo_imagen
+        if imagen_path.exists():
+            p_img = doc.add_paragraph()
+            p_img.alignment = WD_ALIGN_PARAGRAPH.CENTER
+            r_img = p_img.add_run()
+            _add_image_safely(r_img, imagen_path, width=Inches(5.0))
+        else:
+            print(f"ERROR: Imagen global no encontrada en {imagen_path}")
+
+    if req.estimulo_texto:
+        t_est = doc.add_table(rows=1, cols=1)
+        t_est.style = "Table Grid"
+        cell = t_est.cell(0, 0)
+        cell.text = req.estimulo_texto
+        shading_elm = parse_xml(r'<w:shd {} w:fill="F2F2F2"/>'.format(nsdecls('w')))
+        cell._tc.get_or_add_tcPr().append(shading_elm)
+        doc.add_paragraph()
+
+    # 2. Impresión de Preguntas con Estímulos Intercalados
+    for p in preguntas_finales:
+        # A. DIAGRAMACIÓN MULTIMODAL (IMAGEN)
+        if p.estimulo_imagen:
+            # Búsqueda robusta basada en project_root
+            nombre_limpio = p.estimulo_imagen.replace("imgs/", "").replace("imgs_estimulos/", "")
+            ruta_img = project_root / "frontend" / "public" / "imgs_estimulos" / nombre_limpio
+            
+            if ruta_img.exists():
                 p_img = doc.add_paragraph()
                 p_img.alignment = WD_ALIGN_PARAGRAPH.CENTER
                 r_img = p_img.add_run()
-                _add_image_safely(r_img, imagen_path, width=Inches(5.0))
+                _add_image_safely(r_img, ruta_img, width=Inches(5.0))
+                doc.add_paragraph()
             else:
-                print(f"ERROR: Imagen global no encontrada en {imagen_path}")
+                print(f"ERROR: Imagen pregunta no encontrada en {ruta_img}")
 
-        if req.estimulo_texto:
+        # B. DIAGRAMACIÓN MULTIMODAL (RECUADRO GRIS TEXTO)
+        if p.estimulo_texto:
             t_est = doc.add_table(rows=1, cols=1)
             t_est.style = "Table Grid"
             cell = t_est.cell(0, 0)
-            cell.text = req.estimulo_texto
+            cell.text = p.estimulo_texto
             shading_elm = parse_xml(r'<w:shd {} w:fill="F2F2F2"/>'.format(nsdecls('w')))
             cell._tc.get_or_add_tcPr().append(shading_elm)
             doc.add_paragraph()
 
-        # 2. Impresión de Preguntas con Estímulos Intercalados
+        # C. IMPRESIÓN DE LA PREGUNTA
+        p_enun = doc.add_paragraph()
+        run_num = p_enun.add_run(f"{p.numero}. "); run_num.bold = True
+        p_enun.add_run(p.enunciado)
+        
+        # Habilidad badge (sutil)
+        p_hab = doc.add_paragraph()
+        run_hab = p_hab.add_run(f"   [{p.habilidad_medida}]")
+        run_hab.italic = True; run_hab.font.size = Pt(8); run_hab.font.color.rgb = RGBColor(120, 120, 120)
+
+        # Alternativas con sangría
+        for letra, alt_info in p.alternativas.items():
+            # Extraer texto si alt_info es un dict {"texto": "...", ...}
+            texto_final = alt_info.get("texto", str(alt_info)) if isinstance(alt_info, dict) else str(alt_info)
+            p_alt = doc.add_paragraph(f"{letra}) {texto_final}")
+            p_alt.paragraph_format.left_indent = Inches(0.5)
+            if req.incluir_clave and letra == p.correcta:
+                p_alt.runs[0].bold = True
+                p_alt.runs[0].font.color.rgb = RGBColor(0, 128, 0)
+        doc.add_paragraph()
+
+    if req.incluir_clave:
+        doc.add_page_break()
+        doc.add_heading("Pauta de Respuestas", level=1).alignment = WD_ALIGN_PARAGRAPH.CENTER
         for p in preguntas_finales:
-            # A. DIAGRAMACIÓN MULTIMODAL (IMAGEN)
-            if p.estimulo_imagen:
-                # Búsqueda robusta basada en project_root
-                nombre_limpio = p.estimulo_imagen.replace("imgs/", "").replace("imgs_estimulos/", "")
-                ruta_img = project_root / "frontend" / "public" / "imgs_estimulos" / nombre_limpio
-                
-                if ruta_img.exists():
-                    p_img = doc.add_paragraph()
-                    p_img.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                    r_img = p_img.add_run()
-                    _add_image_safely(r_img, ruta_img, width=Inches(5.0))
-                    doc.add_paragraph()
-                else:
-                    print(f"ERROR: Imagen pregunta no encontrada en {ruta_img}")
-
-            # B. DIAGRAMACIÓN MULTIMODAL (RECUADRO GRIS TEXTO)
-            if p.estimulo_texto:
-                t_est = doc.add_table(rows=1, cols=1)
-                t_est.style = "Table Grid"
-                cell = t_est.cell(0, 0)
-                cell.text = p.estimulo_texto
-                shading_elm = parse_xml(r'<w:shd {} w:fill="F2F2F2"/>'.format(nsdecls('w')))
-                cell._tc.get_or_add_tcPr().append(shading_elm)
-                doc.add_paragraph()
+            doc.add_paragraph(f"Pregunta {p.numero}: {p.correcta}").runs[0].bold = True
+            doc.add_paragraph(p.justificacion)
 
-            # C. IMPRESIÓN DE LA PREGUNTA
-            p_enun = doc.add_paragraph()
-            run_num = p_enun.add_run(f"{p.numero}. "); run_num.bold = True
-            p_enun.add_run(p.enunciado)
-            
-            # Habilidad badge (sutil)
-            p_hab = doc.add_paragraph()
-            run_hab = p_hab.add_run(f"   [{p.habilidad_medida}]")
-            run_hab.italic = True; run_hab.font.size = Pt(8); run_hab.font.color.rgb = RGBColor(120, 120, 120)
-
-            # Alternativas con sangría
-            for letra, alt_info in p.alternativas.items():
-                # Extraer texto si alt_info es un dict {"texto": "...", ...}
-                texto_final = alt_info.get("texto", str(alt_info)) if isinstance(alt_info, dict) else str(alt_info)
-                p_alt = doc.add_paragraph(f"{letra}) {texto_final}")
-                p_alt.paragraph_format.left_indent = Inches(0.5)
-                if req.incluir_clave and letra == p.correcta:
-                    p_alt.runs[0].bold = True
-                    p_alt.runs[0].font.color.rgb = RGBColor(0, 128, 0)
-            doc.add_paragraph()
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
 
-        if req.incluir_clave:
-            doc.add_page_break()
-            doc.add_heading("Pauta de Respuestas", level=1).alignment = WD_ALIGN_PARAGRAPH.CENTER
-            for p in preguntas_finales:
-                doc.add_paragraph(f"Pregunta {p.numero}: {p.correcta}").runs[0].bold = True
-                doc.add_paragraph(p.justificacion)
+@router.post("/generate/download-cuadernillo")
+async def download_cuadernillo(req: DescargaCuadernilloRequest, current_user_id: Optional[str] = Depends(get_current_user_id_optional)):
+    try:
+        if not _preguntas_cuadernillo(req):
+            raise HTTPException(status_code=400, detail="No se encontraron preguntas para elevar al cuadernillo.")
 
-        buf = io.BytesIO()
-        doc.save(buf)
-        buf.seek(0)
+        buf = io.BytesIO(await motor_render.renderizar_async(docx_cuadernillo, req, nombre="simce.cuadernillo"))
         return StreamingResponse(buf, media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document", headers=_docx_headers(f"Cuadernillo_{req.asignatura}.docx"))
     except Exception as e:
         import traceback
@@ -675,7 +710,17 @@ async def download_cuadernillo(req: DescargaCuadernilloRequest, current_user_id:
         raise HTTPException(status_code=500, detail=str(e))
 
 import uuid
-from services.omr_template_service import OMRTemplateGenerator
+from services.simce_lote import (
+    MAX_ALUMNOS_LOTE, documentos_omr, hoja_omr_pdf, nomina_csv, nombre_archivo, zip_ensayo
+)
+
+PAGINA_ALUMNOS = 1000
+
+def _logo_omr() -> Optional[str]:
+    logo_path = _ASSETS_DIR / "logo_profeic.svg.png"
+    if not logo_path.exists():
+        logo_path = _ASSETS_DIR / "logo.png"
+    return str(logo_path) if logo_path.exists() else None
 
 @router.post("/generate/download-omr")
 async def download_omr(req: DescargaOMRRequest, current_user_id: Optional[str] = Depends(get_current_user_id_optional)):
@@ -683,20 +728,9 @@ async def download_omr(req: DescargaOMRRequest, current_user_id: Optional[str] =
         # Generar un ID único para personalizar el código QR de esta descarga
         eval_id = f"SIMCE-{uuid.uuid4().hex[:8].upper()}"
         
-        generator = OMRTemplateGenerator()
-        buf = io.BytesIO()
-        
-        logo_path = _ASSETS_DIR / "logo_profeic.svg.png"
-        if not logo_path.exists():
-            logo_path = _ASSETS_DIR / "logo.png"
-            
-        if not logo_path.exists():
-            logo_path = None
-        else:
-            logo_path = str(logo_path)
-            
-        generator.generate_pdf(buf, eval_id, num_questions=req.cantidad_preguntas, logo_path=logo_path)
-        buf.seek(0)
+        buf = io.BytesIO(await motor_render.renderizar_async(
+            hoja_omr_pdf, eval_id, None, req.cantidad_preguntas, _logo_omr(), nombre="simce.omr"
+        ))
         
         return StreamingResponse(
             buf,
@@ -707,3 +741,80 @@ async def download_omr(req: DescargaOMRRequest, current_user_id: Optional[str] =
             }
         )
     except Exception as e: raise HTTPException(status_code=500, detail=str(e))
+
+async def _cursos_con_alumnos(user_id: str, nivel: str, course_ids: Optional[List[str]]) -> List[Dict[str, Any]]:
+    """Cursos del colegio del usuario (los pedidos, o todos los del nivel) con su nómina ordenada por apellido."""
+    supabase = cliente_service()
+    if supabase is None:
+        raise HTTPException(status_code=503, detail="Base de datos no configurada.")
+
+    perfil = await ejecutar(supabase.table("profiles").select("school_id").eq("id", user_id).maybe_single(), "profiles.school_id")
+    school_id = (perfil.data or {}).get("school_id") if perfil else None
+    if not school_id:
+        raise HTTPException(status_code=400, detail="El usuario no tiene un colegio asociado.")
+
+    consulta = supabase.table("courses").select("id, nivel, letra").eq("school_id", school_id)
+    consulta = consulta.in_("id", course_ids) if course_ids else consulta.eq("nivel", nivel)
+    cursos = (await ejecutar(consulta.order("letra"), "courses.lote_simce")).data or []
+    if not cursos:
+        raise HTTPException(status_code=404, detail="No hay cursos para generar el ensayo.")
+
+    # PostgREST corta cada respuesta en 1000 filas: se pagina (orden total, para que las páginas no se solapen)
+    # hasta leer toda la nómina o pasar el máximo del lote, que el endpoint rechaza con 413
+    alumnos: List[Dict[str, Any]] = []
+    while len(alumnos) <= MAX_ALUMNOS_LOTE:
+        pagina = (await ejecutar(
+            supabase.table("students").select("rut, nombres, apellidos, course_id")
+            .in_("course_id", [c["id"] for c in cursos]).order("apellidos").order("nombres").order("rut")
+            .range(len(alumnos), len(alumnos) + PAGINA_ALUMNOS - 1),
+            "students.lote_simce"
+        )).data or []
+        alumnos.extend(pagina)
+        if len(pagina) < PAGINA_ALUMNOS:
+            break
+
+    nombres = {c["id"]: f"{c['nivel']} {c['letra']}" for c in cursos}
+    por_curso: Dict[str, List[Dict[str, str]]] = {c["id"]: [] for c in cursos}
+    for s in alumnos:
+        por_curso[s["course_id"]].append({
+            "rut": s["rut"],
+            "nombre": f"{s['nombres']} {s['apellidos']}".strip(),
+            "curso": nombres[s["course_id"]]
+        })
+    return [{"nombre": nombres[c["id"]], "alumnos": por_curso[c["id"]]} for c in cursos]
+
+@router.post("/generate/download-lote")
+async def download_lote(req: DescargaLoteRequest, user_id: str = Depends(get_current_user_id)):
+    """
+    ZIP con una hoja OMR personalizada por alumno (nombre, curso, RUT en burbujas y QR) de los cursos
+    pedidos, o de todos los cursos del nivel; más cuadernillo y pauta si se envía `cuadernillo`.
+    Se genera en el pool de procesos y se transmite a medida que se escribe.
+    """
+    cursos = await _cursos_con_alumnos(user_id, req.nivel, req.course_ids)
+    total = sum(len(c["alumnos"]) for c in cursos)
+    if total == 0:
+        raise HTTPException(status_code=404, detail="Los cursos seleccionados no tienen estudiantes.")
+    if total > MAX_ALUMNOS_LOTE:
+        raise HTTPException(status_code=413, detail=f"El lote supera el máximo de {MAX_ALUMNOS_LOTE} estudiantes.")
+
+    eval_id = req.evaluation_id or f"SIMCE-{uuid.uuid4().hex[:8].upper()}"
+    documentos = []
+    if req.cuadernillo and _preguntas_cuadernillo(req.cuadernillo):
+        alumno = req.cuadernillo.model_copy(update={"incluir_clave": False})
+        pauta = req.cuadernillo.model_copy(update={"incluir_clave": True})
+        documentos.append((f"Cuadernillo_{nombre_archivo(req.asignatura)}.docx", docx_cuadernillo, (alumno,)))
+        documentos.append((f"Pauta_Docente_{nombre_archivo(req.asignatura)}.docx", docx_cuadernillo, (pauta,)))
+
+    def todos():
+        yield from documentos
+        yield from documentos_omr(eval_id, cursos, req.cantidad_preguntas, _logo_omr(), req.agrupar)
+
+    filename = f"Ensayo_SIMCE_{req.asignatura}_{req.nivel}_{eval_id}.zip"
+    headers = _docx_headers(filename)
+    headers["X-Evaluation-Id"] = eval_id
+    headers["Access-Control-Expose-Headers"] = "Content-Disposition, X-Evaluation-Id"
+    return StreamingResponse(
+        zip_ensayo(todos(), extras=[("nomina.csv", nomina_csv(eval_id, cursos))]),
+        media_type="application/zip",
+        headers=headers
+    )
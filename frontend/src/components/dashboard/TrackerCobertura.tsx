@@ -9,12 +9,11 @@ import { LogroBanner, TipoLogro } from "@/components/dashboard/LogroBanner";
 import { useAuth } from "@/contexts/AuthContext";
 
 interface CoberturaRecord {
-    id: string;
     nivel: string;
     asignatura: string;
     oa_id: string;
     tipo_recurso: string;
-    created_at: string;
+    recursos?: number;
 }
 
 interface OA {
@@ -30,6 +29,8 @@ export function TrackerCobertura() {
 
     // Lista cruda de la base de datos de cobertura
     const [records, setRecords] = useState<CoberturaRecord[]>([]);
+    // null hasta la primera carga; false si el índice aún no existe y se lee la tabla cruda
+    const [usaIndice, setUsaIndice] = useState<boolean | null>(null);
 
     // Cursos detectados (Combinación Nivel + Asignatura)
     const [courses, setCourses] = useState<{ nivel: string; asignatura: string }[]>([]);
@@ -56,16 +57,27 @@ export function TrackerCobertura() {
         }
 
         setLoadingRecords(true);
-        const { data, error } = await supabase
-            .from("cobertura_curricular")
-            .select("*")
-            .eq("user_id", userId);
+        // Contadores por OA mantenidos al guardar cada recurso (una fila por OA y tipo, no por recurso)
+        const indice = await supabase
+            .from("indice_cobertura_oa")
+            .select("nivel, asignatura, oa_id, tipo_recurso, recursos")
+            .eq("ambito", "usuario")
+            .eq("ambito_id", userId);
+        // Si el índice aún no existe en este entorno, leer la tabla cruda
+        const { data, error } = indice.error
+            ? await supabase
+                .from("cobertura_curricular")
+                .select("nivel, asignatura, oa_id, tipo_recurso")
+                .eq("user_id", userId)
+            : indice;
+        setUsaIndice(!indice.error);
 
         if (data && !error) {
-            setRecords(data);
+            const rows: CoberturaRecord[] = data;
+            setRecords(rows);
 
             const uniqueCoursesMap = new Map();
-            data.forEach(r => {
+            rows.forEach(r => {
                 const key = `${r.nivel}|||${r.asignatura}`;
                 if (!uniqueCoursesMap.has(key)) {
                     uniqueCoursesMap.set(key, { nivel: r.nivel, asignatura: r.asignatura });
@@ -90,22 +102,28 @@ export function TrackerCobertura() {
         }
     }, [userId]);
 
-    // Bug fix: userId como dependencia + suscripción en tiempo real
+    // Bug fix: userId como dependencia
     useEffect(() => {
         fetchCoverage();
+    }, [fetchCoverage]);
 
-        if (!userId) return;
+    // Suscripción en tiempo real a una sola tabla: el índice si existe, si no la tabla cruda
+    useEffect(() => {
+        if (!userId || usaIndice === null) return;
+        const [table, filter] = usaIndice
+            ? ['indice_cobertura_oa', `ambito_id=eq.${userId}`]
+            : ['cobertura_curricular', `user_id=eq.${userId}`];
         const channel = supabase
             .channel(`cobertura-${userId}`)
             .on(
                 'postgres_changes',
-                { event: '*', schema: 'public', table: 'cobertura_curricular', filter: `user_id=eq.${userId}` },
+                { event: '*', schema: 'public', table, filter },
                 () => { fetchCoverage(); }
             )
             .subscribe();
 
         return () => { supabase.removeChannel(channel); };
-    }, [userId, fetchCoverage]);
+    }, [userId, usaIndice, fetchCoverage]);
 
     // Cada vez que cambia el curso seleccionado, traer OAs oficiales
     useEffect(() => {
@@ -0,0 +1,67 @@
+-- MIGRATION: Resumen agregado del Motor de Conducción Preventiva
+-- Fecha: 2026-06-02
+-- Descripción: Una fila pequeña por (periodo, corte, curso, asignatura) con las cifras que
+-- leen los gráficos de evolución y el desglose por curso. El backend la recalcula solo
+-- cuando una ingesta o una validación HITL toca esa clave, de modo que /motor/evolucion y
+-- /motor/evolucion/cursos ya no descargan los JSONB completos de motor_conduccion_preventiva.
+
+-- 1. Tabla de resumen
+CREATE TABLE IF NOT EXISTS public.motor_resumen_agregado (
+    id SERIAL PRIMARY KEY,
+    periodo_id VARCHAR(10) NOT NULL,
+    corte_temporal VARCHAR(50) DEFAULT 'General' NOT NULL,
+    curso_id VARCHAR(20) NOT NULL,
+    asignatura VARCHAR(255) NOT NULL,
+    promedio NUMERIC(4, 2) NOT NULL DEFAULT 0,
+    aprobacion NUMERIC(5, 2) NOT NULL DEFAULT 0,
+    atrasos INT NOT NULL DEFAULT 0,
+    alumnos_riesgo INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    CONSTRAINT unique_resumen_periodo_corte_curso_asig UNIQUE (periodo_id, corte_temporal, curso_id, asignatura)
+);
+
+CREATE INDEX IF NOT EXISTS idx_mra_periodo_curso_asig ON public.motor_resumen_agregado (periodo_id, curso_id, asignatura);
+
+-- 2. Poblar con los registros ya existentes (mismas reglas que motor_agregados.resumen_registro)
+INSERT INTO public.motor_resumen_agregado (periodo_id, corte_temporal, curso_id, asignatura, promedio, aprobacion, atrasos, alumnos_riesgo)
+SELECT
+    m.periodo_id,
+    m.corte_temporal,
+    m.curso_id,
+    m.asignatura,
+    COALESCE((m.datos_academicos->>'promedio_general')::numeric, 0),
+    COALESCE((m.datos_academicos->>'porcentaje_aprobacion')::numeric, 0),
+    COALESCE(
+        NULLIF((m.datos_convivencia->>'minutos_atraso_acumulados')::numeric, 0),
+        NULLIF((SELECT SUM(v::numeric) FROM jsonb_each_text(COALESCE(m.datos_convivencia->'atrasos_por_rut', '{}'::jsonb)) AS t(k, v)), 0),
+        (SELECT SUM(COALESCE((d->>'atraso_minutos')::numeric, 0)) FROM jsonb_array_elements(COALESCE(m.datos_convivencia->'alumnos_doble_riesgo_detalle', '[]'::jsonb)) AS d),
+        0
+    )::int,
+    COALESCE(
+        NULLIF(jsonb_array_length(COALESCE(m.datos_convivencia->'alumnos_doble_riesgo', '[]'::jsonb)), 0),
+        jsonb_array_length(COALESCE(m.datos_convivencia->'alumnos_doble_riesgo_detalle', '[]'::jsonb))
+    )
+FROM public.motor_conduccion_preventiva m
+ON CONFLICT (periodo_id, corte_temporal, curso_id, asignatura) DO NOTHING;
+
+-- 3. Seguridad (RLS): lectura para autenticados, escritura para roles directivos
+ALTER TABLE public.motor_resumen_agregado ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Allow select for authenticated on motor_resumen_agregado" ON public.motor_resumen_agregado;
+CREATE POLICY "Allow select for authenticated on motor_resumen_agregado"
+ON public.motor_resumen_agregado
+FOR SELECT
+TO authenticated
+USING (true);
+
+DROP POLICY IF EXISTS "Allow manage for coordinators and directores on motor_resumen_agregado" ON public.motor_resumen_agregado;
+CREATE POLICY "Allow manage for coordinators and directores on motor_resumen_agregado"
+ON public.motor_resumen_agregado
+FOR ALL
+TO authenticated
+USING (
+    EXISTS (
+        SELECT 1 FROM public.authorized_users
+        WHERE email = auth.email() AND role IN ('admin', 'director', 'utp', 'coordinador')
+    )
+);
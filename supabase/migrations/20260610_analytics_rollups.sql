@@ -0,0 +1,178 @@
+-- MIGRATION: Rollups diarios de analítica de producto
+-- Fecha: 2026-06-10
+-- Descripción: calculate_global_stats (/telemetry/analytics y /admin/stats) descargaba hasta
+-- 100.000 filas de telemetry_events y todo biblioteca_recursos para agregarlas en Python en
+-- cada petición. Ahora cada evento o recurso suma en una fila diaria por (email, módulo,
+-- fuente) mediante triggers, y el backend solo lee analytics_resumen(desde): una fila por
+-- (email, módulo, fuente), cuyo tamaño no crece con la telemetría.
+
+-- 1. Reglas compartidas con routers/analytics_service.py
+CREATE OR REPLACE FUNCTION public.analytics_modulo_evento(modulo TEXT)
+RETURNS TEXT LANGUAGE sql IMMUTABLE AS $$
+    -- Último segmento de la ruta, con guiones en vez de guiones bajos
+    SELECT replace(regexp_replace(COALESCE(NULLIF(modulo, ''), 'unknown'), '^.*/', ''), '_', '-')
+$$;
+
+CREATE OR REPLACE FUNCTION public.analytics_modulo_recurso(tipo TEXT)
+RETURNS TEXT LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE upper(COALESCE(tipo, ''))
+        WHEN 'PLANIFICACION' THEN 'planificador'
+        WHEN 'RUBRICA' THEN 'rubricas'
+        WHEN 'EVALUACION' THEN 'evaluaciones'
+        WHEN 'AUDITORIA' THEN 'analizador'
+        WHEN 'LECTURA' THEN 'lectura-inteligente'
+        WHEN 'ESTRATEGIA' THEN 'nee'
+        WHEN 'ELEVADOR' THEN 'elevador'
+        WHEN 'SIMCE' THEN 'simce'
+        WHEN 'OMR' THEN 'omr'
+        ELSE 'unknown'
+    END
+$$;
+
+CREATE OR REPLACE FUNCTION public.analytics_es_exito(evento TEXT)
+RETURNS BOOLEAN LANGUAGE sql IMMUTABLE AS $$
+    SELECT lower(COALESCE(evento, '')) ~ '(success|generar|export)'
+$$;
+
+-- 2. Tabla de rollups
+CREATE TABLE IF NOT EXISTS public.analytics_rollup_diario (
+    dia DATE NOT NULL,
+    email TEXT NOT NULL DEFAULT 'anonymous',
+    modulo TEXT NOT NULL DEFAULT 'unknown',
+    fuente TEXT NOT NULL CHECK (fuente IN ('evento', 'recurso')),
+    total INT NOT NULL DEFAULT 0,
+    page_views INT NOT NULL DEFAULT 0,
+    exitos INT NOT NULL DEFAULT 0,
+    regeneraciones INT NOT NULL DEFAULT 0,
+    ultima_actividad TIMESTAMPTZ,
+    PRIMARY KEY (dia, email, modulo, fuente)
+);
+
+CREATE INDEX IF NOT EXISTS idx_analytics_rollup_email ON public.analytics_rollup_diario (email);
+
+-- 3. Poblar con la historia existente (mismas reglas que los triggers)
+INSERT INTO public.analytics_rollup_diario (dia, email, modulo, fuente, total, page_views, exitos, regeneraciones, ultima_actividad)
+SELECT
+    (COALESCE(e.created_at, NOW()) AT TIME ZONE 'utc')::date,
+    COALESCE(NULLIF(e.email, ''), 'anonymous'),
+    public.analytics_modulo_evento(e.module),
+    'evento',
+    COUNT(*),
+    COUNT(*) FILTER (WHERE e.event_name = 'page_view'),
+    COUNT(*) FILTER (WHERE public.analytics_es_exito(e.event_name)),
+    COUNT(*) FILTER (WHERE e.event_name = 'regenerate_question'),
+    MAX(e.created_at)
+FROM public.telemetry_events e
+GROUP BY 1, 2, 3
+ON CONFLICT (dia, email, modulo, fuente) DO NOTHING;
+
+INSERT INTO public.analytics_rollup_diario (dia, email, modulo, fuente, total, ultima_actividad)
+SELECT
+    (COALESCE(b.created_at, NOW()) AT TIME ZONE 'utc')::date,
+    COALESCE(NULLIF(p.email, ''), 'anonymous'),
+    public.analytics_modulo_recurso(b.tipo),
+    'recurso',
+    COUNT(*),
+    MAX(b.created_at)
+FROM public.biblioteca_recursos b
+LEFT JOIN public.profiles p ON p.id = b.user_id
+GROUP BY 1, 2, 3
+ON CONFLICT (dia, email, modulo, fuente) DO NOTHING;
+
+-- 4. Mantenimiento incremental
+CREATE OR REPLACE FUNCTION public.analytics_rollup_evento()
+RETURNS TRIGGER LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+BEGIN
+    INSERT INTO public.analytics_rollup_diario AS r (dia, email, modulo, fuente, total, page_views, exitos, regeneraciones, ultima_actividad)
+    VALUES (
+        (COALESCE(NEW.created_at, NOW()) AT TIME ZONE 'utc')::date,
+        COALESCE(NULLIF(NEW.email, ''), 'anonymous'),
+        public.analytics_modulo_evento(NEW.module),
+        'evento',
+        1,
+        (NEW.event_name = 'page_view')::int,
+        public.analytics_es_exito(NEW.event_name)::int,
+        (NEW.event_name = 'regenerate_question')::int,
+        NEW.created_at
+    )
+    ON CONFLICT (dia, email, modulo, fuente) DO UPDATE SET
+        total = r.total + EXCLUDED.total,
+        page_views = r.page_views + EXCLUDED.page_views,
+        exitos = r.exitos + EXCLUDED.exitos,
+        regeneraciones = r.regeneraciones + EXCLUDED.regeneraciones,
+        ultima_actividad = GREATEST(r.ultima_actividad, EXCLUDED.ultima_actividad);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_analytics_rollup_evento ON public.telemetry_events;
+CREATE TRIGGER trg_analytics_rollup_evento
+AFTER INSERT ON public.telemetry_events
+FOR EACH ROW EXECUTE FUNCTION public.analytics_rollup_evento();
+
+CREATE OR REPLACE FUNCTION public.analytics_rollup_recurso()
+RETURNS TRIGGER LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+DECLARE
+    fila public.biblioteca_recursos%ROWTYPE;
+    delta INT;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        fila := OLD;
+        delta := -1;
+    ELSE
+        fila := NEW;
+        delta := 1;
+    END IF;
+
+    INSERT INTO public.analytics_rollup_diario AS r (dia, email, modulo, fuente, total, ultima_actividad)
+    VALUES (
+        (COALESCE(fila.created_at, NOW()) AT TIME ZONE 'utc')::date,
+        COALESCE((SELECT NULLIF(p.email, '') FROM public.profiles p WHERE p.id = fila.user_id), 'anonymous'),
+        public.analytics_modulo_recurso(fila.tipo),
+        'recurso',
+        delta,
+        CASE WHEN delta > 0 THEN fila.created_at END
+    )
+    ON CONFLICT (dia, email, modulo, fuente) DO UPDATE SET
+        total = r.total + EXCLUDED.total,
+        ultima_actividad = GREATEST(r.ultima_actividad, EXCLUDED.ultima_actividad);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_analytics_rollup_recurso ON public.biblioteca_recursos;
+CREATE TRIGGER trg_analytics_rollup_recurso
+AFTER INSERT OR DELETE ON public.biblioteca_recursos
+FOR EACH ROW EXECUTE FUNCTION public.analytics_rollup_recurso();
+
+-- 5. API de consulta: totales por (email, módulo, fuente) desde un día (NULL = todo el historial)
+CREATE OR REPLACE FUNCTION public.analytics_resumen(desde DATE DEFAULT NULL)
+RETURNS TABLE (
+    email TEXT,
+    modulo TEXT,
+    fuente TEXT,
+    total BIGINT,
+    page_views BIGINT,
+    exitos BIGINT,
+    regeneraciones BIGINT,
+    ultima_actividad TIMESTAMPTZ
+)
+LANGUAGE sql STABLE AS $$
+    SELECT r.email, r.modulo, r.fuente,
+           SUM(r.total), SUM(r.page_views), SUM(r.exitos), SUM(r.regeneraciones),
+           MAX(r.ultima_actividad)
+    FROM public.analytics_rollup_diario r
+    WHERE desde IS NULL OR r.dia >= desde
+    GROUP BY r.email, r.modulo, r.fuente
+    ORDER BY r.email, r.modulo, r.fuente
+$$;
+
+-- 6. Seguridad (RLS): igual que telemetry_events, solo el super admin lee; el backend usa service role
+ALTER TABLE public.analytics_rollup_diario ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Only re.se.alvarez@gmail.com can view analytics rollups" ON public.analytics_rollup_diario;
+CREATE POLICY "Only re.se.alvarez@gmail.com can view analytics rollups"
+ON public.analytics_rollup_diario
+FOR SELECT
+TO authenticated
+USING (auth.jwt() ->> 'email' = 're.se.alvarez@gmail.com');
@@ -0,0 +1,226 @@
+-- MIGRATION: Índice incremental de cobertura curricular y uso de la biblioteca
+-- Fecha: 2026-06-15
+-- Descripción: /dashboard/insights descargaba los 50 últimos `contenido` completos de
+-- biblioteca_recursos en cada petición y re-parseaba el JSON para la distribución DOK, y el
+-- tracker de cobertura leía todas las filas de cobertura_curricular del docente. Ahora cada
+-- recurso guardado (o borrado) suma en contadores por docente y por colegio mediante
+-- triggers, y los dashboards leen solo esas filas:
+--   indice_uso_recursos:  (ámbito, nivel, asignatura, tipo)        → recursos, dok1..3, última actividad
+--   indice_cobertura_oa:  (ámbito, nivel, asignatura, OA, tipo)    → recursos, última fecha
+-- Además guardar_recurso_con_cobertura() hace en un solo viaje el insert del recurso y de sus OAs.
+
+-- 1. Reglas compartidas con app/services/indice_cobertura.py
+CREATE OR REPLACE FUNCTION public.indice_dok(tipo TEXT, contenido JSONB)
+RETURNS INT[] LANGUAGE plpgsql IMMUTABLE AS $$
+DECLARE
+    c JSONB := contenido;
+    dist JSONB;
+BEGIN
+    -- Solo las evaluaciones declaran distribución DOK (contenido.config.dokDistribution)
+    IF upper(COALESCE(tipo, '')) <> 'EVALUACION' OR c IS NULL THEN
+        RETURN ARRAY[0, 0, 0];
+    END IF;
+    -- Algunos clientes guardaron el contenido como string JSON
+    IF jsonb_typeof(c) = 'string' THEN
+        c := (c #>> '{}')::jsonb;
+    END IF;
+    dist := c -> 'config' -> 'dokDistribution';
+    RETURN ARRAY[
+        COALESCE((dist ->> 'dok1')::numeric, 0)::int,
+        COALESCE((dist ->> 'dok2')::numeric, 0)::int,
+        COALESCE((dist ->> 'dok3')::numeric, 0)::int
+    ];
+EXCEPTION WHEN others THEN
+    RETURN ARRAY[0, 0, 0];
+END;
+$$;
+
+-- 2. Tablas de contadores (ambito = 'usuario' con el id del docente, o 'colegio' con su school_id)
+CREATE TABLE IF NOT EXISTS public.indice_uso_recursos (
+    ambito TEXT NOT NULL CHECK (ambito IN ('usuario', 'colegio')),
+    ambito_id UUID NOT NULL,
+    nivel TEXT NOT NULL DEFAULT '',
+    asignatura TEXT NOT NULL DEFAULT '',
+    tipo TEXT NOT NULL DEFAULT '',
+    recursos INT NOT NULL DEFAULT 0,
+    dok1 INT NOT NULL DEFAULT 0,
+    dok2 INT NOT NULL DEFAULT 0,
+    dok3 INT NOT NULL DEFAULT 0,
+    ultima_actividad TIMESTAMPTZ,
+    PRIMARY KEY (ambito, ambito_id, nivel, asignatura, tipo)
+);
+
+CREATE TABLE IF NOT EXISTS public.indice_cobertura_oa (
+    ambito TEXT NOT NULL CHECK (ambito IN ('usuario', 'colegio')),
+    ambito_id UUID NOT NULL,
+    nivel TEXT NOT NULL,
+    asignatura TEXT NOT NULL,
+    oa_id TEXT NOT NULL,
+    tipo_recurso TEXT NOT NULL DEFAULT '',
+    recursos INT NOT NULL DEFAULT 0,
+    ultima_fecha TIMESTAMPTZ,
+    PRIMARY KEY (ambito, ambito_id, nivel, asignatura, oa_id, tipo_recurso)
+);
+
+-- 3. Poblar con la historia existente (mismas reglas que los triggers)
+INSERT INTO public.indice_uso_recursos (ambito, ambito_id, nivel, asignatura, tipo, recursos, dok1, dok2, dok3, ultima_actividad)
+SELECT a.ambito, a.ambito_id, COALESCE(b.nivel, ''), COALESCE(b.asignatura, ''), COALESCE(b.tipo, ''),
+       COUNT(*),
+       SUM((public.indice_dok(b.tipo, b.contenido))[1]),
+       SUM((public.indice_dok(b.tipo, b.contenido))[2]),
+       SUM((public.indice_dok(b.tipo, b.contenido))[3]),
+       MAX(b.created_at)
+FROM public.biblioteca_recursos b
+LEFT JOIN public.profiles p ON p.id = b.user_id
+CROSS JOIN LATERAL (VALUES ('usuario', b.user_id), ('colegio', p.school_id)) AS a(ambito, ambito_id)
+WHERE a.ambito_id IS NOT NULL
+GROUP BY 1, 2, 3, 4, 5
+ON CONFLICT (ambito, ambito_id, nivel, asignatura, tipo) DO NOTHING;
+
+INSERT INTO public.indice_cobertura_oa (ambito, ambito_id, nivel, asignatura, oa_id, tipo_recurso, recursos, ultima_fecha)
+SELECT a.ambito, a.ambito_id, c.nivel, c.asignatura, c.oa_id, COALESCE(c.tipo_recurso, ''), COUNT(*), MAX(c.fecha)
+FROM public.cobertura_curricular c
+LEFT JOIN public.profiles p ON p.id = c.user_id
+CROSS JOIN LATERAL (VALUES ('usuario', c.user_id), ('colegio', p.school_id)) AS a(ambito, ambito_id)
+WHERE a.ambito_id IS NOT NULL
+GROUP BY 1, 2, 3, 4, 5, 6
+ON CONFLICT (ambito, ambito_id, nivel, asignatura, oa_id, tipo_recurso) DO NOTHING;
+
+-- 4. Mantenimiento incremental (un borrado resta; los contadores en cero se eliminan)
+CREATE OR REPLACE FUNCTION public.indice_uso_trigger()
+RETURNS TRIGGER LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+DECLARE
+    fila public.biblioteca_recursos%ROWTYPE;
+    delta INT;
+    dok INT[];
+    colegio UUID;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        fila := OLD;
+        delta := -1;
+    ELSE
+        fila := NEW;
+        delta := 1;
+    END IF;
+    dok := public.indice_dok(fila.tipo, fila.contenido);
+    SELECT p.school_id INTO colegio FROM public.profiles p WHERE p.id = fila.user_id;
+
+    INSERT INTO public.indice_uso_recursos AS r (ambito, ambito_id, nivel, asignatura, tipo, recursos, dok1, dok2, dok3, ultima_actividad)
+    SELECT a.ambito, a.ambito_id, COALESCE(fila.nivel, ''), COALESCE(fila.asignatura, ''), COALESCE(fila.tipo, ''),
+           delta, delta * dok[1], delta * dok[2], delta * dok[3],
+           CASE WHEN delta > 0 THEN COALESCE(fila.created_at, NOW()) END
+    FROM (VALUES ('usuario', fila.user_id), ('colegio', colegio)) AS a(ambito, ambito_id)
+    WHERE a.ambito_id IS NOT NULL
+    ON CONFLICT (ambito, ambito_id, nivel, asignatura, tipo) DO UPDATE SET
+        recursos = r.recursos + EXCLUDED.recursos,
+        dok1 = r.dok1 + EXCLUDED.dok1,
+        dok2 = r.dok2 + EXCLUDED.dok2,
+        dok3 = r.dok3 + EXCLUDED.dok3,
+        ultima_actividad = GREATEST(r.ultima_actividad, EXCLUDED.ultima_actividad);
+
+    IF delta < 0 THEN
+        DELETE FROM public.indice_uso_recursos r
+        WHERE r.recursos <= 0
+          AND ((r.ambito = 'usuario' AND r.ambito_id = fila.user_id) OR (r.ambito = 'colegio' AND r.ambito_id = colegio));
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_indice_uso ON public.biblioteca_recursos;
+CREATE TRIGGER trg_indice_uso
+AFTER INSERT OR DELETE ON public.biblioteca_recursos
+FOR EACH ROW EXECUTE FUNCTION public.indice_uso_trigger();
+
+-- cobertura_curricular cae en cascada al borrar el recurso: su trigger resta los OAs
+CREATE OR REPLACE FUNCTION public.indice_cobertura_trigger()
+RETURNS TRIGGER LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+DECLARE
+    fila public.cobertura_curricular%ROWTYPE;
+    delta INT;
+    colegio UUID;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        fila := OLD;
+        delta := -1;
+    ELSE
+        fila := NEW;
+        delta := 1;
+    END IF;
+    SELECT p.school_id INTO colegio FROM public.profiles p WHERE p.id = fila.user_id;
+
+    INSERT INTO public.indice_cobertura_oa AS r (ambito, ambito_id, nivel, asignatura, oa_id, tipo_recurso, recursos, ultima_fecha)
+    SELECT a.ambito, a.ambito_id, fila.nivel, fila.asignatura, fila.oa_id, COALESCE(fila.tipo_recurso, ''),
+           delta, CASE WHEN delta > 0 THEN COALESCE(fila.fecha, NOW()) END
+    FROM (VALUES ('usuario', fila.user_id), ('colegio', colegio)) AS a(ambito, ambito_id)
+    WHERE a.ambito_id IS NOT NULL
+    ON CONFLICT (ambito, ambito_id, nivel, asignatura, oa_id, tipo_recurso) DO UPDATE SET
+        recursos = r.recursos + EXCLUDED.recursos,
+        ultima_fecha = GREATEST(r.ultima_fecha, EXCLUDED.ultima_fecha);
+
+    IF delta < 0 THEN
+        DELETE FROM public.indice_cobertura_oa r
+        WHERE r.recursos <= 0
+          AND ((r.ambito = 'usuario' AND r.ambito_id = fila.user_id) OR (r.ambito = 'colegio' AND r.ambito_id = colegio));
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_indice_cobertura ON public.cobertura_curricular;
+CREATE TRIGGER trg_indice_cobertura
+AFTER INSERT OR DELETE ON public.cobertura_curricular
+FOR EACH ROW EXECUTE FUNCTION public.indice_cobertura_trigger();
+
+-- 5. Guardado en un solo viaje: recurso + sus OAs, en la misma transacción
+CREATE OR REPLACE FUNCTION public.guardar_recurso_con_cobertura(registro JSONB, oas TEXT[] DEFAULT '{}')
+RETURNS UUID LANGUAGE plpgsql AS $$
+DECLARE
+    nuevo_id UUID;
+BEGIN
+    INSERT INTO public.biblioteca_recursos (user_id, tipo, titulo, asignatura, nivel, contenido)
+    VALUES (
+        (registro ->> 'user_id')::uuid,
+        registro ->> 'tipo',
+        registro ->> 'titulo',
+        registro ->> 'asignatura',
+        registro ->> 'nivel',
+        registro -> 'contenido'
+    )
+    RETURNING id INTO nuevo_id;
+
+    INSERT INTO public.cobertura_curricular (user_id, nivel, asignatura, oa_id, recurso_id, tipo_recurso)
+    SELECT (registro ->> 'user_id')::uuid, registro ->> 'nivel', registro ->> 'asignatura', oa, nuevo_id, registro ->> 'tipo'
+    FROM unnest(COALESCE(oas, '{}')) AS oa;
+
+    RETURN nuevo_id;
+END;
+$$;
+
+-- 6. Seguridad (RLS): cada docente lee solo sus propios contadores. Los del colegio ('colegio')
+--    los lee el backend con service role, tras validar el rol en el endpoint.
+ALTER TABLE public.indice_uso_recursos ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.indice_cobertura_oa ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view their own usage index" ON public.indice_uso_recursos;
+CREATE POLICY "Users can view their own usage index"
+ON public.indice_uso_recursos FOR SELECT
+TO authenticated
+USING (ambito = 'usuario' AND ambito_id = auth.uid());
+
+DROP POLICY IF EXISTS "Users can view their own coverage index" ON public.indice_cobertura_oa;
+CREATE POLICY "Users can view their own coverage index"
+ON public.indice_cobertura_oa FOR SELECT
+TO authenticated
+USING (ambito = 'usuario' AND ambito_id = auth.uid());
+
+-- El tracker de cobertura se suscribe a los cambios de sus contadores (idempotente)
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_publication_tables
+        WHERE pubname = 'supabase_realtime' AND schemaname = 'public' AND tablename = 'indice_cobertura_oa'
+    ) THEN
+        ALTER PUBLICATION supabase_realtime ADD TABLE public.indice_cobertura_oa;
+    END IF;
+END $$;
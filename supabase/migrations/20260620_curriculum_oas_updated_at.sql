@@ -0,0 +1,25 @@
+-- MIGRATION: Marca de edición en curriculum_oas
+-- Fecha: 2026-06-20
+-- Descripción: El catálogo curricular en memoria del backend (app/services/curriculum_catalog.py)
+-- decide si recargar comparando una huella barata: conteo de filas + MAX(updated_at).
+-- Sin esta columna una corrección de la redacción de un OA no cambiaba la huella y el
+-- catálogo seguía sirviendo el texto anterior hasta reiniciar el proceso.
+
+-- 1. Columna (las filas existentes quedan con la fecha de la migración)
+ALTER TABLE public.curriculum_oas ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+
+CREATE INDEX IF NOT EXISTS idx_curriculum_oas_updated_at ON public.curriculum_oas (updated_at DESC);
+
+-- 2. Cada UPDATE renueva la marca (los INSERT la toman del DEFAULT)
+CREATE OR REPLACE FUNCTION public.curriculum_oas_marcar_edicion()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.updated_at := NOW();
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_curriculum_oas_updated_at ON public.curriculum_oas;
+CREATE TRIGGER trg_curriculum_oas_updated_at
+BEFORE UPDATE ON public.curriculum_oas
+FOR EACH ROW EXECUTE FUNCTION public.curriculum_oas_marcar_edicion();